@@ -33,6 +33,13 @@ class Settings(BaseSettings):
         description="サーバーポート番号",
     )
 
+    # ワーカープロセス数（python -m app.server で起動した場合）
+    web_concurrency: int = Field(
+        default=1,
+        ge=1,
+        description="ワーカープロセス数（タスクの vCPU 数に合わせる）",
+    )
+
     # 環境
     environment: Literal["development", "staging", "production"] = Field(
         default="development",
@@ -45,6 +52,168 @@ class Settings(BaseSettings):
         description="許可するCORSオリジン（カンマ区切り）",
     )
 
+    # 通報番号レピュテーションストア（空なら無効）
+    reputation_store_path: str = Field(
+        default="",
+        description="通報済み番号ストアファイルのパス",
+    )
+    reputation_reload_interval: float = Field(
+        default=30.0,
+        ge=0,
+        description="ストアファイル差し替えの確認間隔（秒、0で無効）",
+    )
+
+    # 詐欺会話の文字 n-gram 分類器（空なら無効、ルールの判定と並べてスコアを返す）
+    scam_model_path: str = Field(
+        default="",
+        description="文字 n-gram 分類器のモデルファイルのパス",
+    )
+
+    # 宣言的ルールバンドル（YAML/JSON、空なら組み込みのルールのみ）
+    rule_bundle_path: str = Field(
+        default="",
+        description="詐欺パターン・闇バイト辞書・しきい値などをまとめたルールバンドルのパス",
+    )
+    rule_bundle_reload_interval: float = Field(
+        default=10.0,
+        ge=0,
+        description="ルールバンドル差し替えの確認間隔（秒、0で無効）",
+    )
+    # 候補ルールのシャドー評価（空なら無効、実トラフィックの一部で現在のルールと判定を比べる）
+    shadow_rule_bundle_path: str = Field(
+        default="",
+        description="シャドー評価する候補ルールバンドルのパス",
+    )
+    shadow_sample_rate: float = Field(
+        default=0.05,
+        ge=0,
+        le=1,
+        description="シャドー評価するリクエストの割合",
+    )
+    # 管理用エンドポイント（/admin/*）のトークン（空なら管理用エンドポイントは無効）
+    admin_token: str = Field(
+        default="",
+        description="管理用エンドポイントの X-Admin-Token ヘッダーに指定するトークン",
+    )
+
+    # 通話中ストリーミング解析
+    stream_alert_threshold: int = Field(
+        default=70,
+        ge=0,
+        le=100,
+        description="リアルタイム警告を送るリスクスコアのしきい値",
+    )
+    stream_max_chunk_chars: int = Field(
+        default=4000,
+        ge=1,
+        description="ストリーミング解析で1メッセージに送れる最大文字数",
+    )
+
+    # 解析結果キャッシュ（エントリ数・バイト数のどちらかが0なら無効）
+    result_cache_max_entries: int = Field(
+        default=10000,
+        ge=0,
+        description="解析結果キャッシュの最大エントリ数（解析器ごと）",
+    )
+    result_cache_max_bytes: int = Field(
+        default=32 * 1024 * 1024,
+        ge=0,
+        description="解析結果キャッシュの最大バイト数（解析器ごと）",
+    )
+    result_cache_ttl: float = Field(
+        default=600.0,
+        gt=0,
+        description="解析結果キャッシュの有効期限（秒）",
+    )
+    # URL・番号・金額だけが違う文面の判定を使い回すキャッシュ（LLM のグレーゾーン判定、0 で無効）
+    near_duplicate_max_entries: int = Field(
+        default=20000,
+        ge=0,
+        description="ほぼ同じ本文の判定キャッシュの最大エントリ数",
+    )
+    near_duplicate_max_distance: int = Field(
+        default=3,
+        ge=0,
+        le=31,
+        description="同じ本文とみなす SimHash のハミング距離の上限",
+    )
+
+    # 画像アップロード（/check/dark-job-image/upload）
+    image_upload_max_bytes: int = Field(
+        default=10 * 1024 * 1024,
+        ge=1,
+        description="アップロード画像の最大バイト数",
+    )
+
+    # CPU処理の実行プール（種類=thread|process:ワーカー数:待ち行列長 をカンマ区切り）
+    executor_pools: str = Field(
+        default="analysis=thread:4:256,batch=thread:2:16,ocr=process:2:32,docs=thread:1:4,admin=thread:1:4,shadow=process:1:8",
+        description="エンドポイント種類ごとの実行プール設定",
+    )
+
+    # リクエスト1件の処理時間の予算（LLM 呼び出しの期限は残り時間から決める）
+    request_budget: float = Field(
+        default=0.5,
+        gt=0,
+        description="リクエスト1件の処理時間の予算（秒）",
+    )
+
+    # グレーゾーン判定の LLM（OpenAI 互換 API、空ならヒューリスティック補正のみ）
+    llm_base_url: str = Field(
+        default="",
+        description="LLM API のベースURL",
+    )
+    llm_api_key: str = Field(
+        default="",
+        description="LLM API のキー",
+    )
+    llm_timeout: float = Field(
+        default=0.4,
+        gt=0,
+        description="LLM 問い合わせ1件の最大待ち時間（秒、リクエストの残り時間の方が短ければそちら）",
+    )
+    llm_hedge_delay: float = Field(
+        default=0.15,
+        gt=0,
+        description="応答がないときに同じ問い合わせをもう1本送るまでの時間（秒）",
+    )
+    llm_max_attempts: int = Field(
+        default=2,
+        ge=1,
+        description="ヘッジ・再送を含めた1件あたりの最大送信数",
+    )
+    llm_max_connections: int = Field(
+        default=32,
+        ge=1,
+        description="LLM API への同時接続数の上限（ワーカーごと）",
+    )
+    llm_circuit_failure_threshold: int = Field(
+        default=5,
+        ge=1,
+        description="サーキットブレーカーを開く連続失敗回数",
+    )
+    llm_circuit_reset_timeout: float = Field(
+        default=30.0,
+        gt=0,
+        description="サーキットブレーカーを開いてから再試行するまでの時間（秒）",
+    )
+    llm_batch_window: float = Field(
+        default=0.01,
+        ge=0,
+        description="グレーゾーンの件をまとめて問い合わせるまで待つ最大時間（秒、0 でまとめない）",
+    )
+    llm_batch_max_size: int = Field(
+        default=16,
+        ge=1,
+        description="1回の問い合わせにまとめる最大件数（ワーカーごと）",
+    )
+
+    # 解析ステージ別のレイテンシ計測
+    stage_metrics_enabled: bool = Field(
+        default=True,
+        description="解析ステージ別ヒストグラム・入力サイズカウンターを記録するか",
+    )
+
     model_config = {
         "env_file": ".env",
         "case_sensitive": False,
@@ -58,6 +227,36 @@ class Settings(BaseSettings):
             return v.upper()
         return v
 
+    @field_validator("executor_pools")
+    @classmethod
+    def validate_executor_pools(cls, v: str) -> str:
+        """実行プール設定の書式を検証する。"""
+        cls.parse_executor_pools(v)
+        return v
+
+    @staticmethod
+    def parse_executor_pools(value: str) -> dict[str, tuple[str, int, int]]:
+        """「名前=種類:ワーカー数:待ち行列長」のカンマ区切りを解析する。"""
+        specs: dict[str, tuple[str, int, int]] = {}
+        for item in value.split(","):
+            if not item.strip():
+                continue
+            try:
+                name, spec = item.split("=")
+                kind, workers, queue_size = spec.split(":")
+                workers_n, queue_n = int(workers), int(queue_size)
+            except ValueError:
+                raise ValueError(f"実行プール設定の書式が不正です: {item.strip()}") from None
+            if kind.strip() not in ("thread", "process") or workers_n < 1 or queue_n < 0:
+                raise ValueError(f"実行プール設定の値が不正です: {item.strip()}")
+            specs[name.strip()] = (kind.strip(), workers_n, queue_n)
+        return specs
+
+    @property
+    def executor_pool_specs(self) -> dict[str, tuple[str, int, int]]:
+        """実行プール設定を辞書で返す。"""
+        return self.parse_executor_pools(self.executor_pools)
+
     @property
     def is_production(self) -> bool:
         """本番環境かどうかを返す。"""
@@ -6,17 +6,31 @@ import re
 import time
 import uuid
 from contextlib import asynccontextmanager
+from functools import partial
 
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-from starlette.middleware.base import BaseHTTPMiddleware
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST, multiprocess
 from starlette.responses import HTMLResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.config import get_settings
 from app.logging_config import setup_logging
-from app.routers import advice, conversation, dark_job, health, metadata, summary
+from app.routers import admin, advice, conversation, dark_job, event, health, metadata, summary
+from app.services.executor import ExecutorSaturatedError, get_executor, shutdown_executors
+from app.services.llm_client import get_llm_client
+from app.services.rule_bundle import get_rule_registry
+from app.services.stage_metrics import (
+    MULTIPROCESS,
+    MultiProcessStageCollector,
+    flush,
+    reset_endpoint,
+    set_endpoint,
+    stage,
+    start_flusher,
+    stop_flusher,
+)
 
 # 設定読み込み（起動時にバリデーション実行）
 settings = get_settings()
@@ -47,57 +61,48 @@ async def lifespan(app: FastAPI):
         settings.log_level,
         settings.port,
     )
+    # OpenAPI スキーマの生成（日本語化を含む）をイベントループ外で済ませておく
+    await get_executor("docs").run(app.openapi)
+    start_flusher()
+    get_rule_registry().start()
     yield
     logger.info("AI service shutting down gracefully")
+    get_rule_registry().stop()
+    shutdown_executors()
+    llm_client = get_llm_client()
+    if llm_client is not None:
+        await llm_client.aclose()
+    stop_flusher()
 
 
-# リクエストサイズ制限ミドルウェア（1MB）
+# リクエストサイズ上限（1MB）
 MAX_REQUEST_SIZE = 1 * 1024 * 1024  # 1MB
 
 
-class RequestSizeLimitMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        content_length = request.headers.get("content-length")
-        if content_length and int(content_length) > MAX_REQUEST_SIZE:
-            return JSONResponse(
-                status_code=413,
-                content={"detail": "リクエストボディが大きすぎます（上限: 1MB）"},
-            )
-        return await call_next(request)
-
-
-# WP-1: セキュリティヘッダーミドルウェア
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response: Response = await call_next(request)
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "camera=(), microphone=(), geolocation=()"
-        if IS_PRODUCTION:
-            response.headers["Strict-Transport-Security"] = (
-                "max-age=31536000; includeSubDomains"
-            )
-        return response
+# 読み込みながら独自の上限を適用するアップロード用エンドポイント
+STREAMING_UPLOAD_PATHS = {"/api/v1/check/dark-job-image/upload"}
 
 
-# WP-3: 相関IDミドルウェア
-class CorrelationIdMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        request_id = request.headers.get("x-request-id") or str(uuid.uuid4())
-        # ログにリクエストID付与
-        logger_ctx = logging.LoggerAdapter(
-            logging.getLogger("request"),
-            {"request_id": request_id},
-        )
-        request.state.request_id = request_id
-        response: Response = await call_next(request)
-        response.headers["X-Request-ID"] = request_id
-        return response
+# WP-1: セキュリティヘッダー
+SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (b"permissions-policy", b"camera=(), microphone=(), geolocation=()"),
+]
+if IS_PRODUCTION:
+    SECURITY_HEADERS.append((b"strict-transport-security", b"max-age=31536000; includeSubDomains"))
+
+# アプリが同名のヘッダーを返した場合はこちらの値で上書きする
+_OVERRIDDEN_HEADERS = frozenset(name for name, _ in SECURITY_HEADERS) | {b"x-request-id"}
 
 
-# WP-6: Prometheusメトリクスミドルウェア
+# WP-6: Prometheusメトリクス
+# path ラベルはマッチしたルートのパステンプレート。存在しないパスへのスキャンで
+# 系列が際限なく増えないよう、どのルートにも一致しなかったリクエストはまとめる
+UNMATCHED_PATH = "unmatched"
+
 http_requests_total = Counter(
     "http_requests_total",
     "Total HTTP requests",
@@ -111,39 +116,115 @@ http_request_duration_seconds = Histogram(
 )
 
 
-class MetricsMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start = time.time()
-        response: Response = await call_next(request)
-        duration = time.time() - start
-        path = request.url.path
-        http_requests_total.labels(
-            method=request.method, path=path, status_code=response.status_code
-        ).inc()
-        http_request_duration_seconds.labels(
-            method=request.method, path=path
-        ).observe(duration)
-        return response
-
-
-# WP-2: リクエストログミドルウェア
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start = time.time()
-        response: Response = await call_next(request)
-        duration_ms = round((time.time() - start) * 1000, 2)
-        request_id = getattr(request.state, "request_id", "-")
+def route_template(scope: Scope) -> str:
+    """マッチしたルートのパステンプレート（プレフィックス込み）を返す。"""
+    route = scope.get("route")
+    if route is None:
+        return UNMATCHED_PATH
+    # FastAPI 0.14x の include_router はルートを複製しないため、route.path にはプレフィックスが
+    # 付かない。プレフィックス込みのパスはルーティング時のコンテキストに残る
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    return getattr(context, "path", None) or getattr(route, "path", UNMATCHED_PATH)
+
+
+class RequestContextMiddleware:
+    """相関ID・サイズ制限・セキュリティヘッダー・メトリクス・リクエストログをまとめた ASGI ミドルウェア
+
+    BaseHTTPMiddleware を重ねると層ごとにタスクの受け渡しとレスポンスの包み直しが
+    発生し、ルールベースの軽いエンドポイントでは解析そのものより重くなります。
+    ここでは send を一度だけ包み、レスポンス開始時にヘッダーを付与し、
+    アプリの処理が終わった時点でメトリクスとログを記録します。
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self.app(scope, receive, send)
+            return
+        # 解析ステージの計測にエンドポイント名を付ける（ルーティング後に解決する）
+        endpoint_token = set_endpoint(partial(route_template, scope))
+        try:
+            if scope["type"] == "http":
+                await self._handle_http(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            reset_endpoint(endpoint_token)
+
+    async def _handle_http(self, scope: Scope, receive: Receive, send: Send) -> None:
+
+        # WP-3: 相関ID（ヘッダーになければ採番し、ログと例外ハンドラから参照できるよう state に置く）
+        request_id = content_length = None
+        for key, value in scope["headers"]:
+            if key == b"x-request-id" and request_id is None:
+                request_id = value.decode("latin-1")
+            elif key == b"content-length" and content_length is None:
+                content_length = value
+        request_id = request_id or str(uuid.uuid4())
+        state = scope.setdefault("state", {})
+        state["request_id"] = request_id
+        # 処理時間の予算の期限（LLM 呼び出しなど、待ち時間のある処理の打ち切りに使う）
+        state["deadline"] = time.monotonic() + settings.request_budget
+        request_id_header = (b"x-request-id", request_id.encode("latin-1"))
+
+        # リクエストサイズ制限（1MB）
+        path = scope["path"]
+        if (
+            content_length is not None
+            and path not in STREAMING_UPLOAD_PATHS
+            and int(content_length) > MAX_REQUEST_SIZE
+        ):
+            response = JSONResponse(
+                status_code=413,
+                content={"detail": "リクエストボディが大きすぎます（上限: 1MB）"},
+            )
+            response.raw_headers.append(request_id_header)
+            await response(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_headers(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [
+                    header for header in message.get("headers", ()) if header[0] not in _OVERRIDDEN_HEADERS
+                ]
+                headers += SECURITY_HEADERS
+                headers.append(request_id_header)
+                message = {**message, "headers": headers}
+            await send(message)
+
+        start = time.perf_counter()
+        await self.app(scope, receive, send_with_headers)
+        duration = time.perf_counter() - start
+
+        method = scope["method"]
+        template = route_template(scope)
+        http_requests_total.labels(method=method, path=template, status_code=status_code).inc()
+        http_request_duration_seconds.labels(method=method, path=template).observe(duration)
+        # WP-2: リクエストログ
         logger.info(
             "request completed",
             extra={
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
-                "duration_ms": duration_ms,
+                "method": method,
+                "path": path,
+                "status_code": status_code,
+                "duration_ms": round(duration * 1000, 2),
                 "request_id": request_id,
             },
         )
-        return response
+
+
+class StageTimedJSONResponse(JSONResponse):
+    """本文の JSON 化を解析ステージ "serialize" として計測する既定のレスポンスクラス"""
+
+    def render(self, content) -> bytes:
+        with stage("serialize"):
+            return super().render(content)
 
 
 app = FastAPI(
@@ -153,14 +234,11 @@ app = FastAPI(
     docs_url=None,  # カスタムdocsを使用するため無効化
     redoc_url="/redoc",
     lifespan=lifespan,
+    default_response_class=StageTimedJSONResponse,
 )
 
 # ミドルウェア登録（逆順で実行される）
-app.add_middleware(RequestLoggingMiddleware)
-app.add_middleware(MetricsMiddleware)
-app.add_middleware(SecurityHeadersMiddleware)
-app.add_middleware(RequestSizeLimitMiddleware)
-app.add_middleware(CorrelationIdMiddleware)
+app.add_middleware(RequestContextMiddleware)
 
 # WP-3: CORS環境別ホワイトリスト
 if IS_PRODUCTION:
@@ -177,6 +255,21 @@ app.add_middleware(
 )
 
 
+# 実行プールが満杯のときは 503 で再試行を促す
+@app.exception_handler(ExecutorSaturatedError)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturatedError):
+    logger.warning(
+        "Executor pool saturated: %s",
+        exc.pool,
+        extra={"request_id": getattr(request.state, "request_id", "unknown")},
+    )
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "解析処理が混み合っています。しばらくしてから再度お試しください。"},
+        headers={"Retry-After": "1"},
+    )
+
+
 # WP-4: グローバル例外ハンドラ
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -205,12 +298,21 @@ app.include_router(dark_job.router, prefix="/api/v1", tags=["闇バイトチェ
 app.include_router(metadata.router, prefix="/api/v1", tags=["着信メタデータ解析"])
 app.include_router(summary.router, prefix="/api/v1", tags=["会話サマリー"])
 app.include_router(advice.router, prefix="/api/v1", tags=["地域別アドバイス"])
+app.include_router(event.router, prefix="/api/v1", tags=["統合イベント解析"])
+app.include_router(admin.router, prefix="/api/v1", tags=["管理"])
 
 
 # WP-6: Prometheusメトリクスエンドポイント
 @app.get("/metrics", include_in_schema=False)
 async def metrics():
-    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    if not MULTIPROCESS:
+        return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    # 複数ワーカー構成（python -m app.server）では全ワーカーの共有ファイルを合算して返す
+    flush()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    MultiProcessStageCollector(registry)
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
 
 
 # ── スキーマ名の日本語マッピング ──
@@ -229,6 +331,17 @@ SCHEMA_RENAMES = {
     "RegionalAdviceResponse": "地域別アドバイスレスポンス",
     "DarkJobImageCheckRequest": "闇バイト画像チェックリクエスト",
     "DarkJobImageCheckResponse": "闇バイト画像チェックレスポンス",
+    "ConversationBatchRequest": "会話解析バッチリクエスト",
+    "ConversationBatchResponse": "会話解析バッチレスポンス",
+    "ConversationBatchItem": "会話解析バッチ結果",
+    "DarkJobBatchRequest": "闇バイトチェックバッチリクエスト",
+    "DarkJobBatchResponse": "闇バイトチェックバッチレスポンス",
+    "DarkJobBatchItem": "闇バイトチェックバッチ結果",
+    "MetadataBatchRequest": "メタデータ解析バッチリクエスト",
+    "MetadataBatchResponse": "メタデータ解析バッチレスポンス",
+    "MetadataBatchItem": "メタデータ解析バッチ結果",
+    "EventAnalysisRequest": "統合イベント解析リクエスト",
+    "EventAnalysisResponse": "統合イベント解析レスポンス",
     "HTTPValidationError": "HTTPバリデーションエラー",
     "ValidationError": "バリデーションエラー詳細",
 }
@@ -237,6 +350,9 @@ _original_openapi = app.openapi
 
 
 def custom_openapi():
+    # 日本語化済みのスキーマは初回生成後に使い回す
+    if app.openapi_schema is not None:
+        return app.openapi_schema
     schema = _original_openapi()
 
     # スキーマキー名を日本語に書き換え
@@ -258,6 +374,7 @@ def custom_openapi():
         new_components[new_key] = value
     schema["components"]["schemas"] = new_components
 
+    app.openapi_schema = schema
     return schema
 
 
@@ -0,0 +1,148 @@
+"""管理用エンドポイント（ルールバンドルの確認・再読み込み、シャドー評価の集計）"""
+
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from pydantic import BaseModel, Field
+
+from app.config import get_settings
+from app.routers.coalescing import run_in_pool
+from app.services.rule_bundle import get_rule_registry
+from app.services.shadow_eval import get_shadow_evaluator
+
+router = APIRouter()
+
+
+def require_admin_token(x_admin_token: str | None = Header(None)) -> None:
+    """X-Admin-Token ヘッダーを検証する（トークン未設定なら管理用エンドポイントは存在しない扱い）。"""
+    expected = get_settings().admin_token
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="管理用トークンが正しくありません")
+
+
+class RuleBundleStatus(BaseModel):
+    model_config = {"json_schema_extra": {"title": "ルールバンドルの状態"}}
+    version: str = Field(..., description="使用中のルールバンドルのバージョン")
+    path: str | None = Field(None, description="ルールバンドルのパス（未設定なら組み込みのルール）")
+    loaded_at: float = Field(..., description="ルールを読み込んだ時刻（UNIX時間）")
+    model_versions: dict[str, str] = Field(..., description="解析器ごとの model_version")
+    reloaded: bool | None = Field(None, description="再読み込みでルールが切り替わったか（再読み込み時のみ）")
+
+
+def rule_bundle_status(reloaded: bool | None = None) -> RuleBundleStatus:
+    registry = get_rule_registry()
+    rules = registry.current
+    return RuleBundleStatus(
+        version=rules.version,
+        path=str(registry.path) if registry.path is not None else None,
+        loaded_at=registry.loaded_at,
+        model_versions=rules.model_versions,
+        reloaded=reloaded,
+    )
+
+
+@router.get(
+    "/admin/rules",
+    response_model=RuleBundleStatus,
+    response_model_exclude_none=True,
+    summary="ルールバンドルの状態",
+    description="このワーカーが使用中のルールバンドルのバージョンと読み込み時刻を返します。",
+    dependencies=[Depends(require_admin_token)],
+    responses={
+        200: {"description": "取得成功"},
+        403: {"description": "管理用トークンが正しくない"},
+    },
+)
+async def get_rules():
+    """使用中のルールバンドルの状態を返します。"""
+    return rule_bundle_status()
+
+
+@router.post(
+    "/admin/rules/reload",
+    response_model=RuleBundleStatus,
+    response_model_exclude_none=True,
+    summary="ルールバンドルの再読み込み",
+    description=(
+        "ルールバンドルのファイルを読み直して切り替えます。読み込み・検証に失敗した場合は"
+        "現在のルールを使い続けます。複数ワーカー構成では、リクエストを受けたワーカーだけが"
+        "即時に切り替わります（他のワーカーはファイル監視の間隔で追従します）。"
+    ),
+    dependencies=[Depends(require_admin_token)],
+    responses={
+        200: {"description": "再読み込み成功"},
+        403: {"description": "管理用トークンが正しくない"},
+        409: {"description": "ルールバンドルのパスが設定されていない"},
+        422: {"description": "ルールバンドルの読み込み・検証エラー"},
+    },
+)
+async def reload_rules():
+    """ルールバンドルを読み直して切り替えます。"""
+    registry = get_rule_registry()
+    if registry.path is None:
+        raise HTTPException(status_code=409, detail="ルールバンドルのパスが設定されていません")
+    try:
+        reloaded = await run_in_pool("admin", registry.reload, True)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"ルールバンドルを読み込めません: {e}") from None
+    return rule_bundle_status(reloaded)
+
+
+class ShadowFlip(BaseModel):
+    current: str = Field(..., description="現在のルールでのリスクレベル")
+    candidate: str = Field(..., description="候補ルールでのリスクレベル")
+    count: int = Field(..., description="件数")
+
+
+class ShadowKeywordDiff(BaseModel):
+    keyword: str = Field(..., description="キーワード")
+    gained: int = Field(..., description="候補ルールでだけ検出された件数")
+    lost: int = Field(..., description="現在のルールでだけ検出された件数")
+
+
+class ShadowAnalyzerSummary(BaseModel):
+    evaluated: int = Field(..., description="評価した件数")
+    changed: int = Field(..., description="リスクスコアが変わった件数")
+    mean_delta: float = Field(..., description="リスクスコアの差（候補 − 現在）の平均")
+    mean_abs_delta: float = Field(..., description="リスクスコアの差の絶対値の平均")
+    max_increase: int = Field(..., description="リスクスコアの最大の増加")
+    max_decrease: int = Field(..., description="リスクスコアの最大の減少（負の値）")
+    delta_histogram: dict[str, int] = Field(..., description="リスクスコアの差の分布（区間の上限 → 件数）")
+    flips: list[ShadowFlip] = Field(..., description="リスクレベルが変わった件数")
+    keywords: list[ShadowKeywordDiff] = Field(..., description="ヒットの増減が多いキーワード")
+
+
+class ShadowSummary(BaseModel):
+    model_config = {"json_schema_extra": {"title": "シャドー評価の集計"}}
+    enabled: bool = Field(..., description="シャドー評価が有効か")
+    sample_rate: float = Field(..., description="評価するリクエストの割合")
+    current_version: str | None = Field(None, description="比較した現在のルールのバージョン")
+    candidate_version: str | None = Field(None, description="比較した候補ルールのバージョン")
+    since: float = Field(..., description="集計の開始時刻（UNIX時間）")
+    sampled: int = Field(..., description="抽出した件数")
+    shed: dict[str, int] = Field(..., description="混雑のため評価せずに捨てた件数（理由別）")
+    errors: int = Field(..., description="評価に失敗した件数")
+    analyzers: dict[str, ShadowAnalyzerSummary] = Field(..., description="解析器ごとの集計")
+
+
+@router.get(
+    "/admin/shadow",
+    response_model=ShadowSummary,
+    summary="シャドー評価の集計",
+    description=(
+        "候補ルールバンドルを実トラフィックの一部で現在のルールと並べて実行した結果"
+        "（リスクスコアの差・リスクレベルの変化・キーワードごとのヒットの増減）を返します。"
+        "集計はワーカーごとです。"
+    ),
+    dependencies=[Depends(require_admin_token)],
+    responses={
+        200: {"description": "取得成功"},
+        403: {"description": "管理用トークンが正しくない"},
+    },
+)
+async def get_shadow_summary(top_keywords: int = Query(50, ge=1, le=1000, description="返すキーワードの件数")):
+    """シャドー評価の集計を返します。"""
+    shadow = get_shadow_evaluator()
+    return {"enabled": shadow.enabled, "sample_rate": shadow.sample_rate, **shadow.stats.summary(top_keywords)}
@@ -0,0 +1,54 @@
+"""バッチエンドポイント共通処理
+
+バッチリクエストは件ごとに単件エンドポイントと同じモデルで検証し、
+不正な件があってもリクエスト全体は失敗させず、その件だけエラーとして返します。
+"""
+
+from typing import Any, TypeVar
+
+from pydantic import BaseModel, Field, ValidationError
+
+# 1リクエストあたりの最大件数
+BATCH_MAX_ITEMS = 1000
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+class BatchRequest(BaseModel):
+    items: list[Any] = Field(
+        ...,
+        min_length=1,
+        max_length=BATCH_MAX_ITEMS,
+        description=f"解析対象の一覧（最大{BATCH_MAX_ITEMS}件、各要素は単件APIと同じ形式）",
+    )
+
+
+def validate_items(
+    model: type[ModelT], items: list[Any]
+) -> tuple[list[tuple[int, ModelT]], dict[int, str]]:
+    """各件を model で検証し、(有効な件の (添字, モデル) 一覧, 添字→エラー文) を返す。"""
+    valid: list[tuple[int, ModelT]] = []
+    errors: dict[int, str] = {}
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as e:
+            errors[index] = "; ".join(
+                f"{'.'.join(str(p) for p in err['loc']) or 'item'}: {err['msg']}" for err in e.errors()
+            )
+    return valid, errors
+
+
+def assemble_results(
+    size: int,
+    valid: list[tuple[int, Any]],
+    results: list[dict],
+    errors: dict[int, str],
+) -> list[dict]:
+    """有効件の結果とエラーを入力順の一覧にまとめる。"""
+    merged: list[dict] = [{} for _ in range(size)]
+    for (index, _), result in zip(valid, results):
+        merged[index] = {"index": index, "result": result, "error": None}
+    for index, message in errors.items():
+        merged[index] = {"index": index, "result": None, "error": message}
+    return merged
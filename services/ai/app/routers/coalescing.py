@@ -0,0 +1,53 @@
+"""ルーター共通: 実行プールでの解析とリクエスト合流
+
+解析はエンドポイント種類ごとの実行プールで実行し、その間に届いた同じ入力
+（または同じ X-Request-ID の再送）のリクエストは実行中の計算に合流させます。
+"""
+
+from collections.abc import Callable
+from typing import Any
+
+from fastapi import Request
+
+from app.services.executor import get_executor
+from app.services.single_flight import SingleFlight, flight_key
+
+_flights: dict[str, SingleFlight] = {}
+
+
+def get_request_id(request: Request) -> str | None:
+    """RequestContextMiddleware が設定したリクエストIDを返す（依存関係として使用）。"""
+    return getattr(request.state, "request_id", None)
+
+
+def get_deadline(request: Request) -> float | None:
+    """RequestContextMiddleware が設定した処理期限（time.monotonic() 基準）を返す（依存関係として使用）。"""
+    return getattr(request.state, "deadline", None)
+
+
+def get_flight(operation: str) -> SingleFlight:
+    flight = _flights.get(operation)
+    if flight is None:
+        flight = _flights[operation] = SingleFlight(operation)
+    return flight
+
+
+async def run_in_pool(pool: str, fn: Callable[..., Any], *args: Any) -> Any:
+    """fn(*args) を指定した実行プールで実行する。"""
+    return await get_executor(pool).run(fn, *args)
+
+
+async def run_coalesced(
+    operation: str,
+    key_parts: tuple[str | bytes | None, ...],
+    fn: Callable[..., Any],
+    *args: Any,
+    request_id: str | None = None,
+    pool: str = "analysis",
+) -> Any:
+    """fn(*args) を実行プールで実行する。同じキーの計算が実行中なら合流する。"""
+    return await get_flight(operation).run(
+        flight_key(*key_parts),
+        lambda: run_in_pool(pool, fn, *args),
+        request_id=request_id,
+    )
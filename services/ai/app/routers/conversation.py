@@ -1,12 +1,27 @@
 """会話解析エンドポイント"""
 
+import json
+
 from pydantic import BaseModel, Field
-from fastapi import APIRouter
+from fastapi import APIRouter, BackgroundTasks, Depends, WebSocket, WebSocketDisconnect
 
+from app.config import get_settings
+from app.routers.batching import BatchRequest, assemble_results, validate_items
+from app.routers.coalescing import get_request_id, run_coalesced, run_in_pool
+from app.services.conversation_stream import ConversationStreamSession
+from app.services.ngram_model import get_scam_model
+from app.services.result_cache import get_result_cache
+from app.services.rule_bundle import get_rule_registry
 from app.services.scam_analyzer import ScamAnalyzer
+from app.services.shadow_eval import get_shadow_evaluator
 
 router = APIRouter()
-analyzer = ScamAnalyzer()
+analyzer = ScamAnalyzer(
+    cache=get_result_cache("conversation"),
+    model=get_scam_model(),
+    rules=get_rule_registry().scam_rules,
+)
+shadow = get_shadow_evaluator()
 
 
 class ConversationRequest(BaseModel):
@@ -15,6 +30,11 @@ class ConversationRequest(BaseModel):
     caller_number: str | None = Field(None, description="発信者の電話番号")
 
 
+class ModelScore(BaseModel):
+    risk_score: int = Field(..., ge=0, le=100, description="学習モデルのリスクスコア（0〜100）")
+    model_version: str = Field(..., description="学習モデルのバージョン")
+
+
 class AnalysisResponse(BaseModel):
     model_config = {"json_schema_extra": {"title": "会話解析レスポンス"}}
     risk_score: int = Field(..., ge=0, le=100, description="リスクスコア（0〜100）")
@@ -22,6 +42,9 @@ class AnalysisResponse(BaseModel):
     summary: str = Field(..., description="解析結果の要約")
     keywords_found: list[str] = Field(..., description="検出されたキーワード一覧")
     model_version: str = Field(..., description="使用モデルのバージョン")
+    model_score: ModelScore | None = Field(
+        None, description="ルールと並べて求めた学習モデルのスコア（モデル未設定時は null）"
+    )
 
 
 @router.post(
@@ -34,12 +57,114 @@ class AnalysisResponse(BaseModel):
         422: {"description": "入力値バリデーションエラー"},
     },
 )
-async def analyze_conversation(request: ConversationRequest):
+async def analyze_conversation(
+    request: ConversationRequest,
+    background_tasks: BackgroundTasks,
+    request_id: str | None = Depends(get_request_id),
+):
     """通話内容のテキストを解析し、詐欺の可能性を判定します。"""
-    result = analyzer.analyze(request.text, request.caller_number)
+    result = await run_coalesced(
+        "conversation", (request.text,), analyzer.analyze, request.text, request_id=request_id
+    )
+    # 候補ルールのシャドー評価はレスポンスの送信後に投入する
+    if shadow.sample():
+        background_tasks.add_task(shadow.submit, "conversation", request.text)
     return result
 
 
+class ConversationBatchRequest(BatchRequest):
+    model_config = {"json_schema_extra": {"title": "会話解析バッチリクエスト"}}
+
+
+class ConversationBatchItem(BaseModel):
+    index: int = Field(..., description="入力一覧での位置")
+    result: AnalysisResponse | None = Field(None, description="解析結果（エラー時は null）")
+    error: str | None = Field(None, description="入力エラーの内容")
+
+
+class ConversationBatchResponse(BaseModel):
+    model_config = {"json_schema_extra": {"title": "会話解析バッチレスポンス"}}
+    results: list[ConversationBatchItem] = Field(..., description="入力順の解析結果")
+
+
+@router.post(
+    "/analyze/conversation:batch",
+    response_model=ConversationBatchResponse,
+    summary="会話テキスト一括解析",
+    description="複数の会話テキストをまとめて解析します。不正な件はその件のみエラーを返します。",
+    responses={
+        200: {"description": "解析成功（件ごとのエラーを含む場合あり）"},
+        422: {"description": "入力値バリデーションエラー"},
+    },
+)
+async def analyze_conversation_batch(request: ConversationBatchRequest):
+    """複数の会話テキストをまとめて解析します。"""
+    valid, errors = validate_items(ConversationRequest, request.items)
+    results = await run_in_pool("batch", analyzer.analyze_batch, [item.text for _, item in valid])
+    return {"results": assemble_results(len(request.items), valid, results, errors)}
+
+
+@router.websocket("/analyze/conversation/stream")
+async def analyze_conversation_stream(websocket: WebSocket, threshold: int | None = None):
+    """通話中の文字起こしを逐次解析します。
+
+    クライアントは {"text": "<新しく確定した文字起こし>"} をチャンクごとに送り、
+    通話終了時に {"type": "end"} を送ります。サーバーからは次のメッセージを返します。
+
+    - update: 新しいキーワードを検出した（リスクスコアが変わりうる）とき
+    - alert: リスクスコアが初めてしきい値以上になったとき（解析結果全体を含む）
+    - final: 終了時の解析結果（/analyze/conversation と同じ形式）
+    - error: 不正なメッセージ（セッションは継続）
+    """
+    settings = get_settings()
+    if threshold is None:
+        threshold = settings.stream_alert_threshold
+    await websocket.accept()
+    session = ConversationStreamSession(min(max(threshold, 0), 100), analyzer)
+
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                await websocket.send_json({"type": "error", "detail": "JSON形式で送信してください"})
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "detail": "オブジェクト形式で送信してください"})
+                continue
+
+            if message.get("type") == "end":
+                session.finish()
+                await websocket.send_json({"type": "final", "chars": session.chars, **session.result()})
+                await websocket.close()
+                return
+
+            chunk = message.get("text")
+            if not isinstance(chunk, str):
+                await websocket.send_json({"type": "error", "detail": "text は文字列で指定してください"})
+                continue
+            if len(chunk) > settings.stream_max_chunk_chars:
+                await websocket.send_json({
+                    "type": "error",
+                    "detail": f"1メッセージは{settings.stream_max_chunk_chars}文字以内で送信してください",
+                })
+                continue
+
+            new_keywords, crossed = session.feed(chunk)
+            if crossed:
+                await websocket.send_json({"type": "alert", "chars": session.chars, **session.result()})
+            elif new_keywords:
+                await websocket.send_json({
+                    "type": "update",
+                    "chars": session.chars,
+                    "risk_score": session.risk_score,
+                    "scam_type": session.scam_type,
+                    "new_keywords": new_keywords,
+                })
+    except WebSocketDisconnect:
+        pass
+
+
 class QuickCheckRequest(BaseModel):
     model_config = {"json_schema_extra": {"title": "クイックチェックリクエスト"}}
     text: str = Field(..., min_length=1, description="チェック対象のテキスト")
@@ -62,9 +187,11 @@ class QuickCheckResponse(BaseModel):
         422: {"description": "入力値バリデーションエラー"},
     },
 )
-async def quick_check(request: QuickCheckRequest):
+async def quick_check(request: QuickCheckRequest, request_id: str | None = Depends(get_request_id)):
     """「これ詐欺？」ボタン用の簡易チェックを実行します。"""
-    result = analyzer.analyze(request.text)
+    result = await run_coalesced(
+        "conversation", (request.text,), analyzer.analyze, request.text, request_id=request_id
+    )
     return QuickCheckResponse(
         is_suspicious=result["risk_score"] >= 50,
         risk_score=result["risk_score"],
@@ -1,14 +1,41 @@
 """闇バイトチェックエンドポイント"""
 
-from fastapi import APIRouter
+from functools import partial
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from pydantic import BaseModel, Field
 
+from app.config import get_settings
+from app.routers.batching import BatchRequest, assemble_results, validate_items
+from app.routers.coalescing import get_deadline, get_flight, get_request_id, run_coalesced, run_in_pool
 from app.services.dark_job_checker import DarkJobChecker
-from app.services.ocr_service import OcrService
+from app.services.executor import get_executor
+from app.services.image_upload import (
+    IMAGE_FIELD_NAME,
+    MULTIPART_OVERHEAD,
+    UploadBuffer,
+    UploadFormatError,
+    UploadTooLargeError,
+    multipart_boundary,
+    read_image_upload,
+)
+from app.services.llm_client import get_llm_client
+from app.services.near_duplicate import get_near_duplicate_cache
+from app.services.ocr_service import OcrService, extract_text_from_shared_memory
+from app.services.result_cache import get_result_cache
+from app.services.rule_bundle import get_rule_registry
+from app.services.shadow_eval import get_shadow_evaluator
+from app.services.single_flight import flight_key
 
 router = APIRouter()
-checker = DarkJobChecker()
+checker = DarkJobChecker(
+    cache=get_result_cache("dark_job"),
+    llm=get_llm_client(),
+    near_cache=get_near_duplicate_cache("dark_job_llm"),
+    rules=get_rule_registry().dark_job_rules,
+)
 ocr_service = OcrService()
+shadow = get_shadow_evaluator()
 
 
 class DarkJobCheckRequest(BaseModel):
@@ -44,12 +71,79 @@ class DarkJobCheckResponse(BaseModel):
         422: {"description": "入力値バリデーションエラー"},
     },
 )
-async def check_dark_job(request: DarkJobCheckRequest):
+async def check_dark_job(
+    request: DarkJobCheckRequest,
+    background_tasks: BackgroundTasks,
+    request_id: str | None = Depends(get_request_id),
+    deadline: float | None = Depends(get_deadline),
+):
     """メッセージや求人投稿が闇バイトの勧誘かどうかを判定します。"""
-    result = checker.check(request.text, request.source)
+    result = await _check_text(request.text, request.source, request_id=request_id, deadline=deadline)
+    if shadow.sample():
+        background_tasks.add_task(shadow.submit, "dark_job", request.text)
     return result
 
 
+async def _check_text(
+    text: str,
+    source: str | None,
+    *,
+    request_id: str | None = None,
+    deadline: float | None = None,
+) -> dict:
+    """1件を判定する。LLM 設定時はグレーゾーンの件を期限まで LLM に問い合わせる。"""
+    if checker.llm is None:
+        return await run_coalesced("dark_job", (text,), checker.check, text, source, request_id=request_id)
+    # ルール照合は実行プール、LLM の待ちはイベントループで行う
+    return await get_flight("dark_job").run(
+        flight_key(text),
+        lambda: checker.check_async(text, source, deadline=deadline, run=partial(run_in_pool, "analysis")),
+        request_id=request_id,
+    )
+
+
+class DarkJobBatchRequest(BatchRequest):
+    model_config = {"json_schema_extra": {"title": "闇バイトチェックバッチリクエスト"}}
+
+
+class DarkJobBatchItem(BaseModel):
+    index: int = Field(..., description="入力一覧での位置")
+    result: DarkJobCheckResponse | None = Field(None, description="判定結果（エラー時は null）")
+    error: str | None = Field(None, description="入力エラーの内容")
+
+
+class DarkJobBatchResponse(BaseModel):
+    model_config = {"json_schema_extra": {"title": "闇バイトチェックバッチレスポンス"}}
+    results: list[DarkJobBatchItem] = Field(..., description="入力順の判定結果")
+
+
+@router.post(
+    "/check/dark-job:batch",
+    response_model=DarkJobBatchResponse,
+    summary="闇バイト一括チェック",
+    description=(
+        "複数のメッセージや求人投稿をまとめて判定します。不正な件はその件のみエラーを返します。"
+        "LLM 設定時は、ルールスコアがグレーゾーンに入った件を単件のチェックと同じく LLM に問い合わせるため、"
+        "同じテキストには単件のチェックと同じ判定を返します。"
+    ),
+    responses={
+        200: {"description": "チェック成功（件ごとのエラーを含む場合あり）"},
+        422: {"description": "入力値バリデーションエラー"},
+    },
+)
+async def check_dark_job_batch(
+    request: DarkJobBatchRequest,
+    deadline: float | None = Depends(get_deadline),
+):
+    """複数のメッセージや求人投稿をまとめて判定します。"""
+    valid, errors = validate_items(DarkJobCheckRequest, request.items)
+    # ルール照合は全件まとめて一括用プールで行い、グレーゾーンの件だけ期限まで LLM を待つ
+    results = await checker.check_batch_async(
+        [item.text for _, item in valid], deadline=deadline, run=partial(run_in_pool, "batch")
+    )
+    return {"results": assemble_results(len(request.items), valid, results, errors)}
+
+
 @router.post(
     "/check/dark-job-image",
     response_model=DarkJobCheckResponse,
@@ -60,10 +154,21 @@ async def check_dark_job(request: DarkJobCheckRequest):
         422: {"description": "入力値バリデーションエラー"},
     },
 )
-async def check_dark_job_image(request: DarkJobImageCheckRequest):
+async def check_dark_job_image(
+    request: DarkJobImageCheckRequest,
+    request_id: str | None = Depends(get_request_id),
+    deadline: float | None = Depends(get_deadline),
+):
     """画像からOCRでテキスト抽出→闇バイト判定"""
-    extracted_text = ocr_service.extract_text(request.image_base64)
+    extracted_text = await run_coalesced(
+        "ocr", (request.image_base64,), ocr_service.extract_text, request.image_base64,
+        request_id=request_id, pool="ocr",
+    )
+    return await _check_extracted_text(extracted_text, request.source, deadline)
+
 
+async def _check_extracted_text(extracted_text: str, source: str | None, deadline: float | None):
+    """OCRの抽出結果を闇バイト判定し、抽出テキストを添えて返す。"""
     if not extracted_text:
         return DarkJobCheckResponse(
             is_dark_job=False,
@@ -75,6 +180,83 @@ async def check_dark_job_image(request: DarkJobImageCheckRequest):
             extracted_text="",
         )
 
-    result = checker.check(extracted_text, request.source or "image_ocr")
-    result["extracted_text"] = extracted_text
-    return result
+    result = await _check_text(extracted_text, source or "image_ocr", deadline=deadline)
+    return {**result, "extracted_text": extracted_text}
+
+
+@router.post(
+    "/check/dark-job-image/upload",
+    response_model=DarkJobCheckResponse,
+    summary="闇バイト画像チェック（バイナリアップロード）",
+    description=(
+        "画像をBase64にせずそのまま送信し、OCRでテキストを抽出して闇バイト判定を実行します。"
+        "リクエストボディに画像のバイト列（Content-Type: image/* または application/octet-stream）、"
+        f"または multipart/form-data の {IMAGE_FIELD_NAME} フィールドで送信してください。"
+    ),
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "image/*": {"schema": {"type": "string", "format": "binary"}},
+                "application/octet-stream": {"schema": {"type": "string", "format": "binary"}},
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": [IMAGE_FIELD_NAME],
+                        "properties": {IMAGE_FIELD_NAME: {"type": "string", "format": "binary"}},
+                    }
+                },
+            },
+        }
+    },
+    responses={
+        200: {"description": "チェック成功"},
+        400: {"description": "multipart の形式が不正"},
+        413: {"description": "画像が大きすぎる"},
+        415: {"description": "対応していない Content-Type"},
+    },
+)
+async def check_dark_job_image_upload(
+    http_request: Request,
+    source: str | None = None,
+    deadline: float | None = Depends(get_deadline),
+):
+    """アップロードされた画像からOCRでテキスト抽出→闇バイト判定"""
+    settings = get_settings()
+    limit = settings.image_upload_max_bytes
+    content_type = http_request.headers.get("content-type", "")
+    try:
+        boundary = multipart_boundary(content_type)
+    except UploadFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from None
+    if boundary is None and not content_type.lower().startswith(("image/", "application/octet-stream")):
+        raise HTTPException(
+            status_code=415,
+            detail="image/*・application/octet-stream・multipart/form-data のいずれかで送信してください",
+        )
+
+    # 申告サイズで超過が分かる場合は本文を読まずに断る
+    declared = http_request.headers.get("content-length")
+    size_hint = int(declared) if declared and declared.isdigit() else None
+    allowance = MULTIPART_OVERHEAD if boundary is not None else 0
+    if size_hint is not None and size_hint > limit + allowance:
+        raise HTTPException(status_code=413, detail=f"画像が大きすぎます（上限: {limit // (1024 * 1024)}MB）")
+
+    # OCR がプロセスプールなら共有メモリで受け渡す
+    shared = get_executor("ocr").kind == "process"
+    with UploadBuffer(limit, size_hint, shared=shared) as buffer:
+        try:
+            await read_image_upload(http_request.stream(), content_type, buffer)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e)) from None
+        except UploadFormatError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from None
+
+        if buffer.size == 0:
+            extracted_text = ""
+        elif buffer.name is not None:
+            extracted_text = await run_in_pool("ocr", extract_text_from_shared_memory, buffer.name, buffer.size)
+        else:
+            extracted_text = await run_in_pool("ocr", ocr_service.extract_text_from_bytes, buffer.view)
+
+    return await _check_extracted_text(extracted_text, source, deadline)
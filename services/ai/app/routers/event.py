@@ -0,0 +1,74 @@
+"""統合イベント解析エンドポイント"""
+
+from fastapi import APIRouter, BackgroundTasks, Depends
+from pydantic import BaseModel, Field
+
+from app.routers.coalescing import get_request_id, run_coalesced
+from app.routers.conversation import AnalysisResponse
+from app.routers.dark_job import DarkJobCheckResponse
+from app.routers.metadata import MetadataResponse
+from app.routers.summary import ConversationSummaryResponse, build_summary_response
+from app.services.event_analyzer import EventAnalyzer
+from app.services.rule_bundle import get_rule_registry
+from app.services.shadow_eval import get_shadow_evaluator
+
+router = APIRouter()
+rules_registry = get_rule_registry()
+analyzer = EventAnalyzer(rules=lambda: rules_registry.current)
+shadow = get_shadow_evaluator()
+
+
+class EventAnalysisRequest(BaseModel):
+    model_config = {"json_schema_extra": {"title": "統合イベント解析リクエスト"}}
+    text: str = Field(..., min_length=1, description="解析対象の会話テキスト")
+    caller_number: str | None = Field(None, description="発信者/送信者の電話番号（指定時はメタデータ解析も実行）")
+    call_type: str = Field("call", description="種類: 'call'（着信）または 'sms'（SMS）")
+    sms_content: str | None = Field(None, description="SMSの本文（該当する場合）")
+
+
+class EventAnalysisResponse(BaseModel):
+    model_config = {"json_schema_extra": {"title": "統合イベント解析レスポンス"}}
+    conversation: AnalysisResponse = Field(..., description="会話解析結果")
+    summary: ConversationSummaryResponse = Field(..., description="会話サマリー結果")
+    dark_job: DarkJobCheckResponse = Field(..., description="闇バイトチェック結果")
+    metadata: MetadataResponse | None = Field(None, description="着信メタデータ解析結果（発信者番号指定時のみ）")
+
+
+@router.post(
+    "/analyze/event",
+    response_model=EventAnalysisResponse,
+    summary="統合イベント解析",
+    description=(
+        "1件のイベントについて、会話解析・会話サマリー・闇バイトチェック・"
+        "着信メタデータ解析を1回の入力走査でまとめて実行します。"
+    ),
+    responses={
+        200: {"description": "解析成功"},
+        422: {"description": "入力値バリデーションエラー"},
+    },
+)
+async def analyze_event(
+    request: EventAnalysisRequest,
+    background_tasks: BackgroundTasks,
+    request_id: str | None = Depends(get_request_id),
+):
+    """1件のイベントを全解析器でまとめて解析します。"""
+    result = await run_coalesced(
+        "event",
+        (request.text, request.caller_number, request.call_type, request.sms_content),
+        analyzer.analyze,
+        request.text,
+        request.caller_number,
+        request.call_type,
+        request.sms_content,
+        request_id=request_id,
+    )
+    if shadow.sample():
+        background_tasks.add_task(shadow.submit, "conversation", request.text)
+        background_tasks.add_task(shadow.submit, "dark_job", request.text)
+    return EventAnalysisResponse(
+        conversation=result["conversation"],
+        summary=build_summary_response(result["conversation"], result["key_points"]),
+        dark_job=result["dark_job"],
+        metadata=result["metadata"],
+    )
@@ -1,12 +1,16 @@
 """着信/SMSメタデータ解析エンドポイント（F2）"""
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from pydantic import BaseModel, Field
 
+from app.routers.batching import BatchRequest, assemble_results, validate_items
+from app.routers.coalescing import get_request_id, run_coalesced, run_in_pool
 from app.services.metadata_analyzer import MetadataAnalyzer
+from app.services.result_cache import get_result_cache
+from app.services.rule_bundle import get_rule_registry
 
 router = APIRouter()
-analyzer = MetadataAnalyzer()
+analyzer = MetadataAnalyzer(cache=get_result_cache("metadata_sms"), rules=get_rule_registry().metadata_rules)
 
 
 class MetadataRequest(BaseModel):
@@ -36,11 +40,51 @@ class MetadataResponse(BaseModel):
         422: {"description": "入力値バリデーションエラー"},
     },
 )
-async def analyze_call_metadata(request: MetadataRequest):
+async def analyze_call_metadata(request: MetadataRequest, request_id: str | None = Depends(get_request_id)):
     """着信やSMSのメタデータから詐欺リスクを判定します。"""
-    result = analyzer.analyze(
-        phone_number=request.phone_number,
-        call_type=request.call_type,
-        sms_content=request.sms_content,
+    result = await run_coalesced(
+        "metadata",
+        (request.phone_number, request.call_type, request.sms_content),
+        analyzer.analyze,
+        request.phone_number,
+        request.call_type,
+        request.sms_content,
+        request_id=request_id,
     )
     return result
+
+
+class MetadataBatchRequest(BatchRequest):
+    model_config = {"json_schema_extra": {"title": "メタデータ解析バッチリクエスト"}}
+
+
+class MetadataBatchItem(BaseModel):
+    index: int = Field(..., description="入力一覧での位置")
+    result: MetadataResponse | None = Field(None, description="解析結果（エラー時は null）")
+    error: str | None = Field(None, description="入力エラーの内容")
+
+
+class MetadataBatchResponse(BaseModel):
+    model_config = {"json_schema_extra": {"title": "メタデータ解析バッチレスポンス"}}
+    results: list[MetadataBatchItem] = Field(..., description="入力順の解析結果")
+
+
+@router.post(
+    "/analyze/call-metadata:batch",
+    response_model=MetadataBatchResponse,
+    summary="着信メタデータ一括解析",
+    description="複数の着信・SMSメタデータをまとめて解析します。不正な件はその件のみエラーを返します。",
+    responses={
+        200: {"description": "解析成功（件ごとのエラーを含む場合あり）"},
+        422: {"description": "入力値バリデーションエラー"},
+    },
+)
+async def analyze_call_metadata_batch(request: MetadataBatchRequest):
+    """複数の着信・SMSメタデータをまとめて解析します。"""
+    valid, errors = validate_items(MetadataRequest, request.items)
+    results = await run_in_pool(
+        "batch",
+        analyzer.analyze_batch,
+        [(item.phone_number, item.call_type, item.sms_content) for _, item in valid],
+    )
+    return {"results": assemble_results(len(request.items), valid, results, errors)}
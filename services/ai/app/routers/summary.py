@@ -1,12 +1,25 @@
 """会話サマリー解析エンドポイント（F5）"""
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from pydantic import BaseModel, Field
 
+from app.routers.coalescing import get_request_id, run_coalesced, run_in_pool
+from app.services.key_points import extract_key_points
+from app.services.ngram_model import get_scam_model
+from app.services.result_cache import get_result_cache
+from app.services.rule_bundle import get_rule_registry
 from app.services.scam_analyzer import ScamAnalyzer
 
 router = APIRouter()
-analyzer = ScamAnalyzer()
+# 会話解析と同じキャッシュ・同時リクエストの合流を使うため、モデルもそろえる
+analyzer = ScamAnalyzer(
+    cache=get_result_cache("conversation"),
+    model=get_scam_model(),
+    rules=get_rule_registry().scam_rules,
+)
+
+# リスクレベルのしきい値（medium 未満は low）
+RISK_LEVEL_THRESHOLDS = {"high": 60, "medium": 30}
 
 # リスクレベル別の推奨アクション
 RECOMMENDED_ACTIONS_BY_RISK = {
@@ -44,49 +57,15 @@ class ConversationSummaryResponse(BaseModel):
     model_version: str = Field(..., description="使用モデルのバージョン")
 
 
-def extract_key_points(text: str) -> list[str]:
-    """会話テキストから重要ポイントを抽出する。"""
-    points = []
-    sentences = [s.strip() for s in text.replace("。", "。\n").split("\n") if s.strip()]
-
-    important_markers = [
-        "お金", "振り込", "送金", "口座", "カード", "暗証番号",
-        "今すぐ", "急いで", "警察", "役所", "銀行",
-        "息子", "娘", "孫", "事故", "病院",
-    ]
-
-    for sentence in sentences[:10]:
-        for marker in important_markers:
-            if marker in sentence:
-                points.append(sentence[:80])
-                break
-
-    if not points and sentences:
-        points = [s[:80] for s in sentences[:3]]
-
-    return points[:5]
-
-
-@router.post(
-    "/analyze/conversation-summary",
-    response_model=ConversationSummaryResponse,
-    summary="会話サマリー解析",
-    description="高齢者から報告された通話内容を要約し、リスク評価・重要ポイント・推奨アクションを返します。",
-    responses={
-        200: {"description": "解析成功"},
-        422: {"description": "入力値バリデーションエラー"},
-    },
-)
-async def analyze_conversation_summary(request: ConversationSummaryRequest):
-    """高齢者から報告された通話内容を要約し、リスク評価と推奨アクションを返します。"""
-    result = analyzer.analyze(request.text)
-
+def build_summary_response(
+    result: dict, key_points: list[str]
+) -> ConversationSummaryResponse:
+    """ScamAnalyzer の解析結果と重要ポイントからサマリーレスポンスを組み立てる。"""
     risk_score = result["risk_score"]
-    key_points = extract_key_points(request.text)
 
-    if risk_score >= 60:
+    if risk_score >= RISK_LEVEL_THRESHOLDS["high"]:
         risk_level = "high"
-    elif risk_score >= 30:
+    elif risk_score >= RISK_LEVEL_THRESHOLDS["medium"]:
         risk_level = "medium"
     else:
         risk_level = "low"
@@ -100,3 +79,26 @@ async def analyze_conversation_summary(request: ConversationSummaryRequest):
         keywords_found=result["keywords_found"],
         model_version=result["model_version"],
     )
+
+
+@router.post(
+    "/analyze/conversation-summary",
+    response_model=ConversationSummaryResponse,
+    summary="会話サマリー解析",
+    description="高齢者から報告された通話内容を要約し、リスク評価・重要ポイント・推奨アクションを返します。",
+    responses={
+        200: {"description": "解析成功"},
+        422: {"description": "入力値バリデーションエラー"},
+    },
+)
+async def analyze_conversation_summary(
+    request: ConversationSummaryRequest, request_id: str | None = Depends(get_request_id)
+):
+    """高齢者から報告された通話内容を要約し、リスク評価と推奨アクションを返します。"""
+    result = await run_coalesced(
+        "conversation", (request.text,), analyzer.analyze, request.text, request_id=request_id
+    )
+    key_points = await run_in_pool(
+        "analysis", extract_key_points, request.text, None, get_rule_registry().key_point_rules()
+    )
+    return build_summary_response(result, key_points)
@@ -0,0 +1,191 @@
+"""マルチワーカー起動（prefork）
+
+uvicorn の ``--workers`` はワーカーを spawn で起動するため、ワーカーごとにキーワード辞書の
+オートマトン・プレフィックス表・OpenAPI スキーマを作り直し、そのぶんのメモリもワーカー数倍になります。
+ここでは親プロセスでアプリを読み込み（ルール表のコンパイルまで済ませて）から fork し、
+読み込み済みのページをワーカー間でコピーオンライトで共有します。
+
+- 待ち受けソケットは親で作り、全ワーカーが同じソケットで accept する
+- fork 前に ``gc.freeze()`` し、ワーカーの GC が共有ページに書き込んでコピーが発生するのを防ぐ
+- 2ワーカー以上では Prometheus のマルチプロセスモードを有効にし、/metrics は全ワーカーの合算を返す
+  （``PROMETHEUS_MULTIPROC_DIR`` が未指定なら一時ディレクトリを作る）
+- 異常終了したワーカーは作り直す。SIGTERM / SIGINT は全ワーカーに伝え、終了を待ってから抜ける
+
+    python -m app.server
+    python -m app.server --workers 4 --port 8000
+"""
+
+import argparse
+import gc
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+# 起動に失敗したワーカーの終了コード（uvicorn.config.STARTUP_FAILURE）
+STARTUP_FAILURE = 3
+# 異常終了したワーカーを作り直すまでの待ち時間（秒）
+RESPAWN_DELAY = 1.0
+
+
+def prepare_metrics_dir(workers: int) -> tuple[str | None, bool]:
+    """マルチプロセスモードのディレクトリを用意し、(パス, 一時ディレクトリか) を返す。
+
+    prometheus_client はモジュール読み込み時に環境変数を見るため、アプリの import 前に呼びます。
+    """
+    path = os.environ.get(MULTIPROC_DIR_ENV)
+    if path:
+        # 環境変数は設定済みのため、ここで prometheus_client を読み込んでもよい
+        from app.services.stage_metrics import SNAPSHOT_PREFIX
+
+        # 前回起動時のワーカーの値（段階別メトリクスのスナップショットも含む）を引き継がないよう空にする
+        Path(path).mkdir(parents=True, exist_ok=True)
+        for pattern in ("*.db", f"{SNAPSHOT_PREFIX}*.json"):
+            for stale in Path(path).glob(pattern):
+                stale.unlink()
+        return path, False
+    if workers < 2:
+        return None, False
+    path = tempfile.mkdtemp(prefix="mamori-metrics-")
+    os.environ[MULTIPROC_DIR_ENV] = path
+    return path, True
+
+
+def load_app():
+    """アプリを読み込み、初回リクエスト時に作られるものも fork 前に作っておく。"""
+    from app.main import app
+
+    # ルーターの import でキーワード辞書のオートマトン・プレフィックス表は構築済み
+    app.openapi()
+    app.middleware_stack = app.build_middleware_stack()
+    return app
+
+
+class Supervisor:
+    """ワーカープロセスの起動・監視・停止"""
+
+    def __init__(self, app, sock: socket.socket, workers: int, metrics_dir: str | None) -> None:
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.metrics_dir = metrics_dir
+        self.children: set[int] = set()
+        self.stopping = False
+        self.exit_code = 0
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        for _ in range(self.workers):
+            self._spawn()
+        logger.info("ワーカーを起動しました: %d プロセス (pid=%s)", self.workers, sorted(self.children))
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            self.children.discard(pid)
+            if self.metrics_dir is not None:
+                from prometheus_client import multiprocess
+
+                multiprocess.mark_process_dead(pid, self.metrics_dir)
+            if self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code == STARTUP_FAILURE:
+                # 設定ミスなどで起動できない場合は作り直しても同じため、全体を止める
+                logger.error("ワーカーが起動に失敗しました (pid=%d)。停止します", pid)
+                self.exit_code = STARTUP_FAILURE
+                self._stop_children()
+                continue
+            logger.warning("ワーカーが終了しました (pid=%d, code=%d)。作り直します", pid, code)
+            time.sleep(RESPAWN_DELAY)
+            if not self.stopping:
+                self._spawn()
+        return self.exit_code
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                run_worker(self.app, self.sock)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                logger.exception("ワーカーが異常終了しました")
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        self.children.add(pid)
+
+    def _handle_stop(self, signum: int, frame) -> None:
+        if not self.stopping:
+            logger.info("停止シグナルを受信しました: %s", signal.Signals(signum).name)
+        self.stopping = True
+        self._stop_children()
+
+    def _stop_children(self) -> None:
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def run_worker(app, sock: socket.socket) -> None:
+    """fork したワーカーで uvicorn を動かす。"""
+    import uvicorn
+
+    # ログはアプリの JSON ログ設定をそのまま使い、アクセスログは
+    # RequestContextMiddleware の "request completed" と重複するため出さない
+    config = uvicorn.Config(app, log_config=None, access_log=False, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=settings.port)
+    parser.add_argument("--workers", type=int, default=settings.web_concurrency, help="ワーカープロセス数")
+    parser.add_argument("--backlog", type=int, default=2048)
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers は1以上を指定してください")
+
+    metrics_dir, temporary = prepare_metrics_dir(args.workers)
+    app = load_app()
+
+    sock = socket.create_server((args.host, args.port), backlog=args.backlog)
+    # 読み込み済みのオブジェクトを GC の対象から外し、ワーカーでの参照カウント以外の書き込みを防ぐ
+    gc.collect()
+    gc.freeze()
+    logger.info("待ち受けを開始します: %s:%d (workers=%d)", args.host, args.port, args.workers)
+
+    try:
+        exit_code = Supervisor(app, sock, args.workers, metrics_dir).run()
+    finally:
+        sock.close()
+        if temporary:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""バッチ照合ユーティリティ
+
+複数件のテキストを区切り文字で連結して1回だけオートマトンで走査し、
+「件数 × キーワード」のヒット行列（NumPy）を作ります。
+各解析器はこの行列とキーワード→パターンの所属行列との積でスコアを
+まとめて計算します。
+"""
+
+import numpy as np
+
+from app.services.keyword_matcher import KeywordMatcher
+
+# キーワードに含まれない区切り文字（連結後も件をまたぐヒットが生じない）
+_SEPARATOR = "\x00"
+
+
+def hit_matrix(matcher: KeywordMatcher, texts: list[str]) -> np.ndarray:
+    """texts の各件について、どのキーワードが出現したかを bool 行列で返す。
+
+    戻り値の形は (len(texts), len(matcher.keywords)) で、列順は matcher.keywords と同じ。
+    """
+    matrix = np.zeros((len(texts), len(matcher.keywords)), dtype=bool)
+    if not texts:
+        return matrix
+
+    starts = np.zeros(len(texts), dtype=np.int64)
+    np.cumsum([len(t) + 1 for t in texts[:-1]], out=starts[1:])
+
+    positions = matcher.find_positions(_SEPARATOR.join(texts))
+    if positions:
+        index = matcher.index
+        offsets = np.fromiter((pos for pos, _ in positions), dtype=np.int64, count=len(positions))
+        columns = np.fromiter((index[kw] for _, kw in positions), dtype=np.int64, count=len(positions))
+        rows = np.searchsorted(starts, offsets, side="right") - 1
+        matrix[rows, columns] = True
+    return matrix
+
+
+def membership_matrix(matcher: KeywordMatcher, groups: list[list[str]]) -> np.ndarray:
+    """キーワード×グループの所属行列（int32）を返す。"""
+    matrix = np.zeros((len(matcher.keywords), len(groups)), dtype=np.int32)
+    index = matcher.index
+    for col, keywords in enumerate(groups):
+        for kw in keywords:
+            matrix[index[kw], col] = 1
+    return matrix
+
+
+def row_hits(matcher: KeywordMatcher, row: np.ndarray) -> set[str]:
+    """ヒット行列の1行をキーワード集合に戻す。"""
+    keywords = matcher.keywords
+    return {keywords[j] for j in np.flatnonzero(row)}
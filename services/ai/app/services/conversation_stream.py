@@ -0,0 +1,93 @@
+"""通話中の文字起こしを逐次解析するストリーミングセッション
+
+文字起こしはチャンク単位で届くため、会話全体を毎回解析し直すと
+通話が長くなるほど1チャンクあたりのコストが増えていきます。
+セッションはオートマトンの状態と検出済みキーワードの集計を保持し、
+新しく届いた文字だけを走査するので、チャンクごとのコストは
+それまでの会話の長さに依存しません（テキスト本体も保持しません）。
+オートマトンの状態は辞書ごとに異なるため、セッションは開始時点のルールを通話の終わりまで使います。
+"""
+
+from app.services.keyword_matcher import ScanState
+from app.services.scam_analyzer import ScamAnalyzer, compute_risk_score
+from app.services.stage_metrics import stage
+
+
+class ConversationStreamSession:
+    """1通話分の逐次解析状態。
+
+    feed() にチャンクを渡すたびにリスクスコアを更新し、
+    しきい値を初めて超えた時点を alert として知らせます。
+    通話の終わりに finish() を呼ぶと、最終的なスコアは全文をまとめて ScamAnalyzer に渡した場合と一致します。
+    """
+
+    def __init__(self, threshold: int, analyzer: ScamAnalyzer | None = None) -> None:
+        self.threshold = threshold
+        self.analyzer = analyzer or ScamAnalyzer()
+        self.rules = self.analyzer.rules()
+        self.hits: set[str] = set()
+        self.chars = 0
+        self.risk_score = 5
+        self.alerted = False
+        self._state = ScanState()
+        self._pattern_counts = [0] * len(self.rules.patterns)
+        self._urgency_count = 0
+
+    def feed(self, chunk: str) -> tuple[list[str], bool]:
+        """チャンクを追加し、(新たに検出したキーワード, しきい値を超えたか) を返す。
+
+        しきい値超過は1セッションにつき1回だけ True になります。
+        """
+        with stage("keyword_match", chars=len(chunk)):
+            found, self._state = self.rules.matcher.scan(chunk, self._state)
+        self.chars += len(chunk)
+        return self._record(found)
+
+    def finish(self) -> tuple[list[str], bool]:
+        """通話の終わりに呼び、最後の英数字の語の終わりで一致したキーワードを反映する（戻り値は feed と同じ）。"""
+        found = self.rules.matcher.finish(self._state)
+        self._state = ScanState(self._state.node)
+        return self._record(found)
+
+    def _record(self, found: set[str]) -> tuple[list[str], bool]:
+        rules = self.rules
+        new_keywords = sorted(found - self.hits, key=rules.matcher.index.__getitem__)
+        for kw in new_keywords:
+            self.hits.add(kw)
+            for p in rules.keyword_patterns[kw]:
+                self._pattern_counts[p] += 1
+            if kw in rules.urgency_set:
+                self._urgency_count += 1
+
+        if new_keywords:
+            self.risk_score = self._score()
+
+        crossed = not self.alerted and self.risk_score >= self.threshold
+        if crossed:
+            self.alerted = True
+        return new_keywords, crossed
+
+    @property
+    def scam_type(self) -> str:
+        """現時点で最も基礎点の高いパターン名（未検出なら "none"）"""
+        top = self._top_pattern()
+        return "none" if top is None else self.rules.patterns[top][0]
+
+    def result(self) -> dict:
+        """現時点の解析結果（/analyze/conversation と同じ形式）"""
+        return self.analyzer.analyze("", hits=self.hits, rules=self.rules)
+
+    def _top_pattern(self) -> int | None:
+        patterns = self.rules.patterns
+        top = None
+        for i, count in enumerate(self._pattern_counts):
+            if count and (top is None or patterns[i][2] > patterns[top][2]):
+                top = i
+        return top
+
+    def _score(self) -> int:
+        top = self._top_pattern()
+        if top is None:
+            return 5
+        matched_count = sum(1 for count in self._pattern_counts if count)
+        return compute_risk_score(self.rules.patterns[top][2], self._urgency_count, matched_count)
@@ -1,6 +1,19 @@
 """Dark job (闇バイト) detection service — enhanced v2 with LLM hybrid."""
 
+import asyncio
 import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import numpy as np
+
+from app.services.batch_matching import hit_matrix, membership_matrix, row_hits
+from app.services.keyword_matcher import KeywordMatcher
+from app.services.llm_client import LlmClient
+from app.services.near_duplicate import NearDuplicateCache, simhash
+from app.services.proximity_rules import ProximityRule, ProximityRuleEngine
+from app.services.result_cache import ResultCache, cached_call, cached_map
+from app.services.stage_metrics import stage
 
 logger = logging.getLogger(__name__)
 
@@ -82,25 +95,275 @@ RISK_THRESHOLDS = {"high": 60, "medium": 35}
 # グレーゾーン（LLM呼び出し候補）
 LLM_GREY_ZONE = (20, 55)
 
+# グレーゾーン補正用の近接ルール: (語A, 語B, 加点, 最大間隔)
+# 最大間隔 None は同一行内で語A の後ろに語B があれば成立
+SUSPICIOUS_PROXIMITY_RULES: list[ProximityRule] = [
+    ("報酬", "即日", 10, None),
+    ("連絡先", "Telegram", 15, None),
+    ("身分証", "送", 12, None),
+    ("誰にも", "言わない", 10, None),
+    ("簡単", "高収入", 12, None),
+    ("口座", "開設", 10, None),
+    ("受け取", "現金", 15, None),
+]
+
+CATEGORY_NAMES_JA = {
+    "high_pay_lure": "高額報酬の誘い",
+    "criminal_activity": "犯罪行為の示唆",
+    "secrecy_signals": "秘匿性の要求",
+    "urgency_coercion": "緊急性・脅迫",
+    "sns_recruitment": "SNS勧誘パターン",
+    "luffy_syndicate": "犯罪組織の勧誘",
+    "disguised_legitimate": "偽装された正当業務",
+}
+
+
+class DarkJobRules:
+    """闇バイトのカテゴリ・しきい値・近接ルールを照合用にコンパイルしたもの（構築後は変更しない）"""
+
+    def __init__(
+        self,
+        patterns: list[tuple[str, list[str], int]],
+        risk_thresholds: dict[str, int] = RISK_THRESHOLDS,
+        grey_zone: tuple[int, int] = LLM_GREY_ZONE,
+        proximity_rules: list[ProximityRule] = SUSPICIOUS_PROXIMITY_RULES,
+        category_names: dict[str, str] = CATEGORY_NAMES_JA,
+        version: str = MODEL_VERSION,
+    ) -> None:
+        self.patterns = patterns
+        self.risk_thresholds = risk_thresholds
+        self.grey_zone = grey_zone
+        self.category_names = category_names
+        self.version = version
+
+        self.matcher = KeywordMatcher([kw for _, keywords, _ in patterns for kw in keywords])
+        # バッチ判定用: キーワード×カテゴリの所属行列と各カテゴリの重み
+        self.membership = membership_matrix(self.matcher, [kws for _, kws, _ in patterns])
+        self.weights = np.array([weight for _, _, weight in patterns], dtype=np.int64)
+        self.proximity = ProximityRuleEngine(proximity_rules)
+
+    def in_grey_zone(self, score: int) -> bool:
+        return self.grey_zone[0] <= score <= self.grey_zone[1]
+
+
+DEFAULT_RULES = DarkJobRules(DARK_JOB_PATTERNS)
+KEYWORD_MATCHER = DEFAULT_RULES.matcher
+PROXIMITY_ENGINE = DEFAULT_RULES.proximity
+
+
+def _default_rules() -> DarkJobRules:
+    return DEFAULT_RULES
+
+
+async def _run_inline(fn: Callable[..., Any], *args: Any) -> Any:
+    return fn(*args)
+
 
 class DarkJobChecker:
-    def check(self, text: str, source: str | None = None) -> dict:
+    def __init__(
+        self,
+        cache: ResultCache | None = None,
+        llm: LlmClient | None = None,
+        near_cache: NearDuplicateCache | None = None,
+        rules: Callable[[], DarkJobRules] = _default_rules,
+    ) -> None:
+        # 同一本文の判定結果キャッシュ（None なら毎回判定）
+        self.cache = cache
+        # グレーゾーン判定の LLM（None ならヒューリスティック補正のみ）
+        self.llm = llm
+        # URL・番号・金額だけが違う本文の LLM スコアを使い回すキャッシュ（None なら毎回問い合わせ）
+        self.near_cache = near_cache
+        # 現在のルールを返す関数（ルールの差し替えに追従する。1回の判定では最初に取得したものを使う）
+        self.rules = rules
+
+    def check(
+        self,
+        text: str,
+        source: str | None = None,
+        *,
+        hits: set[str] | None = None,
+        rules: DarkJobRules | None = None,
+    ) -> dict:
+        """テキストの闇バイトリスクを判定する。
+
+        hits に共有走査で得たキーワード集合を渡すと、テキストの再走査を省略します。
+        rules には走査に使ったルールを渡します。
+        """
+        if rules is None:
+            rules = self.rules()
+        if hits is None:
+            return cached_call(self.cache, rules.version, text, lambda: self._check_text(text, rules))
+        return self._check_hits(text, hits, rules)
+
+    async def check_async(
+        self,
+        text: str,
+        source: str | None = None,
+        *,
+        deadline: float | None = None,
+        run: Callable[..., Awaitable[Any]] = _run_inline,
+    ) -> dict:
+        """LLM を使って判定する（LLM 未設定なら check と同じ）。
+
+        ルール照合は run(fn, *args)（実行プールへの投入など）で実行し、グレーゾーンに入った件だけ
+        期限 deadline（time.monotonic() 基準）まで LLM のスコアを待ちます。
+        ほぼ同じ本文の LLM スコアが near_cache にあり、ルールスコアも同じなら問い合わせずにそれを使います。
+        LLM が使えなかった件はヒューリスティック補正で判定し、キャッシュには保存しません。
+        """
+        if self.llm is None:
+            return await run(self.check, text, source)
+
+        rules = self.rules()
+
+        # ヒューリスティック補正の結果とは別のキーで保存する（バージョンを分けると全件破棄になる）
+        key = ResultCache.make_key(rules.version, f"llm:{self.llm.model}", text)
+        if self.cache is not None:
+            cached = self.cache.get(rules.version, key)
+            if cached is not None:
+                return cached
+
+        total_score, matched = await run(self.rule_verdict, text, rules)
+        return await self._resolve_with_llm(text, key, total_score, matched, rules, deadline, run)
+
+    async def check_batch_async(
+        self,
+        texts: list[str],
+        *,
+        deadline: float | None = None,
+        run: Callable[..., Awaitable[Any]] = _run_inline,
+    ) -> list[dict]:
+        """複数件を LLM を使って判定する（LLM 未設定なら check_batch と同じ。結果は入力順）。
+
+        ルール照合はキャッシュにない本文をまとめて run で1回実行し、グレーゾーンに入った件は
+        check_async と同じく期限 deadline まで LLM のスコアを待ちます（同時の問い合わせは
+        LLM クライアントがまとめて送ります）。そのため同じ本文には check_async と同じ結果を返します。
+        """
+        if self.llm is None:
+            return await run(self.check_batch, texts)
+
+        rules = self.rules()
+        results: dict[str, dict] = {}
+        keys: dict[str, str] = {}
+        for text in dict.fromkeys(texts):
+            keys[text] = ResultCache.make_key(rules.version, f"llm:{self.llm.model}", text)
+            if self.cache is not None:
+                cached = self.cache.get(rules.version, keys[text])
+                if cached is not None:
+                    results[text] = cached
+        pending = [text for text in keys if text not in results]
+        if pending:
+            verdicts = await run(self.rule_verdict_batch, pending, rules)
+            resolved = await asyncio.gather(
+                *(
+                    self._resolve_with_llm(text, keys[text], total_score, matched, rules, deadline, run)
+                    for text, (total_score, matched) in zip(pending, verdicts)
+                )
+            )
+            results.update(zip(pending, resolved))
+        # 重複した本文にも別々の dict を返す
+        return [dict(results[text]) for text in texts]
+
+    async def _resolve_with_llm(
+        self,
+        text: str,
+        key: str,
+        total_score: int,
+        matched: list[tuple[str, list[str], int]],
+        rules: DarkJobRules,
+        deadline: float | None,
+        run: Callable[..., Awaitable[Any]],
+    ) -> dict:
+        """ルールスコアから結果を決める（グレーゾーンなら LLM に問い合わせ、得られた結果をキャッシュする）。"""
+        if not matched:
+            result = self._no_match_result(rules)
+        elif not rules.in_grey_zone(total_score):
+            result = self._verdict(total_score, matched, rules)
+        else:
+            version = f"{rules.version}:{self.llm.model}"
+            fingerprint = None
+            llm_score = None
+            if self.near_cache is not None:
+                fingerprint = await run(simhash, text)
+                cached = self.near_cache.get_fingerprint(version, fingerprint)
+                # 1文の違いでキーワードが増減した文面には使い回さない
+                if cached is not None and cached[0] == total_score:
+                    llm_score = cached[1]
+            if llm_score is None:
+                with stage("llm"):
+                    llm_score = await self.llm.grey_zone_score(text, total_score, deadline=deadline)
+                if llm_score is None:
+                    return await run(self._build_result, text, total_score, matched, rules)
+                if fingerprint is not None:
+                    self.near_cache.put_fingerprint(version, fingerprint, [total_score, llm_score])
+            # 使い回すのは LLM のスコアだけで、該当カテゴリ・キーワードはこの本文のもの
+            result = self._verdict(llm_score, matched, rules)
+
+        if self.cache is not None:
+            self.cache.put(rules.version, key, result)
+        return result
+
+    def rule_verdict(
+        self, text: str, rules: DarkJobRules | None = None
+    ) -> tuple[int, list[tuple[str, list[str], int]]]:
+        """グレーゾーン補正前のルールスコアと、該当したカテゴリを返す。"""
+        if rules is None:
+            rules = self.rules()
+        with stage("keyword_match", chars=len(text)):
+            hits = rules.matcher.find_all(text)
+        with stage("score"):
+            return self._rule_score(hits, rules)
+
+    def rule_verdict_batch(
+        self, texts: list[str], rules: DarkJobRules | None = None
+    ) -> list[tuple[int, list[tuple[str, list[str], int]]]]:
+        """複数件のグレーゾーン補正前のルールスコアと、該当したカテゴリを返す（1回の走査）。"""
+        if rules is None:
+            rules = self.rules()
+        with stage("keyword_match", chars=sum(map(len, texts))):
+            hits = hit_matrix(rules.matcher, texts)
+        with stage("score"):
+            return self._rule_score_batch(hits, rules)
+
+    def check_batch(self, texts: list[str]) -> list[dict]:
+        """複数件のテキストをまとめて判定する（結果は入力順）。
+
+        キーワード照合は全件を1回の走査で行い、ルールスコアは
+        「件数 × カテゴリ」のヒット行列に対するベクトル演算で求めます。
+        グレーゾーンに入った件だけ個別に補正判定を実行します。
+        キャッシュ済みの本文と、バッチ内で重複する本文は判定を省略します。
+        """
+        rules = self.rules()
+        return cached_map(
+            self.cache, rules.version, texts, lambda batch: self._check_batch(batch, rules)
+        )
+
+    def _check_text(self, text: str, rules: DarkJobRules) -> dict:
+        with stage("keyword_match", chars=len(text)):
+            hits = rules.matcher.find_all(text)
+        return self._check_hits(text, hits, rules)
+
+    def _check_hits(self, text: str, hits: set[str], rules: DarkJobRules) -> dict:
+        with stage("score"):
+            return self._score_hits(text, hits, rules)
+
+    def _score_hits(self, text: str, hits: set[str], rules: DarkJobRules) -> dict:
+        total_score, matched = self._rule_score(hits, rules)
+        if not matched:
+            return self._no_match_result(rules)
+        return self._build_result(text, total_score, matched, rules)
+
+    def _rule_score(
+        self, hits: set[str], rules: DarkJobRules
+    ) -> tuple[int, list[tuple[str, list[str], int]]]:
         matched: list[tuple[str, list[str], int]] = []
 
-        for category, keywords, weight in DARK_JOB_PATTERNS:
-            found = [kw for kw in keywords if kw in text]
+        for category, keywords, weight in rules.patterns:
+            found = [kw for kw in keywords if kw in hits]
             if found:
                 matched.append((category, found, weight))
 
         if not matched:
-            return {
-                "is_dark_job": False,
-                "risk_level": "low",
-                "risk_score": 0,
-                "keywords_found": [],
-                "explanation": "闇バイトの兆候は検出されませんでした。",
-                "model_version": MODEL_VERSION,
-            }
+            return 0, matched
 
         total_score = sum(m[2] for m in matched)
         # Bonus for multiple category matches
@@ -111,36 +374,89 @@ class DarkJobChecker:
         elif len(matched) >= 2:
             total_score += 10
 
-        total_score = min(total_score, 100)
+        return min(total_score, 100), matched
 
-        all_keywords = []
-        for _, kws, _ in matched:
-            all_keywords.extend(kws)
+    def _check_batch(self, texts: list[str], rules: DarkJobRules) -> list[dict]:
+        with stage("keyword_match", chars=sum(map(len, texts))):
+            hits = hit_matrix(rules.matcher, texts)
+        with stage("score"):
+            return self._score_batch(texts, hits, rules)
 
+    def _score_batch(self, texts: list[str], hits: np.ndarray, rules: DarkJobRules) -> list[dict]:
+        results = []
+        for text, (total_score, matched) in zip(texts, self._rule_score_batch(hits, rules)):
+            if not matched:
+                results.append(self._no_match_result(rules))
+            else:
+                results.append(self._build_result(text, total_score, matched, rules))
+        return results
+
+    def _rule_score_batch(
+        self, hits: np.ndarray, rules: DarkJobRules
+    ) -> list[tuple[int, list[tuple[str, list[str], int]]]]:
+        matched = (hits.astype(np.int32) @ rules.membership) > 0
+        matched_count = matched.sum(axis=1)
+        bonus = np.select(
+            [matched_count >= 4, matched_count >= 3, matched_count >= 2], [20, 15, 10], 0
+        )
+        scores = np.minimum(matched @ rules.weights + bonus, 100)
+
+        verdicts = []
+        for i in range(len(hits)):
+            if not matched_count[i]:
+                verdicts.append((0, []))
+                continue
+            found = row_hits(rules.matcher, hits[i])
+            matched_categories = [
+                (category, [kw for kw in keywords if kw in found], weight)
+                for c, (category, keywords, weight) in enumerate(rules.patterns)
+                if matched[i, c]
+            ]
+            verdicts.append((int(scores[i]), matched_categories))
+        return verdicts
+
+    def _no_match_result(self, rules: DarkJobRules) -> dict:
+        return {
+            "is_dark_job": False,
+            "risk_level": "low",
+            "risk_score": 0,
+            "keywords_found": [],
+            "explanation": "闇バイトの兆候は検出されませんでした。",
+            "model_version": rules.version,
+        }
+
+    def _build_result(
+        self,
+        text: str,
+        total_score: int,
+        matched: list[tuple[str, list[str], int]],
+        rules: DarkJobRules,
+    ) -> dict:
+        """ルールスコア確定後にグレーゾーン補正を行い、結果を組み立てる。"""
         # グレーゾーンではLLMハイブリッド判定を試行
-        if LLM_GREY_ZONE[0] <= total_score <= LLM_GREY_ZONE[1]:
-            llm_result = self._llm_hybrid_check(text, total_score)
+        if rules.in_grey_zone(total_score):
+            with stage("llm_fallback"):
+                llm_result = self._llm_hybrid_check(text, total_score, rules)
             if llm_result is not None:
                 total_score = llm_result
+        return self._verdict(total_score, matched, rules)
 
-        if total_score >= RISK_THRESHOLDS["high"]:
+    def _verdict(
+        self, total_score: int, matched: list[tuple[str, list[str], int]], rules: DarkJobRules
+    ) -> dict:
+        all_keywords = []
+        for _, kws, _ in matched:
+            all_keywords.extend(kws)
+
+        thresholds = rules.risk_thresholds
+        if total_score >= thresholds["high"]:
             risk_level = "high"
-        elif total_score >= RISK_THRESHOLDS["medium"]:
+        elif total_score >= thresholds["medium"]:
             risk_level = "medium"
         else:
             risk_level = "low"
 
-        categories_ja = {
-            "high_pay_lure": "高額報酬の誘い",
-            "criminal_activity": "犯罪行為の示唆",
-            "secrecy_signals": "秘匿性の要求",
-            "urgency_coercion": "緊急性・脅迫",
-            "sns_recruitment": "SNS勧誘パターン",
-            "luffy_syndicate": "犯罪組織の勧誘",
-            "disguised_legitimate": "偽装された正当業務",
-        }
-
-        cats = [categories_ja.get(m[0], m[0]) for m in matched]
+        cats = [rules.category_names.get(m[0], m[0]) for m in matched]
         explanation = (
             f"闇バイトの可能性が{'高い' if risk_level == 'high' else 'あり'}ます。"
             f"検出カテゴリ: {', '.join(cats)}。"
@@ -148,37 +464,23 @@ class DarkJobChecker:
         )
 
         return {
-            "is_dark_job": total_score >= RISK_THRESHOLDS["medium"],
+            "is_dark_job": total_score >= thresholds["medium"],
             "risk_level": risk_level,
             "risk_score": total_score,
             "keywords_found": list(set(all_keywords)),
             "explanation": explanation,
-            "model_version": MODEL_VERSION,
+            "model_version": rules.version,
         }
 
-    def _llm_hybrid_check(self, text: str, rule_score: int) -> int | None:
-        """グレーゾーンスコアに対してLLM判定を実行。
+    def _llm_hybrid_check(self, text: str, rule_score: int, rules: DarkJobRules) -> int | None:
+        """グレーゾーンスコアに対するヒューリスティック補正。
 
-        Codespaces環境ではLLMが使えないため、
-        追加ヒューリスティックでルールベース補正を行う。
-        本番環境では OpenAI / Claude API 呼び出しに差し替え。
+        LLM 未設定の構成と、LLM が期限内に応答しなかった・サーキットブレーカーが
+        開いている場合（check_async）のフォールバックとして使う。
         """
         try:
-            # Codespaces フォールバック: 追加ヒューリスティック
-            boost = 0
-            suspicious_patterns = [
-                ("報酬.*即日", 10),
-                ("連絡先.*Telegram", 15),
-                ("身分証.*送", 12),
-                ("誰にも.*言わない", 10),
-                ("簡単.*高収入", 12),
-                ("口座.*開設", 10),
-                ("受け取.*現金", 15),
-            ]
-            import re
-            for pattern, score in suspicious_patterns:
-                if re.search(pattern, text):
-                    boost += score
+            # Codespaces フォールバック: 近接ルールによる追加ヒューリスティック
+            boost = rules.proximity.boost(text)
 
             if boost > 0:
                 logger.info(
@@ -0,0 +1,91 @@
+"""イベント単位の統合解析サービス
+
+1件のイベント（会話テキスト・発信番号・SMS本文）について、全解析器の辞書を
+1つのオートマトンにまとめて入力を1回だけ走査し、その結果を詐欺判定・
+重要ポイント抽出・闇バイト判定・メタデータ解析で共有します。
+走査と各解析器には、イベントの最初に取得した同じバージョンのルールを使います。
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from app.services.dark_job_checker import DarkJobChecker
+from app.services.key_points import extract_key_points
+from app.services.keyword_matcher import KeywordMatcher
+from app.services.metadata_analyzer import MetadataAnalyzer
+from app.services.rule_bundle import BUILTIN_RULES, RuleSet
+from app.services.scam_analyzer import ScamAnalyzer
+from app.services.stage_metrics import stage
+
+EVENT_MATCHER = BUILTIN_RULES.event_matcher
+
+
+@dataclass
+class TextScan:
+    """1回の走査結果（全辞書分のキーワード出現位置）"""
+
+    text: str
+    positions: list[tuple[int, str]]
+    hits: set[str] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.hits = {kw for _, kw in self.positions}
+
+
+def scan_text(text: str, matcher: KeywordMatcher = EVENT_MATCHER) -> TextScan:
+    """テキストを統合オートマトンで1回走査する。"""
+    with stage("keyword_match", chars=len(text)):
+        positions = matcher.find_positions(text)
+    return TextScan(text=text, positions=positions)
+
+
+def _builtin_rules() -> RuleSet:
+    return BUILTIN_RULES
+
+
+class EventAnalyzer:
+    """共有走査結果を各解析器に配り、1イベント分の結果をまとめて返す。"""
+
+    def __init__(self, rules: Callable[[], RuleSet] = _builtin_rules) -> None:
+        self.scam_analyzer = ScamAnalyzer()
+        self.dark_job_checker = DarkJobChecker()
+        self.metadata_analyzer = MetadataAnalyzer()
+        # 現在のルールを返す関数（ルールの差し替えに追従する）
+        self.rules = rules
+
+    def analyze(
+        self,
+        text: str,
+        caller_number: str | None = None,
+        call_type: str = "call",
+        sms_content: str | None = None,
+    ) -> dict:
+        rules = self.rules()
+        scan = scan_text(text, rules.event_matcher)
+
+        conversation = self.scam_analyzer.analyze(text, caller_number, hits=scan.hits, rules=rules.scam)
+        key_points = extract_key_points(text, scan.positions, rules.key_points)
+        dark_job = self.dark_job_checker.check(text, call_type, hits=scan.hits, rules=rules.dark_job)
+
+        metadata = None
+        if caller_number is not None:
+            sms_hits = None
+            if sms_content and call_type == "sms":
+                # SMS本文が会話テキストと同一なら走査結果をそのまま流用
+                sms_hits = (
+                    scan.hits if sms_content == text else scan_text(sms_content, rules.event_matcher).hits
+                )
+            metadata = self.metadata_analyzer.analyze(
+                phone_number=caller_number,
+                call_type=call_type,
+                sms_content=sms_content,
+                sms_hits=sms_hits,
+                rules=rules.metadata,
+            )
+
+        return {
+            "conversation": conversation,
+            "key_points": key_points,
+            "dark_job": dark_job,
+            "metadata": metadata,
+        }
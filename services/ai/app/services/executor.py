@@ -0,0 +1,191 @@
+"""CPU処理の実行プール
+
+ルートはすべて ``async def`` ですが、解析器・OCR は同期的な CPU 処理のため、
+イベントループ上で直接実行すると大きな画像1枚の処理中に他のリクエストがすべて止まります。
+エンドポイントの種類（解析・バッチ・OCR・ドキュメント生成）ごとにスレッドプールまたは
+プロセスプールを割り当て、同時実行数と待ち行列の長さに上限を設けます。
+
+- 同時実行数はプールのワーカー数と同じ
+- 実行中＋待機中の件数が上限（ワーカー数＋待ち行列長）に達したら ExecutorSaturatedError
+- 待ち時間・実行時間をプールごとのヒストグラムで公開
+
+プロセスプールに渡す関数と引数は pickle 可能である必要があります。
+"""
+
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Literal
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.config import get_settings
+from app.services.stage_metrics import collect_stages, replay_stages
+
+logger = logging.getLogger(__name__)
+
+PoolKind = Literal["thread", "process"]
+
+_TIME_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5]
+
+executor_queue_wait_seconds = Histogram(
+    "executor_queue_wait_seconds",
+    "Time a job waited for a free worker",
+    ["pool"],
+    buckets=_TIME_BUCKETS,
+)
+executor_run_seconds = Histogram(
+    "executor_run_seconds",
+    "Time a job spent running on a worker",
+    ["pool"],
+    buckets=_TIME_BUCKETS,
+)
+executor_pending = Gauge(
+    "executor_pending_jobs",
+    "Jobs running or waiting in the pool",
+    ["pool"],
+    # 複数ワーカー構成では生存中のワーカーの合計を公開する
+    multiprocess_mode="livesum",
+)
+executor_rejected_total = Counter(
+    "executor_rejected_total",
+    "Jobs rejected because the pool queue was full",
+    ["pool"],
+)
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """プールの待ち行列が満杯で受け付けられない"""
+
+    def __init__(self, pool: str) -> None:
+        super().__init__(f"実行プール {pool} が混み合っています")
+        self.pool = pool
+
+
+def _timed_call(fn: Callable[..., Any], args: tuple) -> tuple[float, float, Any]:
+    """ワーカー側で実行し、(開始時刻, 終了時刻, 結果) を返す。
+
+    time.monotonic は Linux ではプロセス間で共通の時計のため、
+    プロセスプールでも親プロセスの投入時刻と比較できます。
+    """
+    started = time.monotonic()
+    result = fn(*args)
+    return started, time.monotonic(), result
+
+
+def _timed_collecting_call(fn: Callable[..., Any], args: tuple) -> tuple[float, float, Any]:
+    """プロセスプール用: ワーカー内のステージ計測を結果と一緒に返す。"""
+    started = time.monotonic()
+    result = collect_stages(fn, *args)
+    return started, time.monotonic(), result
+
+
+class ExecutorPool:
+    """上限付きの実行プール（スレッドまたはプロセス）"""
+
+    def __init__(self, name: str, kind: PoolKind, workers: int, queue_size: int) -> None:
+        self.name = name
+        self.kind = kind
+        self.workers = workers
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor: Executor | None = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # スレッドを持つ親プロセスからの fork を避ける
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("forkserver"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix=f"pool-{self.name}"
+                )
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """fn(*args) をプールで実行し、結果を返す。"""
+        with self._lock:
+            if self._pending >= self.capacity:
+                executor_rejected_total.labels(pool=self.name).inc()
+                raise ExecutorSaturatedError(self.name)
+            self._pending += 1
+            executor = self._get_executor()
+        executor_pending.labels(pool=self.name).inc()
+
+        submitted = time.monotonic()
+        try:
+            if self.kind == "process":
+                future = executor.submit(_timed_collecting_call, fn, args)
+            else:
+                # ステージ計測のエンドポイント名などをワーカースレッドに引き継ぐ
+                future = executor.submit(contextvars.copy_context().run, _timed_call, fn, args)
+        except BaseException:
+            self._release()
+            raise
+        # 待っているリクエストが取り消されても（クライアントの切断など）、実行中のジョブは
+        # 終わるまで負荷として数える。枠はジョブの完了（または開始前の取り消し）で返す
+        future.add_done_callback(self._release)
+        started, finished, result = await asyncio.wrap_future(future)
+
+        executor_queue_wait_seconds.labels(pool=self.name).observe(max(started - submitted, 0.0))
+        executor_run_seconds.labels(pool=self.name).observe(finished - started)
+        if self.kind == "process":
+            result, stages = result
+            replay_stages(stages)
+        return result
+
+    def _release(self, future: Future | None = None) -> None:
+        with self._lock:
+            self._pending -= 1
+        executor_pending.labels(pool=self.name).dec()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pools: dict[str, ExecutorPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_executor(pool: str) -> ExecutorPool:
+    """設定に従ってプールを返す（未設定の種類は既定値のスレッドプール）。"""
+    executor = _pools.get(pool)
+    if executor is not None:
+        return executor
+    with _pools_lock:
+        if pool not in _pools:
+            kind, workers, queue_size = get_settings().executor_pool_specs.get(pool, ("thread", 4, 64))
+            _pools[pool] = ExecutorPool(pool, kind, workers, queue_size)
+            logger.info(
+                "実行プールを作成: %s (%s, workers=%d, queue=%d)", pool, kind, workers, queue_size
+            )
+        return _pools[pool]
+
+
+def shutdown_executors() -> None:
+    """全プールを停止する（アプリ終了時）。"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
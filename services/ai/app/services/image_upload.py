@@ -0,0 +1,225 @@
+"""画像アップロードの受信（上限付きストリーミング読み込み）
+
+Base64 を JSON に埋め込む方式では、ペイロードが 1.33 倍になるうえ、
+JSON 文字列・Pydantic のフィールド・デコード結果と画像全体のコピーが何重にもできます。
+ここではリクエストボディを届いたチャンクごとに上限付きのバッファへ直接書き込み、
+OCR にはバッファの memoryview をそのまま渡します。
+
+- 生バイト（``image/*`` / ``application/octet-stream``）と ``multipart/form-data`` に対応
+- Content-Length のないチャンク転送でも、読み込み中に上限を超えた時点で打ち切る
+- OCR がプロセスプールで動く場合は共有メモリに受信し、ワーカーは同じ領域を参照する
+"""
+
+import re
+from collections.abc import AsyncIterator
+from multiprocessing import shared_memory
+
+# multipart の区切り・ヘッダー・画像以外のフィールドに許容する余分なバイト数
+MULTIPART_OVERHEAD = 64 * 1024
+# 1パートのヘッダーの最大長
+MAX_PART_HEADER_BYTES = 8 * 1024
+# Content-Length 不明時の初期確保量（プロセス内バッファ）
+_INITIAL_CAPACITY = 256 * 1024
+# 大きなチャンクもこの単位に分けて解析し、未処理データの保持量を抑える
+_FEED_SLICE = 64 * 1024
+
+IMAGE_FIELD_NAME = "image"
+
+_BOUNDARY_PATTERN = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+_DISPOSITION_NAME_PATTERN = re.compile(rb'(?<![a-z])name="([^"]*)"', re.IGNORECASE)
+
+
+class UploadTooLargeError(ValueError):
+    """アップロードがサイズ上限を超えた"""
+
+
+class UploadFormatError(ValueError):
+    """アップロードの形式が不正"""
+
+
+class UploadBuffer:
+    """上限付きの受信バッファ。
+
+    shared=True なら共有メモリ上に確保し、name と size を渡せば
+    別プロセスから同じ領域を参照できます。共有メモリの大きさは固定のため、
+    サイズが分からない場合は上限いっぱいを確保します（実際に使うページのみ物理メモリを消費）。
+    """
+
+    def __init__(self, limit: int, size_hint: int | None = None, *, shared: bool = False) -> None:
+        self.limit = limit
+        self.size = 0
+        capacity = min(size_hint, limit) if size_hint else (limit if shared else _INITIAL_CAPACITY)
+        capacity = max(min(capacity, limit), 1)
+        self._shm: shared_memory.SharedMemory | None = None
+        if shared:
+            self._shm = shared_memory.SharedMemory(create=True, size=capacity)
+            self._data: bytearray | memoryview = self._shm.buf
+        else:
+            self._data = bytearray(capacity)
+
+    @property
+    def name(self) -> str | None:
+        """共有メモリ名（プロセス内バッファなら None）"""
+        return self._shm.name if self._shm is not None else None
+
+    @property
+    def view(self) -> memoryview:
+        """受信済み部分の memoryview（コピーなし）"""
+        return memoryview(self._data)[: self.size]
+
+    def write(self, chunk: bytes | memoryview) -> None:
+        end = self.size + len(chunk)
+        if end > self.limit:
+            raise UploadTooLargeError(f"画像が大きすぎます（上限: {self.limit // (1024 * 1024)}MB）")
+        if end > len(self._data):
+            if self._shm is not None:
+                # 共有メモリは Content-Length を上限に確保しているため、超えたら申告と不一致
+                raise UploadTooLargeError("Content-Length を超えるデータを受信しました")
+            grown = bytearray(min(max(len(self._data) * 2, end), self.limit))
+            grown[: self.size] = memoryview(self._data)[: self.size]
+            self._data = grown
+        self._data[self.size:end] = chunk
+        self.size = end
+
+    def close(self) -> None:
+        if self._shm is not None:
+            self._data = bytearray()
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self) -> "UploadBuffer":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def multipart_boundary(content_type: str) -> bytes | None:
+    """Content-Type から multipart の区切り文字列を取り出す。"""
+    if not content_type.lower().startswith("multipart/form-data"):
+        return None
+    match = _BOUNDARY_PATTERN.search(content_type)
+    if match is None:
+        raise UploadFormatError("multipart の boundary が指定されていません")
+    return match.group(1).encode("latin-1")
+
+
+class MultipartImageReader:
+    """multipart/form-data を逐次解析し、画像パートの中身だけをバッファへ書き込む。
+
+    未処理のまま保持するのは区切り文字列の長さ分とヘッダーのみで、
+    画像データは届いた順にバッファへ移します。
+    """
+
+    def __init__(self, boundary: bytes, buffer: UploadBuffer, field_name: str = IMAGE_FIELD_NAME) -> None:
+        # 先頭の区切りも本文中の区切りと同じ形で探せるよう、CRLF を補って読む
+        self._delimiter = b"\r\n--" + boundary
+        self._pending = bytearray(b"\r\n")
+        self._buffer = buffer
+        self._field_name = field_name.encode("utf-8")
+        self._state = "preamble"
+        self._in_image = False
+        self.found = False
+        self._other_bytes = 0
+
+    def feed(self, chunk: bytes) -> None:
+        data = memoryview(chunk)
+        for start in range(0, len(data), _FEED_SLICE):
+            self._pending += data[start:start + _FEED_SLICE]
+            while self._step():
+                pass
+
+    def finish(self) -> None:
+        if self._state != "done":
+            raise UploadFormatError("multipart の終端がありません")
+        if not self.found:
+            raise UploadFormatError(f"画像パート（{self._field_name.decode()}）がありません")
+
+    def _step(self) -> bool:
+        """状態を1つ進める。データ不足なら False。"""
+        pending = self._pending
+        if self._state in ("preamble", "body"):
+            index = pending.find(self._delimiter)
+            keep = len(self._delimiter) - 1
+            if index < 0:
+                if len(pending) > keep:
+                    self._emit(memoryview(pending)[: len(pending) - keep])
+                    del pending[: len(pending) - keep]
+                return False
+            self._emit(memoryview(pending)[:index])
+            del pending[: index + len(self._delimiter)]
+            self._in_image = False
+            self._state = "delimiter"
+            return True
+
+        if self._state == "delimiter":
+            if len(pending) < 2:
+                return False
+            if pending[:2] == b"--":
+                self._state = "done"
+                pending.clear()
+                return False
+            end = pending.find(b"\r\n")
+            if end < 0:
+                return False
+            del pending[: end + 2]
+            self._state = "headers"
+            return True
+
+        if self._state == "headers":
+            end = pending.find(b"\r\n\r\n")
+            if end < 0:
+                if len(pending) > MAX_PART_HEADER_BYTES:
+                    raise UploadFormatError("multipart のヘッダーが長すぎます")
+                return False
+            self._in_image = self._is_image_part(bytes(pending[:end]))
+            if self._in_image:
+                if self.found:
+                    raise UploadFormatError("画像パートが複数あります")
+                self.found = True
+            del pending[: end + 4]
+            self._state = "body"
+            return True
+
+        # done: 終端以降（epilogue）は読み捨てる
+        pending.clear()
+        return False
+
+    def _is_image_part(self, headers: bytes) -> bool:
+        for line in headers.split(b"\r\n"):
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-disposition":
+                match = _DISPOSITION_NAME_PATTERN.search(value)
+                return match is not None and match.group(1) == self._field_name
+        return False
+
+    def _emit(self, data: memoryview) -> None:
+        if not data:
+            return
+        if self._state == "body" and self._in_image:
+            self._buffer.write(data)
+            return
+        self._other_bytes += len(data)
+        if self._other_bytes > MULTIPART_OVERHEAD:
+            raise UploadTooLargeError("画像以外のデータが大きすぎます")
+
+
+async def read_image_upload(
+    stream: AsyncIterator[bytes],
+    content_type: str,
+    buffer: UploadBuffer,
+) -> None:
+    """リクエストボディを読み、画像のバイト列を buffer に書き込む。"""
+    boundary = multipart_boundary(content_type)
+    if boundary is None:
+        async for chunk in stream:
+            if chunk:
+                buffer.write(chunk)
+        return
+
+    reader = MultipartImageReader(boundary, buffer)
+    async for chunk in stream:
+        if chunk:
+            reader.feed(chunk)
+    reader.finish()
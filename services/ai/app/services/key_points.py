@@ -0,0 +1,85 @@
+"""会話テキストからの重要ポイント抽出（F5 会話サマリー用）"""
+
+from app.services.keyword_matcher import KeywordMatcher
+from app.services.stage_metrics import stage
+
+# 重要ポイントとみなす文に含まれるマーカー語
+IMPORTANT_MARKERS = [
+    "お金", "振り込", "送金", "口座", "カード", "暗証番号",
+    "今すぐ", "急いで", "警察", "役所", "銀行",
+    "息子", "娘", "孫", "事故", "病院",
+]
+
+
+class KeyPointRules:
+    """重要ポイントのマーカー語を照合用にコンパイルしたもの（構築後は変更しない）"""
+
+    def __init__(self, markers: list[str]) -> None:
+        self.markers = markers
+        self.marker_set = frozenset(markers)
+        self.matcher = KeywordMatcher(markers)
+
+
+DEFAULT_RULES = KeyPointRules(IMPORTANT_MARKERS)
+
+
+def split_sentences(text: str) -> list[tuple[int, int, str]]:
+    """「。」と改行で文に分割し、(開始位置, 終了位置, 前後空白を除いた文) を返す。
+
+    位置は元テキスト上のオフセットで、空の文は除外します。
+    """
+    sentences: list[tuple[int, int, str]] = []
+    start = 0
+    for i, ch in enumerate(text):
+        if ch == "。" or ch == "\n":
+            end = i + 1 if ch == "。" else i
+            sentence = text[start:end].strip()
+            if sentence:
+                sentences.append((start, end, sentence))
+            start = i + 1
+    sentence = text[start:].strip()
+    if sentence:
+        sentences.append((start, len(text), sentence))
+    return sentences
+
+
+def extract_key_points(
+    text: str,
+    positions: list[tuple[int, str]] | None = None,
+    rules: KeyPointRules = DEFAULT_RULES,
+) -> list[str]:
+    """会話テキストから重要ポイントを抽出する。
+
+    positions に共有走査のキーワード出現位置を渡すと、
+    文ごとのマーカー再走査を省略します。
+    """
+    with stage("key_points"):
+        return _extract_key_points(text, positions, rules)
+
+
+def _extract_key_points(
+    text: str, positions: list[tuple[int, str]] | None, rules: KeyPointRules
+) -> list[str]:
+    points = []
+    sentences = split_sentences(text)
+
+    if positions is None:
+        marked = [bool(rules.matcher.find_all(sentence)) for _, _, sentence in sentences[:10]]
+    else:
+        marked = [False] * min(len(sentences), 10)
+        for pos, kw in positions:
+            if kw not in rules.marker_set:
+                continue
+            for idx, (start, end, _) in enumerate(sentences[:10]):
+                if start <= pos < end:
+                    marked[idx] = True
+                    break
+
+    for (_, _, sentence), is_marked in zip(sentences, marked):
+        if is_marked:
+            points.append(sentence[:80])
+
+    if not points and sentences:
+        points = [s[:80] for _, _, s in sentences[:3]]
+
+    return points[:5]
@@ -0,0 +1,188 @@
+"""Aho-Corasick 法による複数キーワード一括照合エンジン
+
+キーワード辞書をあらかじめオートマトンにコンパイルしておき、
+テキストを1回走査するだけで全キーワードの出現を検出します。
+走査コストはテキスト長に比例し、辞書のサイズには依存しません。
+
+入力とキーワードはどちらも ``text_normalizer`` で正規化してから照合します（全角・半角、
+大文字・小文字、カタカナ・ひらがな、間の空白・記号の違いを吸収）。キーワードは送り仮名の
+表記ゆれ（「振込」「振り込み」など）も構築時に展開して登録し、どの表記で出現しても
+元の辞書の表記で報告します。出現位置は元テキスト上の位置です。
+
+英数字で始まる・終わるキーワードは単語境界でだけ一致します（「DM」は「admin」「admission」に
+一致しない）。照合の前に英数字の語の前後へ境界の印を挟み、キーワードにも同じ印を付けて
+登録するため、オートマトンの走査は1文字ずつの遷移のままです。逐次照合（``scan``）では
+チャンクをまたぐ語も全文を照合した場合と同じに扱い、最後の語は ``finish`` で確定させます。
+"""
+
+import re
+from collections import deque
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.services.text_normalizer import NormalizedText, is_word_char, keyword_variants, normalize_text
+
+# 英数字の語の前後に挟む境界の印（正規化で除去される制御文字のため、正規化後の本文には現れない）。
+# 英数字の語どうしが隣り合うことはないので、語の始まりと終わりに同じ印を使える
+_BOUNDARY = "\x02"
+_WORD_SPLIT = re.compile(r"([0-9a-z]+)")
+
+
+def _mark_words(text: str) -> str:
+    # split の結果は「語以外, 語, 語以外, ..., 語以外」の順に並ぶ
+    return _BOUNDARY.join(_WORD_SPLIT.split(text))
+
+
+@dataclass(frozen=True)
+class ScanState:
+    """逐次照合（KeywordMatcher.scan）のチャンク間で引き継ぐ状態"""
+
+    # オートマトンの状態
+    node: int = 0
+    # 直前のチャンクが英数字の語の途中で終わった（語の終わりの印をまだ送っていない）
+    in_word: bool = False
+    # その語のあとに区切り（空白・記号）が来ている
+    gap: bool = False
+
+
+class KeywordMatcher:
+    """複数キーワードを1パスで検出する Aho-Corasick オートマトン。
+
+    構築時に goto / failure 関数を展開した決定性オートマトン（DFA）を作るため、
+    走査中は1文字あたり辞書引き1回で状態遷移できます。
+    重なり合うキーワード（例: 「今日中」と「今日中に」）もすべて検出します。
+    """
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        # 重複・空文字を除きつつ登録順を保持
+        self.keywords: tuple[str, ...] = tuple(dict.fromkeys(kw for kw in keywords if kw))
+        # キーワード → 列番号（バッチ照合のヒット行列で使用）
+        self.index: dict[str, int] = {kw: i for i, kw in enumerate(self.keywords)}
+
+        goto: list[dict[str, int]] = [{}]
+        # 状態ごとの (辞書の表記, 境界の印を付けた正規化後の表記の長さ)
+        outputs: list[tuple[tuple[str, int], ...]] = [()]
+        for kw in self.keywords:
+            for variant in map(_mark_words, keyword_variants(kw)):
+                state = 0
+                for ch in variant:
+                    nxt = goto[state].get(ch)
+                    if nxt is None:
+                        goto.append({})
+                        outputs.append(())
+                        nxt = len(goto) - 1
+                        goto[state][ch] = nxt
+                    state = nxt
+                outputs[state] += ((kw, len(variant)),)
+
+        # 幅優先で failure 遷移を埋め込み、DFA の遷移表を作る
+        delta: list[dict[str, int]] = [{} for _ in goto]
+        delta[0] = dict(goto[0])
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            outputs[state] += outputs[fail[state]]
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0) if state else 0
+                queue.append(nxt)
+
+        self._delta = delta
+        self._spans = outputs
+        self._outputs = [tuple(dict.fromkeys(kw for kw, _ in out)) for out in outputs]
+
+    @property
+    def state_count(self) -> int:
+        """オートマトンの状態数（ベンチマーク・デバッグ用）"""
+        return len(self._delta)
+
+    def find_all(self, text: str | NormalizedText) -> set[str]:
+        """テキスト中に出現したキーワードの集合を返す。"""
+        return self._run(_mark_words(normalize_text(text).text), 0)[0]
+
+    def scan(self, text: str | NormalizedText, state: ScanState | None = None) -> tuple[set[str], ScanState]:
+        """state から走査を再開し、(検出キーワード集合, 走査後の状態) を返す。
+
+        前回の戻り値の状態を渡せば、チャンク境界をまたぐキーワードも検出できます。
+        チャンクが英数字で終わる場合、その語が終わったかは次のチャンクを見るまで分からないため、
+        語の終わりで一致するキーワードは次の scan か finish で報告します。
+        """
+        if state is None:
+            state = ScanState()
+        normalized = normalize_text(text)
+        chunk = normalized.text
+        if not chunk:
+            # 区切りだけのチャンクは、続きの語との間の区切りとして覚えておく
+            return set(), ScanState(state.node, state.in_word, state.in_word and (state.gap or bool(text)))
+        offsets = normalized.offsets
+        marked = _mark_words(chunk)
+        if state.in_word:
+            leading_gap = offsets is not None and offsets[0] > 0
+            if is_word_char(chunk[0]) and not (state.gap or leading_gap):
+                # 前のチャンクの語の続き
+                marked = marked[1:]
+            else:
+                marked = _BOUNDARY + (" " if is_word_char(chunk[0]) else "") + marked
+        in_word = is_word_char(chunk[-1])
+        if in_word:
+            marked = marked[:-1]
+        found, node = self._run(marked, state.node)
+        gap = in_word and offsets is not None and offsets[-1] < len(normalized.original) - 1
+        return found, ScanState(node, in_word, gap)
+
+    def finish(self, state: ScanState) -> set[str]:
+        """逐次照合の終わりに、最後の語の終わりで一致するキーワードを返す。"""
+        if not state.in_word:
+            return set()
+        return self._run(_BOUNDARY, state.node)[0]
+
+    def _run(self, marked: str, state: int) -> tuple[set[str], int]:
+        delta = self._delta
+        outputs = self._outputs
+        found: set[str] = set()
+        for ch in marked:
+            state = delta[state].get(ch, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found, state
+
+    def find_positions(self, text: str | NormalizedText) -> list[tuple[int, str]]:
+        """すべての出現を (開始位置, キーワード) のリストで返す（終了位置順）。"""
+        return [(start, kw) for start, _, kw in self.find_spans(text)]
+
+    def find_spans(self, text: str | NormalizedText) -> list[tuple[int, int, str]]:
+        """すべての出現を (開始位置, 終了位置, キーワード) のリストで返す（終了位置順）。
+
+        位置は元テキスト上の位置で、間に挟まった空白・記号も出現の範囲に含みます。
+        """
+        normalized = normalize_text(text)
+        marked = _mark_words(normalized.text)
+        delta = self._delta
+        spans = self._spans
+        starts: list[int] = []
+        ends: list[int] = []
+        keywords: list[str] = []
+        state = 0
+        for end, ch in enumerate(marked, 1):
+            state = delta[state].get(ch, 0)
+            for kw, length in spans[state]:
+                starts.append(end - length)
+                ends.append(end)
+                keywords.append(kw)
+        if not starts or (normalized.offsets is None and len(marked) == len(normalized.text)):
+            return list(zip(starts, ends, keywords))
+        start_array = np.array(starts, dtype=np.int64)
+        end_array = np.array(ends, dtype=np.int64)
+        if len(marked) != len(normalized.text):
+            # 境界の印を除いた正規化後の位置に戻す
+            codes = np.frombuffer(marked.encode("utf-32-le"), dtype=np.uint32)
+            marks = np.concatenate(([0], np.cumsum(codes == ord(_BOUNDARY))))
+            start_array -= marks[start_array]
+            end_array -= marks[end_array]
+        if normalized.offsets is not None:
+            start_array = normalized.offsets[start_array]
+            end_array = normalized.offsets[end_array - 1] + 1
+        return list(zip(start_array.tolist(), end_array.tolist(), keywords))
@@ -0,0 +1,469 @@
+"""グレーゾーン判定用の非同期 LLM クライアント
+
+ルールスコアがグレーゾーンに入った件だけ LLM にリスクスコアを問い合わせます。
+呼び出しはイベントループ上の非同期 I/O で行い、解析の実行プールは占有しません。
+
+- 接続は ``httpx.AsyncClient`` で使い回す（keep-alive・同時接続数の上限あり）
+- 1回の問い合わせの期限は、リクエスト全体の予算の残り時間から決める
+- 応答が ``hedge_delay`` 秒ない場合は同じ問い合わせをもう1本送り、先に返った方を使う（ヘッジ）。
+  接続エラーや 5xx ですぐ失敗した場合も、期限内なら送り直す
+- 失敗が続いたらサーキットブレーカーを開き、一定時間は問い合わせずに呼び出し側の
+  ヒューリスティック補正に任せる。時間が経ったら1件だけ試し、成功すれば閉じる。
+  ``timeout`` より短いリクエストの残り予算で打ち切った場合は失敗に数えない
+- ``batch_window`` を指定すると、同時に来たグレーゾーンの件を最大 ``batch_window`` 秒
+  （または ``batch_max_size`` 件まで）ためて1回の問い合わせにまとめる（マイクロバッチ）。
+  1回あたりのオーバーヘッドと API のレート制限の消費を減らす代わりに、待ち時間は窓の長さまで増える
+
+API は OpenAI 互換の Chat Completions（``POST {base_url}/v1/chat/completions``）です。
+応答本文は1件なら ``{"risk_score": 0〜100}``、複数件なら ``{"risk_scores": [0〜100, ...]}``
+（送った順）の JSON を想定します。
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from functools import lru_cache
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# 期限のうち、応答の組み立て・シリアライズのために残しておく時間（秒）
+DEADLINE_MARGIN = 0.05
+# 残り時間がこれより短ければ問い合わせない（秒）
+MIN_CALL_BUDGET = 0.05
+# マイクロバッチでまとめる件は、自分の予算のこの割合以上を使えるものに限る
+BATCH_BUDGET_RATIO = 0.5
+# LLM に送るテキストの最大文字数
+MAX_PROMPT_CHARS = 2000
+
+SYSTEM_PROMPT = (
+    "あなたは闇バイト（犯罪の実行役を募る求人）の判定者です。"
+    "与えられた求人・メッセージのリスクを0〜100で評価し、"
+    '{"risk_score": 数値} の JSON だけを返してください。'
+)
+BATCH_SYSTEM_PROMPT = (
+    "あなたは闇バイト（犯罪の実行役を募る求人）の判定者です。"
+    "items に複数の求人・メッセージが JSON で与えられます。それぞれのリスクを0〜100で評価し、"
+    '{"risk_scores": [数値, ...]} の JSON だけを items と同じ順で返してください。'
+)
+
+llm_requests_total = Counter(
+    "llm_requests_total",
+    "Grey-zone LLM verdicts by outcome",
+    ["outcome"],
+)
+llm_attempts_total = Counter(
+    "llm_attempts_total",
+    "HTTP attempts sent to the LLM backend",
+    ["kind"],
+)
+llm_request_duration_seconds = Histogram(
+    "llm_request_duration_seconds",
+    "Time to obtain a grey-zone verdict, including hedged and retried attempts",
+    buckets=[0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5],
+)
+llm_batch_size = Histogram(
+    "llm_batch_size",
+    "Grey-zone items sent in one micro-batched LLM call",
+    buckets=[1, 2, 4, 8, 16, 32, 64],
+)
+llm_batch_wait_seconds = Histogram(
+    "llm_batch_wait_seconds",
+    "Time a grey-zone item waited in the batching window before its call was sent",
+    buckets=[0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1],
+)
+llm_batch_flushes_total = Counter(
+    "llm_batch_flushes_total",
+    "Micro-batches sent to the LLM by trigger",
+    ["reason"],
+)
+llm_circuit_open = Gauge(
+    "llm_circuit_open",
+    "Whether the LLM circuit breaker is open (1) or closed (0)",
+    multiprocess_mode="max",
+)
+
+
+class LlmError(RuntimeError):
+    """LLM の呼び出しに失敗した（エラー応答・不正な応答・接続エラー）"""
+
+
+class CircuitBreaker:
+    """連続失敗回数で開閉するサーキットブレーカー（イベントループ内で使用）
+
+    - closed: 通常どおり呼び出す。failure_threshold 回連続で失敗したら open
+    - open: reset_timeout 秒間は呼び出さない
+    - half-open: open から reset_timeout 秒経ったら1件だけ通し、成功なら closed、失敗なら再び open
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """呼び出してよければ True（half-open では試行中の1件だけ許可）。"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release(self) -> None:
+        """結果の出なかった試行（キャンセル）を取り消し、次の試行を許可する。"""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._probing = False
+        if self._opened_at is not None:
+            logger.info("LLM サーキットブレーカーを閉じました")
+        self._opened_at = None
+        llm_circuit_open.set(0)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probing or self._failures >= self.failure_threshold:
+            if self._opened_at is None or self._probing:
+                logger.warning("LLM サーキットブレーカーを開きました（連続失敗 %d 回）", self._failures)
+            self._opened_at = self._clock()
+            self._probing = False
+            llm_circuit_open.set(1)
+
+
+@dataclass
+class _PendingItem:
+    text: str
+    rule_score: int
+    deadline: float
+    enqueued_at: float
+    future: asyncio.Future
+
+
+class MicroBatcher:
+    """同時に来た問い合わせを短い窓の間ためて1回で送る（イベントループ内で使用）
+
+    最初の1件が来てから window 秒経つか、max_size 件たまった時点で send に渡し、
+    返ったスコアを送った順に各呼び出し元へ返す。send の期限はまとめた件のうち最も早い期限になるため、
+
+    - 窓を待つと残り予算が MIN_CALL_BUDGET を切る件は、ためずにすぐ単独で送る
+    - ためた件は期限の近いものどうしでまとめ、どの件も自分の予算の BATCH_BUDGET_RATIO 以上を使えるようにする
+      （予算は max_budget で頭打ち）
+    """
+
+    def __init__(
+        self,
+        send: Callable[[list[tuple[str, int]], float], Awaitable[list[int] | None]],
+        window: float,
+        max_size: int,
+        max_budget: float | None = None,
+    ) -> None:
+        self.send = send
+        self.window = window
+        self.max_size = max_size
+        self.max_budget = max_budget
+        self._pending: list[_PendingItem] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, text: str, rule_score: int, deadline: float) -> int | None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        now = time.monotonic()
+        item = _PendingItem(text, rule_score, deadline, now, future)
+        if deadline - now - DEADLINE_MARGIN - self.window < MIN_CALL_BUDGET:
+            self._start([item], "no_wait", now)
+        else:
+            self._pending.append(item)
+            if len(self._pending) >= self.max_size:
+                self._flush("size")
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush, "window")
+        return await future
+
+    async def drain(self) -> None:
+        """ためている件を送り、送信中の問い合わせが終わるまで待つ。"""
+        self._flush("drain")
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _flush(self, reason: str) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._pending = self._pending, []
+        now = time.monotonic()
+        for group in self._group_by_deadline(items, now):
+            self._start(group, reason, now)
+
+    def _budget(self, item: _PendingItem, now: float) -> float:
+        budget = item.deadline - now - DEADLINE_MARGIN
+        return budget if self.max_budget is None else min(budget, self.max_budget)
+
+    def _group_by_deadline(self, items: list[_PendingItem], now: float) -> list[list[_PendingItem]]:
+        """期限の早い順に、まとめても予算を削られすぎない件どうしに分ける。"""
+        groups: list[list[_PendingItem]] = []
+        current: list[_PendingItem] | None = None
+        current_budget = 0.0
+        for item in sorted(items, key=lambda item: item.deadline):
+            budget = self._budget(item, now)
+            if budget < MIN_CALL_BUDGET:
+                # 予算の残っていない件は他の件と混ぜない（send が問い合わせずに None を返す）
+                groups.append([item])
+            elif current is not None and current_budget >= budget * BATCH_BUDGET_RATIO:
+                current.append(item)
+            else:
+                current = [item]
+                current_budget = budget
+                groups.append(current)
+        return groups
+
+    def _start(self, items: list[_PendingItem], reason: str, now: float) -> None:
+        llm_batch_flushes_total.labels(reason=reason).inc()
+        llm_batch_size.observe(len(items))
+        for item in items:
+            llm_batch_wait_seconds.observe(now - item.enqueued_at)
+        task = asyncio.get_running_loop().create_task(self._dispatch(items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, items: list[_PendingItem]) -> None:
+        try:
+            scores = await self.send(
+                [(item.text, item.rule_score) for item in items],
+                min(item.deadline for item in items),
+            )
+        except Exception:
+            logger.exception("LLM のまとめ問い合わせに失敗しました")
+            scores = None
+        for i, item in enumerate(items):
+            # 待っている間にキャンセルされた呼び出し元には返さない
+            if not item.future.done():
+                item.future.set_result(None if scores is None else scores[i])
+
+
+class LlmClient:
+    """グレーゾーンのリスクスコアを LLM に問い合わせる非同期クライアント"""
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        *,
+        api_key: str = "",
+        timeout: float = 2.0,
+        hedge_delay: float = 0.15,
+        max_attempts: int = 2,
+        max_connections: int = 32,
+        breaker: CircuitBreaker | None = None,
+        batch_window: float = 0.0,
+        batch_max_size: int = 16,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.hedge_delay = hedge_delay
+        self.max_attempts = max_attempts
+        self.max_connections = max_connections
+        self.breaker = breaker or CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._batcher: MicroBatcher | None = None
+        if batch_window > 0 and batch_max_size > 1:
+            self._batcher = MicroBatcher(self._score_items, batch_window, batch_max_size, max_budget=timeout)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # 接続プールはイベントループに属するため、最初の呼び出し時（ワーカーの fork 後）に作る
+        if self._client is None:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._batcher is not None:
+            await self._batcher.drain()
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    async def grey_zone_score(self, text: str, rule_score: int, *, deadline: float | None = None) -> int | None:
+        """LLM のリスクスコアを返す。期限切れ・失敗・ブレーカーが開いている場合は None。
+
+        deadline は time.monotonic() 基準の期限（None なら timeout 秒後）。
+        マイクロバッチが有効なら、同時に来た件とまとめて問い合わせる。
+        """
+        now = time.monotonic()
+        if deadline is None:
+            deadline = now + self.timeout
+        if deadline - now - DEADLINE_MARGIN < MIN_CALL_BUDGET:
+            llm_requests_total.labels(outcome="no_budget").inc()
+            return None
+        if self._batcher is not None:
+            return await self._batcher.submit(text, rule_score, deadline)
+        scores = await self._score_items([(text, rule_score)], deadline)
+        return None if scores is None else scores[0]
+
+    async def _score_items(self, items: list[tuple[str, int]], deadline: float) -> list[int] | None:
+        """(本文, ルールスコア) の並びを1回の問い合わせで判定し、同じ順のスコアを返す。"""
+        now = time.monotonic()
+        budget = min(self.timeout, deadline - now - DEADLINE_MARGIN)
+        if budget < MIN_CALL_BUDGET:
+            llm_requests_total.labels(outcome="no_budget").inc(len(items))
+            return None
+        if not self.breaker.allow():
+            llm_requests_total.labels(outcome="circuit_open").inc(len(items))
+            return None
+
+        payload = self._build_payload(items)
+        try:
+            async with asyncio.timeout(budget):
+                scores = await self._hedged_call(payload, len(items), now + budget)
+        except TimeoutError:
+            if budget < self.timeout:
+                # リクエストの残り予算で打ち切っただけなら LLM の不調とは限らないため、失敗に数えない
+                self.breaker.release()
+                llm_requests_total.labels(outcome="deadline").inc(len(items))
+                return None
+            outcome = "timeout"
+        except LlmError as e:
+            logger.warning("LLM 判定エラー: %s", str(e))
+            outcome = "error"
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        else:
+            self.breaker.record_success()
+            llm_requests_total.labels(outcome="ok").inc(len(items))
+            llm_request_duration_seconds.observe(time.monotonic() - now)
+            return scores
+        self.breaker.record_failure()
+        llm_requests_total.labels(outcome=outcome).inc(len(items))
+        return None
+
+    async def _hedged_call(self, payload: dict, count: int, deadline: float) -> list[int]:
+        """期限内で最初に成功した応答のスコアを返す（ヘッジ・再送込み）。"""
+        attempts = {asyncio.create_task(self._call(payload, count))}
+        llm_attempts_total.labels(kind="first").inc()
+        sent = 1
+        last_error: LlmError | None = None
+        try:
+            while attempts:
+                # 追加で送れるうちはヘッジの待ち時間で区切り、送れなければ結果を待つ
+                wait = self.hedge_delay if sent < self.max_attempts else None
+                done, attempts = await asyncio.wait(attempts, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        return task.result()
+                    except LlmError as e:
+                        last_error = e
+                if sent < self.max_attempts and time.monotonic() + MIN_CALL_BUDGET < deadline:
+                    # 応答が遅ければヘッジ、すぐ失敗したなら再送
+                    llm_attempts_total.labels(kind="retry" if done else "hedge").inc()
+                    attempts.add(asyncio.create_task(self._call(payload, count)))
+                    sent += 1
+            raise last_error or LlmError("LLM から応答がありません")
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    async def _call(self, payload: dict, count: int) -> list[int]:
+        try:
+            response = await self._get_client().post("/v1/chat/completions", json=payload)
+        except httpx.HTTPError as e:
+            raise LlmError(f"接続エラー: {type(e).__name__}") from e
+        if response.status_code != 200:
+            raise LlmError(f"ステータス {response.status_code}")
+        try:
+            content = json.loads(response.json()["choices"][0]["message"]["content"])
+            if count == 1:
+                scores = [int(content["risk_score"])]
+            else:
+                scores = [int(score) for score in content["risk_scores"]]
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise LlmError("応答の形式が不正です") from e
+        if len(scores) != count:
+            raise LlmError(f"応答の件数が一致しません（{len(scores)}/{count}）")
+        return [max(0, min(score, 100)) for score in scores]
+
+    def _build_payload(self, items: list[tuple[str, int]]) -> dict:
+        if len(items) == 1:
+            text, rule_score = items[0]
+            system = SYSTEM_PROMPT
+            user = f"ルールベースのスコア: {rule_score}\n\n{text[:MAX_PROMPT_CHARS]}"
+        else:
+            system = BATCH_SYSTEM_PROMPT
+            user = json.dumps(
+                {"items": [
+                    {"id": i, "rule_score": rule_score, "text": text[:MAX_PROMPT_CHARS]}
+                    for i, (text, rule_score) in enumerate(items)
+                ]},
+                ensure_ascii=False,
+            )
+        return {
+            "model": self.model,
+            "temperature": 0,
+            "response_format": {"type": "json_object"},
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+        }
+
+
+@lru_cache()
+def get_llm_client() -> LlmClient | None:
+    """設定に従って共有クライアントを返す（LLM_BASE_URL 未設定なら None）。"""
+    settings = get_settings()
+    if not settings.llm_base_url:
+        return None
+    return LlmClient(
+        settings.llm_base_url,
+        settings.ai_model_name,
+        api_key=settings.llm_api_key,
+        timeout=settings.llm_timeout,
+        hedge_delay=settings.llm_hedge_delay,
+        max_attempts=settings.llm_max_attempts,
+        max_connections=settings.llm_max_connections,
+        breaker=CircuitBreaker(
+            failure_threshold=settings.llm_circuit_failure_threshold,
+            reset_timeout=settings.llm_circuit_reset_timeout,
+        ),
+        batch_window=settings.llm_batch_window,
+        batch_max_size=settings.llm_batch_max_size,
+    )
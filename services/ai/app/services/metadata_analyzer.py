@@ -1,20 +1,29 @@
 """Call/SMS metadata analyzer for auto-forwarded events (F2)."""
 
 import re
+from collections.abc import Callable
 
-MODEL_VERSION = "metadata-rule-v0.1.0"
-
-# Known scam area codes / international prefixes
-SUSPICIOUS_PREFIXES = [
-    "+1",    # US (often spoofed)
-    "+44",   # UK
-    "+86",   # China
-    "+63",   # Philippines
-    "+234",  # Nigeria
-    "+855",  # Cambodia
-    "050",   # IP phone (domestic, often scam)
-    "0120",  # Toll-free (sometimes spoofed)
-]
+import numpy as np
+
+from app.services.batch_matching import hit_matrix
+from app.services.keyword_matcher import KeywordMatcher
+from app.services.number_reputation import (
+    CATEGORY_LABELS,
+    NumberReputationStore,
+    get_default_reputation_store,
+)
+from app.services.phone_prefix import (
+    JAPAN_COUNTRY_CODE,
+    PrefixEntry,
+    PrefixTrie,
+    clean_phone_number,
+    get_default_prefix_table,
+    normalize_phone_number,
+)
+from app.services.result_cache import ResultCache, cached_call, cached_map
+from app.services.stage_metrics import stage
+
+MODEL_VERSION = "metadata-rule-v0.2.0"
 
 SMS_SCAM_KEYWORDS = [
     "当選", "未払い", "口座", "振込", "至急", "本日中",
@@ -25,31 +34,170 @@ SMS_SCAM_KEYWORDS = [
     "クリックしてください", "URLをタップ",
 ]
 
+SMS_URGENCY_WORDS = ["今すぐ", "急いで", "至急", "本日中", "期限"]
+
+# 非通知・番号不明として扱う表記（NFKC・小文字化後に比較）
+HIDDEN_NUMBER_VALUES = {"非通知", "unknown", "private", ""}
+
 URL_PATTERN = re.compile(r"https?://[^\s]+|[a-zA-Z0-9.-]+\.(com|jp|net|org|xyz|top|click|info)/[^\s]*")
 
+# SMS本文の加点（キーワード1件あたり・URLあり・緊急表現あり）
+SMS_KEYWORD_WEIGHT = 10
+SMS_URL_WEIGHT = 20
+SMS_URGENCY_WEIGHT = 15
+
+# 要約のリスクレベルのしきい値（low 未満は「低リスク」）
+SUMMARY_THRESHOLDS = {"high": 70, "medium": 40, "low": 20}
+
+
+class MetadataRules:
+    """SMS本文のキーワードと疑わしいプレフィックス表を照合用にコンパイルしたもの（構築後は変更しない）"""
+
+    def __init__(
+        self,
+        sms_keywords: list[str],
+        urgency_words: list[str],
+        prefix_entries: list[PrefixEntry] | None = None,
+        version: str = MODEL_VERSION,
+    ) -> None:
+        self.sms_keywords = sms_keywords
+        self.urgency_words = urgency_words
+        self.version = version
+
+        self.matcher = KeywordMatcher(sms_keywords + urgency_words)
+        # バッチ解析用のヒット行列の列番号
+        self.keyword_columns = np.array([self.matcher.index[kw] for kw in sms_keywords], dtype=np.int64)
+        self.urgency_columns = np.array([self.matcher.index[kw] for kw in urgency_words], dtype=np.int64)
+        # プレフィックス表（指定がなければ同梱のデータファイル）
+        self.prefix_table = (
+            PrefixTrie(prefix_entries) if prefix_entries is not None else get_default_prefix_table()
+        )
+
+
+DEFAULT_RULES = MetadataRules(SMS_SCAM_KEYWORDS, SMS_URGENCY_WORDS)
+KEYWORD_MATCHER = DEFAULT_RULES.matcher
+
+
+def _default_rules() -> MetadataRules:
+    return DEFAULT_RULES
+
 
 class MetadataAnalyzer:
     """Analyze call/SMS metadata for scam risk."""
 
+    def __init__(
+        self,
+        prefix_table: PrefixTrie | None = None,
+        reputation_store: NumberReputationStore | None = None,
+        cache: ResultCache | None = None,
+        rules: Callable[[], MetadataRules] = _default_rules,
+    ) -> None:
+        # 国番号・キャリア・市外局番などの疑わしいプレフィックス表（E.164、None ならルールの表）
+        self.prefix_table = prefix_table
+        # 警察・キャリアのフィード由来の通報番号ストア（未設定なら None）
+        self.reputation_store = (
+            reputation_store if reputation_store is not None else get_default_reputation_store()
+        )
+        # SMS本文の判定結果キャッシュ（番号の判定は通報ストアの更新を反映するため毎回行う）
+        self.cache = cache
+        # 現在のルールを返す関数（ルールの差し替えに追従する。1回の解析では最初に取得したものを使う）
+        self.rules = rules
+
     def analyze(
         self,
         phone_number: str,
         call_type: str = "call",
         sms_content: str | None = None,
+        *,
+        sms_hits: set[str] | None = None,
+        rules: MetadataRules | None = None,
     ) -> dict:
-        risk_score = 0
-        reasons: list[str] = []
-        scam_type = "unknown"
-        keywords_found: list[str] = []
+        """着信/SMSメタデータを解析する。
 
-        # 1. Phone number analysis
-        number_risk, number_reasons = self._analyze_number(phone_number)
-        risk_score += number_risk
-        reasons.extend(number_reasons)
+        sms_hits に共有走査で得たSMS本文のキーワード集合を渡すと、本文の再走査を省略します。
+        rules には走査に使ったルールを渡します。
+        """
+        if rules is None:
+            rules = self.rules()
+        with stage("number_lookup"):
+            number_risk, number_reasons = self._analyze_number(phone_number, rules)
 
-        # 2. SMS content analysis (if provided)
+        sms = None
         if sms_content and call_type == "sms":
-            sms_risk, sms_reasons, sms_keywords = self._analyze_sms(sms_content)
+            if sms_hits is None:
+                sms = tuple(cached_call(
+                    self.cache, rules.version, sms_content,
+                    lambda: self._analyze_sms(sms_content, rules),
+                ))
+            else:
+                sms = self._analyze_sms(sms_content, rules, sms_hits)
+
+        return self._build_result(call_type, number_risk, number_reasons, sms, rules)
+
+    def analyze_batch(self, items: list[tuple[str, str, str | None]]) -> list[dict]:
+        """(電話番号, 種類, SMS本文) の組をまとめて解析する（結果は入力順）。
+
+        SMS本文のキーワード照合は全件を1回の走査で行い、本文スコアは
+        ヒット行列に対するベクトル演算で求めます（キャッシュ済み・重複の本文は省略）。
+        番号の判定は1件ずつ行います。
+        """
+        rules = self.rules()
+        sms_rows = [i for i, (_, call_type, content) in enumerate(items) if content and call_type == "sms"]
+        sms_results = cached_map(
+            self.cache, rules.version, [items[i][2] for i in sms_rows],
+            lambda contents: self._analyze_sms_batch(contents, rules),
+        )
+        sms_by_row = {i: tuple(sms) for i, sms in zip(sms_rows, sms_results)}
+
+        results = []
+        for i, (phone_number, call_type, _) in enumerate(items):
+            with stage("number_lookup"):
+                number_risk, number_reasons = self._analyze_number(phone_number, rules)
+            results.append(
+                self._build_result(call_type, number_risk, number_reasons, sms_by_row.get(i), rules)
+            )
+        return results
+
+    def _analyze_sms_batch(
+        self, contents: list[str], rules: MetadataRules
+    ) -> list[tuple[int, list[str], list[str]]]:
+        with stage("keyword_match", chars=sum(map(len, contents))):
+            hits = hit_matrix(rules.matcher, contents)
+        keyword_hits = hits[:, rules.keyword_columns]
+        has_urgency = hits[:, rules.urgency_columns].any(axis=1)
+        has_url = np.fromiter(
+            (URL_PATTERN.search(content) is not None for content in contents),
+            dtype=bool,
+            count=len(contents),
+        )
+        sms_risks = (
+            keyword_hits.sum(axis=1) * SMS_KEYWORD_WEIGHT
+            + has_url * SMS_URL_WEIGHT
+            + has_urgency * SMS_URGENCY_WEIGHT
+        )
+
+        results = []
+        for i in range(len(contents)):
+            keywords = [rules.sms_keywords[j] for j in np.flatnonzero(keyword_hits[i])]
+            reasons = self._sms_reasons(keywords, bool(has_url[i]), bool(has_urgency[i]))
+            results.append((int(sms_risks[i]), reasons, keywords))
+        return results
+
+    def _build_result(
+        self,
+        call_type: str,
+        number_risk: int,
+        number_reasons: list[str],
+        sms: tuple[int, list[str], list[str]] | None,
+        rules: MetadataRules,
+    ) -> dict:
+        risk_score = number_risk
+        reasons: list[str] = list(number_reasons)
+        scam_type = "unknown"
+        keywords_found: list[str] = []
+
+        if sms is not None:
+            sms_risk, sms_reasons, sms_keywords = sms
             risk_score += sms_risk
             reasons.extend(sms_reasons)
             keywords_found.extend(sms_keywords)
@@ -57,7 +205,7 @@ class MetadataAnalyzer:
             if sms_risk >= 40:
                 scam_type = "sms_phishing"
 
-        # 3. Determine scam type from number pattern
+        # Determine scam type from number pattern
         if number_risk >= 30 and scam_type == "unknown":
             scam_type = "suspicious_call"
 
@@ -71,74 +219,90 @@ class MetadataAnalyzer:
             "summary": summary,
             "keywords_found": keywords_found,
             "reasons": reasons,
-            "model_version": MODEL_VERSION,
+            "model_version": rules.version,
         }
 
-    def _analyze_number(self, phone_number: str) -> tuple[int, list[str]]:
+    def _analyze_number(self, phone_number: str, rules: MetadataRules) -> tuple[int, list[str]]:
         risk = 0
         reasons = []
 
+        dialed = clean_phone_number(phone_number)
+        number = normalize_phone_number(phone_number)
+
         # International number (non-Japan)
-        if phone_number.startswith("+") and not phone_number.startswith("+81"):
+        if number.startswith("+") and not number.startswith("+" + JAPAN_COUNTRY_CODE):
             risk += 40
             reasons.append("国際番号からの着信")
 
-        # Suspicious prefixes
-        for prefix in SUSPICIOUS_PREFIXES:
-            if phone_number.startswith(prefix):
-                risk += 20
-                reasons.append(f"疑わしいプレフィックス: {prefix}")
-                break
+        # Suspicious prefixes (longest match)
+        prefix_table = self.prefix_table if self.prefix_table is not None else rules.prefix_table
+        entry = prefix_table.longest_match(number)
+        if entry is not None:
+            prefix, weight, reason = entry
+            risk += weight
+            reasons.append(f"疑わしいプレフィックス: {prefix}（{reason}）")
+
+        # Reported scam number (police / carrier feeds)
+        if self.reputation_store is not None and number.startswith("+"):
+            record = self.reputation_store.lookup(number)
+            if record is not None:
+                risk += record.risk_score
+                reasons.append(
+                    f"通報済みの番号（{CATEGORY_LABELS.get(record.category, record.category)}・"
+                    f"通報{record.report_count}件）"
+                )
 
         # Hidden/withheld number
-        if phone_number in ["非通知", "unknown", "private", ""]:
+        if dialed.strip().lower() in HIDDEN_NUMBER_VALUES:
             risk += 30
             reasons.append("非通知番号")
 
         # Very short number (possible spoofed)
-        if len(phone_number.replace("+", "").replace("-", "")) < 8:
+        if len(dialed.replace("+", "")) < 8:
             risk += 15
             reasons.append("短い番号（偽装の可能性）")
 
         return risk, reasons
 
-    def _analyze_sms(self, content: str) -> tuple[int, list[str], list[str]]:
-        risk = 0
-        reasons = []
-        keywords = []
+    def _analyze_sms(
+        self, content: str, rules: MetadataRules, hits: set[str] | None = None
+    ) -> tuple[int, list[str], list[str]]:
+        if hits is None:
+            with stage("keyword_match", chars=len(content)):
+                hits = rules.matcher.find_all(content)
 
         # Keyword matching
-        for keyword in SMS_SCAM_KEYWORDS:
-            if keyword in content:
-                risk += 10
-                keywords.append(keyword)
+        keywords = [keyword for keyword in rules.sms_keywords if keyword in hits]
+        # URL detection
+        has_url = URL_PATTERN.search(content) is not None
+        # Urgency indicators
+        has_urgency = any(w in hits for w in rules.urgency_words)
 
+        risk = (
+            len(keywords) * SMS_KEYWORD_WEIGHT
+            + (SMS_URL_WEIGHT if has_url else 0)
+            + (SMS_URGENCY_WEIGHT if has_urgency else 0)
+        )
+        return risk, self._sms_reasons(keywords, has_url, has_urgency), keywords
+
+    def _sms_reasons(self, keywords: list[str], has_url: bool, has_urgency: bool) -> list[str]:
+        reasons = []
         if keywords:
             reasons.append(f"詐欺関連キーワード検出: {', '.join(keywords[:5])}")
-
-        # URL detection
-        urls = URL_PATTERN.findall(content)
-        if urls:
-            risk += 20
+        if has_url:
             reasons.append("不審なURLが含まれています")
-
-        # Urgency indicators
-        urgency_words = ["今すぐ", "急いで", "至急", "本日中", "期限"]
-        urgency_found = [w for w in urgency_words if w in content]
-        if urgency_found:
-            risk += 15
+        if has_urgency:
             reasons.append("緊急性を煽る表現を検出")
-
-        return risk, reasons, keywords
+        return reasons
 
     def _build_summary(self, risk_score: int, reasons: list[str], call_type: str) -> str:
         call_label = "SMS" if call_type == "sms" else "着信"
 
-        if risk_score >= 70:
+        if risk_score >= SUMMARY_THRESHOLDS["high"]:
             level = "高リスク"
-        elif risk_score >= 40:
+        elif risk_score >= SUMMARY_THRESHOLDS["medium"]:
             level = "中リスク"
-        elif risk_score >= 20:
+        elif risk_score >= SUMMARY_THRESHOLDS["low"]:
             level = "やや疑わしい"
         else:
             level = "低リスク"
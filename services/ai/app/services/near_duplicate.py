@@ -0,0 +1,244 @@
+"""ほぼ同じ本文の判定を使い回すキャッシュ（SimHash）
+
+詐欺SMSや闇バイトの勧誘は、URL・電話番号・宛名・金額だけを変えた同じ文面で大量に送られるため、
+本文のハッシュをキーにした ``ResultCache`` では2通目以降もミスになります。
+ここでは変わりやすい部分を伏せた本文から SimHash（64ビット）を求め、
+ハミング距離が ``max_distance`` 以下の指紋が登録済みなら、その判定を使い回します。
+
+- URL・メールアドレス・数字（電話番号・金額・日付）・「〇〇様／さん」の宛名を記号に置き換える
+- 特徴量は文字 3-gram（日本語は単語区切りがないため）。出現回数で重み付けする
+- 指紋を ``max_distance + 1`` 個の帯に分け、帯ごとの値で索引を作る。距離が ``max_distance`` 以下なら
+  少なくとも1つの帯が一致するため（鳩の巣原理）、全件と比べずに候補だけを調べればよい
+- エントリ数の上限（LRU）と有効期限（TTL）、モデルバージョンが変わったら全件破棄
+- ヒット・ミス・破棄件数は ``ResultCache`` と同じメトリクスに名前を付けて公開し、
+  ヒットした距離の分布を ``near_duplicate_distance`` で公開する
+"""
+
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Callable
+from functools import lru_cache
+from typing import Any
+
+import numpy as np
+from prometheus_client import Histogram
+
+from app.config import get_settings
+from app.services.result_cache import (
+    ENTRY_OVERHEAD,
+    cache_bytes,
+    cache_entries,
+    cache_evictions_total,
+    cache_hits_total,
+    cache_misses_total,
+)
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3
+
+near_duplicate_distance = Histogram(
+    "near_duplicate_distance",
+    "Hamming distance between a near-duplicate cache lookup and the fingerprint it reused",
+    ["cache"],
+    buckets=[0, 1, 2, 3, 4, 6, 8],
+)
+
+# 伏せる順に並べる（URL 内の数字を先に数字として置き換えないよう、URL・メールが先）
+_MASKS: list[tuple[re.Pattern[str], str]] = [
+    (re.compile(r"(?:https?://|www\.)[\w\-.~:/?#\[\]@!$&'()*+,;=%]+", re.ASCII), "<url>"),
+    (re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+", re.ASCII), "<email>"),
+    (re.compile(r"\b[\w-]+(?:\.[\w-]+)*\.(?:com|net|org|jp|info|xyz|top|click|io|me|cc)(?:/[\w\-./?=&%#]*)?", re.ASCII), "<url>"),
+    (re.compile(r"\d[\d,.\-]*(?:[万千億]\d*)*"), "<num>"),
+    (re.compile(r"[一-龥ァ-ヶー]{1,4}(?=様|さん)"), "<name>"),
+]
+# 空白やハイフンで区切られた番号（"070 1111 2222" など）は1つにまとめる
+_NUM_RUNS = re.compile(r"<num>(?:[\s\-()]*<num>)+")
+_SPACES = re.compile(r"\s+")
+
+
+def mask_variable_parts(text: str) -> str:
+    """文面ごとに変わりやすい部分（URL・数字・宛名など）を記号に置き換える。"""
+    # 全角の数字・英字を半角にそろえてから伏せる
+    masked = unicodedata.normalize("NFKC", text)
+    for pattern, replacement in _MASKS:
+        masked = pattern.sub(replacement, masked)
+    masked = _NUM_RUNS.sub("<num>", masked)
+    return _SPACES.sub(" ", masked).strip()
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 の最終段（64 ビット値をよく混ぜる）"""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def simhash(text: str) -> int:
+    """伏せ字にした本文の 64 ビット SimHash"""
+    masked = mask_variable_parts(text)
+    codepoints = np.frombuffer(masked.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codepoints) < SHINGLE_SIZE:
+        codepoints = np.pad(codepoints, (0, SHINGLE_SIZE - len(codepoints)))
+    # 文字 3-gram をコードポイント（21 ビット）3つを並べた値にして混ぜる。
+    # 同じ 3-gram が何度も出ればそのぶん票が入るため、出現回数の重み付けになる
+    shingles = codepoints[:-2] | (codepoints[1:-1] << np.uint64(21)) | (codepoints[2:] << np.uint64(42))
+    hashes = _mix64(shingles)
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    # 各ビットについて、1 になった 3-gram が半数を超えれば 1
+    ones = bits.sum(axis=0, dtype=np.int64)
+    return int.from_bytes(np.packbits(ones * 2 > len(hashes), bitorder="little").tobytes(), "little")
+
+
+def _band_masks(bands: int) -> list[tuple[int, int]]:
+    """指紋を bands 個の帯に分けたときの (シフト量, マスク) の一覧"""
+    width, extra = divmod(FINGERPRINT_BITS, bands)
+    masks = []
+    shift = 0
+    for i in range(bands):
+        size = width + (1 if i < extra else 0)
+        masks.append((shift, (1 << size) - 1))
+        shift += size
+    return masks
+
+
+class NearDuplicateCache:
+    """SimHash の帯索引で近い本文の判定を引くキャッシュ（スレッドセーフ）"""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        ttl: float,
+        max_distance: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not 0 <= max_distance < FINGERPRINT_BITS // 2:
+            raise ValueError(f"max_distance must be between 0 and {FINGERPRINT_BITS // 2 - 1}")
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._bands = _band_masks(max_distance + 1)
+        # 帯ごとの 帯の値 → 指紋の集合
+        self._tables: list[dict[int, set[int]]] = [{} for _ in self._bands]
+        # 指紋 → (期限, バイト数, シリアライズ済みの結果)
+        self._entries: OrderedDict[int, tuple[float, int, bytes]] = OrderedDict()
+        self._bytes = 0
+        self._version: str | None = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, version: str, text: str) -> Any | None:
+        """距離が max_distance 以下の登録済み本文の結果を返す（なければ None）。"""
+        return self.get_fingerprint(version, simhash(text))
+
+    def put(self, version: str, text: str, value: Any) -> None:
+        self.put_fingerprint(version, simhash(text), value)
+
+    def get_fingerprint(self, version: str, fingerprint: int) -> Any | None:
+        with self._lock:
+            self._check_version(version)
+            now = self._clock()
+            best: int | None = None
+            best_distance = self.max_distance + 1
+            for candidate in self._candidates(fingerprint):
+                if self._entries[candidate][0] <= now:
+                    self._remove(candidate, "expired")
+                    continue
+                distance = (candidate ^ fingerprint).bit_count()
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+            if best is None:
+                cache_misses_total.labels(cache=self.name).inc()
+                self._update_gauges()
+                return None
+            self._entries.move_to_end(best)
+            payload = self._entries[best][2]
+            cache_hits_total.labels(cache=self.name).inc()
+        near_duplicate_distance.labels(cache=self.name).observe(best_distance)
+        return json.loads(payload)
+
+    def put_fingerprint(self, version: str, fingerprint: int, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        size = len(payload) + ENTRY_OVERHEAD
+        with self._lock:
+            self._check_version(version)
+            if fingerprint in self._entries:
+                self._remove(fingerprint, None)
+            self._entries[fingerprint] = (self._clock() + self.ttl, size, payload)
+            self._bytes += size
+            for (shift, mask), table in zip(self._bands, self._tables):
+                table.setdefault((fingerprint >> shift) & mask, set()).add(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)), "capacity")
+            self._update_gauges()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear("invalidated")
+
+    def _candidates(self, fingerprint: int) -> set[int]:
+        candidates: set[int] = set()
+        for (shift, mask), table in zip(self._bands, self._tables):
+            bucket = table.get((fingerprint >> shift) & mask)
+            if bucket:
+                candidates |= bucket
+        return candidates
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            if self._version is not None:
+                self._clear("invalidated")
+            self._version = version
+
+    def _clear(self, reason: str) -> None:
+        if self._entries:
+            cache_evictions_total.labels(cache=self.name, reason=reason).inc(len(self._entries))
+        self._entries.clear()
+        for table in self._tables:
+            table.clear()
+        self._bytes = 0
+        self._update_gauges()
+
+    def _remove(self, fingerprint: int, reason: str | None) -> None:
+        _, size, _ = self._entries.pop(fingerprint)
+        self._bytes -= size
+        for (shift, mask), table in zip(self._bands, self._tables):
+            band = (fingerprint >> shift) & mask
+            bucket = table[band]
+            bucket.discard(fingerprint)
+            if not bucket:
+                del table[band]
+        if reason is not None:
+            cache_evictions_total.labels(cache=self.name, reason=reason).inc()
+
+    def _update_gauges(self) -> None:
+        cache_entries.labels(cache=self.name).set(len(self._entries))
+        cache_bytes.labels(cache=self.name).set(self._bytes)
+
+
+@lru_cache()
+def get_near_duplicate_cache(name: str) -> NearDuplicateCache | None:
+    """設定に従って名前ごとの共有キャッシュを返す（無効なら None）。"""
+    settings = get_settings()
+    if settings.near_duplicate_max_entries <= 0:
+        return None
+    return NearDuplicateCache(
+        name,
+        max_entries=settings.near_duplicate_max_entries,
+        ttl=settings.result_cache_ttl,
+        max_distance=settings.near_duplicate_max_distance,
+    )
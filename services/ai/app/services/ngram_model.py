@@ -0,0 +1,183 @@
+"""文字 n-gram ハッシュ特徴の線形分類器（詐欺会話の学習済みスコアラー）
+
+ルールベースの ``ScamAnalyzer`` と並べて使う軽量な学習モデルです。
+CPU だけで 5KB のトランスクリプトを 1 ミリ秒未満で採点できるよう、次の構成にしています。
+
+- 照合と同じ正規化（``normalize_text``）をかけた本文から文字 1〜3-gram を取り出す
+  （日本語は単語区切りがないため形態素解析はしない）
+- n-gram はコードポイント（21 ビット）を並べた値を混ぜて ``2**bits`` 個のバケットにハッシュする
+  （語彙表を持たないため、未知の言い回しでもメモリは増えない）
+- 特徴量は出現回数を n-gram 総数の平方根で割ったもの。スコアは
+  ``sigmoid(bias + Σ weights[バケット] / sqrt(総数))`` で、疎なベクトルとの内積を
+  重みの配列引きと合計（バッチは ``np.bincount``）だけで求める
+- 重みは ``app.tools.train_ngram_model`` でラベル付き JSONL から学習したファイルを ``mmap`` で開く。
+  複数の uvicorn ワーカーがページキャッシュ上の同じ重みを共有する
+
+ファイル形式（リトルエンディアン）::
+
+    ヘッダ（64バイト） | 重み（float32 × 2**bits）
+"""
+
+import logging
+import mmap
+import os
+import struct
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from app.config import get_settings
+from app.services.text_normalizer import normalize_text
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MNGM"
+FORMAT_VERSION = 1
+
+# magic, version, bits, min_n, max_n, reserved, bias, model_version, trained_at
+HEADER = struct.Struct("<4sHBBBxxxd32sQ")
+HEADER_SIZE = 64
+
+DEFAULT_BITS = 20
+DEFAULT_NGRAM_RANGE = (1, 3)
+
+# n ごとに n-gram の値へ混ぜる定数（長さの違う n-gram が同じ値にならないように）
+_NGRAM_SEEDS = {
+    1: np.uint64(0x9E3779B97F4A7C15),
+    2: np.uint64(0xC2B2AE3D27D4EB4F),
+    3: np.uint64(0x165667B19E3779F9),
+}
+_CODEPOINT_BITS = 21
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 の最終段（64 ビット値をよく混ぜる）"""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def hash_ngrams(
+    texts: list[str],
+    bits: int = DEFAULT_BITS,
+    ngram_range: tuple[int, int] = DEFAULT_NGRAM_RANGE,
+) -> tuple[np.ndarray, np.ndarray]:
+    """複数の本文の n-gram のバケット番号と、それぞれが何件目の本文のものかを返す。
+
+    全件の正規化後の本文を1つの配列につなげてまとめてハッシュし、
+    本文の境界をまたぐ n-gram だけを取り除きます。
+    """
+    normalized = [normalize_text(text).text for text in texts]
+    lengths = np.fromiter(map(len, normalized), dtype=np.int64, count=len(normalized))
+    codes = np.frombuffer("".join(normalized).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    owners = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+    shift = np.uint64(64 - bits)
+
+    buckets: list[np.ndarray] = []
+    ngram_owners: list[np.ndarray] = []
+    min_n, max_n = ngram_range
+    for n in range(min_n, max_n + 1):
+        count = len(codes) - n + 1
+        if count <= 0:
+            break
+        values = codes[:count] ^ _NGRAM_SEEDS[n]
+        for k in range(1, n):
+            values = values ^ (codes[k:k + count] << np.uint64(_CODEPOINT_BITS * k))
+        owner = owners[:count]
+        if len(texts) > 1:
+            same = owner == owners[n - 1:]
+            values, owner = values[same], owner[same]
+        buckets.append((_mix64(values) >> shift).astype(np.uint32))
+        ngram_owners.append(owner)
+    if not buckets:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int64)
+    return np.concatenate(buckets), np.concatenate(ngram_owners)
+
+
+def linear_scores(
+    weights: np.ndarray, bias: float, buckets: np.ndarray, owners: np.ndarray, size: int,
+) -> np.ndarray:
+    """各本文の線形スコア（sigmoid をかける前の値）"""
+    totals = np.bincount(owners, minlength=size)
+    sums = np.bincount(owners, weights=weights[buckets], minlength=size)
+    return bias + sums / np.sqrt(np.maximum(totals, 1))
+
+
+def sigmoid(values: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(values, -50.0, 50.0)))
+
+
+class NgramModel:
+    """学習済みの重みで本文の詐欺らしさ（0〜100）を求める"""
+
+    def __init__(
+        self,
+        weights: np.ndarray,
+        bias: float,
+        model_version: str,
+        ngram_range: tuple[int, int] = DEFAULT_NGRAM_RANGE,
+    ) -> None:
+        bits = int(len(weights)).bit_length() - 1
+        if len(weights) != 1 << bits or not 1 <= bits <= 32:
+            raise ValueError("重みの数は 2 のべき乗にしてください")
+        if not 1 <= ngram_range[0] <= ngram_range[1] <= len(_NGRAM_SEEDS):
+            raise ValueError(f"n-gram の範囲が不正です: {ngram_range}")
+        self.weights = weights
+        self.bias = bias
+        self.model_version = model_version
+        self.ngram_range = ngram_range
+        self.bits = bits
+
+    @classmethod
+    def load(cls, path: str | Path) -> "NgramModel":
+        """モデルファイルを mmap で開く（重みはコピーしない）。"""
+        path = Path(path)
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(mm) < HEADER_SIZE:
+            mm.close()
+            raise ValueError(f"モデルファイルの形式が不正です: {path}")
+        magic, version, bits, min_n, max_n, bias, raw_version, _ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or len(mm) != HEADER_SIZE + 4 * (1 << bits):
+            mm.close()
+            raise ValueError(f"モデルファイルの形式が不正です: {path}")
+        weights = np.frombuffer(mm, dtype="<f4", count=1 << bits, offset=HEADER_SIZE)
+        model_version = raw_version.rstrip(b"\0").decode("utf-8")
+        return cls(weights, bias, model_version, (min_n, max_n))
+
+    def probabilities(self, texts: list[str]) -> np.ndarray:
+        """各本文が詐欺である確率の推定値"""
+        buckets, owners = hash_ngrams(texts, self.bits, self.ngram_range)
+        return sigmoid(linear_scores(self.weights, self.bias, buckets, owners, len(texts)))
+
+    def score(self, text: str) -> int:
+        """本文1件のスコア（0〜100）"""
+        return self.score_batch([text])[0]
+
+    def score_batch(self, texts: list[str]) -> list[int]:
+        """複数件のスコア（0〜100、入力順）"""
+        if not texts:
+            return []
+        return np.rint(self.probabilities(texts) * 100).astype(np.int64).tolist()
+
+
+@lru_cache()
+def get_scam_model() -> NgramModel | None:
+    """設定されたモデルファイルを開く（未設定・読み込み失敗時は None）。"""
+    settings = get_settings()
+    if not settings.scam_model_path:
+        return None
+    try:
+        model = NgramModel.load(settings.scam_model_path)
+    except (OSError, ValueError) as e:
+        logger.error("詐欺判定モデルを開けません: %s", str(e))
+        return None
+    logger.info(
+        "詐欺判定モデルを読み込みました: %s (%s, %d バケット, %d 次まで)",
+        os.path.basename(settings.scam_model_path),
+        model.model_version,
+        len(model.weights),
+        model.ngram_range[1],
+    )
+    return model
@@ -0,0 +1,223 @@
+"""通報済み詐欺番号のレピュテーションストア
+
+警察・キャリアのフィードから作成した数百万件規模の通報番号を、
+ハッシュ化した固定長レコードのソート済み配列としてファイルに格納し、
+``mmap`` で開いて参照します。ページキャッシュ経由で複数の uvicorn ワーカーが
+同じ物理メモリを共有でき、否定的な問い合わせの大半は前段の Bloom フィルタだけで
+答えるため、ソート済み配列には触れません。
+
+ファイル形式（リトルエンディアン）::
+
+    ヘッダ（64バイト） | Bloom フィルタのビット列 | レコード配列（キー昇順）
+
+新しいファイルは一時ファイルに書き出してから ``os.replace`` で差し替えます。
+ストアは一定間隔でファイルの差し替えを検知し、新しい mmap に原子的に切り替えます。
+"""
+
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MREP"
+FORMAT_VERSION = 1
+
+# magic, version, record_size, count, bloom_bits, bloom_hashes, reserved,
+# bloom_offset, records_offset, built_at
+HEADER = struct.Struct("<4sHHQQIIQQQ")
+HEADER_SIZE = 64
+
+# key(u64), risk_score(u8), category(u8), report_count(u16), last_reported(u32)
+RECORD = struct.Struct("<QBBHI")
+_KEY = struct.Struct("<Q")
+
+_MASK64 = (1 << 64) - 1
+
+# 補間探索を試みる回数（超えたら二分探索）
+_INTERPOLATION_PROBES = 8
+
+# カテゴリコード（ファイル内は添字で保持）
+REPORT_CATEGORIES = (
+    "other",
+    "fraud_call",
+    "sms_phishing",
+    "dark_job",
+    "robocall",
+)
+
+CATEGORY_LABELS = {
+    "other": "その他",
+    "fraud_call": "詐欺電話",
+    "sms_phishing": "フィッシングSMS",
+    "dark_job": "闇バイト勧誘",
+    "robocall": "自動音声",
+}
+
+
+def hash_number(number: str) -> tuple[int, int]:
+    """E.164 番号から (レコードキー, Bloom 用の第2ハッシュ) を求める。"""
+    digest = hashlib.blake2b(number.encode("utf-8"), digest_size=16).digest()
+    h1, h2 = struct.unpack("<QQ", digest)
+    return h1, h2 | 1
+
+
+def bloom_parameters(count: int, false_positive_rate: float) -> tuple[int, int]:
+    """要素数と偽陽性率から (ビット数, ハッシュ関数の数) を求める。"""
+    count = max(count, 1)
+    bits = math.ceil(-count * math.log(false_positive_rate) / (math.log(2) ** 2))
+    bits = max(64, (bits + 7) // 8 * 8)
+    hashes = max(1, round(bits / count * math.log(2)))
+    return bits, hashes
+
+
+@dataclass(frozen=True)
+class ReputationRecord:
+    """通報番号1件分のメタデータ"""
+
+    risk_score: int
+    category: str
+    report_count: int
+    last_reported: int
+
+
+class ReputationFile:
+    """mmap で開いた1世代分のストアファイル（読み取り専用）"""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        (
+            magic, version, record_size, self.count, self.bloom_bits,
+            self.bloom_hashes, _, self._bloom_offset, self._records_offset, self.built_at,
+        ) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD.size:
+            self._mm.close()
+            raise ValueError(f"レピュテーションストアの形式が不正です: {self.path}")
+
+    def might_contain(self, h1: int, h2: int) -> bool:
+        """Bloom フィルタ判定（False なら確実に未登録）"""
+        mm = self._mm
+        base = self._bloom_offset
+        bits = self.bloom_bits
+        for i in range(self.bloom_hashes):
+            bit = ((h1 + i * h2) & _MASK64) % bits
+            if not mm[base + (bit >> 3)] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def find(self, key: int) -> ReputationRecord | None:
+        """ソート済みレコード配列からキーを探す。
+
+        キーは一様分布のハッシュ値なので補間探索で数回の読み出しに収め、
+        偏りがあっても最悪 O(log n) になるよう途中から二分探索に切り替えます。
+        """
+        mm = self._mm
+        base = self._records_offset
+        size = RECORD.size
+        unpack_key = _KEY.unpack_from
+        lo, hi = 0, self.count - 1
+        lo_key, hi_key = 0, _MASK64
+        probes = 0
+        while lo <= hi:
+            if probes < _INTERPOLATION_PROBES and lo_key < key < hi_key:
+                mid = lo + (key - lo_key) * (hi - lo) // (hi_key - lo_key)
+            else:
+                mid = (lo + hi) >> 1
+            probes += 1
+            (probe,) = unpack_key(mm, base + mid * size)
+            if probe < key:
+                lo, lo_key = mid + 1, probe
+            elif probe > key:
+                hi, hi_key = mid - 1, probe
+            else:
+                _, risk, category, reports, last = RECORD.unpack_from(mm, base + mid * size)
+                name = REPORT_CATEGORIES[category] if category < len(REPORT_CATEGORIES) else "other"
+                return ReputationRecord(risk, name, reports, last)
+        return None
+
+    def lookup(self, number: str) -> ReputationRecord | None:
+        h1, h2 = hash_number(number)
+        if not self.might_contain(h1, h2):
+            return None
+        return self.find(h1)
+
+
+class NumberReputationStore:
+    """ファイル差し替えを検知して自動で切り替わるレピュテーションストア。
+
+    切り替えは参照の代入1回で行うため、切り替え中の問い合わせは
+    旧世代のファイルで最後まで処理されます（旧 mmap は参照がなくなった時点で解放）。
+    """
+
+    def __init__(self, path: str | Path, reload_interval: float = 30.0) -> None:
+        self.path = Path(path)
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._current = ReputationFile(self.path)
+        self._next_check = time.monotonic() + reload_interval
+
+    @property
+    def current(self) -> ReputationFile:
+        return self._current
+
+    def refresh(self) -> bool:
+        """ファイルが差し替えられていれば新しい世代を開く。切り替えたら True。"""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return False
+            if (stat.st_ino, stat.st_mtime_ns, stat.st_size) == self._current.identity:
+                return False
+            try:
+                new_file = ReputationFile(self.path)
+            except (OSError, ValueError) as e:
+                logger.error("レピュテーションストアの再読み込みに失敗: %s", str(e))
+                return False
+            self._current = new_file
+            logger.info(
+                "レピュテーションストアを切り替えました: %s (%d件)",
+                self.path,
+                new_file.count,
+            )
+            return True
+
+    def lookup(self, number: str) -> ReputationRecord | None:
+        """E.164 番号の通報情報を返す（未登録なら None）。"""
+        if self.reload_interval > 0:
+            now = time.monotonic()
+            if now >= self._next_check:
+                self._next_check = now + self.reload_interval
+                self.refresh()
+        return self._current.lookup(number)
+
+
+@lru_cache()
+def get_default_reputation_store() -> NumberReputationStore | None:
+    """設定されたストアを開く（未設定・読み込み失敗時は None）。"""
+    settings = get_settings()
+    if not settings.reputation_store_path:
+        return None
+    try:
+        return NumberReputationStore(
+            settings.reputation_store_path,
+            reload_interval=settings.reputation_reload_interval,
+        )
+    except (OSError, ValueError) as e:
+        logger.error("レピュテーションストアを開けません: %s", str(e))
+        return None
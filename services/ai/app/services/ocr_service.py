@@ -3,6 +3,9 @@
 import base64
 import logging
 import re
+from multiprocessing import shared_memory
+
+from app.services.stage_metrics import stage
 
 logger = logging.getLogger(__name__)
 
@@ -21,8 +24,20 @@ class OcrService:
         """Base64エンコードされた画像からテキストを抽出"""
         try:
             # Base64をデコードしてバイナリを取得
-            image_data = base64.b64decode(image_base64)
+            with stage("base64_decode"):
+                image_data = base64.b64decode(image_base64)
+        except Exception as e:
+            logger.error("OCRテキスト抽出に失敗: %s", str(e))
+            return ""
+        return self.extract_text_from_bytes(image_data)
+
+    def extract_text_from_bytes(self, image_data: bytes | memoryview) -> str:
+        """画像のバイト列（memoryview 可、コピーせずに参照）からテキストを抽出"""
+        with stage("ocr", nbytes=len(image_data)):
+            return self._extract(image_data)
 
+    def _extract(self, image_data: bytes | memoryview) -> str:
+        try:
             # pytesseract が使える環境ではOCRを実行
             try:
                 import pytesseract
@@ -43,12 +58,12 @@ class OcrService:
             logger.error("OCRテキスト抽出に失敗: %s", str(e))
             return ""
 
-    def _heuristic_extract(self, data: bytes) -> str:
+    def _heuristic_extract(self, data: bytes | memoryview) -> str:
         """バイナリデータからテキストっぽい部分を抽出（フォールバック）"""
         # UTF-8でデコード可能な連続部分を探す
         text_parts: list[str] = []
         try:
-            decoded = data.decode("utf-8", errors="ignore")
+            decoded = str(data, "utf-8", errors="ignore")
             # 日本語文字やASCII文字の連続を検出
             patterns = re.findall(
                 r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF\uFF00-\uFFEFa-zA-Z0-9\s,.!?、。！？「」（）\-]{4,}',
@@ -64,3 +79,16 @@ class OcrService:
         else:
             logger.info("テキスト抽出結果: 空（画像のみのコンテンツの可能性）")
         return result
+
+
+def extract_text_from_shared_memory(name: str, size: int) -> str:
+    """共有メモリ上の画像からテキストを抽出（プロセスプールのワーカーで実行）"""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        view = shm.buf[:size]
+        try:
+            return OcrService().extract_text_from_bytes(view)
+        finally:
+            view.release()
+    finally:
+        shm.close()
@@ -0,0 +1,114 @@
+"""電話番号の E.164 正規化とプレフィックス分類
+
+着信番号は端末や入力経路によって全角数字・ハイフン・``0081``/``010`` 付き国際
+プレフィックス・``+81 50`` のような空白入りなど表記がばらつくため、
+判定前に E.164 形式（``+`` ＋国番号＋番号）へ正規化します。
+プレフィックス表はデータファイルから最長一致トライに読み込み、
+表の行数によらず番号長に比例する時間で検索します。
+"""
+
+import csv
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+
+DEFAULT_PREFIX_TABLE = Path(__file__).resolve().parent.parent / "data" / "phone_prefixes.csv"
+
+JAPAN_COUNTRY_CODE = "81"
+
+# 区切りとして除去する文字（NFKC 後も残る各種ハイフン・長音符を含む）
+_SEPARATORS = re.compile(r"[\s\-‐‑‒–—―−ー().]")
+_DIAL_STRING = re.compile(r"\+?[0-9]+")
+
+# 国内からの国際発信プレフィックス（010）と国際共通プレフィックス（00）
+_INTERNATIONAL_ACCESS_CODES = ("010", "00")
+
+# (プレフィックス, 加点, 理由)
+PrefixEntry = tuple[str, int, str]
+
+
+def clean_phone_number(raw: str) -> str:
+    """全角→半角変換と区切り文字の除去だけを行う。"""
+    return _SEPARATORS.sub("", unicodedata.normalize("NFKC", raw))
+
+
+def normalize_phone_number(raw: str) -> str:
+    """電話番号を E.164 形式に正規化する。
+
+    ``0`` 始まりの国内番号は ``+81`` を補い、``00``/``010`` 始まりは
+    国際プレフィックスとして ``+`` に置き換えます。
+    数字以外を含む値（「非通知」など）や短縮番号はそのまま返します。
+    """
+    number = clean_phone_number(raw)
+    if not _DIAL_STRING.fullmatch(number):
+        return number
+    if number.startswith("+"):
+        # 「+81 090…」のように国内の 0 を残した表記を補正
+        if number.startswith("+" + JAPAN_COUNTRY_CODE + "0"):
+            return "+" + JAPAN_COUNTRY_CODE + number[len(JAPAN_COUNTRY_CODE) + 2:]
+        return number
+    for access_code in _INTERNATIONAL_ACCESS_CODES:
+        if number.startswith(access_code) and len(number) > len(access_code):
+            return "+" + number[len(access_code):]
+    if number.startswith("0") and len(number) > 1:
+        return "+" + JAPAN_COUNTRY_CODE + number[1:]
+    return number
+
+
+class PrefixTrie:
+    """文字単位の最長一致プレフィックストライ。"""
+
+    # 終端ノードに値を格納するキー（1文字のキーと衝突しない）
+    _VALUE = ""
+
+    def __init__(self, entries: list[PrefixEntry] | None = None) -> None:
+        self._root: dict = {}
+        self._size = 0
+        for entry in entries or []:
+            self.add(entry)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, entry: PrefixEntry) -> None:
+        node = self._root
+        for ch in entry[0]:
+            node = node.setdefault(ch, {})
+        if self._VALUE not in node:
+            self._size += 1
+        node[self._VALUE] = entry
+
+    def longest_match(self, number: str) -> PrefixEntry | None:
+        """number の先頭に一致する最長のエントリを返す。"""
+        node = self._root
+        best = node.get(self._VALUE)
+        for ch in number:
+            node = node.get(ch)
+            if node is None:
+                break
+            best = node.get(self._VALUE, best)
+        return best
+
+
+def read_prefix_entries(path: str | Path = DEFAULT_PREFIX_TABLE) -> list[PrefixEntry]:
+    """CSV（prefix, weight, reason）を読み込み、prefix を E.164 に正規化して返す。
+
+    prefix は E.164 形式、または国内表記（``050`` など）で記述できます。
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        return [
+            (normalize_phone_number(row["prefix"]), int(row["weight"]), row["reason"])
+            for row in csv.DictReader(f)
+        ]
+
+
+def load_prefix_table(path: str | Path = DEFAULT_PREFIX_TABLE) -> PrefixTrie:
+    """CSV からプレフィックストライを構築する。"""
+    return PrefixTrie(read_prefix_entries(path))
+
+
+@lru_cache()
+def get_default_prefix_table() -> PrefixTrie:
+    """同梱のプレフィックス表を返す（プロセス内で1回だけ読み込む）。"""
+    return load_prefix_table(DEFAULT_PREFIX_TABLE)
@@ -0,0 +1,67 @@
+"""近接ルールエンジン
+
+「語A の後ろ N 文字以内に語B が現れる」という近接ルールをまとめてコンパイルし、
+キーワード出現位置の1回の走査で全ルールを評価します。
+正規表現 ``A.*B`` のようなバックトラックが起きないため、
+評価コストは入力長とヒット数に対して線形（＋二分探索）に収まります。
+"""
+
+from bisect import bisect_right
+
+from app.services.keyword_matcher import KeywordMatcher
+
+# 行区切り（正規表現の "." と同様、ルールは行をまたがない）
+_NEWLINE = "\n"
+
+# (語A, 語B, 加点, 最大間隔)  最大間隔 None は同一行内なら距離無制限
+ProximityRule = tuple[str, str, int, int | None]
+
+
+class ProximityRuleEngine:
+    """近接ルール群を1つのオートマトンにコンパイルして評価する。"""
+
+    def __init__(self, rules: list[ProximityRule]) -> None:
+        self.rules = list(rules)
+        self._by_first: dict[str, list[int]] = {}
+        self._by_second: dict[str, list[int]] = {}
+        for idx, (first, second, _, _) in enumerate(self.rules):
+            self._by_first.setdefault(first, []).append(idx)
+            self._by_second.setdefault(second, []).append(idx)
+        self._matcher = KeywordMatcher(
+            [term for rule in self.rules for term in rule[:2]] + [_NEWLINE]
+        )
+
+    def matched_rules(self, text: str) -> list[int]:
+        """成立したルールのインデックスを昇順で返す。"""
+        rules = self.rules
+        by_first = self._by_first
+        by_second = self._by_second
+        # ルールごとの「語A の終了位置」一覧（現在行のみ、昇順）
+        first_ends: list[list[int]] = [[] for _ in rules]
+        matched = [False] * len(rules)
+
+        # 出現は終了位置順に届くので、語B の判定時点で
+        # 開始位置以前に終わった語A はすべて記録済み
+        for start, end, kw in self._matcher.find_spans(text):
+            if kw == _NEWLINE:
+                for ends in first_ends:
+                    ends.clear()
+                continue
+            for idx in by_second.get(kw, ()):
+                ends = first_ends[idx]
+                if matched[idx] or not ends:
+                    continue
+                max_gap = rules[idx][3]
+                if max_gap is None:
+                    matched[idx] = ends[0] <= start
+                else:
+                    pos = bisect_right(ends, start) - 1
+                    matched[idx] = pos >= 0 and start - ends[pos] <= max_gap
+            for idx in by_first.get(kw, ()):
+                first_ends[idx].append(end)
+
+        return [idx for idx, ok in enumerate(matched) if ok]
+
+    def boost(self, text: str) -> int:
+        """成立したルールの加点合計を返す。"""
+        return sum(self.rules[idx][2] for idx in self.matched_rules(text))
@@ -0,0 +1,236 @@
+"""解析結果のコンテンツハッシュキャッシュ
+
+拡散した詐欺SMSや求人投稿は、多数の利用者から同じ本文で届きます。
+入力テキストとモデルバージョンのハッシュをキーに解析結果を保持し、
+同じ本文の2件目以降はルール照合を省略します。
+
+- エントリ数とバイト数の両方に上限を設け、超えたら最も古く使われたものから破棄（LRU）
+- エントリごとの有効期限（TTL）
+- モデルバージョンが変わったら全エントリを破棄
+- ヒット・ミス・破棄件数・使用バイト数を Prometheus で公開
+
+結果は JSON にシリアライズして保持するため、呼び出し側が結果を書き換えても
+キャッシュには影響せず、使用バイト数もシリアライズ後の長さで見積もれます。
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from functools import lru_cache
+from typing import Any
+
+from prometheus_client import Counter, Gauge
+
+from app.config import get_settings
+
+# キー・辞書エントリ・期限などのシリアライズ結果以外に使う概算バイト数
+ENTRY_OVERHEAD = 160
+
+cache_hits_total = Counter(
+    "analysis_cache_hits_total",
+    "Analysis result cache hits",
+    ["cache"],
+)
+cache_misses_total = Counter(
+    "analysis_cache_misses_total",
+    "Analysis result cache misses",
+    ["cache"],
+)
+cache_evictions_total = Counter(
+    "analysis_cache_evictions_total",
+    "Analysis result cache evictions",
+    ["cache", "reason"],
+)
+cache_entries = Gauge(
+    "analysis_cache_entries",
+    "Number of cached analysis results",
+    ["cache"],
+    # 複数ワーカー構成では生存中のワーカーの合計を公開する
+    multiprocess_mode="livesum",
+)
+cache_bytes = Gauge(
+    "analysis_cache_bytes",
+    "Approximate memory used by cached analysis results",
+    ["cache"],
+    multiprocess_mode="livesum",
+)
+
+
+def normalize_cache_text(text: str) -> str:
+    """キャッシュキー用に入力を正規化する。
+
+    判定結果が変わらない範囲（前後の空白のみ）に留めます。
+    """
+    return text.strip()
+
+
+class ResultCache:
+    """LRU・TTL・容量上限付きの解析結果キャッシュ（スレッドセーフ）"""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        max_bytes: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key → (期限, バイト数, シリアライズ済みの結果)
+        self._entries: OrderedDict[bytes, tuple[float, int, bytes]] = OrderedDict()
+        self._bytes = 0
+        self._version: str | None = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    @staticmethod
+    def make_key(version: str, *parts: str) -> bytes:
+        """モデルバージョンと入力からキャッシュキーを作る。"""
+        digest = hashlib.blake2b(version.encode("utf-8"), digest_size=16)
+        for part in parts:
+            digest.update(b"\x00")
+            digest.update(normalize_cache_text(part).encode("utf-8"))
+        return digest.digest()
+
+    def get(self, version: str, key: bytes) -> Any | None:
+        """キャッシュ済みの結果を返す（なければ None）。"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                self._remove(key, "expired")
+                entry = None
+            if entry is None:
+                cache_misses_total.labels(cache=self.name).inc()
+                self._update_gauges()
+                return None
+            self._entries.move_to_end(key)
+            cache_hits_total.labels(cache=self.name).inc()
+        return json.loads(entry[2])
+
+    def put(self, version: str, key: bytes, value: Any) -> None:
+        """結果を保存する（単体で上限を超える結果は保存しない）。"""
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        size = len(payload) + ENTRY_OVERHEAD
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            if key in self._entries:
+                self._remove(key, None)
+            self._entries[key] = (self._clock() + self.ttl, size, payload)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)), "capacity")
+            self._update_gauges()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear("invalidated")
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            if self._version is not None:
+                self._clear("invalidated")
+            self._version = version
+
+    def _clear(self, reason: str) -> None:
+        if self._entries:
+            cache_evictions_total.labels(cache=self.name, reason=reason).inc(len(self._entries))
+        self._entries.clear()
+        self._bytes = 0
+        self._update_gauges()
+
+    def _remove(self, key: bytes, reason: str | None) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+        if reason is not None:
+            cache_evictions_total.labels(cache=self.name, reason=reason).inc()
+
+    def _update_gauges(self) -> None:
+        cache_entries.labels(cache=self.name).set(len(self._entries))
+        cache_bytes.labels(cache=self.name).set(self._bytes)
+
+
+def cached_call(
+    cache: ResultCache | None,
+    version: str,
+    text: str,
+    compute: Callable[[], Any],
+) -> Any:
+    """キャッシュを引き、なければ compute() の結果を保存して返す。"""
+    if cache is None:
+        return compute()
+    key = ResultCache.make_key(version, text)
+    result = cache.get(version, key)
+    if result is None:
+        result = compute()
+        cache.put(version, key, result)
+    return result
+
+
+def cached_map(
+    cache: ResultCache | None,
+    version: str,
+    texts: Sequence[str],
+    compute_batch: Callable[[list[str]], list[Any]],
+) -> list[Any]:
+    """複数件をキャッシュ経由で処理する（結果は入力順）。
+
+    キャッシュにない本文だけを重複を除いて compute_batch() に渡します。
+    """
+    if not texts:
+        return []
+    if cache is None:
+        return compute_batch(list(texts))
+
+    results: list[Any] = [None] * len(texts)
+    pending: dict[bytes, list[int]] = {}
+    for i, text in enumerate(texts):
+        key = ResultCache.make_key(version, text)
+        if key in pending:
+            pending[key].append(i)
+            continue
+        result = cache.get(version, key)
+        if result is None:
+            pending[key] = [i]
+        else:
+            results[i] = result
+
+    if pending:
+        keys = list(pending)
+        computed = compute_batch([texts[pending[key][0]] for key in keys])
+        for key, result in zip(keys, computed):
+            cache.put(version, key, result)
+            first, *rest = pending[key]
+            results[first] = result
+            for i in rest:
+                results[i] = json.loads(json.dumps(result))
+    return results
+
+
+@lru_cache()
+def get_result_cache(name: str) -> ResultCache | None:
+    """設定に従って名前ごとの共有キャッシュを返す（無効なら None）。"""
+    settings = get_settings()
+    if settings.result_cache_max_entries <= 0 or settings.result_cache_max_bytes <= 0:
+        return None
+    return ResultCache(
+        name,
+        max_entries=settings.result_cache_max_entries,
+        max_bytes=settings.result_cache_max_bytes,
+        ttl=settings.result_cache_ttl,
+    )
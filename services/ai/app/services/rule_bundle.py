@@ -0,0 +1,386 @@
+"""宣言的なルールバンドルの読み込みとホットリロード
+
+詐欺パターン・緊急キーワード・闇バイトのカテゴリ・しきい値・近接ルール・SMS キーワード・
+疑わしいプレフィックス・重要ポイントのマーカー語を、バージョン付きの YAML / JSON ファイル
+（ルールバンドル）で差し替えられるようにします。
+
+- バンドルは pydantic で検証してから、解析器ごとのルール（``ScamRules`` など）と
+  統合走査用のオートマトンにまとめてコンパイルする（``RuleSet``）
+- 省略したセクション・項目は組み込みのルール（各モジュールの定数）を使う
+- コンパイルはリクエストの処理経路の外（監視スレッド・管理エンドポイントの実行プール）で行い、
+  完成した ``RuleSet`` を参照の代入1回で切り替える。解析器は1回の解析の最初に現在のルールを
+  取得するため、切り替え中のリクエストは旧バージョンのルールで最後まで処理される
+- 各解析器の ``model_version`` は ``<解析器のバージョン>+<バンドルのバージョン>`` になる。
+  結果キャッシュはバージョンが変わると破棄されるため、旧ルールの結果が返ることはない
+- 切り替えはファイルの差し替え（``reload_interval`` 秒ごとに確認）か管理エンドポイントで行う。
+  読み込み・検証に失敗したバンドルは適用せず、現在のルールを使い続ける
+
+複数ワーカー構成ではワーカーごとにファイルを監視します。管理エンドポイントは
+受け付けたワーカーだけを即時に切り替え、他のワーカーは次の確認で追従します。
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Annotated, Any
+
+from prometheus_client import Counter, Histogram
+from pydantic import BaseModel, Field, model_validator
+
+from app.config import get_settings
+from app.services import dark_job_checker, key_points, metadata_analyzer, scam_analyzer
+from app.services.dark_job_checker import DarkJobRules
+from app.services.key_points import KeyPointRules
+from app.services.keyword_matcher import KeywordMatcher
+from app.services.metadata_analyzer import MetadataRules
+from app.services.phone_prefix import normalize_phone_number
+from app.services.scam_analyzer import ScamRules
+
+logger = logging.getLogger(__name__)
+
+BUILTIN_VERSION = "builtin"
+
+rule_bundle_reloads_total = Counter(
+    "rule_bundle_reloads_total",
+    "Rule bundle reload attempts",
+    ["result"],
+)
+rule_bundle_compile_seconds = Histogram(
+    "rule_bundle_compile_seconds",
+    "Time spent loading and compiling a rule bundle",
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5],
+)
+
+
+# 空文字のキーワードはオートマトンに登録されず、解析器の構築時に列番号を引けない
+Keyword = Annotated[str, Field(min_length=1)]
+
+
+class ThresholdSpec(BaseModel):
+    model_config = {"extra": "forbid"}
+    high: int = Field(..., ge=0, le=100, description="高リスクとみなすスコア")
+    medium: int = Field(..., ge=0, le=100, description="中リスクとみなすスコア")
+
+    @model_validator(mode="after")
+    def check_order(self) -> "ThresholdSpec":
+        if self.high < self.medium:
+            raise ValueError("high は medium 以上にしてください")
+        return self
+
+
+class ScamPatternSpec(BaseModel):
+    model_config = {"extra": "forbid"}
+    name: str = Field(..., min_length=1, description="詐欺タイプ（scam_type）")
+    label: str | None = Field(None, description="要約文に使う表示名")
+    score: int = Field(..., ge=0, le=100, description="基礎点")
+    keywords: list[Keyword] = Field(..., min_length=1)
+
+
+class ScamSpec(BaseModel):
+    model_config = {"extra": "forbid"}
+    patterns: list[ScamPatternSpec] = Field(
+        default_factory=lambda: [
+            ScamPatternSpec(
+                name=name, label=scam_analyzer.SCAM_TYPE_NAMES.get(name), score=score, keywords=keywords
+            )
+            for name, keywords, score in scam_analyzer.SCAM_PATTERNS
+        ],
+        min_length=1,
+    )
+    urgency_keywords: list[Keyword] = Field(default_factory=lambda: list(scam_analyzer.URGENCY_KEYWORDS))
+    severity_thresholds: ThresholdSpec = Field(
+        default_factory=lambda: ThresholdSpec(**scam_analyzer.SEVERITY_THRESHOLDS)
+    )
+
+
+class DarkJobCategorySpec(BaseModel):
+    model_config = {"extra": "forbid"}
+    name: str = Field(..., min_length=1)
+    label: str | None = Field(None, description="説明文に使う表示名")
+    weight: int = Field(..., ge=0, le=100)
+    keywords: list[Keyword] = Field(..., min_length=1)
+
+
+class ProximityRuleSpec(BaseModel):
+    model_config = {"extra": "forbid"}
+    first: str = Field(..., min_length=1, description="語A")
+    second: str = Field(..., min_length=1, description="語A の後ろに現れる語B")
+    boost: int = Field(..., ge=0, le=100, description="加点")
+    max_gap: int | None = Field(None, ge=0, description="最大間隔（文字数、null は同一行内なら無制限）")
+
+
+class DarkJobSpec(BaseModel):
+    model_config = {"extra": "forbid"}
+    categories: list[DarkJobCategorySpec] = Field(
+        default_factory=lambda: [
+            DarkJobCategorySpec(
+                name=name, label=dark_job_checker.CATEGORY_NAMES_JA.get(name), weight=weight, keywords=keywords
+            )
+            for name, keywords, weight in dark_job_checker.DARK_JOB_PATTERNS
+        ],
+        min_length=1,
+    )
+    risk_thresholds: ThresholdSpec = Field(
+        default_factory=lambda: ThresholdSpec(**dark_job_checker.RISK_THRESHOLDS)
+    )
+    llm_grey_zone: tuple[int, int] = Field(default=dark_job_checker.LLM_GREY_ZONE)
+    proximity_rules: list[ProximityRuleSpec] = Field(
+        default_factory=lambda: [
+            ProximityRuleSpec(first=first, second=second, boost=boost, max_gap=max_gap)
+            for first, second, boost, max_gap in dark_job_checker.SUSPICIOUS_PROXIMITY_RULES
+        ]
+    )
+
+    @model_validator(mode="after")
+    def check_grey_zone(self) -> "DarkJobSpec":
+        low, high = self.llm_grey_zone
+        if not 0 <= low <= high <= 100:
+            raise ValueError("llm_grey_zone は 0 以上 100 以下の [下限, 上限] で指定してください")
+        return self
+
+
+class PrefixSpec(BaseModel):
+    model_config = {"extra": "forbid"}
+    prefix: str = Field(..., min_length=1, description="E.164 または国内表記のプレフィックス")
+    weight: int = Field(..., ge=0, le=100)
+    reason: str
+
+
+class MetadataSpec(BaseModel):
+    model_config = {"extra": "forbid"}
+    sms_keywords: list[Keyword] = Field(default_factory=lambda: list(metadata_analyzer.SMS_SCAM_KEYWORDS))
+    sms_urgency_words: list[Keyword] = Field(default_factory=lambda: list(metadata_analyzer.SMS_URGENCY_WORDS))
+    # 省略時は同梱のプレフィックス表（app/data/phone_prefixes.csv）
+    suspicious_prefixes: list[PrefixSpec] | None = None
+
+
+class KeyPointSpec(BaseModel):
+    model_config = {"extra": "forbid"}
+    important_markers: list[Keyword] = Field(default_factory=lambda: list(key_points.IMPORTANT_MARKERS))
+
+
+class RuleBundle(BaseModel):
+    """ルールバンドル（省略したセクションは組み込みのルール）"""
+
+    model_config = {"extra": "forbid"}
+    version: str = Field(..., min_length=1, max_length=64, pattern=r"^[\w.\-]+$")
+    scam: ScamSpec = Field(default_factory=ScamSpec)
+    dark_job: DarkJobSpec = Field(default_factory=DarkJobSpec)
+    metadata: MetadataSpec = Field(default_factory=MetadataSpec)
+    key_points: KeyPointSpec = Field(default_factory=KeyPointSpec)
+
+
+class RuleSet:
+    """1つのバージョンのルールをすべてコンパイルしたもの（構築後は変更しない）"""
+
+    def __init__(
+        self,
+        version: str,
+        scam: ScamRules,
+        dark_job: DarkJobRules,
+        metadata: MetadataRules,
+        key_points: KeyPointRules,
+    ) -> None:
+        self.version = version
+        self.scam = scam
+        self.dark_job = dark_job
+        self.metadata = metadata
+        self.key_points = key_points
+        # イベント解析の統合走査用: 全解析器の辞書を1つのオートマトンにまとめる
+        self.event_matcher = KeywordMatcher(
+            list(scam.matcher.keywords)
+            + key_points.markers
+            + list(dark_job.matcher.keywords)
+            + list(metadata.matcher.keywords)
+        )
+
+    @property
+    def model_versions(self) -> dict[str, str]:
+        return {
+            "conversation": self.scam.version,
+            "dark_job": self.dark_job.version,
+            "metadata": self.metadata.version,
+        }
+
+
+BUILTIN_RULES = RuleSet(
+    BUILTIN_VERSION,
+    scam_analyzer.DEFAULT_RULES,
+    dark_job_checker.DEFAULT_RULES,
+    metadata_analyzer.DEFAULT_RULES,
+    key_points.DEFAULT_RULES,
+)
+
+
+def builtin_rule_bundle() -> RuleBundle:
+    """組み込みのルールをバンドルの形で返す（書き出して編集する元として使う）。"""
+    return RuleBundle(version=BUILTIN_VERSION)
+
+
+def load_rule_bundle(path: str | Path) -> RuleBundle:
+    """YAML（.yaml / .yml）または JSON のバンドルファイルを読み込んで検証する。"""
+    path = Path(path)
+    text = path.read_text(encoding="utf-8")
+    if path.suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("YAML のルールバンドルを読むには PyYAML が必要です") from None
+        try:
+            data: Any = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ValueError(f"ルールバンドルの YAML が不正です: {e}") from None
+    else:
+        data = json.loads(text)
+    return RuleBundle.model_validate(data)
+
+
+def compile_rule_bundle(bundle: RuleBundle) -> RuleSet:
+    """バンドルを解析器ごとのルールにコンパイルする。"""
+    suffix = f"+{bundle.version}"
+    scam = bundle.scam
+    dark_job = bundle.dark_job
+    metadata = bundle.metadata
+    prefixes = None
+    if metadata.suspicious_prefixes is not None:
+        prefixes = [
+            (normalize_phone_number(p.prefix), p.weight, p.reason) for p in metadata.suspicious_prefixes
+        ]
+    return RuleSet(
+        bundle.version,
+        ScamRules(
+            [(p.name, p.keywords, p.score) for p in scam.patterns],
+            scam.urgency_keywords,
+            severity_thresholds=scam.severity_thresholds.model_dump(),
+            type_names={
+                p.name: p.label or scam_analyzer.SCAM_TYPE_NAMES.get(p.name, p.name) for p in scam.patterns
+            },
+            version=scam_analyzer.MODEL_VERSION + suffix,
+        ),
+        DarkJobRules(
+            [(c.name, c.keywords, c.weight) for c in dark_job.categories],
+            risk_thresholds=dark_job.risk_thresholds.model_dump(),
+            grey_zone=dark_job.llm_grey_zone,
+            proximity_rules=[(r.first, r.second, r.boost, r.max_gap) for r in dark_job.proximity_rules],
+            category_names={
+                c.name: c.label or dark_job_checker.CATEGORY_NAMES_JA.get(c.name, c.name)
+                for c in dark_job.categories
+            },
+            version=dark_job_checker.MODEL_VERSION + suffix,
+        ),
+        MetadataRules(
+            metadata.sms_keywords,
+            metadata.sms_urgency_words,
+            prefix_entries=prefixes,
+            version=metadata_analyzer.MODEL_VERSION + suffix,
+        ),
+        KeyPointRules(bundle.key_points.important_markers),
+    )
+
+
+class RuleRegistry:
+    """現在のルールを保持し、バンドルの差し替えを検知して原子的に切り替える。"""
+
+    def __init__(self, path: str | Path | None = None, reload_interval: float = 10.0) -> None:
+        self.path = Path(path) if path else None
+        self.reload_interval = reload_interval
+        self.loaded_at = time.time()
+        self._current = BUILTIN_RULES
+        # 最後に読み込みを試みたファイルの (inode, mtime, サイズ)
+        self._identity: tuple[int, int, int] | None = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def current(self) -> RuleSet:
+        return self._current
+
+    def scam_rules(self) -> ScamRules:
+        return self._current.scam
+
+    def dark_job_rules(self) -> DarkJobRules:
+        return self._current.dark_job
+
+    def metadata_rules(self) -> MetadataRules:
+        return self._current.metadata
+
+    def key_point_rules(self) -> KeyPointRules:
+        return self._current.key_points
+
+    def reload(self, force: bool = False) -> bool:
+        """バンドルファイルが差し替えられていれば読み込んで切り替える。切り替えたら True。
+
+        force なら差し替えの有無によらず読み直します。読み込み・検証・コンパイルに失敗した場合は
+        例外（OSError / ValueError）を送出し、現在のルールを使い続けます。
+        """
+        if self.path is None:
+            return False
+        with self._lock:
+            stat = os.stat(self.path)
+            identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if not force and identity == self._identity:
+                return False
+            # 壊れたファイルを確認のたびに読み直さないよう、結果によらず記録する
+            self._identity = identity
+            start = time.perf_counter()
+            try:
+                rules = compile_rule_bundle(load_rule_bundle(self.path))
+            except (OSError, ValueError):
+                rule_bundle_reloads_total.labels(result="error").inc()
+                raise
+            except Exception as e:
+                # 検証を通ったのにコンパイルで落ちたバンドルも、読み込みの失敗として扱う
+                rule_bundle_reloads_total.labels(result="error").inc()
+                logger.exception("ルールバンドルのコンパイルに失敗: %s", self.path)
+                raise ValueError(f"ルールバンドルをコンパイルできません: {e!r}") from e
+            rule_bundle_compile_seconds.observe(time.perf_counter() - start)
+            rule_bundle_reloads_total.labels(result="success").inc()
+            previous, self._current = self._current, rules
+            self.loaded_at = time.time()
+        logger.info(
+            "ルールバンドルを切り替えました: %s → %s (%s, %.1fms)",
+            previous.version, rules.version, self.path, (time.perf_counter() - start) * 1000,
+        )
+        return True
+
+    def start(self) -> None:
+        """バンドルファイルの監視スレッドを開始する（ファイル未設定・間隔0なら何もしない）。"""
+        if self.path is None or self.reload_interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="rule-bundle-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.reload_interval):
+            try:
+                self.reload()
+            except (OSError, ValueError) as e:
+                logger.error("ルールバンドルの再読み込みに失敗: %s", str(e))
+            except Exception:
+                # 想定外の失敗でも監視は止めない
+                logger.exception("ルールバンドルの再読み込みに失敗")
+
+
+@lru_cache()
+def get_rule_registry() -> RuleRegistry:
+    """設定されたバンドルを読み込んだレジストリを返す（未設定なら組み込みのルールのみ）。"""
+    settings = get_settings()
+    registry = RuleRegistry(settings.rule_bundle_path or None, settings.rule_bundle_reload_interval)
+    if registry.path is not None:
+        try:
+            registry.reload(force=True)
+        except (OSError, ValueError) as e:
+            logger.error("ルールバンドルを読み込めません（組み込みのルールを使用）: %s", str(e))
+    return registry
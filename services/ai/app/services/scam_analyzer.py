@@ -1,6 +1,14 @@
-"""Rule-based scam analyzer (Phase 0 – to be replaced by ML model in Phase 2)."""
+"""Rule-based scam analyzer (Phase 0), optionally paired with the learned n-gram scorer (Phase 2)."""
 
-import re
+from collections.abc import Callable
+
+import numpy as np
+
+from app.services.batch_matching import hit_matrix, membership_matrix, row_hits
+from app.services.keyword_matcher import KeywordMatcher
+from app.services.ngram_model import NgramModel
+from app.services.result_cache import ResultCache, cached_call, cached_map
+from app.services.stage_metrics import stage
 
 MODEL_VERSION = "rule-v0.1.0"
 
@@ -43,58 +51,239 @@ URGENCY_KEYWORDS = [
     "誰にも", "内緒", "秘密", "警察に言わない",
 ]
 
+SCAM_TYPE_NAMES = {
+    "ore_ore": "オレオレ詐欺",
+    "refund_fraud": "還付金詐欺",
+    "billing_fraud": "架空請求詐欺",
+    "investment_fraud": "投資詐欺",
+    "cash_card_fraud": "キャッシュカード詐欺",
+}
+
+# 要約文の確度の言い回しを切り替えるリスクスコア
+SEVERITY_THRESHOLDS = {"high": 70, "medium": 50}
+
+# どのパターンにも該当しなかった会話のリスクスコア
+NO_MATCH_SCORE = 5
+NO_MATCH_SUMMARY = "特に詐欺の兆候は検出されませんでした。"
+
+
+def compute_risk_score(top_score: int, urgency_count: int, matched_count: int) -> int:
+    """最上位パターンの基礎点に緊急性・複数パターンの加点を足したリスクスコア。"""
+    urgency_bonus = min(urgency_count * 5, 15)
+    multi_bonus = min((matched_count - 1) * 10, 20)
+    return min(top_score + urgency_bonus + multi_bonus, 100)
+
+
+class ScamRules:
+    """詐欺パターン・緊急キーワードを照合用にコンパイルしたもの（構築後は変更しない）
+
+    ルールの差し替えはこのオブジェクトごと入れ替えるため、解析の途中で
+    辞書・所属行列・しきい値の世代が混ざることはありません。
+    """
+
+    def __init__(
+        self,
+        patterns: list[tuple[str, list[str], int]],
+        urgency_keywords: list[str],
+        severity_thresholds: dict[str, int] = SEVERITY_THRESHOLDS,
+        type_names: dict[str, str] = SCAM_TYPE_NAMES,
+        version: str = MODEL_VERSION,
+    ) -> None:
+        self.patterns = patterns
+        self.urgency_keywords = urgency_keywords
+        self.severity_thresholds = severity_thresholds
+        self.type_names = type_names
+        self.version = version
+
+        # 全パターン＋緊急キーワードを1つのオートマトンにまとめ、1回の走査で照合する
+        self.matcher = KeywordMatcher(
+            [kw for _, keywords, _ in patterns for kw in keywords] + urgency_keywords
+        )
+        # バッチ解析用: キーワード×パターンの所属行列と各パターンの基礎点
+        self.membership = membership_matrix(self.matcher, [kws for _, kws, _ in patterns])
+        self.base_scores = np.array([score for _, _, score in patterns], dtype=np.int64)
+        self.urgency_columns = np.array(
+            [self.matcher.index[kw] for kw in urgency_keywords], dtype=np.int64
+        )
+        # 基礎点の降順（同点はパターン定義順）。単件解析の安定ソートと同じ順序
+        self.pattern_order = sorted(range(len(patterns)), key=lambda i: patterns[i][2], reverse=True)
+        # ストリーミング解析用: キーワード → 所属するパターンの添字
+        self.keyword_patterns: dict[str, tuple[int, ...]] = {
+            kw: tuple(i for i, (_, keywords, _) in enumerate(patterns) if kw in keywords)
+            for kw in self.matcher.keywords
+        }
+        self.urgency_set = frozenset(urgency_keywords)
+
+
+DEFAULT_RULES = ScamRules(SCAM_PATTERNS, URGENCY_KEYWORDS)
+KEYWORD_MATCHER = DEFAULT_RULES.matcher
+
+
+def _default_rules() -> ScamRules:
+    return DEFAULT_RULES
+
 
 class ScamAnalyzer:
+    def __init__(
+        self,
+        cache: ResultCache | None = None,
+        model: NgramModel | None = None,
+        rules: Callable[[], ScamRules] = _default_rules,
+    ) -> None:
+        # 同一本文の解析結果キャッシュ（None なら毎回解析）
+        self.cache = cache
+        # ルールと並べてスコアを返す学習モデル（None なら使わない）
+        self.model = model
+        # 現在のルールを返す関数（ルールの差し替えに追従する。1回の解析では最初に取得したものを使う）
+        self.rules = rules
+
+    def version(self, rules: ScamRules) -> str:
+        """キャッシュのバージョン（ルールとモデルの組み合わせ）"""
+        if self.model is None:
+            return rules.version
+        return f"{rules.version}+{self.model.model_version}"
+
     def analyze(
-        self, text: str, caller_number: str | None = None
+        self,
+        text: str,
+        caller_number: str | None = None,
+        *,
+        hits: set[str] | None = None,
+        rules: ScamRules | None = None,
     ) -> dict:
+        """会話テキストを解析する。
+
+        hits に共有走査で得たキーワード集合を渡すと、テキストの再走査を省略します
+        （学習モデルのスコアも付けません）。rules には走査に使ったルールを渡します。
+        """
+        if rules is None:
+            rules = self.rules()
+        if hits is None:
+            return cached_call(
+                self.cache, self.version(rules), text, lambda: self._analyze_text(text, rules)
+            )
+        return self._analyze_hits(hits, rules)
+
+    def analyze_batch(self, texts: list[str]) -> list[dict]:
+        """複数件の会話テキストをまとめて解析する（結果は入力順）。
+
+        キーワード照合は全件を1回の走査で行い、スコアは
+        「件数 × パターン」のヒット行列に対するベクトル演算で求めます。
+        キャッシュ済みの本文と、バッチ内で重複する本文は照合を省略します。
+        """
+        rules = self.rules()
+        return cached_map(
+            self.cache, self.version(rules), texts, lambda batch: self._analyze_batch(batch, rules)
+        )
+
+    def _analyze_text(self, text: str, rules: ScamRules) -> dict:
+        with stage("keyword_match", chars=len(text)):
+            hits = rules.matcher.find_all(text)
+        result = self._analyze_hits(hits, rules)
+        if self.model is not None:
+            with stage("model_score"):
+                result["model_score"] = self._model_score(self.model.score(text))
+        return result
+
+    def _analyze_hits(self, hits: set[str], rules: ScamRules) -> dict:
+        with stage("score"):
+            return self._score_hits(hits, rules)
+
+    def _score_hits(self, hits: set[str], rules: ScamRules) -> dict:
         matched_patterns: list[tuple[str, list[str], int]] = []
 
-        for pattern_name, keywords, base_score in SCAM_PATTERNS:
-            found = [kw for kw in keywords if kw in text]
+        for pattern_name, keywords, base_score in rules.patterns:
+            found = [kw for kw in keywords if kw in hits]
             if found:
                 matched_patterns.append((pattern_name, found, base_score))
 
         if not matched_patterns:
-            return {
-                "risk_score": 5,
-                "scam_type": "none",
-                "summary": "特に詐欺の兆候は検出されませんでした。",
-                "keywords_found": [],
-                "model_version": MODEL_VERSION,
-            }
+            return self._no_match_result(rules)
 
         # Pick the highest-scoring pattern
         matched_patterns.sort(key=lambda x: x[2], reverse=True)
-        top_name, top_keywords, top_score = matched_patterns[0]
+        top_score = matched_patterns[0][2]
+
+        # Urgency / multiple-pattern bonus
+        urgency_found = [kw for kw in rules.urgency_keywords if kw in hits]
+        final_score = compute_risk_score(top_score, len(urgency_found), len(matched_patterns))
+
+        return self._build_result(final_score, matched_patterns, urgency_found, rules)
 
-        # Urgency bonus
-        urgency_found = [kw for kw in URGENCY_KEYWORDS if kw in text]
-        urgency_bonus = min(len(urgency_found) * 5, 15)
+    def _analyze_batch(self, texts: list[str], rules: ScamRules) -> list[dict]:
+        with stage("keyword_match", chars=sum(map(len, texts))):
+            hits = hit_matrix(rules.matcher, texts)
+        with stage("score"):
+            results = self._score_batch(hits, rules)
+        if self.model is not None:
+            with stage("model_score"):
+                for result, score in zip(results, self.model.score_batch(texts)):
+                    result["model_score"] = self._model_score(score)
+        return results
 
-        # Multiple-pattern bonus
-        multi_bonus = min((len(matched_patterns) - 1) * 10, 20)
+    def _model_score(self, score: int) -> dict:
+        return {"risk_score": score, "model_version": self.model.model_version}
+
+    def _score_batch(self, hits: np.ndarray, rules: ScamRules) -> list[dict]:
+        matched = (hits.astype(np.int32) @ rules.membership) > 0
+        matched_count = matched.sum(axis=1)
+        top = np.where(matched, rules.base_scores, -1).argmax(axis=1)
+        urgency_count = hits[:, rules.urgency_columns].sum(axis=1)
+        scores = np.minimum(
+            rules.base_scores[top]
+            + np.minimum(urgency_count * 5, 15)
+            + np.minimum((matched_count - 1) * 10, 20),
+            100,
+        )
+
+        patterns = rules.patterns
+        results = []
+        for i in range(len(hits)):
+            if not matched_count[i]:
+                results.append(self._no_match_result(rules))
+                continue
+            found = row_hits(rules.matcher, hits[i])
+            matched_patterns = [
+                (patterns[p][0], [kw for kw in patterns[p][1] if kw in found], patterns[p][2])
+                for p in rules.pattern_order
+                if matched[i, p]
+            ]
+            urgency_found = [kw for kw in rules.urgency_keywords if kw in found]
+            results.append(self._build_result(int(scores[i]), matched_patterns, urgency_found, rules))
+        return results
+
+    def _no_match_result(self, rules: ScamRules) -> dict:
+        return {
+            "risk_score": NO_MATCH_SCORE,
+            "scam_type": "none",
+            "summary": NO_MATCH_SUMMARY,
+            "keywords_found": [],
+            "model_version": rules.version,
+        }
+
+    def _build_result(
+        self,
+        final_score: int,
+        matched_patterns: list[tuple[str, list[str], int]],
+        urgency_found: list[str],
+        rules: ScamRules,
+    ) -> dict:
+        """スコア確定後の結果（要約文・キーワード一覧）を組み立てる。
+
+        matched_patterns は基礎点の降順に並んでいること。
+        """
+        top_name, top_keywords, _ = matched_patterns[0]
 
         all_keywords = []
         for _, kws, _ in matched_patterns:
             all_keywords.extend(kws)
         all_keywords.extend(urgency_found)
 
-        final_score = min(top_score + urgency_bonus + multi_bonus, 100)
-
-        scam_type_names = {
-            "ore_ore": "オレオレ詐欺",
-            "refund_fraud": "還付金詐欺",
-            "billing_fraud": "架空請求詐欺",
-            "investment_fraud": "投資詐欺",
-            "cash_card_fraud": "キャッシュカード詐欺",
-        }
-
-        types_found = [scam_type_names.get(p[0], p[0]) for p in matched_patterns]
+        types_found = [rules.type_names.get(p[0], p[0]) for p in matched_patterns]
 
-        if final_score >= 70:
+        if final_score >= rules.severity_thresholds["high"]:
             severity = "高い確率"
-        elif final_score >= 50:
+        elif final_score >= rules.severity_thresholds["medium"]:
             severity = "中程度の可能性"
         else:
             severity = "やや疑わしい兆候"
@@ -109,5 +298,5 @@ class ScamAnalyzer:
             "scam_type": top_name,
             "summary": summary,
             "keywords_found": list(set(all_keywords)),
-            "model_version": MODEL_VERSION,
+            "model_version": rules.version,
         }
@@ -0,0 +1,314 @@
+"""候補ルールのシャドー評価
+
+昇格前の候補ルールバンドル（``SHADOW_RULE_BUNDLE_PATH``）を、実トラフィックの一部
+（``SHADOW_SAMPLE_RATE``）に対して現在のルールと並べて実行し、判定がどう変わるかを集計します。
+
+- 対象は会話解析（``ScamAnalyzer``）と闇バイトチェック（``DarkJobChecker``）のルール判定。
+  LLM・学習モデル・結果キャッシュは使わず、ルールの違いだけを比べる
+- 評価はレスポンスの送信後（FastAPI のバックグラウンドタスク）に ``shadow`` 実行プールへ投入する。
+  既定はプロセスプールで、ワーカーは nice 値を下げて動くため本処理の CPU を奪わない
+- 本処理の ``analysis`` プールに待ちが出ている、または ``shadow`` プールが満杯のときは
+  評価せずに捨てる（負荷時に最初に削られる処理）
+- スコアの差・リスクレベルの変化・キーワードごとのヒットの増減を、件数に依存しない
+  大きさの集計に足し込み、メトリクスと管理エンドポイント（``/admin/shadow``）で公開する。
+  本文は保持しない
+
+ワーカープロセスは現在のルール・候補ルールのバンドルをそれぞれ自分で読み込み、
+評価のたびにファイルの差し替えを確認します。どちらかのバージョンが変わると集計をやり直します。
+複数ワーカー構成では集計はワーカーごと、メトリクスは全ワーカーの合算です。
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import time
+from bisect import bisect_left
+from collections.abc import Callable
+from functools import lru_cache
+
+from prometheus_client import Counter, Histogram
+
+from app.config import get_settings
+from app.services.dark_job_checker import DarkJobChecker
+from app.services.executor import ExecutorSaturatedError, get_executor
+from app.services.rule_bundle import BUILTIN_RULES, RuleRegistry, RuleSet
+from app.services.scam_analyzer import ScamAnalyzer, ScamRules
+from app.services.stage_metrics import set_endpoint
+
+logger = logging.getLogger(__name__)
+
+SHADOW_ANALYZERS = ("conversation", "dark_job")
+
+# スコア差の分布の区切り（候補 − 現在、各区間の上限）
+DELTA_BUCKETS = (-50, -20, -10, -5, -1, 0, 1, 5, 10, 20, 50)
+# 解析器ごとに集計するキーワードの上限（超えた分は "(other)" にまとめる）
+MAX_KEYWORDS = 1000
+OTHER_KEYWORD = "(other)"
+# 評価ワーカーの nice 値の増分
+WORKER_NICENESS = 10
+
+shadow_evaluations_total = Counter(
+    "shadow_evaluations_total",
+    "Shadow evaluations of the candidate rule bundle",
+    ["analyzer", "result"],
+)
+shadow_shed_total = Counter(
+    "shadow_shed_total",
+    "Sampled shadow evaluations dropped before running",
+    ["reason"],
+)
+shadow_risk_level_flips_total = Counter(
+    "shadow_risk_level_flips_total",
+    "Shadow evaluations whose risk level differs between the current and candidate rules",
+    ["analyzer", "current", "candidate"],
+)
+shadow_score_delta = Histogram(
+    "shadow_score_delta",
+    "Candidate minus current risk score",
+    ["analyzer"],
+    buckets=DELTA_BUCKETS,
+)
+
+
+def scam_risk_level(score: int, rules: ScamRules) -> str:
+    """会話解析のリスクレベル（要約文の確度と同じしきい値）"""
+    if score >= rules.severity_thresholds["high"]:
+        return "high"
+    if score >= rules.severity_thresholds["medium"]:
+        return "medium"
+    return "low"
+
+
+def compare_rule_sets(analyzer: str, text: str, current: RuleSet, candidate: RuleSet) -> dict:
+    """1件のテキストを現在のルールと候補ルールで判定し、差分を返す。"""
+    if analyzer == "conversation":
+        scam = ScamAnalyzer()
+        before = scam.analyze(text, rules=current.scam)
+        after = scam.analyze(text, rules=candidate.scam)
+        before_level = scam_risk_level(before["risk_score"], current.scam)
+        after_level = scam_risk_level(after["risk_score"], candidate.scam)
+    elif analyzer == "dark_job":
+        checker = DarkJobChecker()
+        before = checker.check(text, rules=current.dark_job)
+        after = checker.check(text, rules=candidate.dark_job)
+        before_level = before["risk_level"]
+        after_level = after["risk_level"]
+    else:
+        raise ValueError(f"シャドー評価の対象外の解析器です: {analyzer}")
+    before_keywords = set(before["keywords_found"])
+    after_keywords = set(after["keywords_found"])
+    return {
+        "analyzer": analyzer,
+        "current_version": current.version,
+        "candidate_version": candidate.version,
+        "current_score": before["risk_score"],
+        "candidate_score": after["risk_score"],
+        "current_level": before_level,
+        "candidate_level": after_level,
+        "gained": sorted(after_keywords - before_keywords),
+        "lost": sorted(before_keywords - after_keywords),
+    }
+
+
+@lru_cache()
+def _worker_registries() -> tuple[RuleRegistry, RuleRegistry]:
+    """評価ワーカー用: 現在のルールと候補ルールのレジストリ"""
+    if multiprocessing.parent_process() is not None:
+        # プロセスプールのワーカーでのみ優先度を下げる（スレッドで下げると本処理にも効く）
+        os.nice(WORKER_NICENESS)
+    settings = get_settings()
+    return (
+        RuleRegistry(settings.rule_bundle_path or None),
+        RuleRegistry(settings.shadow_rule_bundle_path or None),
+    )
+
+
+def _refresh(registry: RuleRegistry) -> None:
+    try:
+        registry.reload()
+    except (OSError, ValueError) as e:
+        logger.error("シャドー評価のルールバンドルを読み込めません: %s", str(e))
+
+
+def shadow_compare(analyzer: str, text: str) -> dict:
+    """評価ワーカーで実行する: 設定されたバンドルで compare_rule_sets を行う。"""
+    current, candidate = _worker_registries()
+    _refresh(current)
+    _refresh(candidate)
+    # 読み込みに一度も成功していなければ組み込みのルールのまま
+    if candidate.current is BUILTIN_RULES:
+        raise ValueError("候補ルールバンドルが読み込まれていません")
+    return compare_rule_sets(analyzer, text, current.current, candidate.current)
+
+
+class _AnalyzerStats:
+    """1つの解析器のシャドー評価の集計（大きさは件数によらない）"""
+
+    def __init__(self) -> None:
+        self.evaluated = 0
+        self.changed = 0
+        self.delta_sum = 0
+        self.abs_delta_sum = 0
+        self.max_increase = 0
+        self.max_decrease = 0
+        # DELTA_BUCKETS の各区間＋上限超え
+        self.delta_counts = [0] * (len(DELTA_BUCKETS) + 1)
+        self.flips: dict[tuple[str, str], int] = {}
+        # キーワード → [候補で増えた件数, 候補で消えた件数]
+        self.keywords: dict[str, list[int]] = {}
+
+    def record(self, diff: dict) -> None:
+        delta = diff["candidate_score"] - diff["current_score"]
+        self.evaluated += 1
+        self.changed += delta != 0
+        self.delta_sum += delta
+        self.abs_delta_sum += abs(delta)
+        self.max_increase = max(self.max_increase, delta)
+        self.max_decrease = min(self.max_decrease, delta)
+        self.delta_counts[bisect_left(DELTA_BUCKETS, delta)] += 1
+        if diff["current_level"] != diff["candidate_level"]:
+            flip = (diff["current_level"], diff["candidate_level"])
+            self.flips[flip] = self.flips.get(flip, 0) + 1
+        for column, keywords in ((0, diff["gained"]), (1, diff["lost"])):
+            for keyword in keywords:
+                if keyword not in self.keywords and len(self.keywords) >= MAX_KEYWORDS:
+                    keyword = OTHER_KEYWORD
+                self.keywords.setdefault(keyword, [0, 0])[column] += 1
+
+    def summary(self, top_keywords: int) -> dict:
+        labels = [f"<={edge}" for edge in DELTA_BUCKETS] + [f">{DELTA_BUCKETS[-1]}"]
+        keywords = sorted(self.keywords.items(), key=lambda item: (-sum(item[1]), item[0]))
+        return {
+            "evaluated": self.evaluated,
+            "changed": self.changed,
+            "mean_delta": round(self.delta_sum / self.evaluated, 3) if self.evaluated else 0.0,
+            "mean_abs_delta": round(self.abs_delta_sum / self.evaluated, 3) if self.evaluated else 0.0,
+            "max_increase": self.max_increase,
+            "max_decrease": self.max_decrease,
+            "delta_histogram": dict(zip(labels, self.delta_counts)),
+            "flips": [
+                {"current": current, "candidate": candidate, "count": count}
+                for (current, candidate), count in sorted(self.flips.items())
+            ],
+            "keywords": [
+                {"keyword": keyword, "gained": gained, "lost": lost}
+                for keyword, (gained, lost) in keywords[:top_keywords]
+            ],
+        }
+
+
+class ShadowStats:
+    """シャドー評価の集計（現在・候補のバージョンの組ごと）"""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self, current_version: str | None = None, candidate_version: str | None = None) -> None:
+        self.current_version = current_version
+        self.candidate_version = candidate_version
+        self.since = time.time()
+        self.sampled = 0
+        self.errors = 0
+        self.shed: dict[str, int] = {}
+        self.analyzers = {name: _AnalyzerStats() for name in SHADOW_ANALYZERS}
+
+    def record(self, diff: dict) -> None:
+        versions = (diff["current_version"], diff["candidate_version"])
+        if versions != (self.current_version, self.candidate_version):
+            # 別の組み合わせの評価とは混ぜない（抽出・破棄の件数は引き継ぐ）
+            sampled, shed, errors = self.sampled, self.shed, self.errors
+            self.reset(*versions)
+            self.sampled, self.shed, self.errors = sampled, shed, errors
+        self.analyzers[diff["analyzer"]].record(diff)
+
+    def summary(self, top_keywords: int = 50) -> dict:
+        return {
+            "current_version": self.current_version,
+            "candidate_version": self.candidate_version,
+            "since": self.since,
+            "sampled": self.sampled,
+            "shed": dict(self.shed),
+            "errors": self.errors,
+            "analyzers": {name: stats.summary(top_keywords) for name, stats in self.analyzers.items()},
+        }
+
+
+class ShadowEvaluator:
+    """抽出したリクエストの評価を投入し、結果を集計する（イベントループ上で使う）"""
+
+    def __init__(
+        self,
+        enabled: bool,
+        sample_rate: float,
+        pool: str = "shadow",
+        primary_pool: str = "analysis",
+        compare: Callable[[str, str], dict] = shadow_compare,
+        random_value: Callable[[], float] = random.random,
+    ) -> None:
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.pool = pool
+        self.primary_pool = primary_pool
+        self.compare = compare
+        self.random_value = random_value
+        self.stats = ShadowStats()
+        # 実行中の評価（参照を持っておかないとタスクが回収される）
+        self._tasks: set[asyncio.Task] = set()
+
+    def sample(self) -> bool:
+        """このリクエストを評価するか（評価しないリクエストのコストは乱数1回）"""
+        return self.enabled and self.random_value() < self.sample_rate
+
+    async def submit(self, analyzer: str, text: str) -> None:
+        """抽出した1件の評価を投入する（完了は待たない）。混雑時は投入せずに捨てる。"""
+        self.stats.sampled += 1
+        primary = get_executor(self.primary_pool)
+        if primary.pending >= primary.workers:
+            self._shed("busy")
+            return
+        pool = get_executor(self.pool)
+        if pool.pending >= pool.capacity:
+            self._shed("queue_full")
+            return
+        task = asyncio.create_task(self._evaluate(analyzer, text))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def drain(self) -> None:
+        """実行中の評価の完了を待つ。"""
+        while self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    async def _evaluate(self, analyzer: str, text: str) -> None:
+        # ワーカー内の解析ステージの計測を本処理のエンドポイントに混ぜない
+        set_endpoint("shadow")
+        try:
+            diff = await get_executor(self.pool).run(self.compare, analyzer, text)
+        except ExecutorSaturatedError:
+            self._shed("queue_full")
+            return
+        except Exception:
+            self.stats.errors += 1
+            shadow_evaluations_total.labels(analyzer=analyzer, result="error").inc()
+            logger.exception("シャドー評価に失敗しました")
+            return
+        self.stats.record(diff)
+        shadow_evaluations_total.labels(analyzer=analyzer, result="ok").inc()
+        shadow_score_delta.labels(analyzer=analyzer).observe(diff["candidate_score"] - diff["current_score"])
+        if diff["current_level"] != diff["candidate_level"]:
+            shadow_risk_level_flips_total.labels(
+                analyzer=analyzer, current=diff["current_level"], candidate=diff["candidate_level"]
+            ).inc()
+
+    def _shed(self, reason: str) -> None:
+        self.stats.shed[reason] = self.stats.shed.get(reason, 0) + 1
+        shadow_shed_total.labels(reason=reason).inc()
+
+
+@lru_cache()
+def get_shadow_evaluator() -> ShadowEvaluator:
+    """設定に従ったシャドー評価（候補バンドル未設定なら無効）"""
+    settings = get_settings()
+    return ShadowEvaluator(bool(settings.shadow_rule_bundle_path), settings.shadow_sample_rate)
@@ -0,0 +1,94 @@
+"""同一解析のリクエスト合流（single-flight）
+
+API サーバーの AI 呼び出しはタイムアウト時に最大2回再送するため、
+負荷が高いと1件のイベントに対して同じ解析が2〜3回並行して走ることがあります。
+拡散した同一本文も多数の利用者から同時に届きます。
+
+SingleFlight は入力のハッシュごとに実行中の計算を1つだけ持ち、
+同じキーの後続リクエストは新たに計算を始めずに、実行中の計算の結果を待ちます。
+同じ X-Request-ID の再送は理由 "request_id"、それ以外の同一入力は "content" として集計します。
+"""
+
+import asyncio
+import copy
+import hashlib
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from prometheus_client import Counter
+
+T = TypeVar("T")
+
+singleflight_executions_total = Counter(
+    "singleflight_executions_total",
+    "Computations started by the single-flight layer",
+    ["operation"],
+)
+singleflight_coalesced_total = Counter(
+    "singleflight_coalesced_total",
+    "Requests that attached to an in-flight computation instead of starting one",
+    ["operation", "reason"],
+)
+
+
+def flight_key(*parts: str | bytes | None) -> bytes:
+    """入力からキーを作る（None は空値として区別して扱う）。"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if part is None:
+            digest.update(b"\x01")
+            continue
+        digest.update(b"\x00")
+        digest.update(part.encode("utf-8") if isinstance(part, str) else part)
+    return digest.digest()
+
+
+class SingleFlight:
+    """キーごとに実行中の計算を共有する（イベントループ内で使用）。
+
+    計算は独立したタスクとして実行するため、最初のリクエストが切断されても
+    合流した他のリクエストには結果が届きます。例外も全員に伝わります。
+    """
+
+    def __init__(self, operation: str) -> None:
+        self.operation = operation
+        self._flights: dict[bytes, asyncio.Task] = {}
+        # 実行中の X-Request-ID → キー
+        self._request_ids: dict[str, bytes] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def run(
+        self,
+        key: bytes,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        request_id: str | None = None,
+    ) -> T:
+        task = self._flights.get(key)
+        if task is not None:
+            reason = "request_id" if request_id and self._request_ids.get(request_id) == key else "content"
+            singleflight_coalesced_total.labels(operation=self.operation, reason=reason).inc()
+            # 合流側には複製を返し、呼び出し側ごとの書き換えが互いに影響しないようにする
+            return copy.deepcopy(await asyncio.shield(task))
+
+        task = asyncio.ensure_future(fn())
+        self._flights[key] = task
+        if request_id:
+            self._request_ids[request_id] = key
+        task.add_done_callback(lambda done: self._finish(done, key, request_id))
+        singleflight_executions_total.labels(operation=self.operation).inc()
+        # 最初の呼び出し側にも複製を返す。合流側より先に再開するため、共有の結果を書き換えると
+        # 後から複製する合流側にその変更が漏れる
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def _finish(self, task: asyncio.Task, key: bytes, request_id: str | None) -> None:
+        # 全員が切断済みでも例外が未回収の警告にならないよう参照しておく
+        if not task.cancelled():
+            task.exception()
+        self._flights.pop(key, None)
+        if request_id and self._request_ids.get(request_id) == key:
+            del self._request_ids[request_id]
+
@@ -0,0 +1,366 @@
+"""解析ステージ別のレイテンシ計測
+
+リクエスト全体の所要時間（http_request_duration_seconds）だけでは、p99 が悪化したときに
+Base64 デコード・OCR・キーワード照合・グレーゾーン補正・重要ポイント抽出・
+レスポンスのシリアライズのどこで時間を使ったのか分かりません。
+解析器は処理の区切りを ``stage()`` で囲み、エンドポイント×ステージのヒストグラムに記録します。
+
+- エンドポイントは RequestContextMiddleware がリクエストごとに設定する（``set_endpoint``）。
+  ルーティング前に設定するため、マッチしたルートのパステンプレートを返す関数も渡せる
+- 実行プールのスレッドにはコンテキストごと引き継ぐ。プロセスプールではワーカー側の計測を
+  結果と一緒に持ち帰り、親プロセスで記録する（``collect_stages`` / ``replay_stages``）
+- ステージは入れ子になりうる（闇バイト判定の score は llm_fallback を含む）
+- 入力サイズは照合・OCR の対象になった文字数（テキスト）とバイト数（画像）を数える
+- ``STAGE_METRICS_ENABLED=false`` または ``set_enabled(False)`` で無効化すると、
+  ``stage()`` は共有の空コンテキストを返すだけになる
+- レスポンスのシリアライズは、アプリの既定のレスポンスクラス（``app.main.StageTimedJSONResponse``）が
+  本文の JSON 化を "serialize" ステージとして計測する
+- 複数ワーカー構成（Prometheus のマルチプロセスモード）では、各ワーカーが累計を
+  ``FLUSH_INTERVAL`` 秒ごとに共有ディレクトリのスナップショットへ書き出し（``start_flusher`` / ``flush``）、
+  スクレイプ時に ``MultiProcessStageCollector`` が全ワーカー分を合算する
+"""
+
+import json
+import os
+import tempfile
+import threading
+from bisect import bisect_left
+from collections.abc import Callable
+from contextlib import nullcontext
+from contextvars import ContextVar, Token
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+from prometheus_client import REGISTRY
+from prometheus_client.core import CounterMetricFamily, HistogramMetricFamily
+from prometheus_client.utils import floatToGoString
+
+from app.config import get_settings
+
+# 1ステージあたりの典型値はマイクロ秒〜ミリ秒単位のため、下限を細かく取る
+_STAGE_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5,
+)
+
+# エンドポイント外（ベンチマークやバッチスクリプト）から呼ばれた場合のラベル
+NO_ENDPOINT = "none"
+
+# マルチプロセスモードで集計を書き出す間隔（秒）
+FLUSH_INTERVAL = 5.0
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+_endpoint: ContextVar[str | Callable[[], str]] = ContextVar("analysis_endpoint", default=NO_ENDPOINT)
+_enabled = get_settings().stage_metrics_enabled
+# プロセスプールのワーカー内でのみ使う計測結果の一時置き場
+_collected: list[tuple[str, float, int, int]] | None = None
+
+_NO_STAGE = nullcontext()
+
+
+class _Series:
+    """1系列（エンドポイント×ステージ）のバケット別件数と合計秒数"""
+
+    __slots__ = ("counts", "total")
+
+    def __init__(self) -> None:
+        # 末尾は +Inf バケット
+        self.counts = [0] * (len(_STAGE_BUCKETS) + 1)
+        self.total = 0.0
+
+
+class _ThreadTable:
+    """スレッドごとの集計。
+
+    prometheus_client の Histogram.observe はロックを2回取るため1回あたり1µs以上かかります。
+    スレッドごとにロックなしで数え、スクレイプ時に全スレッド分を合算します。
+    """
+
+    __slots__ = ("stages", "chars", "nbytes")
+
+    def __init__(self) -> None:
+        self.stages: dict[tuple[str, str], _Series] = {}
+        self.chars: dict[str, int] = {}
+        self.nbytes: dict[str, int] = {}
+
+
+_local = threading.local()
+_tables: list[_ThreadTable] = []
+_tables_lock = threading.Lock()
+
+
+def _table() -> _ThreadTable:
+    table = getattr(_local, "table", None)
+    if table is None:
+        table = _local.table = _ThreadTable()
+        with _tables_lock:
+            _tables.append(table)
+    return table
+
+
+def set_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def set_endpoint(endpoint: str | Callable[[], str]) -> Token:
+    """以降の計測に付けるエンドポイント名を設定する（戻り値は reset_endpoint に渡す）。
+
+    関数を渡すと、計測のたびに呼び出してエンドポイント名を決めます。
+    """
+    return _endpoint.set(endpoint)
+
+
+def reset_endpoint(token: Token) -> None:
+    _endpoint.reset(token)
+
+
+class _StageTimer:
+    __slots__ = ("_series", "_start")
+
+    def __init__(self, series: _Series) -> None:
+        self._series = series
+
+    def __enter__(self) -> "_StageTimer":
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        elapsed = perf_counter() - self._start
+        series = self._series
+        series.counts[bisect_left(_STAGE_BUCKETS, elapsed)] += 1
+        series.total += elapsed
+
+
+class _CollectingTimer:
+    __slots__ = ("_name", "_chars", "_nbytes", "_start")
+
+    def __init__(self, name: str, chars: int, nbytes: int) -> None:
+        self._name = name
+        self._chars = chars
+        self._nbytes = nbytes
+
+    def __enter__(self) -> "_CollectingTimer":
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if _collected is not None:
+            _collected.append((self._name, perf_counter() - self._start, self._chars, self._nbytes))
+
+
+def stage(name: str, *, chars: int = 0, nbytes: int = 0):
+    """name ステージの処理時間を計測するコンテキストマネージャーを返す。
+
+    chars / nbytes を渡すと、入力サイズのカウンターにも加算します。
+    """
+    if not _enabled:
+        return _NO_STAGE
+    if _collected is not None:
+        return _CollectingTimer(name, chars, nbytes)
+    return _StageTimer(_series(_table(), _current_endpoint(), name, chars, nbytes))
+
+
+def _current_endpoint() -> str:
+    endpoint = _endpoint.get()
+    return endpoint if isinstance(endpoint, str) else endpoint()
+
+
+def _series(table: _ThreadTable, endpoint: str, name: str, chars: int, nbytes: int) -> _Series:
+    if chars:
+        table.chars[endpoint] = table.chars.get(endpoint, 0) + chars
+    if nbytes:
+        table.nbytes[endpoint] = table.nbytes.get(endpoint, 0) + nbytes
+    series = table.stages.get((endpoint, name))
+    if series is None:
+        series = table.stages[(endpoint, name)] = _Series()
+    return series
+
+
+def collect_stages(fn: Callable[..., Any], *args: Any) -> tuple[Any, list[tuple[str, float, int, int]]]:
+    """fn(*args) を実行し、(結果, 実行中のステージ計測) を返す（プロセスプールのワーカー用）。"""
+    global _collected
+    _collected = []
+    try:
+        return fn(*args), _collected
+    finally:
+        _collected = None
+
+
+def replay_stages(observations: list[tuple[str, float, int, int]]) -> None:
+    """ワーカーから持ち帰ったステージ計測を、現在のエンドポイントで記録する。"""
+    if not _enabled:
+        return
+    table = _table()
+    endpoint = _current_endpoint()
+    for name, seconds, chars, nbytes in observations:
+        series = _series(table, endpoint, name, chars, nbytes)
+        series.counts[bisect_left(_STAGE_BUCKETS, seconds)] += 1
+        series.total += seconds
+
+
+_Aggregates = tuple[dict[tuple[str, str], _Series], dict[str, int], dict[str, int]]
+
+
+def _merge(parts: list[_Aggregates]) -> _Aggregates:
+    """(ステージ, 文字数, バイト数) の集計を合算する。"""
+    stages: dict[tuple[str, str], _Series] = {}
+    chars: dict[str, int] = {}
+    nbytes: dict[str, int] = {}
+    for part_stages, part_chars, part_nbytes in parts:
+        for key, series in list(part_stages.items()):
+            merged = stages.get(key)
+            if merged is None:
+                merged = stages[key] = _Series()
+            merged.counts = [a + b for a, b in zip(merged.counts, series.counts)]
+            merged.total += series.total
+        for endpoint, value in list(part_chars.items()):
+            chars[endpoint] = chars.get(endpoint, 0) + value
+        for endpoint, value in list(part_nbytes.items()):
+            nbytes[endpoint] = nbytes.get(endpoint, 0) + value
+    return stages, chars, nbytes
+
+
+def _merge_tables() -> _Aggregates:
+    """全スレッドの集計を合算する（ステージ, 文字数, バイト数）。"""
+    with _tables_lock:
+        tables = list(_tables)
+    return _merge([(table.stages, table.chars, table.nbytes) for table in tables])
+
+
+def _describe() -> list:
+    return [
+        HistogramMetricFamily(
+            "analysis_stage_duration_seconds", "Time spent in one stage of an analysis",
+            labels=["endpoint", "stage"],
+        ),
+        CounterMetricFamily(
+            "analysis_input_chars", "Characters of text passed to keyword matching", labels=["endpoint"]
+        ),
+        CounterMetricFamily("analysis_input_bytes", "Bytes of image data passed to OCR", labels=["endpoint"]),
+    ]
+
+
+def _families(aggregates: _Aggregates) -> list:
+    stages, chars, nbytes = aggregates
+    histogram, chars_family, bytes_family = _describe()
+    bounds = [floatToGoString(b) for b in _STAGE_BUCKETS] + ["+Inf"]
+    for (endpoint, name), series in sorted(stages.items()):
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(bounds, series.counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        histogram.add_metric([endpoint, name], buckets, series.total)
+    for endpoint, value in sorted(chars.items()):
+        chars_family.add_metric([endpoint], value)
+    for endpoint, value in sorted(nbytes.items()):
+        bytes_family.add_metric([endpoint], value)
+    return [histogram, chars_family, bytes_family]
+
+
+class _StageCollector:
+    """全スレッドの集計を合算して Prometheus に公開する"""
+
+    def describe(self):
+        return _describe()
+
+    def collect(self):
+        return _families(_merge_tables())
+
+
+REGISTRY.register(_StageCollector())
+
+
+# ── マルチプロセスモード ──
+# スクレイプを受けたワーカーの REGISTRY には他のワーカーの集計が載らないため、各ワーカーが
+# 自分の累計を共有ディレクトリ（PROMETHEUS_MULTIPROC_DIR）のスナップショットファイルに書き出し、
+# スクレイプを受けたワーカーが全ファイルを合算して公開する（MultiProcessStageCollector）。
+# 終了したワーカーのファイルも残すため、prometheus_client のカウンターと同じく累計は減らない。
+SNAPSHOT_PREFIX = "stage_metrics_"
+
+_flush_lock = threading.Lock()
+_flusher_stop = threading.Event()
+
+
+def write_snapshot(directory: str | os.PathLike, pid: int | None = None) -> None:
+    """このプロセスの累計を directory のスナップショットファイルへ原子的に書き出す。"""
+    stages, chars, nbytes = _merge_tables()
+    data = {
+        "stages": [[endpoint, name, series.counts, series.total] for (endpoint, name), series in stages.items()],
+        "chars": chars,
+        "nbytes": nbytes,
+    }
+    path = Path(directory) / f"{SNAPSHOT_PREFIX}{pid if pid is not None else os.getpid()}.json"
+    with _flush_lock:
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def read_snapshots(directory: str | os.PathLike) -> _Aggregates:
+    """directory の全ワーカーのスナップショットを合算する。"""
+    parts: list[_Aggregates] = []
+    for path in sorted(Path(directory).glob(f"{SNAPSHOT_PREFIX}*.json")):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        stages = {}
+        for endpoint, name, counts, total in data.get("stages", []):
+            series = stages[(endpoint, name)] = _Series()
+            series.counts = list(counts)
+            series.total = total
+        parts.append((stages, data.get("chars", {}), data.get("nbytes", {})))
+    return _merge(parts)
+
+
+class MultiProcessStageCollector:
+    """全ワーカーのスナップショットを合算して公開する（マルチプロセスモードの /metrics 用）"""
+
+    def __init__(self, registry, directory: str | os.PathLike | None = None) -> None:
+        self.directory = directory if directory is not None else os.environ["PROMETHEUS_MULTIPROC_DIR"]
+        registry.register(self)
+
+    def describe(self):
+        return _describe()
+
+    def collect(self):
+        return _families(read_snapshots(self.directory))
+
+
+def flush() -> None:
+    """このプロセスの累計をスナップショットに書き出す（マルチプロセスモードのみ）。"""
+    if not MULTIPROCESS:
+        return
+    write_snapshot(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
+
+def _flush_periodically() -> None:
+    while not _flusher_stop.wait(FLUSH_INTERVAL):
+        flush()
+
+
+def start_flusher() -> None:
+    """マルチプロセスモードなら定期書き出しのスレッドを起動する（ワーカーの起動時）。"""
+    if not MULTIPROCESS:
+        return
+    _flusher_stop.clear()
+    threading.Thread(target=_flush_periodically, name="stage-metrics-flush", daemon=True).start()
+
+
+def stop_flusher() -> None:
+    """定期書き出しを止め、残りを書き出す（ワーカーの終了時）。"""
+    _flusher_stop.set()
+    flush()
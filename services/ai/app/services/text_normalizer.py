@@ -0,0 +1,253 @@
+"""キーワード照合用の日本語テキスト正規化
+
+全角英数字（「ＡＴＭ」）、半角カナ、カタカナとひらがなの表記ゆれ（「テレグラム」「てれぐらむ」）、
+間に挟んだ空白や記号（「振 込」「L・I・N・E」）で辞書のキーワードをすり抜けられないよう、
+照合の前に入力を1回だけ正規化します。キーワード辞書も同じ規則で正規化してからオートマトンに登録します。
+
+- NFKC（全角英数字・半角カナ・丸数字などをそろえる）
+- 英字の小文字化、カタカナのひらがな化
+- 空白（改行を除く）・句読点などの記号・ゼロ幅文字の除去
+  （改行は近接ルール・文分割の区切りとして残す）。ただし英数字の単語どうしの間の区切りは
+  空白1文字にまとめて残す（「good morning」を「goodmorning」にしない）。英数字の語は
+  照合側で単語境界を要求する（``keyword_matcher``）
+
+正規化後の各文字が元テキストのどの位置から来たかを ``offsets`` に持ち、
+照合結果の位置は元テキスト上の位置に戻して返します。
+1文字ずつの変換表を NumPy の配列引きで一括適用するため、通常は Python のループを通りません。
+変換表（BMP の全文字分）は最初に正規化するときに1回だけ作ります。
+結合文字（半角カナの濁点など）や複数文字に展開される文字（「㍿」など）を含む場合だけ、
+1文字ずつ変換します。
+
+同じリクエストの中で複数の解析器が同じ本文を照合する場合に備え、スレッドごとに
+直前の1件の正規化結果を保持して使い回します。
+"""
+
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import product
+
+import numpy as np
+
+# 正規化で残す制御文字（改行は行区切り、NUL はバッチ照合の件の区切り）
+_KEPT_CONTROLS = frozenset("\n\x00")
+
+# 送り仮名の表記ゆれ（同じグループの表記はどれも同じ語とみなす）
+OKURIGANA_VARIANTS: list[tuple[str, ...]] = [
+    ("振り込", "振込"),
+    ("払い", "払"),
+    ("戻し", "戻"),
+    ("引き出", "引出"),
+    ("受け取", "受取"),
+    ("差し押さえ", "差し押え", "差押え", "差押"),
+    ("手続き", "手続"),
+    ("使い込み", "使込み", "使込"),
+    ("申し込", "申込"),
+    ("問い合わせ", "問い合せ", "問合わせ", "問合せ"),
+    ("引き落とし", "引落し", "引落"),
+    ("取り引き", "取引"),
+    ("持ち逃げ", "持逃げ"),
+    ("見張り", "見張"),
+    ("貸し", "貸"),
+]
+
+
+def _fold_char(ch: str) -> str:
+    """NFKC 後の1文字を小文字化・ひらがな化する。"""
+    if "ァ" <= ch <= "ヶ" or ch in "ヽヾ":
+        return chr(ord(ch) - 0x60)
+    lower = ch.lower()
+    return lower if len(lower) == 1 else ch
+
+
+def _is_stripped(ch: str) -> bool:
+    category = unicodedata.category(ch)
+    if ch in _KEPT_CONTROLS:
+        return False
+    return category[0] in "PZ" or category in ("Cc", "Cf")
+
+
+def is_word_char(ch: str) -> bool:
+    """正規化後の文字が英数字の単語を作る文字（0-9, a-z）なら True。"""
+    return "0" <= ch <= "9" or "a" <= ch <= "z"
+
+
+# ASCII の各文字が英数字の単語を作るか（0x7F 以上はすべて False。DEL は除去されるため本文に残らない）
+_WORD_CODES = np.array([is_word_char(chr(code)) for code in range(0x80)])
+
+
+def _is_word_code(codes: np.ndarray) -> np.ndarray:
+    return _WORD_CODES[np.minimum(codes, 0x7F)]
+
+
+# 変換表で「除去」を表す値（Unicode の範囲外）
+_REMOVED = np.uint32(0xFFFFFFFF)
+_SPACE = np.uint32(0x20)
+
+
+@lru_cache(maxsize=None)
+def _tables() -> tuple[np.ndarray, re.Pattern[str], re.Pattern[str]]:
+    """BMP の各文字の変換先（除去する文字は _REMOVED）と、1文字ずつの変換が必要な文字・
+    英数字の直後に除去する区切りが来る箇所を探すパターンを作る。"""
+    folded = np.arange(0x10000, dtype=np.uint32)
+    complex_chars = []
+    for code in range(0x10000):
+        ch = chr(code)
+        if 0xD800 <= code <= 0xDFFF:
+            continue
+        if _is_stripped(ch):
+            folded[code] = _REMOVED
+            continue
+        normalized = unicodedata.normalize("NFKC", ch)
+        if len(normalized) != 1 or unicodedata.combining(normalized) or unicodedata.combining(ch):
+            # 前の文字と合成される・複数文字に展開される文字は1文字ずつの変換に回す
+            complex_chars.append(ch)
+            continue
+        folded[code] = ord(_fold_char(normalized))
+    pattern = re.compile(_char_class(complex_chars))
+    word_gap = re.compile(
+        _char_class(map(chr, np.flatnonzero(_is_word_code(folded))))
+        + _char_class(map(chr, np.flatnonzero(folded == _REMOVED)))
+    )
+    return folded, pattern, word_gap
+
+
+def _char_class(chars) -> str:
+    return "[" + "".join(re.escape(ch) for ch in chars) + "]"
+
+
+@dataclass(frozen=True)
+class NormalizedText:
+    """正規化したテキストと、各文字の元テキスト上の位置"""
+
+    original: str
+    text: str
+    # offsets[i] は text[i] の元テキスト上の位置（int32。None なら位置が変わっていない）
+    offsets: np.ndarray | None
+
+    def to_original(self, positions: list[int]) -> list[int]:
+        """正規化後の位置の一覧を元テキスト上の位置に戻す。"""
+        if self.offsets is None or not positions:
+            return positions
+        return self.offsets[np.asarray(positions, dtype=np.int64)].tolist()
+
+    def original_end(self, end: int) -> int:
+        """正規化後の終了位置（その位置の文字は含まない）を元テキスト上の終了位置に戻す。"""
+        if self.offsets is None or end == 0:
+            return end
+        return int(self.offsets[end - 1]) + 1
+
+
+_local = threading.local()
+
+
+def normalize_text(text: str | NormalizedText) -> NormalizedText:
+    """照合用にテキストを正規化する（正規化済みならそのまま返す）。"""
+    if isinstance(text, NormalizedText):
+        return text
+    last = getattr(_local, "last", None)
+    if last is not None and last.original == text:
+        return last
+    table, complex_pattern, word_gap = _tables()
+    if complex_pattern.search(text):
+        result = _normalize_complex(text, table)
+    else:
+        result = _normalize_simple(text, table, word_gap)
+    _local.last = result
+    return result
+
+
+def _normalize_simple(text: str, table: np.ndarray, word_gap: re.Pattern[str]) -> NormalizedText:
+    # 変換表を NumPy の配列引きで一括適用する（str.translate の辞書引きより速い）
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    if codes.max(initial=0) <= 0xFFFF:
+        folded = table[codes]
+    else:
+        # BMP 外の文字（絵文字など）は変換・除去せずに残す
+        folded = np.where(codes > 0xFFFF, codes, table[np.minimum(codes, 0xFFFF)])
+    # 以降の一時配列と同時に持たないよう、エンコード結果はここで手放す
+    del codes
+    keep = folded != _REMOVED
+    if keep.all():
+        return NormalizedText(text, str(folded, "utf-32-le"), None)
+    kept = _positions(keep)
+    # 英数字どうしの間で除去した区切りは、先頭の位置に空白1文字として残す
+    # （英数字の直後に区切りが来ないテキストでは配列演算を省く）
+    runs = np.flatnonzero(np.diff(kept) > 1) if word_gap.search(text) else ()
+    if len(runs):
+        before = kept[runs]
+        gaps = before[_is_word_code(folded[before]) & _is_word_code(folded[kept[runs + 1]])] + 1
+        if len(gaps):
+            folded[gaps] = _SPACE
+            keep[gaps] = True
+            kept = _positions(keep)
+    return NormalizedText(text, str(folded[keep], "utf-32-le"), kept)
+
+
+def _positions(keep: np.ndarray) -> np.ndarray:
+    # 位置の対応表は int32 で持つ（flatnonzero の int64 の半分。文字列長は int32 に収まる前提）
+    return np.arange(len(keep), dtype=np.int32)[keep]
+
+
+def _normalize_complex(text: str, table: np.ndarray) -> NormalizedText:
+    chars: list[str] = []
+    offsets: list[int] = []
+    # 直前に除去した区切りの位置（英数字どうしの間なら空白として残す）
+    gap: int | None = None
+    for i, ch in enumerate(text):
+        code = ord(ch)
+        if code < 0x10000 and table[code] == _REMOVED:
+            if gap is None:
+                gap = i
+            continue
+        for part in unicodedata.normalize("NFKC", ch):
+            if unicodedata.combining(part) and chars:
+                # 濁点・半濁点などは直前の文字と合成する（「ｶﾞ」→「が」）
+                composed = unicodedata.normalize("NFC", chars[-1] + part)
+                if len(composed) == 1:
+                    chars[-1] = composed
+                    continue
+            if _is_stripped(part):
+                if gap is None:
+                    gap = i
+                continue
+            folded = _fold_char(part)
+            if gap is not None and chars and is_word_char(chars[-1]) and is_word_char(folded):
+                chars.append(" ")
+                offsets.append(gap)
+            gap = None
+            chars.append(folded)
+            offsets.append(i)
+    return NormalizedText(text, "".join(chars), np.array(offsets, dtype=np.int32))
+
+
+_VARIANT_GROUPS = {spelling: group for group in OKURIGANA_VARIANTS for spelling in group}
+_VARIANT_PATTERN = re.compile("|".join(sorted(_VARIANT_GROUPS, key=len, reverse=True)))
+# 2文字以上の英数字の語（1文字ずつ区切った表記「L・I・N・E」も同じ語とみなす）
+_SPELLED_OUT = re.compile(r"[0-9a-z]{2,}")
+
+
+def keyword_variants(keyword: str) -> list[str]:
+    """キーワードの表記ゆれをすべて正規化して返す（先頭は元の表記の正規化）。
+
+    送り仮名の表記ゆれと、英数字の語を1文字ずつ区切った表記を展開します。
+    """
+    pieces: list[tuple[str, ...]] = []
+    pos = 0
+    for match in _VARIANT_PATTERN.finditer(keyword):
+        pieces.append((keyword[pos:match.start()],))
+        pieces.append(_VARIANT_GROUPS[match.group()])
+        pos = match.end()
+    pieces.append((keyword[pos:],))
+    variants = [normalize_text(keyword).text]
+    for combination in product(*pieces):
+        variant = normalize_text("".join(combination)).text
+        if variant not in variants:
+            variants.append(variant)
+    for variant in list(variants):
+        spelled_out = _SPELLED_OUT.sub(lambda m: " ".join(m.group()), variant)
+        if spelled_out not in variants:
+            variants.append(spelled_out)
+    return [variant for variant in variants if variant]
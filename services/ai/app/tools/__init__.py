@@ -0,0 +1 @@
+"""運用向けコマンドラインツール群（``python -m app.tools.<name>`` で実行）"""
@@ -0,0 +1,200 @@
+"""通報番号フィードからレピュテーションストアを構築する
+
+    python -m app.tools.build_reputation_store feed1.csv feed2.csv -o reputation.mrep
+
+入力 CSV の列（ヘッダ必須、phone_number 以外は省略可）::
+
+    phone_number, risk_score, category, report_count, last_reported
+
+last_reported は UNIX 秒または ``YYYY-MM-DD``。同じ番号が複数行ある場合は
+risk_score・last_reported の最大値と report_count の合計に集約します。
+数値として読めない値・1970年より前（または 2106 年より後）の last_reported がある行は
+``ファイル:行`` を表示して中断します（ストアは書き換えません）。範囲外の risk_score・report_count は
+保持できる範囲に収めます。
+出力は一時ファイルに書き出してから ``os.replace`` で原子的に差し替えるため、
+稼働中のサービスは書きかけのファイルを読むことがありません。
+"""
+
+import argparse
+import csv
+import logging
+import os
+import sys
+import tempfile
+import time
+from array import array
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from app.services.number_reputation import (
+    FORMAT_VERSION,
+    HEADER,
+    HEADER_SIZE,
+    MAGIC,
+    RECORD,
+    REPORT_CATEGORIES,
+    bloom_parameters,
+    hash_number,
+)
+from app.services.phone_prefix import normalize_phone_number
+
+logger = logging.getLogger(__name__)
+
+RECORD_DTYPE = np.dtype(
+    [("key", "<u8"), ("risk", "u1"), ("category", "u1"), ("reports", "<u2"), ("last", "<u4")]
+)
+assert RECORD_DTYPE.itemsize == RECORD.size
+
+DEFAULT_RISK_SCORE = 80
+# report_count・last_reported を保持する配列（array("I")）の上限
+_MAX_U32 = 0xFFFFFFFF
+_CATEGORY_CODES = {name: code for code, name in enumerate(REPORT_CATEGORIES)}
+
+
+def _parse_timestamp(value: str | int | None) -> int:
+    if not value:
+        return 0
+    if isinstance(value, int):
+        return value
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp())
+
+
+def parse_feed_row(row: dict) -> dict:
+    """フィードの1行の risk_score・report_count・last_reported を数値にする（不正な値なら ValueError）。"""
+    parsed = dict(row)
+    for field, default in (("risk_score", DEFAULT_RISK_SCORE), ("report_count", 1)):
+        value = row.get(field)
+        if value is None or value == "":
+            parsed[field] = default
+            continue
+        try:
+            parsed[field] = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} が整数ではありません: {value!r}") from None
+    # 範囲外の値は保持できる範囲に収める（ストアでは risk は 0〜100、件数は 65535 が上限）
+    parsed["risk_score"] = min(max(parsed["risk_score"], 0), 100)
+    parsed["report_count"] = min(max(parsed["report_count"], 0), _MAX_U32)
+    try:
+        parsed["last_reported"] = _parse_timestamp(row.get("last_reported"))
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(
+            f"last_reported は UNIX 秒か YYYY-MM-DD で指定してください: {row.get('last_reported')!r}"
+        ) from None
+    if not 0 <= parsed["last_reported"] <= _MAX_U32:
+        raise ValueError(f"last_reported が 1970-01-01〜2106-02-07 の範囲外です: {row.get('last_reported')!r}")
+    return parsed
+
+
+def read_feed_rows(paths: Iterable[str | Path]) -> Iterable[dict]:
+    """複数の CSV フィードを順に読み出す（値を検証し、不正な行は ファイル:行 付きの ValueError）。"""
+    for path in paths:
+        with open(path, encoding="utf-8", newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                try:
+                    yield parse_feed_row(row)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{reader.line_num}: {e}") from None
+
+
+def build_store(
+    rows: Iterable[dict],
+    output: str | Path,
+    false_positive_rate: float = 0.01,
+) -> int:
+    """フィード行（``parse_feed_row`` 済み）からストアファイルを構築し、登録件数を返す。"""
+    keys = array("Q")
+    second_hashes = array("Q")
+    risks = array("B")
+    categories = array("B")
+    reports = array("I")
+    lasts = array("I")
+
+    for row in rows:
+        number = normalize_phone_number(row.get("phone_number") or "")
+        if not number:
+            continue
+        h1, h2 = hash_number(number)
+        keys.append(h1)
+        second_hashes.append(h2)
+        risks.append(row["risk_score"])
+        categories.append(_CATEGORY_CODES.get((row.get("category") or "").strip(), 0))
+        reports.append(row["report_count"])
+        lasts.append(row["last_reported"])
+
+    key_arr = np.frombuffer(keys, dtype=np.uint64)
+    order = np.argsort(key_arr, kind="stable")
+    key_arr = key_arr[order]
+    unique_keys, starts = np.unique(key_arr, return_index=True)
+    count = len(unique_keys)
+
+    records = np.zeros(count, dtype=RECORD_DTYPE)
+    records["key"] = unique_keys
+    if count:
+        records["risk"] = np.maximum.reduceat(np.frombuffer(risks, dtype=np.uint8)[order], starts)
+        records["category"] = np.frombuffer(categories, dtype=np.uint8)[order][starts]
+        summed = np.add.reduceat(np.frombuffer(reports, dtype=np.uint32)[order].astype(np.uint64), starts)
+        records["reports"] = np.minimum(summed, 0xFFFF)
+        records["last"] = np.maximum.reduceat(np.frombuffer(lasts, dtype=np.uint32)[order], starts)
+
+    # Bloom フィルタ: ビット位置 = (h1 + i * h2) mod m（ルックアップ側と同じ二重ハッシュ）
+    bloom_bits, bloom_hashes = bloom_parameters(count, false_positive_rate)
+    bitmap = np.zeros(bloom_bits, dtype=bool)
+    if count:
+        h2_arr = np.frombuffer(second_hashes, dtype=np.uint64)[order][starts]
+        for i in range(bloom_hashes):
+            bitmap[(unique_keys + np.uint64(i) * h2_arr) % np.uint64(bloom_bits)] = True
+    bloom = np.packbits(bitmap, bitorder="little")
+
+    bloom_offset = HEADER_SIZE
+    records_offset = bloom_offset + len(bloom)
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, RECORD.size, count, bloom_bits, bloom_hashes, 0,
+        bloom_offset, records_offset, int(time.time()),
+    ).ljust(HEADER_SIZE, b"\0")
+
+    output = Path(output)
+    fd, tmp_path = tempfile.mkstemp(dir=output.parent, prefix=output.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(bloom.tobytes())
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return count
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="通報番号フィードからレピュテーションストアを構築する")
+    parser.add_argument("feeds", nargs="+", help="入力 CSV フィード")
+    parser.add_argument("-o", "--output", required=True, help="出力ストアファイル")
+    parser.add_argument("--fp-rate", type=float, default=0.01, help="Bloom フィルタの偽陽性率")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    start = time.perf_counter()
+    try:
+        count = build_store(read_feed_rows(args.feeds), args.output, args.fp_rate)
+    except (OSError, ValueError) as e:
+        logger.error("ストアを構築できません: %s", e)
+        return 1
+    logger.info(
+        "ストア構築完了: %s (%d件, %.1f秒)", args.output, count, time.perf_counter() - start
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,434 @@
+"""過去のイベント・闇バイトチェックの記録をまとめて採点し直す
+
+    python -m app.tools.bulk_score events.jsonl.gz -o scores.jsonl
+    python -m app.tools.bulk_score checks.csv -o scores.jsonl --analyzers dark_job --rules rules.yaml
+    python -m app.tools.bulk_score events.jsonl.gz -o scores.jsonl --resume
+
+入力は1行1件の JSON（JSONL）またはヘッダ付き CSV で、拡張子が ``.gz`` なら gzip 圧縮として読みます。
+各レコードの列（``--*-field`` で変更可）::
+
+    id, text, caller_number, call_type, sms_content
+
+``text`` 以外は省略可。``caller_number`` があるレコードだけ着信メタデータ解析も行います。
+出力は入力と同じ順の JSONL で、1レコードにつき1行（``index`` は入力での 0 始まりの位置）::
+
+    {"index": 0, "id": "...", "conversation": {...}, "dark_job": {...}, "metadata": {...}}
+    {"index": 1, "id": "...", "error": "text がありません"}
+
+- レコードを ``--chunk-size`` 件ずつプロセスプールに渡し、各ワーカーが ``ScamAnalyzer`` /
+  ``DarkJobChecker`` / ``MetadataAnalyzer`` のバッチ解析（1回の走査＋ヒット行列の演算）で採点する。
+  JSONL の行の解析と結果の JSON 化もワーカーで行い、親プロセスは読み書きだけを行う
+- 投入中のチャンクは ``ワーカー数 × 2`` 個までで、先頭のチャンクから順に書き出すため、
+  メモリ使用量は入力の大きさによらない
+- ルールは ``--rules``（省略時は ``RULE_BUNDLE_PATH``、未設定なら組み込みのルール）を使う。
+  闇バイトのグレーゾーンは LLM に問い合わせず、ヒューリスティック補正で判定する
+- ``--checkpoint-interval`` 秒ごとに出力を fsync してから、書き出し済みの件数と出力のバイト数を
+  ``<出力>.checkpoint`` に原子的に保存する。``--resume`` で出力をその位置まで切り詰めて再開し、
+  完了したらチェックポイントを削除する
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from app.services.dark_job_checker import DarkJobChecker
+from app.services.metadata_analyzer import MetadataAnalyzer
+from app.services.ngram_model import NgramModel, get_scam_model
+from app.services.rule_bundle import RuleSet, compile_rule_bundle, get_rule_registry, load_rule_bundle
+from app.services.scam_analyzer import ScamAnalyzer
+
+logger = logging.getLogger(__name__)
+
+ANALYZERS = ("conversation", "dark_job", "metadata")
+DEFAULT_CHUNK_SIZE = 256
+# ワーカー1つあたりの投入中のチャンク数
+INFLIGHT_PER_WORKER = 2
+
+
+@dataclass(frozen=True)
+class ScoreOptions:
+    """採点の設定（ワーカーに渡し、チェックポイントにも記録する）"""
+
+    analyzers: tuple[str, ...] = ANALYZERS
+    rules_path: str | None = None
+    scam_model_path: str | None = None
+    id_field: str = "id"
+    text_field: str = "text"
+    phone_field: str = "caller_number"
+    call_type_field: str = "call_type"
+    sms_field: str = "sms_content"
+
+
+class RecordScorer:
+    """1チャンク分のレコードを採点し、出力の JSONL を返す。"""
+
+    def __init__(self, options: ScoreOptions, rules: RuleSet, model: NgramModel | None = None) -> None:
+        self.options = options
+        self.scam_analyzer = ScamAnalyzer(model=model, rules=lambda: rules.scam)
+        self.dark_job_checker = DarkJobChecker(rules=lambda: rules.dark_job)
+        self.metadata_analyzer = MetadataAnalyzer(rules=lambda: rules.metadata)
+
+    def score(self, start: int, records: list[str | dict]) -> bytes:
+        """records（JSONL の行または CSV の行）を採点する。start は先頭レコードの位置。"""
+        options = self.options
+        outputs: list[dict] = []
+        valid: list[tuple[dict, dict]] = []
+        for index, raw in enumerate(records, start):
+            output: dict = {"index": index}
+            outputs.append(output)
+            try:
+                record = json.loads(raw) if isinstance(raw, str) else raw
+            except json.JSONDecodeError as e:
+                output["error"] = f"JSON として読めません: {e}"
+                continue
+            if not isinstance(record, dict):
+                output["error"] = "レコードがオブジェクトではありません"
+                continue
+            if record.get(options.id_field) is not None:
+                output["id"] = record[options.id_field]
+            text = record.get(options.text_field)
+            if not isinstance(text, str) or not text:
+                output["error"] = f"{options.text_field} がありません"
+                continue
+            if "metadata" in options.analyzers:
+                error = _metadata_field_error(record, options)
+                if error:
+                    output["error"] = error
+                    continue
+            valid.append((output, record))
+
+        texts = [record[options.text_field] for _, record in valid]
+        if "conversation" in options.analyzers:
+            for (output, _), result in zip(valid, self.scam_analyzer.analyze_batch(texts)):
+                output["conversation"] = result
+        if "dark_job" in options.analyzers:
+            for (output, _), result in zip(valid, self.dark_job_checker.check_batch(texts)):
+                output["dark_job"] = result
+        if "metadata" in options.analyzers:
+            with_number = []
+            for output, record in valid:
+                output["metadata"] = None
+                if record.get(options.phone_field):
+                    with_number.append((output, record))
+            items = [
+                (
+                    str(record[options.phone_field]),
+                    record.get(options.call_type_field) or "call",
+                    record.get(options.sms_field) or None,
+                )
+                for _, record in with_number
+            ]
+            for (output, _), result in zip(with_number, self.metadata_analyzer.analyze_batch(items)):
+                output["metadata"] = result
+
+        return "".join(json.dumps(output, ensure_ascii=False) + "\n" for output in outputs).encode("utf-8")
+
+
+def _metadata_field_error(record: dict, options: ScoreOptions) -> str | None:
+    """メタデータ解析に渡す項目の型を確かめる（配列などが来るとチャンク全体の採点が失敗するため）"""
+    phone = record.get(options.phone_field)
+    if phone is not None and (isinstance(phone, bool) or not isinstance(phone, (str, int))):
+        return f"{options.phone_field} が文字列ではありません"
+    for field in (options.call_type_field, options.sms_field):
+        if record.get(field) is not None and not isinstance(record[field], str):
+            return f"{field} が文字列ではありません"
+    return None
+
+
+def load_rules(rules_path: str | None) -> RuleSet:
+    """--rules のバンドル（省略時はサービスと同じルール）"""
+    if rules_path:
+        return compile_rule_bundle(load_rule_bundle(rules_path))
+    return get_rule_registry().current
+
+
+def build_scorer(options: ScoreOptions) -> RecordScorer:
+    if options.scam_model_path:
+        model = NgramModel.load(options.scam_model_path)
+    else:
+        model = get_scam_model()
+    return RecordScorer(options, load_rules(options.rules_path), model)
+
+
+# プロセスプールのワーカーごとの採点器
+_scorer: RecordScorer | None = None
+
+
+def _init_worker(options: ScoreOptions, quiet: bool = True) -> None:
+    global _scorer
+    if quiet:
+        # 進捗は親プロセスが出すため、ワーカーのルール読み込みなどのログは抑える
+        logging.disable(logging.INFO)
+    _scorer = build_scorer(options)
+
+
+def _score_chunk(start: int, records: list[str | dict]) -> bytes:
+    return _scorer.score(start, records)
+
+
+def input_format(path: str | Path) -> str:
+    """拡張子から入力形式（jsonl / csv）を判定する（.gz は外して判定）。"""
+    name = Path(path).name.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return "csv" if name.endswith(".csv") else "jsonl"
+
+
+def iter_records(stream: io.TextIOBase, fmt: str) -> Iterator[str | dict]:
+    """JSONL は空行以外の行をそのまま、CSV は行の dict を返す。"""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield line
+
+
+def iter_chunks(records: Iterable[str | dict], start: int, size: int) -> Iterator[tuple[int, list]]:
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def _done(result: bytes) -> Future:
+    future: Future = Future()
+    future.set_result(result)
+    return future
+
+
+def read_checkpoint(path: Path) -> dict | None:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def write_checkpoint(path: Path, data: dict) -> None:
+    """チェックポイントを一時ファイル経由で原子的に書き込む。"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class _Progress:
+    """処理件数・スループット・入力の読み込み位置を定期的にログに出す。"""
+
+    def __init__(self, raw: BinaryIO, total_bytes: int, skipped: int, interval: float) -> None:
+        self.raw = raw
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.start = time.monotonic()
+        self.last = self.start
+        self.skipped = skipped
+        self.records = skipped
+
+    def update(self, records: int, force: bool = False) -> None:
+        self.records += records
+        now = time.monotonic()
+        if not force and now - self.last < self.interval:
+            return
+        self.last = now
+        elapsed = max(now - self.start, 1e-9)
+        done = self.records - self.skipped
+        position = ""
+        if self.total_bytes:
+            position = f", 入力 {self.raw.tell() / self.total_bytes:.1%}"
+        logger.info(
+            "%d件 (%.0f件/秒, %.0f秒%s)", self.records, done / elapsed, elapsed, position,
+        )
+
+
+def bulk_score(
+    input_path: str | Path,
+    output_path: str | Path,
+    options: ScoreOptions,
+    *,
+    workers: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    resume: bool = False,
+    progress_interval: float = 10.0,
+    checkpoint_interval: float = 30.0,
+) -> dict:
+    """入力を採点して出力に書き出し、件数と所要時間を返す（workers=0 なら同じプロセスで実行）。"""
+    input_path = Path(input_path)
+    output_path = Path(output_path)
+    checkpoint_path = output_path.with_name(output_path.name + ".checkpoint")
+    settings = {"input": str(input_path.resolve()), "options": asdict(options)}
+    # JSON に書き出して読み直した形（tuple は list になる）で比べる
+    settings = json.loads(json.dumps(settings))
+
+    checkpoint = read_checkpoint(checkpoint_path)
+    skip = 0
+    if checkpoint is not None:
+        if not resume:
+            raise ValueError(f"チェックポイント {checkpoint_path} があります（--resume で再開するか削除してください）")
+        if {k: checkpoint.get(k) for k in settings} != settings:
+            raise ValueError("チェックポイントと入力・設定が一致しません")
+        skip = checkpoint["records"]
+        output = open(output_path, "r+b")
+        output.truncate(checkpoint["output_bytes"])
+        output.seek(checkpoint["output_bytes"])
+        logger.info("%d件目から再開します", skip)
+    else:
+        output = open(output_path, "wb")
+
+    executor = None
+    if workers > 0:
+        # スレッドを持つ親プロセスからの fork を避ける（実行プールと同じ）
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=_init_worker,
+            initargs=(options,),
+        )
+    else:
+        _init_worker(options, quiet=False)
+
+    raw = open(input_path, "rb")
+    total_bytes = os.fstat(raw.fileno()).st_size
+    binary = gzip.GzipFile(fileobj=raw) if input_path.name.lower().endswith(".gz") else raw
+    stream = io.TextIOWrapper(binary, encoding="utf-8", newline="")
+    records = itertools.islice(iter_records(stream, input_format(input_path)), skip, None)
+    progress = _Progress(raw, total_bytes, skip, progress_interval)
+    done = skip
+    last_checkpoint = time.monotonic()
+    pending: deque[tuple[int, Future]] = deque()
+    max_inflight = workers * INFLIGHT_PER_WORKER if executor is not None else 1
+
+    def write(count: int, future: Future) -> None:
+        nonlocal done, last_checkpoint
+        output.write(future.result())
+        done += count
+        progress.update(count)
+        if time.monotonic() - last_checkpoint >= checkpoint_interval:
+            save()
+            last_checkpoint = time.monotonic()
+
+    def save() -> None:
+        output.flush()
+        os.fsync(output.fileno())
+        write_checkpoint(checkpoint_path, {**settings, "records": done, "output_bytes": output.tell()})
+
+    try:
+        for start, chunk in iter_chunks(records, skip, chunk_size):
+            if executor is None:
+                future = _done(_score_chunk(start, chunk))
+            else:
+                future = executor.submit(_score_chunk, start, chunk)
+            pending.append((len(chunk), future))
+            if len(pending) >= max_inflight:
+                write(*pending.popleft())
+        while pending:
+            write(*pending.popleft())
+        output.flush()
+        os.fsync(output.fileno())
+        progress.update(0, force=True)
+    except BaseException:
+        # 書き出し済みの分までを再開位置として残す
+        pending.clear()
+        if not output.closed:
+            save()
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        stream.close()
+        raw.close()
+        output.close()
+
+    checkpoint_path.unlink(missing_ok=True)
+    elapsed = time.monotonic() - progress.start
+    return {"records": done, "scored": done - skip, "elapsed": elapsed}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="過去のイベント・闇バイトチェックの記録をまとめて採点し直す")
+    parser.add_argument("input", help="入力（.jsonl / .csv、.gz なら gzip 圧縮）")
+    parser.add_argument("-o", "--output", required=True, help="出力 JSONL")
+    parser.add_argument(
+        "--analyzers",
+        default=",".join(ANALYZERS),
+        help=f"実行する解析（カンマ区切り、{' / '.join(ANALYZERS)}）",
+    )
+    parser.add_argument("--rules", help="ルールバンドル（省略時は RULE_BUNDLE_PATH、未設定なら組み込みのルール）")
+    parser.add_argument("--scam-model", help="文字 n-gram 分類器（省略時は SCAM_MODEL_PATH）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="ワーカープロセス数（0 で同じプロセス）")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="ワーカーに一度に渡す件数")
+    parser.add_argument("--resume", action="store_true", help="チェックポイントから再開する")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="進捗を表示する間隔（秒）")
+    parser.add_argument("--checkpoint-interval", type=float, default=30.0, help="チェックポイントを保存する間隔（秒）")
+    for field in ("id", "text", "phone", "call_type", "sms"):
+        parser.add_argument(
+            f"--{field.replace('_', '-')}-field",
+            default=getattr(ScoreOptions, f"{field}_field"),
+            help=f"{field} の列名",
+        )
+    args = parser.parse_args(argv)
+
+    analyzers = tuple(name.strip() for name in args.analyzers.split(",") if name.strip())
+    unknown = set(analyzers) - set(ANALYZERS)
+    if not analyzers or unknown:
+        parser.error(f"--analyzers には {', '.join(ANALYZERS)} を指定してください")
+    if args.workers < 0 or args.chunk_size < 1:
+        parser.error("--workers は 0 以上、--chunk-size は 1 以上にしてください")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    # 解析器のレコードごとのログは出さない（--workers 0 でも進捗だけを表示する）
+    logging.getLogger("app.services").setLevel(logging.WARNING)
+    options = ScoreOptions(
+        analyzers=analyzers,
+        rules_path=args.rules,
+        scam_model_path=args.scam_model,
+        id_field=args.id_field,
+        text_field=args.text_field,
+        phone_field=args.phone_field,
+        call_type_field=args.call_type_field,
+        sms_field=args.sms_field,
+    )
+    try:
+        stats = bulk_score(
+            args.input,
+            args.output,
+            options,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            resume=args.resume,
+            progress_interval=args.progress_interval,
+            checkpoint_interval=args.checkpoint_interval,
+        )
+    except (OSError, ValueError) as e:
+        logger.error("採点を中断しました: %s", e)
+        return 1
+    logger.info(
+        "採点完了: %s (%d件, うち今回 %d件, %.1f秒, %.0f件/秒)",
+        args.output, stats["records"], stats["scored"], stats["elapsed"],
+        stats["scored"] / max(stats["elapsed"], 1e-9),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,728 @@
+"""ラベル付きコーパスでリスクスコアのしきい値と重みを較正する
+
+    python -m app.tools.calibrate_thresholds labelled.jsonl --analyzer conversation
+    python -m app.tools.calibrate_thresholds checks.jsonl.gz --analyzer dark_job \\
+        --deltas=-10,0,10 --grey-zones 20-55,25-50,30-60 --cache checks.npz -o report.json
+
+入力は bulk_score と同じ JSONL / CSV（.gz 可）です。各レコードは解析器の入力（``text``、
+metadata は ``caller_number`` / ``call_type`` / ``sms_content``）に加えて ``label``（詐欺・闇バイトなら
+1 / true）と、省略可の ``type``（詐欺の種類など。種類別の集計に使う）を持ちます。
+
+- コーパスは解析器の辞書で1回だけ照合し、「件数 × パターン（カテゴリ）」のヒット行列と、
+  重み・しきい値によらない件ごとの値（緊急キーワード数・近接ルールの補正・SMS の URL の有無・番号のリスク）
+  を ``--cache`` の .npz に保存する。入力・ルール・列名が同じなら次回は照合を省略する
+  （番号のリスクも保存するため、通報番号ストアの更新を反映するにはキャッシュを削除する）
+- 重み（詐欺パターンの基礎点・闇バイトのカテゴリの重み・SMS の加点）に ``--deltas`` を足した
+  すべての組み合わせと、闇バイトは ``--grey-zones`` の各グレーゾーンについて、リスクスコアを
+  ヒット行列に対する NumPy の配列演算で求める（解析器は再実行しない）
+- スコアは 0〜100 の整数なので、設定ごとの正例・負例のスコア分布（bincount）の累積和から
+  101 通りのしきい値（その値以上を陽性とする）の混同行列を一度に求める
+- 現在の設定での適合率・再現率・F1 の曲線、現在の各しきい値と F1 最大のしきい値での混同行列、
+  種類別の集計（conversation は詐欺の種類ごとの1対他の混同行列）、F1 の高い設定の一覧を表示し、
+  ``-o`` に JSON で書き出す
+- 闇バイトは設定ごとに LLM に問い合わせる件数（ルールスコアがグレーゾーンに入った件数）も数える。
+  近似重複のキャッシュで省ける分は含まないため上限の目安になる。評価には LLM のスコアの代わりに
+  ヒューリスティック補正（bulk_score と同じ）を使う
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+
+from app.routers.summary import RISK_LEVEL_THRESHOLDS
+from app.services.batch_matching import hit_matrix
+from app.services.metadata_analyzer import (
+    SMS_KEYWORD_WEIGHT,
+    SMS_URGENCY_WEIGHT,
+    SMS_URL_WEIGHT,
+    SUMMARY_THRESHOLDS,
+    URL_PATTERN,
+    MetadataAnalyzer,
+)
+from app.services.rule_bundle import RuleSet
+from app.services.scam_analyzer import NO_MATCH_SCORE
+from app.tools.bulk_score import input_format, iter_records, load_rules
+
+logger = logging.getLogger(__name__)
+
+ANALYZERS = ("conversation", "dark_job", "metadata")
+MAX_SCORE = 100
+# しきい値の候補数（0〜100）
+LEVELS = MAX_SCORE + 1
+# 1回の配列演算で作る要素数の目安（設定の組み合わせ × 件数 × 列）
+BLOCK_ELEMENTS = 1 << 22
+# 特徴量を取り出すときに1回で照合する件数
+EXTRACT_CHUNK = 10000
+# キャッシュの形式（特徴量の中身を変えたら上げる）
+CACHE_FORMAT = 1
+
+
+@dataclass(frozen=True)
+class CorpusFields:
+    """入力の列名"""
+
+    text: str = "text"
+    label: str = "label"
+    type: str = "type"
+    phone: str = "caller_number"
+    call_type: str = "call_type"
+    sms: str = "sms_content"
+
+
+@dataclass(frozen=True)
+class AnalyzerSpec:
+    """較正する解析器の現在の重み・しきい値"""
+
+    weight_names: list[str]
+    weights: np.ndarray
+    # 表示名 → しきい値（その値以上で該当）
+    thresholds: dict[str, int]
+    # 種類別の集計に使うしきい値の表示名
+    decision: str
+    grey_zone: tuple[int, int] | None = None
+    # 最上位パターンの添字 → 詐欺の種類（conversation のみ）
+    type_names: list[str] | None = None
+
+
+def analyzer_spec(analyzer: str, rules: RuleSet) -> AnalyzerSpec:
+    if analyzer == "conversation":
+        scam = rules.scam
+        return AnalyzerSpec(
+            weight_names=[name for name, _, _ in scam.patterns],
+            weights=scam.base_scores.copy(),
+            thresholds={
+                **{f"severity.{k}": v for k, v in scam.severity_thresholds.items()},
+                **{f"summary.{k}": v for k, v in RISK_LEVEL_THRESHOLDS.items()},
+            },
+            decision="severity.medium",
+            type_names=[name for name, _, _ in scam.patterns],
+        )
+    if analyzer == "dark_job":
+        dark_job = rules.dark_job
+        return AnalyzerSpec(
+            weight_names=[name for name, _, _ in dark_job.patterns],
+            weights=dark_job.weights.copy(),
+            thresholds={f"risk.{k}": v for k, v in dark_job.risk_thresholds.items()},
+            decision="risk.medium",
+            grey_zone=tuple(dark_job.grey_zone),
+        )
+    if analyzer == "metadata":
+        return AnalyzerSpec(
+            weight_names=["sms_keyword", "sms_url", "sms_urgency"],
+            weights=np.array([SMS_KEYWORD_WEIGHT, SMS_URL_WEIGHT, SMS_URGENCY_WEIGHT], dtype=np.int64),
+            thresholds={f"summary.{k}": v for k, v in SUMMARY_THRESHOLDS.items()},
+            decision="summary.medium",
+        )
+    raise ValueError(f"未対応の解析器です: {analyzer}")
+
+
+# ---- コーパスと特徴量 ----
+
+
+def _open_text(path: Path) -> io.TextIOBase:
+    if path.name.lower().endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def _parse_label(value: object) -> int | None:
+    if isinstance(value, str):
+        value = value.strip().lower()
+        return {"1": 1, "true": 1, "0": 0, "false": 0}.get(value)
+    if value in (0, 1):
+        return int(value)
+    return None
+
+
+def read_corpus(path: str | Path, analyzer: str, fields: CorpusFields = CorpusFields()) -> list[dict]:
+    """評価に使うレコード（解析器の入力・label・type）を読み出す。
+
+    metadata では電話番号のないレコードを飛ばします（bulk_score と同じく解析の対象外）。
+    """
+    path = Path(path)
+    records = []
+    skipped = 0
+    with _open_text(path) as stream:
+        for number, raw in enumerate(iter_records(stream, input_format(path)), 1):
+            try:
+                record = json.loads(raw) if isinstance(raw, str) else raw
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{number}: JSON として読めません: {e}") from None
+            if not isinstance(record, dict):
+                raise ValueError(f"{path}:{number}: レコードがオブジェクトではありません")
+            label = _parse_label(record.get(fields.label))
+            if label is None:
+                raise ValueError(f"{path}:{number}: {fields.label}（0/1）が必要です")
+            item = {"label": label, "type": str(record.get(fields.type) or "")}
+            if analyzer == "metadata":
+                if not record.get(fields.phone):
+                    skipped += 1
+                    continue
+                item["phone"] = str(record[fields.phone])
+                item["call_type"] = record.get(fields.call_type) or "call"
+                item["sms"] = record.get(fields.sms) or None
+            else:
+                text = record.get(fields.text)
+                if not isinstance(text, str) or not text:
+                    raise ValueError(f"{path}:{number}: {fields.text} がありません")
+                item["text"] = text
+            records.append(item)
+    if skipped:
+        logger.info("電話番号のないレコード %d件を飛ばしました", skipped)
+    return records
+
+
+def _conversation_features(records: list[dict], rules: RuleSet) -> dict[str, np.ndarray]:
+    scam = rules.scam
+    hits = hit_matrix(scam.matcher, [r["text"] for r in records])
+    return {
+        "pattern_hits": (hits.astype(np.int32) @ scam.membership) > 0,
+        "urgency": hits[:, scam.urgency_columns].sum(axis=1).astype(np.int64),
+    }
+
+
+def _dark_job_features(records: list[dict], rules: RuleSet) -> dict[str, np.ndarray]:
+    dark_job = rules.dark_job
+    texts = [r["text"] for r in records]
+    matched = (hit_matrix(dark_job.matcher, texts).astype(np.int32) @ dark_job.membership) > 0
+    # 近接ルールの補正はグレーゾーンの境界によらないため、該当カテゴリのある件だけ先に求めておく
+    boost = np.fromiter(
+        (dark_job.proximity.boost(text) if row.any() else 0 for text, row in zip(texts, matched)),
+        dtype=np.int64,
+        count=len(texts),
+    )
+    return {"category_hits": matched, "boost": boost}
+
+
+def _metadata_features(
+    records: list[dict], rules: RuleSet, analyzer: MetadataAnalyzer
+) -> dict[str, np.ndarray]:
+    metadata = rules.metadata
+    # SMS 本文を渡さなければ、リスクスコアは番号のリスク（上限 100）だけになる
+    number_risk = np.array(
+        [r["risk_score"] for r in analyzer.analyze_batch([(r["phone"], r["call_type"], None) for r in records])],
+        dtype=np.int64,
+    )
+    contents = [r["sms"] if r["sms"] and r["call_type"] == "sms" else "" for r in records]
+    hits = hit_matrix(metadata.matcher, contents)
+    has_url = np.fromiter(
+        (bool(content) and URL_PATTERN.search(content) is not None for content in contents),
+        dtype=bool,
+        count=len(contents),
+    )
+    return {
+        "number_risk": number_risk,
+        # SMS の加点の対象（キーワード件数・URL あり・緊急表現あり）
+        "sms_counts": np.stack(
+            [
+                hits[:, metadata.keyword_columns].sum(axis=1),
+                has_url,
+                hits[:, metadata.urgency_columns].any(axis=1),
+            ],
+            axis=1,
+        ).astype(np.int64),
+    }
+
+
+def extract_features(analyzer: str, records: list[dict], rules: RuleSet) -> dict[str, np.ndarray]:
+    """レコードを解析器の辞書で照合し、重み・しきい値によらない件ごとの特徴量を返す。"""
+    metadata_analyzer = MetadataAnalyzer(rules=lambda: rules.metadata)
+    parts = []
+    for start in range(0, len(records), EXTRACT_CHUNK):
+        chunk = records[start:start + EXTRACT_CHUNK]
+        if analyzer == "conversation":
+            parts.append(_conversation_features(chunk, rules))
+        elif analyzer == "dark_job":
+            parts.append(_dark_job_features(chunk, rules))
+        else:
+            parts.append(_metadata_features(chunk, rules, metadata_analyzer))
+    features = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    features["labels"] = np.array([r["label"] for r in records], dtype=bool)
+    features["types"] = np.array([r["type"] for r in records], dtype=str)
+    return features
+
+
+def cache_key(path: str | Path, analyzer: str, rules: RuleSet, fields: CorpusFields) -> str:
+    """入力の内容・解析器・ルールのバージョン・列名から決まるキャッシュのキー"""
+    digest = hashlib.blake2b(digest_size=16)
+    settings = {
+        "format": CACHE_FORMAT,
+        "analyzer": analyzer,
+        "rules": [rules.version, rules.model_versions[analyzer]],
+        "fields": asdict(fields),
+    }
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_features(path: str | Path, key: str) -> dict[str, np.ndarray] | None:
+    """キャッシュの特徴量（キーが違う・ファイルがなければ None）"""
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["key"]) != key:
+                return None
+            return {name: data[name] for name in data.files if name != "key"}
+    except FileNotFoundError:
+        return None
+
+
+def save_features(path: str | Path, key: str, features: dict[str, np.ndarray]) -> None:
+    """特徴量を .npz に原子的に書き出す。"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, key=np.array(key), **features)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_or_extract(
+    path: str | Path,
+    analyzer: str,
+    rules: RuleSet,
+    fields: CorpusFields = CorpusFields(),
+    cache_path: str | Path | None = None,
+) -> dict[str, np.ndarray]:
+    """キャッシュがあればその特徴量を、なければコーパスを照合して返す（cache_path があれば保存）。"""
+    key = None
+    if cache_path is not None:
+        key = cache_key(path, analyzer, rules, fields)
+        features = load_features(cache_path, key)
+        if features is not None:
+            logger.info("特徴量のキャッシュを使います: %s", cache_path)
+            return features
+    records = read_corpus(path, analyzer, fields)
+    if not records:
+        raise ValueError("評価データがありません")
+    start = time.perf_counter()
+    features = extract_features(analyzer, records, rules)
+    logger.info("照合完了: %d件 (%.1f秒)", len(records), time.perf_counter() - start)
+    if cache_path is not None:
+        save_features(cache_path, key, features)
+    return features
+
+
+# ---- 重み・しきい値ごとのスコア ----
+
+
+def scam_scores(
+    pattern_hits: np.ndarray, urgency: np.ndarray, base_scores: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """ScamAnalyzer と同じリスクスコアと最上位パターンの添字を、基礎点の組み合わせごとに返す。
+
+    pattern_hits は (件数, パターン)、base_scores は (組み合わせ, パターン)。戻り値は (組み合わせ, 件数)。
+    """
+    matched_count = pattern_hits.sum(axis=1)
+    masked = np.where(pattern_hits[None, :, :], base_scores[:, None, :], -1)
+    # 同点は定義順の先のパターン（単件解析の安定ソートと同じ）
+    top = masked.argmax(axis=2)
+    bonus = np.minimum(urgency * 5, 15) + np.minimum((matched_count - 1) * 10, 20)
+    scores = np.minimum(masked.max(axis=2) + bonus, MAX_SCORE)
+    return np.where(matched_count > 0, scores, NO_MATCH_SCORE), top
+
+
+def dark_job_scores(
+    category_hits: np.ndarray, boost: np.ndarray, weights: np.ndarray, grey_zone: tuple[int, int]
+) -> tuple[np.ndarray, np.ndarray]:
+    """DarkJobChecker（LLM なし）と同じリスクスコアと、ルールスコアがグレーゾーンに入ったか
+    （LLM に問い合わせる件か）を、カテゴリの重みの組み合わせごとに返す。"""
+    matched_count = category_hits.sum(axis=1)
+    bonus = np.select([matched_count >= 4, matched_count >= 3, matched_count >= 2], [20, 15, 10], 0)
+    raw = np.minimum(weights @ category_hits.T.astype(np.int64) + bonus, MAX_SCORE)
+    grey = (matched_count > 0) & (raw >= grey_zone[0]) & (raw <= grey_zone[1])
+    scores = np.where(grey & (boost > 0), np.minimum(raw + boost, MAX_SCORE), raw)
+    return np.where(matched_count > 0, scores, 0), grey
+
+
+def metadata_scores(number_risk: np.ndarray, sms_counts: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """MetadataAnalyzer と同じリスクスコアを、SMS の加点の組み合わせごとに返す。"""
+    return np.minimum(number_risk + weights @ sms_counts.T, MAX_SCORE)
+
+
+def score_block(
+    analyzer: str, features: dict[str, np.ndarray], weights: np.ndarray, grey_zone: tuple[int, int] | None
+) -> tuple[np.ndarray, np.ndarray | None, np.ndarray | None]:
+    """(スコア, グレーゾーンに入ったか, 最上位パターン) を返す（該当しないものは None）。"""
+    if analyzer == "conversation":
+        scores, top = scam_scores(features["pattern_hits"], features["urgency"], weights)
+        return scores, None, top
+    if analyzer == "dark_job":
+        scores, grey = dark_job_scores(features["category_hits"], features["boost"], weights, grey_zone)
+        return scores, grey, None
+    return metadata_scores(features["number_risk"], features["sms_counts"], weights), None, None
+
+
+def weight_grid(current: np.ndarray, deltas: list[int], max_combinations: int) -> np.ndarray:
+    """現在の重みの各要素に deltas のいずれかを足したすべての組み合わせ（0〜100 に丸める）。"""
+    deltas = sorted(set(deltas) | {0})
+    count = len(deltas) ** len(current)
+    if count > max_combinations:
+        raise ValueError(
+            f"重みの組み合わせが {count}通りあります（上限 {max_combinations}）。--deltas を減らしてください"
+        )
+    offsets = np.array(list(itertools.product(deltas, repeat=len(current))), dtype=np.int64)
+    return np.unique(np.clip(current + offsets.reshape(count, len(current)), 0, MAX_SCORE), axis=0)
+
+
+def score_histograms(scores: np.ndarray, labels: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(組み合わせ, 件数) のスコアから、組み合わせごとの正例・負例のスコア分布 (組み合わせ, 101) を求める。"""
+    combos = scores.shape[0]
+    flat = scores + LEVELS * np.arange(combos)[:, None]
+    positives = np.bincount(flat[:, labels].ravel(), minlength=combos * LEVELS)
+    negatives = np.bincount(flat[:, ~labels].ravel(), minlength=combos * LEVELS)
+    return positives.reshape(combos, LEVELS), negatives.reshape(combos, LEVELS)
+
+
+def sweep(
+    analyzer: str,
+    features: dict[str, np.ndarray],
+    grid: np.ndarray,
+    grey_zones: list[tuple[int, int] | None],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """すべての (グレーゾーン, 重み) について、正例・負例のスコア分布と LLM に問い合わせる件数を求める。
+
+    戻り値の形は (グレーゾーン, 重み, 101) ×2 と (グレーゾーン, 重み)。
+    """
+    labels = features["labels"]
+    shape = (len(grey_zones), len(grid))
+    positives = np.zeros(shape + (LEVELS,), dtype=np.int64)
+    negatives = np.zeros(shape + (LEVELS,), dtype=np.int64)
+    llm_calls = np.zeros(shape, dtype=np.int64)
+    # 件数方向に区切り、中間の配列の大きさを組み合わせ数によらず抑える
+    rows = max(1, BLOCK_ELEMENTS // (len(grid) * grid.shape[1]))
+    for start in range(0, len(labels), rows):
+        block = {name: values[start:start + rows] for name, values in features.items()}
+        for g, grey_zone in enumerate(grey_zones):
+            scores, grey, _ = score_block(analyzer, block, grid, grey_zone)
+            pos, neg = score_histograms(scores, block["labels"])
+            positives[g] += pos
+            negatives[g] += neg
+            if grey is not None:
+                llm_calls[g] += grey.sum(axis=1)
+    return positives, negatives, llm_calls
+
+
+def threshold_metrics(positives: np.ndarray, negatives: np.ndarray) -> dict[str, np.ndarray]:
+    """スコア分布から、しきい値 0〜100（その値以上を陽性）ごとの混同行列と適合率・再現率・F1 を求める。"""
+    tp = positives[..., ::-1].cumsum(axis=-1)[..., ::-1]
+    fp = negatives[..., ::-1].cumsum(axis=-1)[..., ::-1]
+    fn = positives.sum(axis=-1, keepdims=True) - tp
+    tn = negatives.sum(axis=-1, keepdims=True) - fp
+
+    def ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+        return np.divide(
+            numerator, denominator, out=np.zeros(numerator.shape), where=denominator > 0
+        )
+
+    return {
+        "tp": tp,
+        "fp": fp,
+        "fn": fn,
+        "tn": tn,
+        "precision": ratio(tp, tp + fp),
+        "recall": ratio(tp, tp + fn),
+        "f1": ratio(2 * tp, 2 * tp + fp + fn),
+    }
+
+
+# ---- 報告 ----
+
+
+def _point(metrics: dict[str, np.ndarray], threshold: int) -> dict:
+    return {
+        "threshold": threshold,
+        "precision": round(float(metrics["precision"][threshold]), 4),
+        "recall": round(float(metrics["recall"][threshold]), 4),
+        "f1": round(float(metrics["f1"][threshold]), 4),
+        "confusion": {name: int(metrics[name][threshold]) for name in ("tp", "fp", "fn", "tn")},
+    }
+
+
+def type_breakdown(
+    features: dict[str, np.ndarray],
+    scores: np.ndarray,
+    top: np.ndarray | None,
+    threshold: int,
+    type_names: list[str] | None,
+) -> dict[str, dict]:
+    """type 列の値ごとの件数・該当と判定した件数。
+
+    conversation は、しきい値以上で最上位パターンがその種類だった件を「その種類と判定」とした
+    1対他の混同行列と適合率・再現率・F1 も返します。
+    """
+    types = features["types"]
+    labels = features["labels"]
+    flagged = scores >= threshold
+    predicted_types = np.array(type_names)[top] if top is not None else None
+    breakdown = {}
+    for name in sorted(set(types.tolist()) - {""}):
+        actual = types == name
+        items = int(actual.sum())
+        entry = {
+            "items": items,
+            "positives": int((actual & labels).sum()),
+            "flagged": int((actual & flagged).sum()),
+            "flagged_rate": round(float((actual & flagged).sum()) / items, 4),
+        }
+        if predicted_types is not None and name in type_names:
+            predicted = flagged & (predicted_types == name)
+            tp = int((predicted & actual).sum())
+            fp = int((predicted & ~actual).sum())
+            fn = items - tp
+            entry["confusion"] = {"tp": tp, "fp": fp, "fn": fn, "tn": len(types) - tp - fp - fn}
+            entry["precision"] = round(tp / max(tp + fp, 1), 4)
+            entry["recall"] = round(tp / max(items, 1), 4)
+            entry["f1"] = round(2 * tp / max(2 * tp + fp + fn, 1), 4)
+        breakdown[name] = entry
+    return breakdown
+
+
+def calibrate(
+    analyzer: str,
+    features: dict[str, np.ndarray],
+    spec: AnalyzerSpec,
+    *,
+    deltas: Sequence[int] = (0,),
+    grey_zones: Sequence[tuple[int, int]] = (),
+    max_combinations: int = 100000,
+    top: int = 10,
+    max_llm_rate: float | None = None,
+) -> dict:
+    """重み・グレーゾーン・しきい値の全組み合わせを評価し、報告（JSON にできる dict）を返す。"""
+    grid = weight_grid(spec.weights, list(deltas), max_combinations)
+    zones: list[tuple[int, int] | None] = [None]
+    if spec.grey_zone is not None:
+        zones = list(dict.fromkeys([spec.grey_zone, *(tuple(zone) for zone in grey_zones)]))
+    if len(grid) * len(zones) > max_combinations:
+        raise ValueError(f"設定の組み合わせが {len(grid) * len(zones)}通りあります（上限 {max_combinations}）")
+
+    labels = features["labels"]
+    items = len(labels)
+    start = time.perf_counter()
+    positives, negatives, llm_calls = sweep(analyzer, features, grid, zones)
+    metrics = threshold_metrics(positives, negatives)
+    elapsed = time.perf_counter() - start
+    best_thresholds = metrics["f1"].argmax(axis=-1)
+    best_f1 = np.take_along_axis(metrics["f1"], best_thresholds[..., None], axis=-1)[..., 0]
+
+    def setting(g: int, c: int) -> dict:
+        result = {"weights": dict(zip(spec.weight_names, grid[c].tolist()))}
+        if spec.grey_zone is not None:
+            result["grey_zone"] = list(zones[g])
+            result["llm_calls"] = int(llm_calls[g, c])
+            result["llm_call_rate"] = round(int(llm_calls[g, c]) / items, 4)
+        return result
+
+    def breakdown(g: int, c: int, threshold: int) -> dict:
+        scores, _, top_pattern = score_block(analyzer, features, grid[c:c + 1], zones[g])
+        return type_breakdown(
+            features, scores[0], top_pattern[0] if top_pattern is not None else None, threshold, spec.type_names
+        )
+
+    current = int(np.flatnonzero((grid == spec.weights).all(axis=1))[0])
+    at_current = {name: values[0, current] for name, values in metrics.items()}
+    curve = [
+        {
+            "threshold": t,
+            "precision": round(float(at_current["precision"][t]), 4),
+            "recall": round(float(at_current["recall"][t]), 4),
+            "f1": round(float(at_current["f1"][t]), 4),
+        }
+        for t in range(LEVELS)
+    ]
+    decision = spec.thresholds[spec.decision]
+
+    # F1 の高い順（同じなら LLM に問い合わせる件数の少ない順）
+    candidates = np.arange(best_f1.size)
+    if max_llm_rate is not None:
+        candidates = candidates[llm_calls.ravel() <= max_llm_rate * items]
+    order = candidates[np.lexsort((llm_calls.ravel()[candidates], -best_f1.ravel()[candidates]))][:top]
+    ranked = []
+    for index in order:
+        g, c = np.unravel_index(index, best_f1.shape)
+        at = {name: values[g, c] for name, values in metrics.items()}
+        ranked.append({**setting(g, c), **_point(at, int(best_thresholds[g, c]))})
+
+    report = {
+        "analyzer": analyzer,
+        "items": items,
+        "positives": int(labels.sum()),
+        "combinations": len(grid) * len(zones),
+        "sweep_seconds": round(elapsed, 3),
+        "current": {
+            **setting(0, current),
+            "thresholds": {name: _point(at_current, t) for name, t in spec.thresholds.items()},
+            "best": _point(at_current, int(best_thresholds[0, current])),
+            "by_type": {"threshold": spec.decision, "types": breakdown(0, current, decision)},
+            "curve": curve,
+        },
+        "top": ranked,
+    }
+    if ranked:
+        best = order[0]
+        g, c = np.unravel_index(best, best_f1.shape)
+        report["top"][0]["by_type"] = breakdown(g, c, int(best_thresholds[g, c]))
+    return report
+
+
+def format_report(report: dict) -> str:
+    """報告を表にした文字列"""
+    current = report["current"]
+    lines = [
+        f"{report['analyzer']}: {report['items']}件（正例 {report['positives']}件）、"
+        f"設定の組み合わせ {report['combinations']}通り（{report['sweep_seconds']:.2f}秒）",
+        "現在の設定: " + " ".join(f"{k}={v}" for k, v in current["weights"].items()),
+    ]
+    if "grey_zone" in current:
+        lines.append(
+            f"  グレーゾーン {current['grey_zone'][0]}〜{current['grey_zone'][1]}: "
+            f"LLM 問い合わせ {current['llm_calls']}件（{current['llm_call_rate']:.1%}）"
+        )
+    lines.append(f"  {'しきい値':<18}{'適合率':>8}{'再現率':>8}{'F1':>8}{'TP':>8}{'FP':>8}{'FN':>8}{'TN':>8}")
+    rows = [*current["thresholds"].items(), ("F1 最大", current["best"])]
+    for name, point in rows:
+        confusion = point["confusion"]
+        lines.append(
+            f"  {name + ' >= ' + str(point['threshold']):<20}{point['precision']:>8.3f}{point['recall']:>8.3f}"
+            f"{point['f1']:>8.3f}{confusion['tp']:>8}{confusion['fp']:>8}{confusion['fn']:>8}{confusion['tn']:>8}"
+        )
+
+    by_type = current["by_type"]
+    if by_type["types"]:
+        lines.append(f"種類別（{by_type['threshold']}）:")
+        for name, entry in by_type["types"].items():
+            line = f"  {name:<24}{entry['items']:>8}件 該当 {entry['flagged']:>6}件（{entry['flagged_rate']:.1%}）"
+            if "confusion" in entry:
+                line += f" 種類の適合率 {entry['precision']:.3f} 再現率 {entry['recall']:.3f} F1 {entry['f1']:.3f}"
+            lines.append(line)
+
+    if report["top"]:
+        lines.append("F1 の高い設定:")
+        for rank, entry in enumerate(report["top"], 1):
+            line = (
+                f"  {rank:>2}. F1 {entry['f1']:.3f} 適合率 {entry['precision']:.3f} 再現率 {entry['recall']:.3f}"
+                f" しきい値 {entry['threshold']:>3}"
+            )
+            if "grey_zone" in entry:
+                line += (
+                    f" グレーゾーン {entry['grey_zone'][0]}〜{entry['grey_zone'][1]}"
+                    f" LLM {entry['llm_calls']}件（{entry['llm_call_rate']:.1%}）"
+                )
+            line += " " + " ".join(f"{k}={v}" for k, v in entry["weights"].items())
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def write_report(path: str | Path, report: dict) -> None:
+    """報告の JSON を原子的に書き出す。"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _parse_deltas(value: str) -> list[int]:
+    try:
+        return [int(delta) for delta in value.split(",") if delta.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError("整数のカンマ区切りで指定してください") from None
+
+
+def _parse_grey_zones(value: str) -> list[tuple[int, int]]:
+    zones = []
+    for zone in value.split(","):
+        if not zone.strip():
+            continue
+        try:
+            low, high = (int(bound) for bound in zone.split("-"))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"下限-上限 の形で指定してください: {zone}") from None
+        if not 0 <= low <= high <= MAX_SCORE:
+            raise argparse.ArgumentTypeError(f"0 <= 下限 <= 上限 <= {MAX_SCORE} にしてください: {zone}")
+        zones.append((low, high))
+    return zones
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="ラベル付きコーパスでリスクスコアのしきい値と重みを較正する")
+    parser.add_argument("input", help="入力（.jsonl / .csv、.gz なら gzip 圧縮）")
+    parser.add_argument("--analyzer", choices=ANALYZERS, default="conversation", help="較正する解析器")
+    parser.add_argument("--rules", help="ルールバンドル（省略時は RULE_BUNDLE_PATH、未設定なら組み込みのルール）")
+    parser.add_argument(
+        "--deltas",
+        type=_parse_deltas,
+        default=[0],
+        help="各重みに足して試す値（カンマ区切り。負の値を含むなら --deltas=-10,0,10 の形で指定）",
+    )
+    parser.add_argument(
+        "--grey-zones",
+        type=_parse_grey_zones,
+        default=[],
+        help="現在の設定と並べて試すグレーゾーン（dark_job のみ。例: 20-55,25-50）",
+    )
+    parser.add_argument("--max-combinations", type=int, default=100000, help="設定の組み合わせ数の上限")
+    parser.add_argument("--top", type=int, default=10, help="表示する設定の数")
+    parser.add_argument("--max-llm-rate", type=float, help="LLM に問い合わせる割合がこれ以下の設定だけを表示する")
+    parser.add_argument("--cache", help="照合結果（特徴量）のキャッシュ .npz")
+    parser.add_argument("-o", "--output", help="報告の JSON")
+    for field in asdict(CorpusFields()):
+        parser.add_argument(
+            f"--{field.replace('_', '-')}-field",
+            default=getattr(CorpusFields, field),
+            help=f"{field} の列名",
+        )
+    args = parser.parse_args(argv)
+    if args.grey_zones and args.analyzer != "dark_job":
+        parser.error("--grey-zones は --analyzer dark_job でだけ指定できます")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    logging.getLogger("app.services").setLevel(logging.WARNING)
+    fields = CorpusFields(**{field: getattr(args, f"{field}_field") for field in asdict(CorpusFields())})
+    try:
+        rules = load_rules(args.rules)
+        features = load_or_extract(args.input, args.analyzer, rules, fields, args.cache)
+        report = calibrate(
+            args.analyzer,
+            features,
+            analyzer_spec(args.analyzer, rules),
+            deltas=args.deltas,
+            grey_zones=args.grey_zones,
+            max_combinations=args.max_combinations,
+            top=args.top,
+            max_llm_rate=args.max_llm_rate,
+        )
+        if args.output:
+            write_report(args.output, report)
+    except (OSError, ValueError) as e:
+        logger.error("較正を中断しました: %s", e)
+        return 1
+    print(format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""ルールバンドルの書き出し・検証
+
+    python -m app.tools.rule_bundle export -o rules.yaml
+    python -m app.tools.rule_bundle check rules.yaml
+
+``export`` は組み込みのルールをバンドルの形（YAML / JSON、拡張子で判定）で書き出します。
+編集して ``RULE_BUNDLE_PATH`` に指定する元として使います。``check`` はバンドルを
+サービスと同じ手順で検証・コンパイルし、解析器ごとの ``model_version`` と件数を表示します。
+配置前に ``check`` を通しておけば、稼働中のサービスで読み込みに失敗することはありません。
+出力は一時ファイルに書き出してから ``os.replace`` で原子的に差し替えるため、
+監視中のサービスが書きかけのファイルを読むことはありません。
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.services.rule_bundle import RuleBundle, builtin_rule_bundle, compile_rule_bundle, load_rule_bundle
+
+logger = logging.getLogger(__name__)
+
+
+def dump_rule_bundle(bundle: RuleBundle, output: str | Path) -> None:
+    """バンドルを YAML（.yaml / .yml）または JSON で書き出す。"""
+    output = Path(output)
+    data = bundle.model_dump(exclude_none=True)
+    if output.suffix in (".yaml", ".yml"):
+        import yaml
+
+        text = yaml.safe_dump(data, allow_unicode=True, sort_keys=False)
+    else:
+        text = json.dumps(data, ensure_ascii=False, indent=2) + "\n"
+
+    fd, tmp_path = tempfile.mkstemp(dir=output.parent or ".", prefix=f".{output.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, output)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def check_rule_bundle(path: str | Path) -> dict:
+    """バンドルを検証・コンパイルし、バージョンと件数を返す。"""
+    start = time.perf_counter()
+    bundle = load_rule_bundle(path)
+    rules = compile_rule_bundle(bundle)
+    return {
+        "version": rules.version,
+        "model_versions": rules.model_versions,
+        "scam_patterns": len(bundle.scam.patterns),
+        "dark_job_categories": len(bundle.dark_job.categories),
+        "proximity_rules": len(bundle.dark_job.proximity_rules),
+        "keywords": len(rules.event_matcher.keywords),
+        "compile_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="ルールバンドルを書き出す・検証する")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="組み込みのルールをバンドルとして書き出す")
+    export.add_argument("-o", "--output", required=True, help="出力ファイル（.yaml / .yml / .json）")
+    export.add_argument("--version", default=None, help="バンドルのバージョン（既定: builtin）")
+    check = commands.add_parser("check", help="バンドルを検証・コンパイルする")
+    check.add_argument("bundle", help="ルールバンドル（.yaml / .yml / .json）")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    if args.command == "export":
+        bundle = builtin_rule_bundle()
+        if args.version:
+            bundle = bundle.model_copy(update={"version": args.version})
+        dump_rule_bundle(bundle, args.output)
+        logger.info("組み込みのルールを書き出しました: %s", args.output)
+        return 0
+
+    try:
+        summary = check_rule_bundle(args.bundle)
+    except (OSError, ValueError) as e:
+        logger.error("ルールバンドルが不正です: %s", e)
+        return 1
+    json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
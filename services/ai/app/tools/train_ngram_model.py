@@ -0,0 +1,208 @@
+"""ラベル付き JSONL から文字 n-gram 分類器の重みを学習する
+
+    python -m app.tools.train_ngram_model labelled.jsonl -o scam-ngram.mngm
+    python -m app.tools.train_ngram_model a.jsonl b.jsonl -o scam-ngram.mngm --bits 18 --epochs 200
+
+入力は1行1件の JSON で、``text``（本文）と ``label``（詐欺なら 1 / true、それ以外は 0 / false）を持ちます。
+ロジスティック回帰を全件の勾配（AdaGrad）で学習します。各エポックの勾配は
+n-gram のバケット番号に対する ``np.bincount`` 1回で求めるため、Python のループは件数に比例しません。
+``--holdout`` の割合を検証用に取り分け、正解率・適合率・再現率・AUC を表示します。
+出力は一時ファイルに書き出してから ``os.replace`` で原子的に差し替えます。
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+
+from app.services.ngram_model import (
+    DEFAULT_BITS,
+    DEFAULT_NGRAM_RANGE,
+    FORMAT_VERSION,
+    HEADER,
+    HEADER_SIZE,
+    MAGIC,
+    NgramModel,
+    hash_ngrams,
+    linear_scores,
+    sigmoid,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def read_labelled(paths: Iterable[str | Path]) -> tuple[list[str], np.ndarray]:
+    """複数の JSONL から (本文一覧, ラベル配列) を読み出す。"""
+    texts: list[str] = []
+    labels: list[int] = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                text, label = record.get("text"), record.get("label")
+                if not isinstance(text, str) or label not in (0, 1):
+                    raise ValueError(f"{path}:{line_no}: text（文字列）と label（0/1）が必要です")
+                texts.append(text)
+                labels.append(int(label))
+    return texts, np.array(labels, dtype=np.float64)
+
+
+def train(
+    texts: list[str],
+    labels: np.ndarray,
+    model_version: str,
+    bits: int = DEFAULT_BITS,
+    ngram_range: tuple[int, int] = DEFAULT_NGRAM_RANGE,
+    epochs: int = 100,
+    learning_rate: float = 0.5,
+    l2: float = 1e-6,
+) -> NgramModel:
+    """ロジスティック回帰の重みを学習する。
+
+    正例・負例の件数の偏りは重み付けで打ち消します（少ないクラスの誤りを重く数える）。
+    """
+    size = len(texts)
+    buckets, owners = hash_ngrams(texts, bits, ngram_range)
+    scale = 1.0 / np.sqrt(np.maximum(np.bincount(owners, minlength=size), 1))
+    positives = labels.sum()
+    sample_weight = np.where(
+        labels > 0, size / (2 * max(positives, 1)), size / (2 * max(size - positives, 1))
+    ) / size
+
+    weights = np.zeros(1 << bits, dtype=np.float64)
+    bias = 0.0
+    weight_sq = np.zeros_like(weights)
+    bias_sq = 0.0
+    for _ in range(epochs):
+        residual = (sigmoid(linear_scores(weights, bias, buckets, owners, size)) - labels) * sample_weight
+        gradient = np.bincount(buckets, weights=(residual * scale)[owners], minlength=1 << bits)
+        gradient += l2 * weights
+        bias_gradient = residual.sum()
+        # AdaGrad: よく出る n-gram ほど学習率を下げる
+        weight_sq += gradient * gradient
+        weights -= learning_rate * gradient / (np.sqrt(weight_sq) + 1e-8)
+        bias_sq += bias_gradient * bias_gradient
+        bias -= learning_rate * bias_gradient / (np.sqrt(bias_sq) + 1e-8)
+    return NgramModel(weights.astype(np.float32), bias, model_version, ngram_range)
+
+
+def evaluate(model: NgramModel, texts: list[str], labels: np.ndarray) -> dict[str, float]:
+    """しきい値 0.5 での正解率・適合率・再現率と AUC"""
+    probabilities = model.probabilities(texts)
+    predicted = probabilities >= 0.5
+    actual = labels > 0
+    true_positive = int((predicted & actual).sum())
+    # AUC: 正例のスコア順位の和から求める（同点は平均順位）
+    ranks = np.empty(len(probabilities))
+    order = np.argsort(probabilities, kind="stable")
+    ranks[order] = np.arange(1, len(probabilities) + 1)
+    _, inverse, counts = np.unique(probabilities, return_inverse=True, return_counts=True)
+    ranks = (np.bincount(inverse, weights=ranks) / counts)[inverse]
+    positives = int(actual.sum())
+    negatives = len(actual) - positives
+    auc = (
+        (ranks[actual].sum() - positives * (positives + 1) / 2) / (positives * negatives)
+        if positives and negatives else float("nan")
+    )
+    return {
+        "accuracy": float((predicted == actual).mean()) if len(actual) else float("nan"),
+        "precision": true_positive / max(int(predicted.sum()), 1),
+        "recall": true_positive / max(positives, 1),
+        "auc": float(auc),
+    }
+
+
+def save_model(model: NgramModel, output: str | Path) -> None:
+    """モデルファイルを原子的に書き出す。"""
+    encoded_version = model.model_version.encode("utf-8")
+    if len(encoded_version) > 32:
+        raise ValueError("model_version は UTF-8 で32バイト以内にしてください")
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, model.bits, model.ngram_range[0], model.ngram_range[1],
+        float(model.bias), encoded_version, int(time.time()),
+    ).ljust(HEADER_SIZE, b"\0")
+
+    output = Path(output)
+    fd, tmp_path = tempfile.mkstemp(dir=output.parent, prefix=output.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(np.asarray(model.weights, dtype="<f4").tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def default_model_version(texts: list[str], labels: np.ndarray) -> str:
+    """学習データから決まるモデルバージョン（日付＋データのハッシュ）"""
+    digest = hashlib.blake2b(digest_size=4)
+    for text, label in zip(texts, labels):
+        digest.update(f"{int(label)}\t{text}\n".encode("utf-8"))
+    return f"ngram-{time.strftime('%Y%m%d')}-{digest.hexdigest()}"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="ラベル付き JSONL から文字 n-gram 分類器の重みを学習する")
+    parser.add_argument("inputs", nargs="+", help="入力 JSONL（text, label）")
+    parser.add_argument("-o", "--output", required=True, help="出力モデルファイル")
+    parser.add_argument("--model-version", help="モデルバージョン（省略時は日付とデータのハッシュ）")
+    parser.add_argument("--bits", type=int, default=DEFAULT_BITS, help="ハッシュのビット数（重みは 2**bits 個）")
+    parser.add_argument("--max-n", type=int, default=DEFAULT_NGRAM_RANGE[1], choices=(1, 2, 3))
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--learning-rate", type=float, default=0.5)
+    parser.add_argument("--l2", type=float, default=1e-6, help="L2 正則化の係数")
+    parser.add_argument("--holdout", type=float, default=0.1, help="検証用に取り分ける割合")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    start = time.perf_counter()
+    texts, labels = read_labelled(args.inputs)
+    if not texts:
+        parser.error("学習データがありません")
+    order = np.random.default_rng(args.seed).permutation(len(texts))
+    held = order[: int(len(texts) * args.holdout)]
+    kept = order[len(held):]
+    train_texts = [texts[i] for i in kept]
+
+    model = train(
+        train_texts,
+        labels[kept],
+        args.model_version or default_model_version(texts, labels),
+        bits=args.bits,
+        ngram_range=(DEFAULT_NGRAM_RANGE[0], args.max_n),
+        epochs=args.epochs,
+        learning_rate=args.learning_rate,
+        l2=args.l2,
+    )
+    save_model(model, args.output)
+    logger.info(
+        "学習完了: %s (%s, 学習%d件, %.1f秒)",
+        args.output, model.model_version, len(kept), time.perf_counter() - start,
+    )
+    for name, index in (("学習", kept), ("検証", held)):
+        if len(index):
+            metrics = evaluate(model, [texts[i] for i in index], labels[index])
+            logger.info(
+                "%s: 正解率 %.3f 適合率 %.3f 再現率 %.3f AUC %.3f",
+                name, metrics["accuracy"], metrics["precision"], metrics["recall"], metrics["auc"],
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
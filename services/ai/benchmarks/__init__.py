@@ -0,0 +1,4 @@
+"""AI解析サービスのオフラインベンチマーク群
+
+各モジュールは ``python -m benchmarks.<name>`` で単体実行できます。
+"""
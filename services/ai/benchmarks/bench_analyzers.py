@@ -0,0 +1,218 @@
+"""解析器のマイクロベンチマーク: ops/sec・1呼び出しのレイテンシ分位点・ピークメモリ
+
+合成コーパス（``benchmarks.corpus``）の文書で各解析器を直接呼び出し、
+ルール変更による速度・メモリの劣化を検出します。結果キャッシュは使いません。
+
+- ops/sec と p50 / p95 / p99 は tracemalloc を止めた状態で計測
+- ピークメモリは別パスで tracemalloc を有効にし、1呼び出しあたりの最大増分を記録
+
+保存済みのベースライン（既定: ``benchmarks/baselines/analyzers.json``）と比較し、
+ops/sec が ``--tolerance`` を超えて低下したケース、またはピークメモリが
+``--alloc-tolerance`` を超えて増えたケースがあれば終了コード 1 を返します。
+速度はマシンに依存するため、ベースラインは比較に使うマシンで ``--update-baseline`` して作り直してください。
+
+    python -m benchmarks.bench_analyzers
+    python -m benchmarks.bench_analyzers --filter scam_analyzer --min-time 1
+    python -m benchmarks.bench_analyzers --update-baseline
+"""
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from app.services.dark_job_checker import DarkJobChecker
+from app.services.key_points import extract_key_points
+from app.services.metadata_analyzer import MetadataAnalyzer
+from app.services.ocr_service import OcrService
+from app.services.scam_analyzer import ScamAnalyzer
+from benchmarks.corpus import CorpusGenerator
+
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "analyzers.json"
+
+# 1ケースあたりの入力文書数（順に使い回す）
+POOL_SIZE = 32
+# ピークメモリを測る入力数
+ALLOC_SAMPLES = 8
+# ピークメモリの比較で無視する増分（小さなケースの揺らぎ対策）
+ALLOC_SLACK_BYTES = 4096
+
+
+@dataclass(frozen=True)
+class Case:
+    analyzer: str
+    kind: str
+    length: int
+    density: float
+
+    @property
+    def name(self) -> str:
+        return f"{self.analyzer}/{self.kind}-{self.length}-d{self.density:.2f}"
+
+
+CASES = [
+    Case("scam_analyzer", "transcript", 1000, 0.1),
+    Case("scam_analyzer", "transcript", 1000, 0.5),
+    Case("scam_analyzer", "transcript", 10000, 0.1),
+    Case("dark_job_checker", "job_post", 500, 0.1),
+    Case("dark_job_checker", "job_post", 500, 0.5),
+    Case("dark_job_checker", "job_post", 5000, 0.2),
+    Case("metadata_analyzer", "sms", 120, 0.2),
+    Case("metadata_analyzer", "sms", 400, 0.5),
+    Case("key_points", "transcript", 2000, 0.2),
+    Case("key_points", "transcript", 20000, 0.2),
+    Case("ocr_heuristic", "image", 64 * 1024, 0.2),
+    Case("ocr_heuristic", "image", 700 * 1024, 0.2),
+]
+
+PHONE_NUMBERS = ["090-1234-5678", "+1-876-555-0100", "非通知", "050-3123-4567", "0120-123-456"]
+
+
+def build_call(case: Case, seed: int) -> tuple[Callable[[Any], Any], list[Any]]:
+    """(1件を処理する関数, 入力のリスト) を返す。"""
+    generator = CorpusGenerator(seed)
+    if case.kind == "image":
+        inputs: list[Any] = [generator.image(case.length, case.density) for _ in range(POOL_SIZE)]
+    else:
+        inputs = [generator.generate(case.kind, case.length, case.density) for _ in range(POOL_SIZE)]
+
+    if case.analyzer == "scam_analyzer":
+        return ScamAnalyzer().analyze, inputs
+    if case.analyzer == "dark_job_checker":
+        return DarkJobChecker().check, inputs
+    if case.analyzer == "metadata_analyzer":
+        analyzer = MetadataAnalyzer()
+        items = [(PHONE_NUMBERS[i % len(PHONE_NUMBERS)], text) for i, text in enumerate(inputs)]
+        return lambda item: analyzer.analyze(item[0], "sms", item[1]), items
+    if case.analyzer == "key_points":
+        return extract_key_points, inputs
+    if case.analyzer == "ocr_heuristic":
+        return OcrService()._heuristic_extract, inputs
+    raise ValueError(f"unknown analyzer: {case.analyzer}")
+
+
+def measure(fn: Callable[[Any], Any], inputs: list[Any], min_time: float) -> dict:
+    """1ケースを計測し、ops/sec・分位点（マイクロ秒）・ピークメモリ（バイト）を返す。"""
+    for item in inputs:
+        fn(item)
+
+    timings: list[int] = []
+    clock = time.perf_counter_ns
+    deadline = clock() + int(min_time * 1e9)
+    while clock() < deadline or len(timings) < len(inputs):
+        for item in inputs:
+            start = clock()
+            fn(item)
+            timings.append(clock() - start)
+    timings.sort()
+
+    def percentile(q: float) -> float:
+        return timings[min(int(len(timings) * q), len(timings) - 1)] / 1000
+
+    tracemalloc.start()
+    peak_alloc = 0
+    try:
+        for item in inputs[:ALLOC_SAMPLES]:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            fn(item)
+            _, peak = tracemalloc.get_traced_memory()
+            peak_alloc = max(peak_alloc, peak - baseline)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ops_per_sec": round(len(timings) / (sum(timings) / 1e9), 1),
+        "p50_us": round(statistics.median(timings) / 1000, 2),
+        "p95_us": round(percentile(0.95), 2),
+        "p99_us": round(percentile(0.99), 2),
+        "peak_alloc_bytes": peak_alloc,
+    }
+
+
+def compare(
+    results: dict[str, dict],
+    baseline: dict[str, dict],
+    tolerance: float,
+    alloc_tolerance: float,
+) -> dict[str, list[str]]:
+    """ベースラインより劣化したケースと、その理由を返す。"""
+    regressions: dict[str, list[str]] = {}
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        reasons = []
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - tolerance):
+            reasons.append(f"ops/sec {base['ops_per_sec']:.0f} -> {result['ops_per_sec']:.0f}")
+        alloc_limit = base["peak_alloc_bytes"] * (1 + alloc_tolerance) + ALLOC_SLACK_BYTES
+        if result["peak_alloc_bytes"] > alloc_limit:
+            reasons.append(f"peak alloc {base['peak_alloc_bytes']} -> {result['peak_alloc_bytes']} B")
+        if reasons:
+            regressions[name] = reasons
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", default="", help="ケース名に含まれる文字列で絞り込む")
+    parser.add_argument("--min-time", type=float, default=0.5, help="1ケースあたりの最短計測時間（秒）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="計測結果でベースラインを書き換える")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="許容する ops/sec の低下率")
+    parser.add_argument("--alloc-tolerance", type=float, default=0.1, help="許容するピークメモリの増加率")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    baseline_cases = {}
+    if args.baseline.exists():
+        baseline_cases = json.loads(args.baseline.read_text(encoding="utf-8"))["cases"]
+
+    results: dict[str, dict] = {}
+    print(f"{'case':<42} {'ops/sec':>10} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'peak KB':>9} {'vs base':>8}")
+    for case in CASES:
+        if args.filter not in case.name:
+            continue
+        fn, inputs = build_call(case, args.seed)
+        result = results[case.name] = measure(fn, inputs, args.min_time)
+        base = baseline_cases.get(case.name)
+        delta = f"{result['ops_per_sec'] / base['ops_per_sec'] - 1:>+8.0%}" if base else f"{'-':>8}"
+        print(
+            f"{case.name:<42} {result['ops_per_sec']:>10.0f} {result['p50_us']:>9.1f} "
+            f"{result['p95_us']:>9.1f} {result['p99_us']:>9.1f} "
+            f"{result['peak_alloc_bytes'] / 1024:>9.1f} {delta}"
+        )
+
+    if args.update_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        document = {
+            "meta": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "seed": args.seed,
+                "min_time": args.min_time,
+            },
+            "cases": {**baseline_cases, **results},
+        }
+        args.baseline.write_text(json.dumps(document, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"baseline updated: {args.baseline}")
+        return
+
+    regressions = compare(results, baseline_cases, args.tolerance, args.alloc_tolerance)
+    for name, reasons in regressions.items():
+        print(f"REGRESSION {name}: {'; '.join(reasons)}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
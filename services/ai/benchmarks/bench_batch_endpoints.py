@@ -0,0 +1,86 @@
+"""単件エンドポイントとバッチエンドポイントのスループット比較
+
+アプリをインプロセスの ASGI トランスポートで呼び出し、同じメッセージ群を
+単件 API で1件ずつ送った場合と ``:batch`` API でまとめて送った場合の
+メッセージ/秒を比較します。
+
+    python -m benchmarks.bench_batch_endpoints --messages 2048 --batch-size 256
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+
+from app.main import app
+from app.services.dark_job_checker import KEYWORD_MATCHER as DARK_JOB_MATCHER
+from app.services.scam_analyzer import KEYWORD_MATCHER as SCAM_MATCHER
+
+FILLER = [
+    "お世話になっております。",
+    "明日の予定を確認させてください。",
+    "詳しくはこちらをご覧ください。",
+    "よろしくお願いいたします。",
+]
+
+
+def make_messages(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    vocabulary = list(SCAM_MATCHER.keywords) + list(DARK_JOB_MATCHER.keywords)
+    messages = []
+    for _ in range(count):
+        parts = [rng.choice(FILLER) for _ in range(rng.randint(3, 8))]
+        parts += [rng.choice(vocabulary) for _ in range(rng.randint(0, 3))]
+        rng.shuffle(parts)
+        messages.append("".join(parts))
+    return messages
+
+
+ENDPOINTS = {
+    "conversation": ("/api/v1/analyze/conversation", lambda m: {"text": m}),
+    "dark-job": ("/api/v1/check/dark-job", lambda m: {"text": m}),
+    "call-metadata": (
+        "/api/v1/analyze/call-metadata",
+        lambda m: {"phone_number": "050-1234-5678", "call_type": "sms", "sms_content": m},
+    ),
+}
+
+
+async def run(messages: list[str], batch_size: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'endpoint':>14} {'single msg/s':>13} {'batch msg/s':>12} {'speedup':>8}")
+        for name, (path, payload) in ENDPOINTS.items():
+            start = time.perf_counter()
+            for message in messages:
+                res = await client.post(path, json=payload(message))
+                res.raise_for_status()
+            single = len(messages) / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for i in range(0, len(messages), batch_size):
+                chunk = messages[i:i + batch_size]
+                res = await client.post(f"{path}:batch", json={"items": [payload(m) for m in chunk]})
+                res.raise_for_status()
+            batch = len(messages) / (time.perf_counter() - start)
+
+            print(f"{name:>14} {single:>13.0f} {batch:>12.0f} {batch / single:>7.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2048)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # リクエストごとのアクセスログは計測のノイズになるため抑止
+    logging.disable(logging.INFO)
+    asyncio.run(run(make_messages(args.messages, args.seed), args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""一括採点 CLI ベンチマーク: ワーカー数ごとのスループットと親プロセスのメモリ
+
+合成コーパス（通話トランスクリプト、3件に1件は SMS のメタデータ付き）を gzip 圧縮の JSONL に書き出し、
+``app.tools.bulk_score`` を ``--workers`` の各値で実行して、件数/秒・1ワーカー比の速度・
+親プロセスの最大 RSS の増分を表示します。0 は同じプロセスで実行する場合です。
+速度の伸びはマシンの CPU 数が上限になります。
+
+    python -m benchmarks.bench_bulk_score
+    python -m benchmarks.bench_bulk_score --records 200000 --workers 0,1,2,4,8 --chunk-size 512
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import random
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from app.tools.bulk_score import ScoreOptions, bulk_score
+from benchmarks.corpus import CorpusGenerator
+
+
+def write_corpus(path: Path, count: int, seed: int) -> None:
+    rng = random.Random(seed)
+    generator = CorpusGenerator(seed)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for i in range(count):
+            record = {"id": i, "text": generator.generate("transcript", rng.randint(100, 2000), 0.2)}
+            if i % 3 == 0:
+                record.update(caller_number="09012345678", call_type="sms", sms_content=record["text"][:200])
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--workers", default="0,1,2,4", help="計測するワーカー数（カンマ区切り）")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "events.jsonl.gz"
+        write_corpus(source, args.records, args.seed)
+        print(f"input: {args.records} records, {source.stat().st_size / 1e6:.1f} MB gzip")
+        baseline = None
+        for workers in (int(w) for w in args.workers.split(",")):
+            output = Path(tmp) / f"scores-{workers}.jsonl"
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            start = time.perf_counter()
+            bulk_score(source, output, ScoreOptions(), workers=workers, chunk_size=args.chunk_size)
+            elapsed = time.perf_counter() - start
+            rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+            rate = args.records / elapsed
+            if workers == 1:
+                baseline = rate
+            speedup = f" x{rate / baseline:.2f}" if baseline and workers >= 1 else ""
+            print(
+                f"workers={workers}: {rate:,.0f} records/s ({elapsed:.1f}s){speedup}"
+                f" parent max RSS +{rss_growth / 1024:.0f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""しきい値較正ベンチマーク: ヒット行列の配列演算と解析器の再実行の比較
+
+合成コーパス（通話トランスクリプト・求人文、半数は詐欺・闇バイトのキーワードを多めに含む）で、
+``app.tools.calibrate_thresholds`` の照合（1回だけ）と設定の全組み合わせの評価にかかる時間を表示し、
+同じ件数を解析器のバッチ解析で1回採点する時間から「設定ごとに解析器を再実行した場合」の時間を見積もります。
+
+    python -m benchmarks.bench_calibration
+    python -m benchmarks.bench_calibration --records 50000 --deltas=-10,0,10 --analyzer dark_job
+"""
+
+import argparse
+import logging
+import random
+import time
+
+from app.services.dark_job_checker import DarkJobChecker
+from app.services.rule_bundle import BUILTIN_RULES
+from app.services.scam_analyzer import ScamAnalyzer
+from app.tools.calibrate_thresholds import analyzer_spec, calibrate, extract_features
+from benchmarks.corpus import CorpusGenerator
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--analyzer", choices=("conversation", "dark_job"), default="conversation")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--chars", type=int, default=300)
+    parser.add_argument("--deltas", default="-10,0,10", help="各重みに足して試す値（カンマ区切り）")
+    parser.add_argument("--grey-zones", default="15-50,20-55,25-60", help="dark_job で試すグレーゾーン")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    rng = random.Random(args.seed)
+    generator = CorpusGenerator(args.seed)
+    kind = "transcript" if args.analyzer == "conversation" else "job_post"
+    records = []
+    for i in range(args.records):
+        label = i % 2
+        text = generator.generate(kind, rng.randint(args.chars // 2, args.chars * 2), 0.3 if label else 0.02)
+        records.append({"text": text, "label": label, "type": ""})
+
+    start = time.perf_counter()
+    features = extract_features(args.analyzer, records, BUILTIN_RULES)
+    extract_elapsed = time.perf_counter() - start
+
+    deltas = [int(d) for d in args.deltas.split(",")]
+    zones = [tuple(int(b) for b in zone.split("-")) for zone in args.grey_zones.split(",")]
+    spec = analyzer_spec(args.analyzer, BUILTIN_RULES)
+    start = time.perf_counter()
+    report = calibrate(
+        args.analyzer,
+        features,
+        spec,
+        deltas=deltas,
+        grey_zones=zones if args.analyzer == "dark_job" else (),
+        max_combinations=10**7,
+    )
+    sweep_elapsed = time.perf_counter() - start
+
+    texts = [record["text"] for record in records]
+    start = time.perf_counter()
+    if args.analyzer == "conversation":
+        ScamAnalyzer(rules=lambda: BUILTIN_RULES.scam).analyze_batch(texts)
+    else:
+        DarkJobChecker(rules=lambda: BUILTIN_RULES.dark_job).check_batch(texts)
+    analyzer_elapsed = time.perf_counter() - start
+
+    combinations = report["combinations"]
+    print(f"{args.analyzer}: {args.records} records, {combinations} settings x 101 thresholds")
+    print(f"extract (once):  {extract_elapsed:.2f}s")
+    print(
+        f"sweep:           {sweep_elapsed:.2f}s"
+        f" ({combinations * args.records / sweep_elapsed / 1e6:.1f}M item-settings/s)"
+    )
+    print(
+        f"re-run analyzer: {analyzer_elapsed:.2f}s per setting,"
+        f" ~{analyzer_elapsed * combinations:.0f}s for all settings"
+    )
+    best = report["top"][0]
+    print(f"best F1 {best['f1']:.3f} at >= {best['threshold']} (current {report['current']['best']['f1']:.3f})")
+
+
+if __name__ == "__main__":
+    main()
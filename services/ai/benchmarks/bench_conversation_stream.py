@@ -0,0 +1,60 @@
+"""ストリーミング解析ベンチマーク: 全文再解析と逐次セッションの比較
+
+通話の文字起こしをチャンク単位で追加していき、会話が長くなるにつれて
+1チャンクあたりの処理時間がどう変わるかを計測します。
+全文再解析は会話長に比例して遅くなり、逐次セッションはほぼ一定になります。
+
+    python -m benchmarks.bench_conversation_stream
+"""
+
+import argparse
+import random
+import time
+
+from app.services.conversation_stream import ConversationStreamSession
+from app.services.scam_analyzer import KEYWORD_MATCHER, ScamAnalyzer
+
+FILLER = ["もしもし、", "はい、そうです。", "ええと、", "少々お待ちください。", "わかりました。\n"]
+
+
+def make_chunks(count: int, size: int, rng: random.Random) -> list[str]:
+    vocabulary = FILLER * 20 + list(KEYWORD_MATCHER.keywords)
+    text = "".join(rng.choice(vocabulary) for _ in range(count * size // 4))
+    return [text[i:i + size] for i in range(0, count * size, size)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000, help="1通話あたりのチャンク数")
+    parser.add_argument("--chunk-size", type=int, default=40, help="1チャンクの文字数")
+    parser.add_argument("--report-every", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks, args.chunk_size, random.Random(args.seed))
+    analyzer = ScamAnalyzer()
+    session = ConversationStreamSession(threshold=101)
+    transcript = ""
+
+    print(f"{'chars':>8} {'stream us/chunk':>16} {'full us/chunk':>14}")
+    stream_total = full_total = 0.0
+    for i, chunk in enumerate(chunks, 1):
+        start = time.perf_counter()
+        session.feed(chunk)
+        stream_total += time.perf_counter() - start
+
+        start = time.perf_counter()
+        transcript += chunk
+        analyzer.analyze(transcript)
+        full_total += time.perf_counter() - start
+
+        if i % args.report_every == 0:
+            n = args.report_every
+            print(f"{session.chars:>8} {stream_total / n * 1e6:>16.1f} {full_total / n * 1e6:>14.1f}")
+            stream_total = full_total = 0.0
+
+    assert session.risk_score == analyzer.analyze(transcript)["risk_score"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""実行プールの分離効果: 大きな画像のOCR中に会話チェックがどれだけ待たされるか
+
+会話チェックを一定間隔で送り続けながら、大きな画像の OCR リクエストを並行して流し、
+会話チェックのレイテンシ分布を比較します。``--inline`` を付けると
+解析・OCR をイベントループ上で直接実行する従来の動作を再現します。
+
+    python -m benchmarks.bench_executor_isolation
+    python -m benchmarks.bench_executor_isolation --inline
+"""
+
+import argparse
+import asyncio
+import base64
+import logging
+import random
+import statistics
+import time
+
+import httpx
+
+from app.main import app
+from app.routers import coalescing
+
+
+async def _inline(pool, fn, *args):
+    return fn(*args)
+
+
+def make_image(size: int, seed: int) -> str:
+    """テキスト断片を埋め込んだ擬似画像（Base64）"""
+    rng = random.Random(seed)
+    chunks = []
+    while sum(len(c) for c in chunks) < size:
+        chunks.append(rng.randbytes(256))
+        chunks.append("日給10万の高額バイト、Telegramで連絡".encode())
+    return base64.b64encode(b"".join(chunks)[:size]).decode()
+
+
+async def run(args: argparse.Namespace) -> None:
+    image = make_image(args.image_kb * 1024, args.seed)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        stop = asyncio.Event()
+
+        async def images():
+            sent = 0
+            while not stop.is_set():
+                # 同じ画像が合流しないよう末尾を変える
+                payload = {"image_base64": image[:-8] + base64.b64encode(sent.to_bytes(6, "big")).decode()}
+                await client.post("/api/v1/check/dark-job-image", json=payload)
+                sent += 1
+            return sent
+
+        image_tasks = [asyncio.ensure_future(images()) for _ in range(args.image_clients)]
+        latencies = []
+        for i in range(args.checks):
+            start = time.perf_counter()
+            res = await client.post("/api/v1/analyze/quick-check", json={"text": f"還付金の手続き {i}"})
+            res.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(args.interval_ms / 1000)
+        stop.set()
+        processed = sum(await asyncio.gather(*image_tasks))
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"mode={'inline' if args.inline else 'executor'} images={processed} ({args.image_kb} KB each)")
+    print(
+        f"quick-check latency ms: p50={statistics.median(latencies):.1f} "
+        f"p95={p95:.1f} max={latencies[-1]:.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--inline", action="store_true", help="イベントループ上で直接実行する")
+    parser.add_argument("--checks", type=int, default=200)
+    parser.add_argument("--interval-ms", type=float, default=5)
+    parser.add_argument("--image-kb", type=int, default=700)
+    parser.add_argument("--image-clients", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    if args.inline:
+        coalescing.run_in_pool = _inline
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""画像チェックの1リクエストあたりピークメモリ: Base64 JSON とバイナリアップロードの比較
+
+同じ画像を ``/check/dark-job-image``（Base64 を JSON に埋め込む）と
+``/check/dark-job-image/upload``（生バイト・multipart）に送り、
+tracemalloc でリクエスト処理中の Python ヒープのピーク増分を測ります。
+OCR のメモリも数えるため、計測中は OCR をプロセス内のスレッドプールで実行します。
+``--receive-only`` では OCR を画像の長さを数えるだけの処理に置き換え、受信・デコード段階の
+コピーだけを比較します。
+
+    python -m benchmarks.bench_image_upload_memory --sizes 256,700,4096
+    python -m benchmarks.bench_image_upload_memory --receive-only
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import random
+import tracemalloc
+
+import httpx
+
+from app.main import MAX_REQUEST_SIZE, app
+from app.services import executor as executor_module
+from app.services.executor import ExecutorPool
+from app.services.ocr_service import OcrService
+
+BOUNDARY = "bench-boundary"
+
+
+def make_image(size: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    marker = "日給10万の高額バイト、Telegramで連絡".encode()
+    body = bytearray()
+    while len(body) < size:
+        body += rng.randbytes(4096) + marker
+    return bytes(body[:size])
+
+
+def multipart_body(image: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="image"; filename="screenshot.png"\r\n'
+        "Content-Type: image/png\r\n\r\n"
+    ).encode() + image + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def measure(client: httpx.AsyncClient, path: str, body: bytes, content_type: str) -> tuple[int, int]:
+    """(ステータス, ピーク増分バイト) を返す。"""
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    res = await client.post(path, content=body, headers={"Content-Type": content_type})
+    _, peak = tracemalloc.get_traced_memory()
+    return res.status_code, peak - baseline
+
+
+async def run(sizes: list[int], seed: int) -> None:
+    executor_module._pools["ocr"] = ExecutorPool("ocr", "thread", workers=1, queue_size=4)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        print(f"{'image KB':>9} {'path':>22} {'status':>6} {'peak MB':>8} {'x image':>8}")
+        for size_kb in sizes:
+            image = make_image(size_kb * 1024, seed)
+            cases = [
+                (
+                    "base64 JSON",
+                    "/api/v1/check/dark-job-image",
+                    json.dumps({"image_base64": base64.b64encode(image).decode()}).encode(),
+                    "application/json",
+                ),
+                ("upload (raw)", "/api/v1/check/dark-job-image/upload", image, "image/png"),
+                (
+                    "upload (multipart)",
+                    "/api/v1/check/dark-job-image/upload",
+                    multipart_body(image),
+                    f"multipart/form-data; boundary={BOUNDARY}",
+                ),
+            ]
+            for name, path, body, content_type in cases:
+                if name == "base64 JSON" and len(body) > MAX_REQUEST_SIZE:
+                    print(f"{size_kb:>9} {name:>22} {'413':>6} {'-':>8} {'-':>8}  (1MB JSON limit)")
+                    continue
+                status, peak = await measure(client, path, body, content_type)
+                print(
+                    f"{size_kb:>9} {name:>22} {status:>6} {peak / 1e6:>8.2f} {peak / len(image):>8.2f}"
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="256,700,4096", help="画像サイズ（KB、カンマ区切り）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--receive-only", action="store_true", help="OCR を除いた受信段階のみ比較する")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    if args.receive_only:
+        OcrService.extract_text_from_bytes = lambda self, data: f"{len(data)}バイトの画像"
+    tracemalloc.start()
+    asyncio.run(run([int(s) for s in args.sizes.split(",")], args.seed))
+
+
+if __name__ == "__main__":
+    main()
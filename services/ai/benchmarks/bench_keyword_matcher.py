@@ -0,0 +1,101 @@
+"""キーワード照合ベンチマーク: 逐次 ``kw in text`` と Aho-Corasick の比較
+
+トランスクリプト長（1KB / 10KB / 100KB）とキーワード辞書サイズを変化させ、
+1リクエストあたりの照合時間とスループットを表示します。
+
+    python -m benchmarks.bench_keyword_matcher
+"""
+
+import argparse
+import random
+import time
+
+from app.services.keyword_matcher import KeywordMatcher
+from app.services.scam_analyzer import SCAM_PATTERNS, URGENCY_KEYWORDS
+
+BASE_KEYWORDS = [kw for _, keywords, _ in SCAM_PATTERNS for kw in keywords] + URGENCY_KEYWORDS
+
+# 会話らしさを出すための平文フレーズ（キーワードは低頻度で混ぜる）
+FILLER_SENTENCES = [
+    "お母さん、元気にしてる？",
+    "今日は天気がいいから散歩に行こうと思う。",
+    "最近は腰の調子もだいぶ良くなってきたよ。",
+    "孫の運動会はいつだったかしら。",
+    "夕飯は何にしようか迷っているところです。",
+    "病院の予約は来週の火曜日にしておいたからね。",
+]
+
+KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+KANJI = "金口座振込銀行詐欺警察役所電話番号手続期限支払請求保険年金投資配当通貨暗証"
+
+
+def make_transcript(size: int, rng: random.Random) -> str:
+    """指定文字数の疑似トランスクリプトを生成する。"""
+    parts: list[str] = []
+    length = 0
+    while length < size:
+        if rng.random() < 0.1:
+            piece = rng.choice(BASE_KEYWORDS) + "。"
+        else:
+            piece = rng.choice(FILLER_SENTENCES)
+        parts.append(piece)
+        length += len(piece)
+    return "".join(parts)[:size]
+
+
+def make_keywords(multiplier: int, rng: random.Random) -> list[str]:
+    """実キーワードに合成キーワードを足して辞書サイズを multiplier 倍にする。"""
+    keywords = list(BASE_KEYWORDS)
+    alphabet = KANA + KANJI
+    while len(keywords) < len(BASE_KEYWORDS) * multiplier:
+        keywords.append("".join(rng.choice(alphabet) for _ in range(rng.randint(3, 7))))
+    return keywords
+
+
+def naive_find_all(keywords: list[str], text: str) -> set[str]:
+    return {kw for kw in keywords if kw in text}
+
+
+def measure(fn, *args, min_time: float = 0.2) -> float:
+    """1回あたりの平均実行時間（秒）を返す。"""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        fn(*args)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="トランスクリプト長（文字数, カンマ区切り）")
+    parser.add_argument("--multipliers", default="1,10,100", help="辞書サイズの倍率（カンマ区切り）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-time", type=float, default=0.2, help="1計測あたりの最短計測時間（秒）")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sizes = [int(s) for s in args.sizes.split(",")]
+    multipliers = [int(m) for m in args.multipliers.split(",")]
+
+    print(f"{'keywords':>8} {'states':>7} {'text':>7} {'naive us':>11} {'ac us':>11} {'naive MB/s':>11} {'ac MB/s':>9}")
+    for multiplier in multipliers:
+        keywords = make_keywords(multiplier, rng)
+        matcher = KeywordMatcher(keywords)
+        for size in sizes:
+            text = make_transcript(size, rng)
+            assert matcher.find_all(text) == naive_find_all(keywords, text)
+            naive = measure(naive_find_all, keywords, text, min_time=args.min_time)
+            ac = measure(matcher.find_all, text, min_time=args.min_time)
+            mbytes = len(text.encode("utf-8")) / 1e6
+            print(
+                f"{len(keywords):>8} {matcher.state_count:>7} {size:>7} "
+                f"{naive * 1e6:>11.1f} {ac * 1e6:>11.1f} "
+                f"{mbytes / naive:>11.1f} {mbytes / ac:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""グレーゾーン LLM 問い合わせのマイクロバッチ: 窓の長さごとの問い合わせ回数・待ち時間
+
+偽 LLM サーバー（1回あたりの固定遅延 + 1件ごとの追加遅延、同時処理数の上限あり）に
+グレーゾーンの件を一定のペース（ポアソン到着）で送り、窓の長さごとに
+問い合わせ回数・1回あたりの件数・窓で待った時間・判定までの時間・フォールバック率を比べます。
+窓 0 はまとめない従来の動作です。
+
+    python -m benchmarks.bench_llm_batching
+    python -m benchmarks.bench_llm_batching --rate 400 --windows 0,0.005,0.02 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+
+import httpx
+from prometheus_client import REGISTRY
+
+from app.services.llm_client import CircuitBreaker, LlmClient
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.fake_llm import FakeLlmConfig, create_app
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def _wait_totals() -> tuple[float, float]:
+    return (
+        REGISTRY.get_sample_value("llm_batch_wait_seconds_sum") or 0.0,
+        REGISTRY.get_sample_value("llm_batch_wait_seconds_count") or 0.0,
+    )
+
+
+async def run_window(args: argparse.Namespace, texts: list[str], window: float) -> dict:
+    fake = create_app(FakeLlmConfig(
+        latency=args.latency,
+        item_latency=args.item_latency,
+        concurrency=args.concurrency,
+        seed=args.seed,
+    ))
+    client = LlmClient(
+        "http://fake-llm",
+        "fake-model",
+        timeout=args.budget,
+        # ヘッジは窓の比較を分かりにくくするため使わない
+        max_attempts=1,
+        breaker=CircuitBreaker(failure_threshold=10**9, reset_timeout=1.0),
+        batch_window=window,
+        batch_max_size=args.max_size,
+        transport=httpx.ASGITransport(app=fake),
+    )
+    rng = random.Random(args.seed)
+    wait_sum, wait_count = _wait_totals()
+    latencies: list[float] = []
+    fallbacks = 0
+
+    async def one(text: str) -> None:
+        nonlocal fallbacks
+        start = time.monotonic()
+        score = await client.grey_zone_score(text, 30, deadline=start + args.budget)
+        latencies.append((time.monotonic() - start) * 1000)
+        if score is None:
+            fallbacks += 1
+
+    tasks = []
+    for i in range(args.items):
+        tasks.append(asyncio.create_task(one(texts[i % len(texts)])))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*tasks)
+    await client.aclose()
+
+    new_sum, new_count = _wait_totals()
+    sizes = fake.state.batch_sizes
+    return {
+        "window": window,
+        "calls": fake.state.requests,
+        "mean_size": statistics.fmean(sizes),
+        "max_size": max(sizes),
+        "wait_ms": (new_sum - wait_sum) / (new_count - wait_count) * 1000 if new_count > wait_count else 0.0,
+        "p50": _percentile(latencies, 0.5),
+        "p99": _percentile(latencies, 0.99),
+        "fallback": fallbacks / len(latencies),
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    generator = CorpusGenerator(args.seed)
+    texts = [generator.generate("job_post", 300, 0.1) for _ in range(200)]
+    windows = [float(w) for w in args.windows.split(",")]
+    print(
+        f"rate={args.rate}/s items={args.items} backend={args.latency * 1000:.0f}ms"
+        f"+{args.item_latency * 1000:.1f}ms/件 concurrency={args.concurrency or '∞'} budget={args.budget * 1000:.0f}ms"
+    )
+    print(f"{'window':>8} {'calls':>6} {'size':>6} {'max':>4} {'wait':>8} {'p50':>8} {'p99':>8} {'fallback':>9}")
+    for window in windows:
+        r = await run_window(args, texts, window)
+        print(
+            f"{r['window'] * 1000:6.1f}ms {r['calls']:6d} {r['mean_size']:6.1f} {r['max_size']:4d}"
+            f" {r['wait_ms']:6.1f}ms {r['p50']:6.1f}ms {r['p99']:6.1f}ms {r['fallback']:8.1%}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=300.0, help="グレーゾーンの件の到着レート（件/秒）")
+    parser.add_argument("--items", type=int, default=1500)
+    parser.add_argument("--windows", default="0,0.002,0.005,0.01,0.02", help="比べる窓の長さ（秒、カンマ区切り）")
+    parser.add_argument("--max-size", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.04, help="偽 LLM の1回あたりの遅延（秒）")
+    parser.add_argument("--item-latency", type=float, default=0.001, help="偽 LLM の1件ごとの追加遅延（秒）")
+    parser.add_argument("--concurrency", type=int, default=8, help="偽 LLM の同時処理数（0 で無制限）")
+    parser.add_argument("--budget", type=float, default=0.4, help="1件あたりの期限（秒）")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""ミドルウェアのオーバーヘッド: quick-check の毎秒リクエスト数
+
+アプリをインプロセスの ASGI トランスポートで呼び出し、``/api/v1/analyze/quick-check`` を
+並行クライアントで送り続けたときの毎秒リクエスト数とレイテンシを測ります。
+``--legacy`` を付けると、相関ID・サイズ制限・セキュリティヘッダー・メトリクス・
+リクエストログを BaseHTTPMiddleware 5層で処理していた従来の構成を再現します。
+
+    python -m benchmarks.bench_middleware
+    python -m benchmarks.bench_middleware --legacy
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+import uuid
+
+import httpx
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+from app.main import (
+    MAX_REQUEST_SIZE,
+    SECURITY_HEADERS,
+    RequestContextMiddleware,
+    app,
+    http_request_duration_seconds,
+    http_requests_total,
+    logger,
+)
+
+
+class _LegacyLogging(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        start = time.time()
+        response = await call_next(request)
+        logger.info(
+            "request completed",
+            extra={
+                "method": request.method,
+                "path": request.url.path,
+                "status_code": response.status_code,
+                "duration_ms": round((time.time() - start) * 1000, 2),
+                "request_id": getattr(request.state, "request_id", "-"),
+            },
+        )
+        return response
+
+
+class _LegacyMetrics(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        start = time.time()
+        response = await call_next(request)
+        path = request.url.path
+        http_requests_total.labels(
+            method=request.method, path=path, status_code=response.status_code
+        ).inc()
+        http_request_duration_seconds.labels(method=request.method, path=path).observe(
+            time.time() - start
+        )
+        return response
+
+
+class _LegacySecurityHeaders(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        for name, value in SECURITY_HEADERS:
+            response.headers[name.decode()] = value.decode()
+        return response
+
+
+class _LegacySizeLimit(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        content_length = request.headers.get("content-length")
+        if content_length and int(content_length) > MAX_REQUEST_SIZE:
+            return JSONResponse(status_code=413, content={"detail": "too large"})
+        return await call_next(request)
+
+
+class _LegacyCorrelationId(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        request_id = request.headers.get("x-request-id") or str(uuid.uuid4())
+        request.state.request_id = request_id
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+
+def use_legacy_stack() -> None:
+    """RequestContextMiddleware を従来の5層に置き換える（最初のリクエスト前に呼ぶ）。"""
+    legacy = [
+        Middleware(cls)
+        for cls in (_LegacyCorrelationId, _LegacySizeLimit, _LegacySecurityHeaders, _LegacyMetrics, _LegacyLogging)
+    ]
+    index = next(i for i, m in enumerate(app.user_middleware) if m.cls is RequestContextMiddleware)
+    app.user_middleware[index:index + 1] = legacy
+    app.middleware_stack = None
+
+
+async def run(args: argparse.Namespace) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # 解析結果はキャッシュに載り、計測の大半はミドルウェアとルーティングの処理になる
+        payload = {"text": "還付金の手続きでATMに行ってください"}
+        for _ in range(100):
+            (await client.post("/api/v1/analyze/quick-check", json=payload)).raise_for_status()
+
+        latencies: list[float] = []
+
+        async def worker(count: int) -> None:
+            for _ in range(count):
+                start = time.perf_counter()
+                res = await client.post("/api/v1/analyze/quick-check", json=payload)
+                res.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        per_client = args.requests // args.concurrency
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(per_client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"middleware={'legacy (5x BaseHTTPMiddleware)' if args.legacy else 'RequestContextMiddleware'}")
+    print(
+        f"requests={len(latencies)} concurrency={args.concurrency} "
+        f"rps={len(latencies) / elapsed:.0f} p50={statistics.median(latencies):.2f}ms p99={p99:.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--legacy", action="store_true", help="BaseHTTPMiddleware 5層の従来構成で計測する")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    if args.legacy:
+        use_legacy_stack()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
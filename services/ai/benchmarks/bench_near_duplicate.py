@@ -0,0 +1,157 @@
+"""ほぼ同じ本文の判定キャッシュ: 距離の上限ごとのヒット率と誤った使い回しの割合
+
+ラベル付きの合成コーパスを作り、本文を順に ``NearDuplicateCache`` に通します。
+
+- キャンペーン: 本文の雛形1つに URL・電話番号・宛名・金額を差し込んだ複数の文面
+  （一部は1文を言い換える・行を落とすなどの小さな編集を加える）
+- 紛らわしい別キャンペーン: 同じ雛形に1文だけ足したもの（ラベルは別）
+
+``DarkJobChecker`` と同じく、ルールスコアが登録時と同じ場合だけ使い回します。
+使い回さなかった本文は登録し、使い回した本文は登録元のキャンペーンと比べます。
+別キャンペーンの判定を使い回した割合を「誤った使い回し」、そのうち偽 LLM のスコア
+（``benchmarks.fake_llm.fake_score``）によるリスクレベルが変わってしまう割合を「判定の変化」として
+距離の上限ごとに表示します。``--no-rule-guard`` でルールスコアの照合を省いた場合と比べられます。
+
+    python -m benchmarks.bench_near_duplicate
+    python -m benchmarks.bench_near_duplicate --campaigns 200 --copies 30 --distances 0,2,3,4,6
+"""
+
+import argparse
+import logging
+import random
+import time
+
+from app.services.dark_job_checker import RISK_THRESHOLDS, DarkJobChecker
+from app.services.near_duplicate import NearDuplicateCache, simhash
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.fake_llm import fake_score
+
+SLOT_LINES = [
+    "詳細は {url} からご確認ください。{name}様専用の案内です。",
+    "担当の{name}さんまでお電話ください（{phone}）。報酬は{amount}円です。",
+    "{name}様、本日中に {url} へ。お問い合わせ: {phone}",
+    "報酬{amount}円、即日お支払い。連絡先 {phone}",
+]
+SWAP_LINES = [
+    "・荷物を受け取るだけの簡単なお仕事です。",
+    "・交通費は規定により支給します。",
+    "・身分証を送ってください。",
+    "・シフトは週2日から相談可能です。",
+    "・受け子の経験がある方歓迎。",
+    "・社会保険完備、有給休暇あり。",
+]
+NAMES = ["田中", "佐藤", "鈴木", "高橋", "伊藤", "ワタナベ", "山本", "中村"]
+TLDS = ["xyz", "top", "click", "info", "com"]
+
+
+def _risk_level(score: int) -> str:
+    if score >= RISK_THRESHOLDS["high"]:
+        return "high"
+    if score >= RISK_THRESHOLDS["medium"]:
+        return "medium"
+    return "low"
+
+
+class LabelledCorpus:
+    """キャンペーン ID 付きの文面を作る"""
+
+    def __init__(self, seed: int) -> None:
+        self.rng = random.Random(seed)
+        self.generator = CorpusGenerator(seed)
+
+    def build(self, campaigns: int, copies: int, edit_rate: float) -> list[tuple[int, str]]:
+        templates: list[list[str]] = []
+        for _ in range(campaigns // 2):
+            kind = self.rng.choice(["sms", "job_post"])
+            lines = self.generator.generate(kind, self.rng.randint(80, 240), 0.3).split("\n")
+            lines.insert(self.rng.randrange(len(lines) + 1), self.rng.choice(SLOT_LINES))
+            templates.append(lines)
+            # 1文だけ足した紛らわしい別キャンペーン
+            sibling = list(lines)
+            sibling.insert(self.rng.randrange(len(sibling) + 1), self.rng.choice(SWAP_LINES))
+            templates.append(sibling)
+
+        messages = []
+        for campaign, lines in enumerate(templates):
+            for _ in range(copies):
+                copy = list(lines)
+                if self.rng.random() < edit_rate and len(copy) > 2:
+                    self._edit(copy)
+                messages.append((campaign, self._fill("\n".join(copy))))
+        self.rng.shuffle(messages)
+        return messages
+
+    def _edit(self, lines: list[str]) -> None:
+        if self.rng.random() < 0.5:
+            del lines[self.rng.randrange(len(lines))]
+        else:
+            i = self.rng.randrange(len(lines))
+            lines[i] = lines[i].replace("。", "！", 1) + self.rng.choice(["", "✨", "（再送）"])
+
+    def _fill(self, text: str) -> str:
+        rng = self.rng
+        phone = f"0{rng.choice('789')}0-{rng.randrange(10**4):04d}-{rng.randrange(10**4):04d}"
+        url = f"https://{rng.randbytes(3).hex()}.{rng.choice(TLDS)}/{rng.randbytes(4).hex()}"
+        return text.format(
+            url=url, phone=phone, name=rng.choice(NAMES), amount=f"{rng.randint(1, 30) * 10000:,}",
+        )
+
+
+def run(messages: list[tuple[int, str, int]], max_distance: int, max_entries: int, rule_guard: bool) -> dict:
+    cache = NearDuplicateCache("bench", max_entries=max_entries, ttl=3600, max_distance=max_distance)
+    hits = cross = flips = 0
+    elapsed = 0.0
+    for campaign, text, rule_score in messages:
+        start = time.perf_counter()
+        fingerprint = simhash(text)
+        cached = cache.get_fingerprint("v1", fingerprint)
+        elapsed += time.perf_counter() - start
+        if cached is None or (rule_guard and cached[1] != rule_score):
+            cache.put_fingerprint("v1", fingerprint, [campaign, rule_score, fake_score(text)])
+            continue
+        hits += 1
+        source, _, score = cached
+        if source != campaign:
+            cross += 1
+            if _risk_level(score) != _risk_level(fake_score(text)):
+                flips += 1
+    return {
+        "hit_rate": hits / len(messages),
+        "false_reuse": cross / hits if hits else 0.0,
+        "flips": flips / hits if hits else 0.0,
+        "entries": len(cache),
+        "lookup_us": elapsed / len(messages) * 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--campaigns", type=int, default=100, help="キャンペーン数（半数は紛らわしい別キャンペーン）")
+    parser.add_argument("--copies", type=int, default=20, help="キャンペーンごとの文面数")
+    parser.add_argument("--edit-rate", type=float, default=0.2, help="小さな編集を加える文面の割合")
+    parser.add_argument("--distances", default="0,1,2,3,4,6,8", help="比べる距離の上限（カンマ区切り）")
+    parser.add_argument("--max-entries", type=int, default=20000)
+    parser.add_argument("--no-rule-guard", action="store_true", help="ルールスコアが違っても使い回す")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    checker = DarkJobChecker()
+    messages = [
+        (campaign, text, checker.rule_verdict(text)[0])
+        for campaign, text in LabelledCorpus(args.seed).build(args.campaigns, args.copies, args.edit_rate)
+    ]
+    # キャンペーンごとに最初の1通だけミスした場合のヒット率（文面ごとに URL が違うため完全一致キャッシュでは 0%）
+    ideal = 1 - args.campaigns / len(messages)
+    print(f"messages={len(messages)} campaigns={args.campaigns} ideal_hit_rate={ideal:.1%}")
+    print(f"{'distance':>8} {'hit_rate':>9} {'false_reuse':>12} {'verdict_flip':>13} {'entries':>8} {'lookup':>9}")
+    for distance in (int(d) for d in args.distances.split(",")):
+        r = run(messages, distance, args.max_entries, not args.no_rule_guard)
+        print(
+            f"{distance:8d} {r['hit_rate']:9.1%} {r['false_reuse']:12.2%} {r['flips']:13.2%}"
+            f" {r['entries']:8d} {r['lookup_us']:7.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""文字 n-gram 分類器ベンチマーク: 学習時間・検証精度と、1件／バッチの採点レイテンシ
+
+合成コーパス（詐欺キーワードを含む通話トランスクリプトを正例、含まないものを負例）で
+``app.tools.train_ngram_model`` と同じ学習を行い、検証データでの精度をルール
+（``ScamAnalyzer`` のリスクスコア 50 以上を詐欺とみなす）と並べて表示します。
+続けて ``--chars`` 文字のトランスクリプトの採点時間（1件ずつの p50 / p99 と、バッチでの1件あたり）を計測します。
+
+    python -m benchmarks.bench_ngram_model
+    python -m benchmarks.bench_ngram_model --train 4000 --bits 18 --chars 5000 --requests 500
+"""
+
+import argparse
+import logging
+import random
+import time
+
+import numpy as np
+
+from app.services.scam_analyzer import ScamAnalyzer
+from app.tools.train_ngram_model import evaluate, train
+from benchmarks.corpus import CorpusGenerator
+
+
+def labelled_corpus(count: int, seed: int) -> tuple[list[str], np.ndarray]:
+    rng = random.Random(seed)
+    generator = CorpusGenerator(seed)
+    texts, labels = [], []
+    for _ in range(count):
+        label = rng.random() < 0.5
+        density = rng.uniform(0.1, 0.4) if label else 0.0
+        texts.append(generator.generate("transcript", rng.randint(100, 2000), density))
+        labels.append(int(label))
+    return texts, np.array(labels, dtype=np.float64)
+
+
+def percentile_us(samples: list[float], q: float) -> float:
+    return float(np.percentile(samples, q)) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--train", type=int, default=2000, help="学習件数")
+    parser.add_argument("--test", type=int, default=500, help="検証件数")
+    parser.add_argument("--bits", type=int, default=20)
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--chars", type=int, default=5000, help="採点時間を計測するトランスクリプトの文字数")
+    parser.add_argument("--requests", type=int, default=300, help="採点時間の計測件数")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    texts, labels = labelled_corpus(args.train + args.test, args.seed)
+    start = time.perf_counter()
+    model = train(texts[: args.train], labels[: args.train], "bench", bits=args.bits, epochs=args.epochs)
+    print(f"train: {args.train} docs, 2**{args.bits} buckets, {time.perf_counter() - start:.1f}s")
+
+    test_texts, test_labels = texts[args.train:], labels[args.train:]
+    metrics = evaluate(model, test_texts, test_labels)
+    analyzer = ScamAnalyzer()
+    predicted = np.array([analyzer.analyze(text)["risk_score"] >= 50 for text in test_texts])
+    actual = test_labels > 0
+    print(
+        f"model: accuracy={metrics['accuracy']:.3f} precision={metrics['precision']:.3f}"
+        f" recall={metrics['recall']:.3f} auc={metrics['auc']:.3f}"
+    )
+    print(
+        f"rules: accuracy={(predicted == actual).mean():.3f}"
+        f" precision={(predicted & actual).sum() / max(predicted.sum(), 1):.3f}"
+        f" recall={(predicted & actual).sum() / max(actual.sum(), 1):.3f}"
+    )
+
+    generator = CorpusGenerator(args.seed + 1)
+    requests = [generator.generate("transcript", args.chars, 0.2) for _ in range(args.requests)]
+    model.score(requests[0])
+    single = []
+    for text in requests:
+        start = time.perf_counter()
+        model.score(text)
+        single.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    for i in range(0, len(requests), args.batch_size):
+        model.score_batch(requests[i:i + args.batch_size])
+    batched = (time.perf_counter() - start) / len(requests)
+    print(
+        f"score {args.chars} chars: p50={percentile_us(single, 50):.0f}us p99={percentile_us(single, 99):.0f}us"
+        f" batch({args.batch_size})={batched * 1e6:.0f}us/doc"
+    )
+
+
+if __name__ == "__main__":
+    main()
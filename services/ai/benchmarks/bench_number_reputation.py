@@ -0,0 +1,70 @@
+"""通報番号ストアのルックアップベンチマーク
+
+合成した通報番号でストアを構築し、登録済み番号（Bloom 通過＋二分探索）と
+未登録番号（大半が Bloom で棄却）の1件あたりの検索時間を計測します。
+
+    python -m benchmarks.bench_number_reputation --entries 10000000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app.services.number_reputation import ReputationFile, hash_number
+from app.tools.build_reputation_store import build_store
+
+
+def synthetic_rows(entries: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(entries):
+        yield {
+            "phone_number": f"+81{rng.choice('3456789')}0{rng.randrange(10**8):08d}",
+            "risk_score": rng.randint(40, 100),
+            "report_count": 1,
+            "last_reported": 0,
+        }
+
+
+def measure(store: ReputationFile, numbers: list[str], min_time: float) -> float:
+    """1件あたりの平均検索時間（秒）を返す。"""
+    runs = 0
+    lookup = store.lookup
+    start = time.perf_counter()
+    while True:
+        for number in numbers:
+            lookup(number)
+        runs += len(numbers)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1_000_000, help="登録番号の件数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-time", type=float, default=0.5, help="1計測あたりの最短計測時間（秒）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.mrep"
+        start = time.perf_counter()
+        count = build_store(synthetic_rows(args.entries, args.seed), path)
+        build_time = time.perf_counter() - start
+        store = ReputationFile(path)
+
+        hits = [row["phone_number"] for _, row in zip(range(1000), synthetic_rows(args.entries, args.seed))]
+        rng = random.Random(args.seed + 1)
+        misses = [f"+8112{rng.randrange(10**8):08d}" for _ in range(1000)]
+        false_positives = sum(store.might_contain(*hash_number(n)) for n in misses)
+
+        print(f"entries:        {count:,} ({path.stat().st_size / 1e6:.1f} MB, build {build_time:.1f}s)")
+        print(f"bloom:          {store.bloom_bits:,} bits, {store.bloom_hashes} hashes, FP {false_positives / len(misses):.2%}")
+        print(f"hit lookup:     {measure(store, hits, args.min_time) * 1e6:.2f} us")
+        print(f"miss lookup:    {measure(store, misses, args.min_time) * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
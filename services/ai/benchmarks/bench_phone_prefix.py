@@ -0,0 +1,72 @@
+"""電話番号プレフィックス検索ベンチマーク: ``startswith`` ループとトライの比較
+
+プレフィックス表の行数を 8 行から 50,000 行まで変化させ、
+1番号あたりの検索時間が表の大きさに依存しないことを確認します。
+
+    python -m benchmarks.bench_phone_prefix
+"""
+
+import argparse
+import random
+import time
+
+from app.services.phone_prefix import PrefixTrie, read_prefix_entries
+
+
+def make_entries(rows: int, rng: random.Random) -> list[tuple[str, int, str]]:
+    """同梱の表に合成プレフィックスを足して rows 行にする。"""
+    entries = read_prefix_entries()
+    seen = {entry[0] for entry in entries}
+    while len(entries) < rows:
+        prefix = "+" + "".join(rng.choice("0123456789") for _ in range(rng.randint(3, 8)))
+        if prefix not in seen:
+            seen.add(prefix)
+            entries.append((prefix, rng.randint(5, 40), "synthetic"))
+    return entries[:rows]
+
+
+def linear_lookup(entries: list[tuple[str, int, str]], number: str):
+    best = None
+    for entry in entries:
+        if number.startswith(entry[0]) and (best is None or len(entry[0]) > len(best[0])):
+            best = entry
+    return best
+
+
+def measure(fn, numbers: list[str], min_time: float) -> float:
+    """1番号あたりの平均検索時間（秒）を返す。"""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        for number in numbers:
+            fn(number)
+        runs += len(numbers)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="8,1000,10000,50000", help="プレフィックス表の行数（カンマ区切り）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-time", type=float, default=0.2, help="1計測あたりの最短計測時間（秒）")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    numbers = ["+81" + "".join(rng.choice("0123456789") for _ in range(10)) for _ in range(500)]
+    numbers += ["+" + "".join(rng.choice("0123456789") for _ in range(12)) for _ in range(500)]
+
+    print(f"{'rows':>7} {'trie ns':>9} {'startswith ns':>14}")
+    for rows in (int(r) for r in args.rows.split(",")):
+        entries = make_entries(rows, rng)
+        trie = PrefixTrie(entries)
+        for number in numbers[:50]:
+            assert trie.longest_match(number) == linear_lookup(entries, number)
+        trie_time = measure(trie.longest_match, numbers, args.min_time)
+        linear_time = measure(lambda n: linear_lookup(entries, n), numbers[:20], args.min_time)
+        print(f"{rows:>7} {trie_time * 1e9:>9.0f} {linear_time * 1e9:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
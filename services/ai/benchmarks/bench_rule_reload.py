@@ -0,0 +1,89 @@
+"""ルールバンドルのホットリロード ベンチマーク: 切り替え中の解析レイテンシ
+
+統合イベント解析（``EventAnalyzer``）を1件ずつ実行し、p50 / p99 / 最大を
+「切り替えなし」と「別スレッドで ``--interval`` 秒ごとにバンドルを読み直して切り替える」で
+比較します。切り替え中のリクエストも取得済みのルールで最後まで処理されること
+（1件の結果に複数バージョンの ``model_version`` が混ざらないこと）も確認します。
+
+    python -m benchmarks.bench_rule_reload
+    python -m benchmarks.bench_rule_reload --chars 2000 --requests 2000 --interval 0.05
+"""
+
+import argparse
+import logging
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.event_analyzer import EventAnalyzer
+from app.services.rule_bundle import RuleRegistry, builtin_rule_bundle
+from app.tools.rule_bundle import dump_rule_bundle
+from benchmarks.corpus import CorpusGenerator
+
+
+def run(analyzer: EventAnalyzer, texts: list[str]) -> tuple[list[float], int]:
+    """1件ずつ解析し、レイテンシと「バージョンが混ざった結果」の件数を返す。"""
+    latencies, mixed = [], 0
+    for text in texts:
+        start = time.perf_counter()
+        result = analyzer.analyze(text, "09012345678", "sms")
+        latencies.append(time.perf_counter() - start)
+        versions = {
+            result[name]["model_version"].partition("+")[2] for name in ("conversation", "dark_job", "metadata")
+        }
+        mixed += len(versions) > 1
+    return latencies, mixed
+
+
+def report(label: str, latencies: list[float], mixed: int) -> None:
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e6
+    print(f"{label:>10}: p50={p50:.0f}us p99={p99:.0f}us max={max(latencies) * 1e6:.0f}us mixed={mixed}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chars", type=int, default=1000, help="1件の文字数")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--interval", type=float, default=0.1, help="切り替えの間隔（秒）")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    generator = CorpusGenerator(args.seed)
+    texts = [generator.generate("transcript", args.chars, 0.2) for _ in range(args.requests)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "rules.json"
+        dump_rule_bundle(builtin_rule_bundle(), path)
+        registry = RuleRegistry(path)
+        registry.reload(force=True)
+        analyzer = EventAnalyzer(rules=lambda: registry.current)
+        run(analyzer, texts[:50])
+
+        report("baseline", *run(analyzer, texts))
+
+        stop = threading.Event()
+        swaps = 0
+
+        def swap() -> None:
+            nonlocal swaps
+            while not stop.wait(args.interval):
+                bundle = builtin_rule_bundle().model_copy(update={"version": f"v{swaps}"})
+                dump_rule_bundle(bundle, path)
+                registry.reload()
+                swaps += 1
+
+        thread = threading.Thread(target=swap, daemon=True)
+        thread.start()
+        latencies, mixed = run(analyzer, texts)
+        stop.set()
+        thread.join()
+        report("reloading", latencies, mixed)
+        print(f"swaps: {swaps}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""ステージ計測のオーバーヘッド: stage() 1回あたりのコスト（有効・無効）
+
+空の処理を ``stage()`` で囲んだ場合と囲まない場合の差を、1回あたりのナノ秒で表示します。
+1リクエストは数ステージ（照合・採点・シリアライズなど）を通るため、
+リクエストあたりのオーバーヘッドはこの値のステージ数倍です。
+
+    python -m benchmarks.bench_stage_metrics
+"""
+
+import argparse
+import time
+
+from app.services import stage_metrics
+from app.services.stage_metrics import stage
+
+
+def per_call_ns(fn, iterations: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def bare() -> None:
+    pass
+
+
+def timed() -> None:
+    with stage("bench"):
+        pass
+
+
+def timed_with_input() -> None:
+    with stage("bench", chars=1000):
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500_000)
+    args = parser.parse_args()
+
+    baseline = per_call_ns(bare, args.iterations)
+    print(f"{'mode':>20} {'ns/stage':>10}")
+    for enabled in (True, False):
+        stage_metrics.set_enabled(enabled)
+        label = "enabled" if enabled else "disabled"
+        print(f"{label:>20} {per_call_ns(timed, args.iterations) - baseline:>10.0f}")
+        print(f"{label + ' +input':>20} {per_call_ns(timed_with_input, args.iterations) - baseline:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
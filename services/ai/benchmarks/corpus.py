@@ -0,0 +1,187 @@
+"""ベンチマーク用の合成コーパス（日本語の通話トランスクリプト・SMS・求人投稿）
+
+シードを固定し、文字数とキーワード密度を指定して文書を生成します。
+キーワードは各解析器の辞書から選ぶため、密度を上げるほど照合後の採点・補正の経路を通ります。
+密度は「キーワードを含む文の割合」（0.0〜1.0）です。
+
+    python -m benchmarks.corpus --kind transcript --count 100 --length 2000 --density 0.2 > corpus.jsonl
+"""
+
+import argparse
+import json
+import random
+import sys
+
+from app.services.dark_job_checker import DARK_JOB_PATTERNS
+from app.services.key_points import IMPORTANT_MARKERS
+from app.services.metadata_analyzer import SMS_SCAM_KEYWORDS, SMS_URGENCY_WORDS
+from app.services.scam_analyzer import SCAM_PATTERNS, URGENCY_KEYWORDS
+
+KINDS = ("transcript", "sms", "job_post")
+
+TRANSCRIPT_KEYWORDS = (
+    [kw for _, keywords, _ in SCAM_PATTERNS for kw in keywords] + URGENCY_KEYWORDS + IMPORTANT_MARKERS
+)
+SMS_KEYWORDS = SMS_SCAM_KEYWORDS + SMS_URGENCY_WORDS
+JOB_POST_KEYWORDS = [kw for _, keywords, _ in DARK_JOB_PATTERNS for kw in keywords]
+
+# ── 通話トランスクリプト（話者ごとに改行） ──
+TRANSCRIPT_SPEAKERS = ("相手", "本人")
+TRANSCRIPT_BENIGN = [
+    "もしもし、聞こえますか。",
+    "ああ、久しぶりだね。元気にしてた？",
+    "今日は天気がいいから散歩に行ってきたよ。",
+    "最近は腰の調子もだいぶ良くなってきたの。",
+    "孫の運動会は来月の第二土曜日だったかしら。",
+    "夕飯は何にしようか迷っているところです。",
+    "病院の予約は来週の火曜日にしておいたからね。",
+    "そうなんだ、それは大変だったね。",
+    "ちょっと待ってね、メモを取るから。",
+    "うん、うん、分かった。",
+    "また週末にでも顔を見せに行くよ。",
+    "お父さんにもよろしく伝えておいて。",
+]
+TRANSCRIPT_CARRIERS = [
+    "実は{kw}のことで電話したんだ。",
+    "{kw}って言われたんだけど、どうしたらいい？",
+    "それで{kw}になってしまって困っているんです。",
+    "担当の者から{kw}の件でご連絡しております。",
+    "とにかく{kw}、お願いだから。",
+    "え、{kw}ってどういうこと？",
+]
+
+# ── SMS ──
+SMS_SENDERS = ["【〇〇銀行】", "【宅配便】", "【カード会社】", "【携帯キャリア】", "【通販サイト】", ""]
+SMS_BENIGN = [
+    "いつもご利用ありがとうございます。",
+    "ご注文の商品を発送いたしました。",
+    "明日のご予約を承っております。",
+    "詳しくは下記をご確認ください。",
+    "本メールは送信専用です。",
+    "お問い合わせはカスタマーセンターまで。",
+]
+SMS_CARRIERS = [
+    "お客様の{kw}について確認が必要です。",
+    "{kw}のため、下記URLよりお手続きください。",
+    "{kw}が発生しています。",
+    "【重要】{kw}のお知らせ。",
+]
+SMS_URLS = [
+    "https://example-bank.xyz/login",
+    "http://delivery-check.top/track?id=",
+    "https://secure-card.click/verify/",
+    "bit-support.info/a/",
+]
+
+# ── 求人投稿（SNS・掲示板） ──
+JOB_POST_HEADINGS = ["【募集】", "■仕事内容", "■給与", "■応募方法", "■勤務地", "■条件"]
+JOB_POST_BENIGN = [
+    "・未経験の方も歓迎します。",
+    "・研修制度あり、丁寧に指導します。",
+    "・シフトは週2日から相談可能です。",
+    "・交通費は規定により支給します。",
+    "・社会保険完備、有給休暇あり。",
+    "・駅から徒歩5分の好立地です。",
+    "・履歴書をご持参のうえ面接にお越しください。",
+]
+JOB_POST_CARRIERS = [
+    "・{kw}の簡単なお仕事です。",
+    "・{kw}、詳細は後ほどお伝えします。",
+    "・{kw}！まずは気軽に連絡ください。",
+    "・条件: {kw}",
+]
+
+
+class CorpusGenerator:
+    """シード固定の合成文書ジェネレーター"""
+
+    def __init__(self, seed: int = 42) -> None:
+        self.rng = random.Random(seed)
+
+    def generate(self, kind: str, length: int, density: float) -> str:
+        if kind == "transcript":
+            return self.transcript(length, density)
+        if kind == "sms":
+            return self.sms(length, density)
+        if kind == "job_post":
+            return self.job_post(length, density)
+        raise ValueError(f"unknown corpus kind: {kind}")
+
+    def transcript(self, length: int, density: float) -> str:
+        """話者ラベル付きの通話書き起こし（1発話1行）"""
+        turn = self.rng.randrange(2)
+        lines = []
+        size = 0
+        while size < length:
+            utterance = "".join(
+                self._sentence(TRANSCRIPT_BENIGN, TRANSCRIPT_CARRIERS, TRANSCRIPT_KEYWORDS, density)
+                for _ in range(self.rng.randint(1, 3))
+            )
+            line = f"{TRANSCRIPT_SPEAKERS[turn]}: {utterance}"
+            lines.append(line)
+            size += len(line) + 1
+            turn ^= 1
+        return "\n".join(lines)[:length]
+
+    def sms(self, length: int, density: float) -> str:
+        """差出人表記と、密度に応じて URL を含む SMS 本文"""
+        parts = [self.rng.choice(SMS_SENDERS)]
+        size = len(parts[0])
+        while size < length:
+            if self.rng.random() < density / 2:
+                piece = self.rng.choice(SMS_URLS) + str(self.rng.randrange(10**6)) + " "
+            else:
+                piece = self._sentence(SMS_BENIGN, SMS_CARRIERS, SMS_KEYWORDS, density)
+            parts.append(piece)
+            size += len(piece)
+        return "".join(parts)[:length]
+
+    def job_post(self, length: int, density: float) -> str:
+        """見出しと箇条書きからなる求人投稿"""
+        lines = []
+        size = 0
+        while size < length:
+            heading = self.rng.choice(JOB_POST_HEADINGS)
+            lines.append(heading)
+            size += len(heading) + 1
+            for _ in range(self.rng.randint(1, 4)):
+                line = self._sentence(JOB_POST_BENIGN, JOB_POST_CARRIERS, JOB_POST_KEYWORDS, density)
+                lines.append(line)
+                size += len(line) + 1
+        return "\n".join(lines)[:length]
+
+    def image(self, size: int, density: float, text_ratio: float = 0.1) -> bytes:
+        """求人投稿の文字列を text_ratio の割合で埋め込んだ擬似画像バイト列"""
+        data = bytearray()
+        while len(data) < size:
+            block = self.rng.randint(1024, 4096)
+            data += self.rng.randbytes(block)
+            # 日本語は UTF-8 で1文字3バイト
+            text_chars = max(int(block * text_ratio / (1 - text_ratio) / 3), 20)
+            data += self.job_post(text_chars, density).encode("utf-8")
+        return bytes(data[:size])
+
+    def _sentence(self, benign: list[str], carriers: list[str], keywords: list[str], density: float) -> str:
+        if self.rng.random() < density:
+            return self.rng.choice(carriers).format(kw=self.rng.choice(keywords))
+        return self.rng.choice(benign)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kind", choices=KINDS, default="transcript")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--length", type=int, default=1000, help="1文書あたりの文字数")
+    parser.add_argument("--density", type=float, default=0.2, help="キーワードを含む文の割合（0.0〜1.0）")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(args.seed)
+    for _ in range(args.count):
+        text = generator.generate(args.kind, args.length, args.density)
+        record = {"kind": args.kind, "length": args.length, "density": args.density, "text": text}
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
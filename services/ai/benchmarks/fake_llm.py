@@ -0,0 +1,180 @@
+"""ローカル用の偽 LLM サーバー（OpenAI 互換 Chat Completions）
+
+ネットワークなしで LLM クライアントの期限・ヘッジ・再送・サーキットブレーカーを試すためのサーバーです。
+応答の遅延とエラーを設定で注入できます。
+
+- 遅延: ``latency`` 秒 + 指数分布のゆらぎ（平均 ``jitter`` 秒）。``slow_rate`` の割合で ``slow_latency`` 秒
+- 障害: ``error_rate`` の割合で 500 を返し、``hang_rate`` の割合で応答しない（クライアント側の期限切れ）
+- ``script`` に "ok" / "slow" / "error" / "hang" を並べると、先頭から1件ずつ適用する（テスト用）
+- スコアは本文中の闇バイト関連キーワードの数から決める（同じ本文には同じスコア）
+- 複数件のまとめ問い合わせ（``{"items": [...]}``）には ``risk_scores`` を返す。
+  遅延は1件ごとに ``item_latency`` 秒ずつ増え、``concurrency`` を指定すると同時に処理する
+  問い合わせ数を制限する（API のレート制限の代わり）
+- 設定は ``POST /_config`` で実行中に変更できる（負荷試験の途中で障害を起こすなど）
+
+    python -m benchmarks.fake_llm --port 9100 --latency 0.08 --error-rate 0.05
+    LLM_BASE_URL=http://127.0.0.1:9100 python -m app.server
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from dataclasses import asdict, dataclass, field, fields
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.services.dark_job_checker import KEYWORD_MATCHER
+
+BEHAVIORS = ("ok", "slow", "error", "hang")
+
+
+@dataclass
+class FakeLlmConfig:
+    latency: float = 0.05
+    jitter: float = 0.0
+    slow_latency: float = 1.0
+    slow_rate: float = 0.0
+    error_rate: float = 0.0
+    hang_rate: float = 0.0
+    item_latency: float = 0.0
+    concurrency: int = 0
+    script: list[str] = field(default_factory=list)
+    seed: int = 42
+
+    def update(self, values: dict) -> None:
+        names = {f.name for f in fields(self)}
+        for name, value in values.items():
+            if name not in names:
+                raise ValueError(f"unknown setting: {name}")
+            setattr(self, name, value)
+
+
+def fake_score(text: str) -> int:
+    """本文中のキーワード数から決まるリスクスコア"""
+    return min(20 + 10 * len(KEYWORD_MATCHER.find_all(text)), 100)
+
+
+def create_app(config: FakeLlmConfig | None = None) -> Starlette:
+    """偽 LLM の ASGI アプリを作る。
+
+    app.state.config で設定、app.state.requests で受信件数、app.state.batch_sizes で
+    問い合わせごとの件数を参照できる。
+    """
+    config = config or FakeLlmConfig()
+    rng = random.Random(config.seed)
+    # 同時処理数の制限は最初の問い合わせ時に（実行中のイベントループで）作る
+    slots: list[asyncio.Semaphore] = []
+
+    def next_behavior() -> str:
+        if config.script:
+            return config.script.pop(0)
+        roll = rng.random()
+        if roll < config.error_rate:
+            return "error"
+        if roll < config.error_rate + config.hang_rate:
+            return "hang"
+        if roll < config.error_rate + config.hang_rate + config.slow_rate:
+            return "slow"
+        return "ok"
+
+    async def chat_completions(request: Request) -> JSONResponse:
+        app.state.requests += 1
+        body = await request.json()
+        user = body["messages"][-1]["content"]
+        items = _batch_items(user)
+        app.state.batch_sizes.append(1 if items is None else len(items))
+        if config.concurrency > 0:
+            if not slots:
+                slots.append(asyncio.Semaphore(config.concurrency))
+            async with slots[0]:
+                return await respond(body, user, items)
+        return await respond(body, user, items)
+
+    async def respond(body: dict, user: str, items: list[dict] | None) -> JSONResponse:
+        behavior = next_behavior()
+        if behavior == "hang":
+            await asyncio.sleep(3600)
+        delay = config.slow_latency if behavior == "slow" else config.latency
+        if config.jitter > 0:
+            delay += rng.expovariate(1 / config.jitter)
+        delay += config.item_latency * (1 if items is None else len(items))
+        await asyncio.sleep(delay)
+        if behavior == "error":
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=500)
+
+        if items is None:
+            content = json.dumps({"risk_score": fake_score(user)})
+        else:
+            content = json.dumps({"risk_scores": [fake_score(item["text"]) for item in items]})
+        return JSONResponse({
+            "id": f"fake-{app.state.requests}",
+            "object": "chat.completion",
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        })
+
+    async def update_config(request: Request) -> JSONResponse:
+        try:
+            config.update(await request.json())
+        except ValueError as e:
+            return JSONResponse({"detail": str(e)}, status_code=400)
+        return JSONResponse(asdict(config))
+
+    app = Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/_config", update_config, methods=["POST"]),
+    ])
+    app.state.config = config
+    app.state.requests = 0
+    app.state.batch_sizes = []
+    return app
+
+
+def _batch_items(content: str) -> list[dict] | None:
+    """まとめ問い合わせなら items を返す（1件の問い合わせは本文そのもの）"""
+    if not content.startswith("{"):
+        return None
+    try:
+        items = json.loads(content)["items"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    return items if isinstance(items, list) else None
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.05, help="通常の応答遅延（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="遅延に加えるゆらぎの平均（秒）")
+    parser.add_argument("--slow-latency", type=float, default=1.0, help="遅い応答の遅延（秒）")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="遅い応答の割合")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500 を返す割合")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="応答しない割合")
+    parser.add_argument("--item-latency", type=float, default=0.0, help="まとめ問い合わせの1件ごとの追加遅延（秒）")
+    parser.add_argument("--concurrency", type=int, default=0, help="同時に処理する問い合わせ数（0 で無制限）")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    config = FakeLlmConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        slow_latency=args.slow_latency,
+        slow_rate=args.slow_rate,
+        error_rate=args.error_rate,
+        hang_rate=args.hang_rate,
+        item_latency=args.item_latency,
+        concurrency=args.concurrency,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
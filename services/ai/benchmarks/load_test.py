@@ -0,0 +1,358 @@
+"""負荷試験ハーネス: エンドポイント別の p50 / p95 / p99 と 500ms SLO の確認
+
+会話解析・サマリー・闇バイトチェック・闇バイト画像チェック・着信メタデータの混合トラフィックを
+送り、エンドポイントごとのスループット・レイテンシ分位点・エラー率を表示します。
+SLO はアーキテクチャ文書の「通常API < 500ms (p95)」です。
+
+送信先:
+
+- ``--target inprocess``（既定）: ``app.main`` の ``app`` をインプロセスの ASGI トランスポートで呼び出す
+- ``--target uvicorn``: ローカルに uvicorn（1ワーカー）を起動し、実際の HTTP で送る
+- ``--target prefork``: ``python -m app.server`` を ``--workers`` 個のワーカーで起動して送る
+  （ワーカー数を変えて飽和点を比べると、コア数に対するスケールを確認できる）
+- ``--url``: 起動済みのサーバーへ送る
+
+インプロセスではクライアントも同じイベントループで動くため、飽和点は uvicorn より低めに出ます。
+
+負荷のかけ方:
+
+- ``--concurrency N``: N 並列のクローズドループ（応答を待って次を送る）
+- ``--rate R``: 毎秒 R 件の固定到着レート。レイテンシは予定送信時刻から測るため、
+  サーバーが詰まって送信が遅れた分も含まれる
+- ``--find-saturation``: 到着レートを段階的に上げ、SLO を満たす最大レート（1ワーカーの飽和点）を探す
+
+    python -m benchmarks.load_test --concurrency 16 --duration 10
+    python -m benchmarks.load_test --rate 200 --mix conversation=4,dark-job=3,call-metadata=2
+    python -m benchmarks.load_test --target uvicorn --find-saturation
+    python -m benchmarks.load_test --target prefork --workers 4 --find-saturation
+"""
+
+import argparse
+import asyncio
+import base64
+import logging
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+from benchmarks.corpus import CorpusGenerator
+
+SLO_P95_MS = 500.0
+SERVICE_ROOT = Path(__file__).resolve().parent.parent
+
+PHONE_NUMBERS = ["090-1234-5678", "+1-876-555-0100", "非通知", "050-3123-4567", "0120-123-456"]
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    path: str
+    build: Callable[[CorpusGenerator, argparse.Namespace], dict]
+
+
+ENDPOINTS = {
+    "conversation": Endpoint(
+        "/api/v1/analyze/conversation",
+        lambda gen, args: {"text": gen.transcript(args.text_length, args.density)},
+    ),
+    "summary": Endpoint(
+        "/api/v1/analyze/conversation-summary",
+        lambda gen, args: {"text": gen.transcript(args.text_length, args.density)},
+    ),
+    "dark-job": Endpoint(
+        "/api/v1/check/dark-job",
+        lambda gen, args: {"text": gen.job_post(args.text_length // 2, args.density), "source": "sns"},
+    ),
+    "dark-job-image": Endpoint(
+        "/api/v1/check/dark-job-image",
+        lambda gen, args: {
+            "image_base64": base64.b64encode(gen.image(args.image_kb * 1024, args.density)).decode(),
+            "source": "screenshot",
+        },
+    ),
+    "call-metadata": Endpoint(
+        "/api/v1/analyze/call-metadata",
+        lambda gen, args: {
+            "phone_number": gen.rng.choice(PHONE_NUMBERS),
+            "call_type": "sms",
+            "sms_content": gen.sms(160, args.density),
+        },
+    ),
+}
+
+DEFAULT_MIX = "conversation=4,summary=1,dark-job=3,dark-job-image=1,call-metadata=2"
+
+
+@dataclass
+class EndpointStats:
+    latencies_ms: list[float] = field(default_factory=list)
+    errors: int = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.latencies_ms) + self.errors
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint in mix: {name}（{', '.join(ENDPOINTS)}）")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+class Workload:
+    """重み付きの混合リクエスト列。ペイロードは事前生成したプールを順に使う。"""
+
+    def __init__(self, mix: dict[str, int], args: argparse.Namespace) -> None:
+        generator = CorpusGenerator(args.seed)
+        self.rng = random.Random(args.seed)
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.pools = {
+            name: [ENDPOINTS[name].build(generator, args) for _ in range(args.pool)] for name in self.names
+        }
+        self.cursor = dict.fromkeys(self.names, 0)
+
+    def next(self) -> tuple[str, dict]:
+        name = self.rng.choices(self.names, self.weights)[0]
+        pool = self.pools[name]
+        payload = pool[self.cursor[name] % len(pool)]
+        self.cursor[name] += 1
+        return name, payload
+
+
+async def send(client: httpx.AsyncClient, name: str, payload: dict, stats: dict[str, EndpointStats], start: float):
+    try:
+        res = await client.post(ENDPOINTS[name].path, json=payload)
+        ok = res.status_code < 400
+    except httpx.HTTPError:
+        ok = False
+    if ok:
+        stats[name].latencies_ms.append((time.perf_counter() - start) * 1000)
+    else:
+        stats[name].errors += 1
+
+
+async def closed_loop(client, workload: Workload, concurrency: int, duration: float, stats) -> None:
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            name, payload = workload.next()
+            await send(client, name, payload, stats, time.perf_counter())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(client, workload: Workload, rate: float, duration: float, max_in_flight: int, stats) -> None:
+    """固定間隔で送信する。同時実行が上限に達した分はエラーとして数える。"""
+    interval = 1 / rate
+    begin = time.perf_counter()
+    in_flight: set[asyncio.Task] = set()
+    for i in range(int(rate * duration)):
+        scheduled = begin + i * interval
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        name, payload = workload.next()
+        if len(in_flight) >= max_in_flight:
+            stats[name].errors += 1
+            continue
+        task = asyncio.ensure_future(send(client, name, payload, stats, scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)] if ordered else float("nan")
+
+
+def summarize(stats: dict[str, EndpointStats], elapsed: float) -> dict[str, dict]:
+    rows = {}
+    merged = EndpointStats()
+    for name, stat in stats.items():
+        merged.latencies_ms += stat.latencies_ms
+        merged.errors += stat.errors
+    for name, stat in [*stats.items(), ("total", merged)]:
+        if not stat.count:
+            continue
+        rows[name] = {
+            "count": stat.count,
+            "rps": stat.count / elapsed,
+            "p50": statistics.median(stat.latencies_ms) if stat.latencies_ms else float("nan"),
+            "p95": percentile(stat.latencies_ms, 0.95),
+            "p99": percentile(stat.latencies_ms, 0.99),
+            "error_rate": stat.errors / stat.count,
+        }
+    return rows
+
+
+def print_report(rows: dict[str, dict]) -> None:
+    print(f"{'endpoint':>15} {'count':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'SLO':>5}")
+    for name, row in rows.items():
+        slo = "ok" if row["p95"] <= SLO_P95_MS and row["error_rate"] == 0 else "NG"
+        print(
+            f"{name:>15} {row['count']:>7} {row['rps']:>8.1f} {row['p50']:>8.1f} {row['p95']:>8.1f} "
+            f"{row['p99']:>8.1f} {row['error_rate']:>7.1%} {slo:>5}"
+        )
+
+
+async def run_once(base_url: str, transport, workload: Workload, args, rate: float | None) -> dict[str, dict]:
+    stats = {name: EndpointStats() for name in workload.names}
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=30, limits=limits) as client:
+        start = time.perf_counter()
+        if rate is None:
+            await closed_loop(client, workload, args.concurrency, args.duration, stats)
+        else:
+            await open_loop(client, workload, rate, args.duration, args.max_in_flight, stats)
+        elapsed = time.perf_counter() - start
+    return summarize(stats, elapsed)
+
+
+async def warm_up(base_url: str, transport, workload: Workload, args) -> None:
+    """プロセスプールの起動などの初回コストを計測から除くため、各エンドポイントを数回呼ぶ。
+
+    計測用のプールと別の入力を使い、結果キャッシュに計測用の入力が載らないようにする。
+    """
+    generator = CorpusGenerator(args.seed + 1)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=30) as client:
+        for name in workload.names:
+            await asyncio.gather(
+                *(client.post(ENDPOINTS[name].path, json=ENDPOINTS[name].build(generator, args)) for _ in range(4))
+            )
+
+
+async def find_saturation(base_url: str, transport, workload: Workload, args) -> None:
+    """到着レートを step 倍ずつ上げ、p95・エラー率・達成スループットが基準を満たす最大レートを探す。"""
+    rate = args.rate or 10.0
+    best = None
+    while rate <= args.max_rate:
+        total = (await run_once(base_url, transport, workload, args, rate))["total"]
+        achieved = total["rps"] * (1 - total["error_rate"])
+        healthy = total["p95"] <= SLO_P95_MS and total["error_rate"] <= 0.01 and achieved >= rate * 0.9
+        print(
+            f"rate={rate:>7.1f}/s achieved={achieved:>7.1f}/s p95={total['p95']:>8.1f}ms "
+            f"errors={total['error_rate']:.1%} {'ok' if healthy else 'saturated'}"
+        )
+        if not healthy:
+            break
+        best = rate
+        rate *= args.step
+    if best is None:
+        print("saturation: SLO not met at the starting rate")
+    else:
+        print(f"saturation: max sustainable rate ~{best:.1f} req/s (p95 <= {SLO_P95_MS:.0f}ms)")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def launch_uvicorn(port: int) -> subprocess.Popen:
+    """1ワーカーの uvicorn を起動し、/health が応答するまで待つ。"""
+    return _launch(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", "1",
+         "--log-level", "warning", "--no-access-log"],
+        port,
+    )
+
+
+def launch_prefork(port: int, workers: int) -> subprocess.Popen:
+    """app.server を指定ワーカー数で起動し、/health が応答するまで待つ。"""
+    return _launch(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers)],
+        port,
+    )
+
+
+def _launch(command: list[str], port: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        command,
+        cwd=SERVICE_ROOT,
+        env={**os.environ, "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING")},
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("server did not become healthy within 30s")
+
+
+async def run(args: argparse.Namespace) -> None:
+    workload = Workload(parse_mix(args.mix), args)
+    process = None
+    if args.url:
+        base_url, transport = args.url, None
+    elif args.target in ("uvicorn", "prefork"):
+        port = _free_port()
+        process = launch_uvicorn(port) if args.target == "uvicorn" else launch_prefork(port, args.workers)
+        base_url, transport = f"http://127.0.0.1:{port}", None
+    else:
+        from app.main import app
+
+        logging.disable(logging.INFO)
+        base_url, transport = "http://loadtest", httpx.ASGITransport(app=app)
+
+    mode = f"rate={args.rate}/s" if args.rate else f"concurrency={args.concurrency}"
+    target = args.url or (f"prefork x{args.workers}" if args.target == "prefork" else args.target)
+    print(f"target={target} {mode} duration={args.duration}s mix={args.mix}")
+    try:
+        await warm_up(base_url, transport, workload, args)
+        if args.find_saturation:
+            await find_saturation(base_url, transport, workload, args)
+        else:
+            print_report(await run_once(base_url, transport, workload, args, args.rate))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=["inprocess", "uvicorn", "prefork"], default="inprocess")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="--target prefork のワーカー数")
+    parser.add_argument("--url", help="起動済みサーバーのURL（指定時は --target を無視）")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="エンドポイント=重み のカンマ区切り")
+    parser.add_argument("--concurrency", type=int, default=16, help="クローズドループの並列数")
+    parser.add_argument("--rate", type=float, help="固定到着レート（件/秒）。指定時はオープンループ")
+    parser.add_argument("--duration", type=float, default=10, help="1回の計測時間（秒）")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="オープンループの同時実行上限")
+    parser.add_argument("--find-saturation", action="store_true", help="SLO を満たす最大到着レートを探す")
+    parser.add_argument("--step", type=float, default=1.5, help="飽和点探索でのレートの倍率")
+    parser.add_argument("--max-rate", type=float, default=5000, help="飽和点探索の上限レート")
+    parser.add_argument("--pool", type=int, default=256, help="エンドポイントごとの事前生成ペイロード数")
+    parser.add_argument("--text-length", type=int, default=800, help="会話テキストの文字数")
+    parser.add_argument("--image-kb", type=int, default=64, help="画像チェックの画像サイズ（KB）")
+    parser.add_argument("--density", type=float, default=0.2, help="キーワード密度（0.0〜1.0）")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Batch endpoint tests."""
+
+import random
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.dark_job_checker import KEYWORD_MATCHER as DARK_JOB_MATCHER
+from app.services.dark_job_checker import DarkJobChecker
+from app.services.metadata_analyzer import MetadataAnalyzer
+from app.services.scam_analyzer import KEYWORD_MATCHER as SCAM_MATCHER
+from app.services.scam_analyzer import ScamAnalyzer
+
+client = TestClient(app)
+
+FILLER = ["お元気ですか。", "明日は晴れです。", "\n", "報酬は即日。", "連絡先はTelegram。"]
+
+
+def _texts(keywords, seed: int, size: int = 200) -> list[str]:
+    rng = random.Random(seed)
+    vocabulary = list(keywords) + FILLER
+    return ["".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 10))) for _ in range(size)]
+
+
+def _normalized(result: dict) -> dict:
+    return {**result, "keywords_found": sorted(result["keywords_found"])}
+
+
+class TestBatchScoring:
+    def test_scam_batch_matches_single(self):
+        analyzer = ScamAnalyzer()
+        texts = _texts(SCAM_MATCHER.keywords, seed=0)
+        batch = analyzer.analyze_batch(texts)
+        assert [_normalized(r) for r in batch] == [_normalized(analyzer.analyze(t)) for t in texts]
+
+    def test_dark_job_batch_matches_single(self):
+        checker = DarkJobChecker()
+        texts = _texts(DARK_JOB_MATCHER.keywords, seed=1)
+        batch = checker.check_batch(texts)
+        assert [_normalized(r) for r in batch] == [_normalized(checker.check(t)) for t in texts]
+
+    def test_metadata_batch_matches_single(self):
+        analyzer = MetadataAnalyzer()
+        rng = random.Random(2)
+        numbers = ["+44123456789", "090-1234-5678", "050-1111-2222", "非通知", "110"]
+        contents = _texts(["当選", "至急", "口座", "https://evil.example.com/x", "本日中"], seed=3, size=50)
+        items = [
+            (rng.choice(numbers), rng.choice(["call", "sms"]), rng.choice(contents + [None]))
+            for _ in range(200)
+        ]
+        assert analyzer.analyze_batch(items) == [analyzer.analyze(*item) for item in items]
+
+    def test_empty_batch(self):
+        assert ScamAnalyzer().analyze_batch([]) == []
+
+
+class TestBatchEndpoints:
+    def test_conversation_batch_keeps_order_and_reports_item_errors(self):
+        res = client.post(
+            "/api/v1/analyze/conversation:batch",
+            json={"items": [{"text": "還付金があります。ATMで手続き"}, {"text": ""}, {"text": "明日は晴れ"}]},
+        )
+        assert res.status_code == 200
+        results = res.json()["results"]
+        assert [r["index"] for r in results] == [0, 1, 2]
+        assert results[0]["result"]["scam_type"] == "refund_fraud"
+        assert results[1]["result"] is None and "text" in results[1]["error"]
+        assert results[2]["result"]["scam_type"] == "none"
+
+    def test_dark_job_batch(self):
+        res = client.post(
+            "/api/v1/check/dark-job:batch",
+            json={"items": [{"text": "受け子募集。高額バイト"}, {"source": "sms"}]},
+        )
+        results = res.json()["results"]
+        assert results[0]["result"]["is_dark_job"] is True
+        assert results[1]["error"] is not None
+
+    def test_metadata_batch(self):
+        res = client.post(
+            "/api/v1/analyze/call-metadata:batch",
+            json={"items": [{"phone_number": "+44123456789"}, {"phone_number": "09012345678", "call_type": "call"}]},
+        )
+        results = res.json()["results"]
+        assert results[0]["result"]["risk_score"] >= 40
+        assert results[1]["result"]["risk_score"] < 20
+
+    def test_empty_items_returns_422(self):
+        res = client.post("/api/v1/analyze/conversation:batch", json={"items": []})
+        assert res.status_code == 422
+
+    def test_too_many_items_returns_422(self):
+        res = client.post("/api/v1/check/dark-job:batch", json={"items": [{"text": "a"}] * 1001})
+        assert res.status_code == 422
@@ -0,0 +1,45 @@
+"""Benchmark corpus generator and regression check tests."""
+
+import pytest
+
+from app.services.dark_job_checker import DarkJobChecker
+from app.services.scam_analyzer import ScamAnalyzer
+from benchmarks.bench_analyzers import compare
+from benchmarks.corpus import KINDS, CorpusGenerator
+
+
+class TestCorpusGenerator:
+    @pytest.mark.parametrize("kind", KINDS)
+    def test_seeded_and_exact_length(self, kind):
+        first = [CorpusGenerator(7).generate(kind, 300, 0.3) for _ in range(3)]
+        second = [CorpusGenerator(7).generate(kind, 300, 0.3) for _ in range(3)]
+        assert first == second
+        assert all(len(text) == 300 for text in first)
+
+    def test_density_controls_keywords(self):
+        analyzer = ScamAnalyzer()
+        benign = CorpusGenerator(1).transcript(1000, 0.0)
+        dense = CorpusGenerator(1).transcript(1000, 0.8)
+        assert analyzer.analyze(benign)["keywords_found"] == []
+        assert analyzer.analyze(dense)["keywords_found"]
+
+    def test_job_post_triggers_dark_job_checker(self):
+        assert DarkJobChecker().check(CorpusGenerator(3).job_post(500, 0.5))["risk_score"] > 0
+
+    def test_image_embeds_text(self):
+        image = CorpusGenerator(5).image(16 * 1024, 0.5)
+        assert len(image) == 16 * 1024
+        assert "・".encode() in image
+
+
+class TestBaselineCompare:
+    BASE = {"case": {"ops_per_sec": 1000.0, "peak_alloc_bytes": 100_000}}
+
+    def test_within_tolerance(self):
+        results = {"case": {"ops_per_sec": 800.0, "peak_alloc_bytes": 105_000}, "new": {}}
+        assert compare(results, self.BASE, tolerance=0.3, alloc_tolerance=0.1) == {}
+
+    def test_detects_regressions(self):
+        results = {"case": {"ops_per_sec": 600.0, "peak_alloc_bytes": 200_000}}
+        regressions = compare(results, self.BASE, tolerance=0.3, alloc_tolerance=0.1)
+        assert len(regressions["case"]) == 2
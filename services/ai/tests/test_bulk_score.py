@@ -0,0 +1,184 @@
+"""Offline bulk scoring CLI tests."""
+
+import gzip
+import json
+
+import pytest
+
+from app.services.dark_job_checker import DarkJobChecker
+from app.services.metadata_analyzer import MetadataAnalyzer
+from app.services.scam_analyzer import ScamAnalyzer
+from app.tools import bulk_score
+from app.tools.bulk_score import ScoreOptions, main
+
+TEXTS = [
+    "市役所の者ですが、還付金があります。ATMで手続きしてください。",
+    "高額バイト！受け子募集。Telegramで連絡。",
+    "明日は散歩に行きましょう。",
+    "キャッシュカードを封筒に入れてください。暗証番号も必要です。",
+]
+
+
+def _records(count: int) -> list[dict]:
+    records = []
+    for i in range(count):
+        record = {"id": f"e{i}", "text": TEXTS[i % len(TEXTS)]}
+        if i % 2 == 0:
+            record.update(caller_number="09012345678", call_type="sms", sms_content="至急ご確認ください")
+        records.append(record)
+    return records
+
+
+def _write_jsonl(path, records, extra_lines=()) -> None:
+    lines = [json.dumps(record, ensure_ascii=False) for record in records] + list(extra_lines)
+    opener = gzip.open if path.name.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _read(path) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def _normalized(results: list[dict]) -> list[dict]:
+    # keywords_found は集合から作るため、プロセス間で並びが変わる
+    for result in results:
+        for name in ("conversation", "dark_job", "metadata"):
+            if result.get(name):
+                result[name]["keywords_found"] = sorted(result[name]["keywords_found"])
+    return results
+
+
+class TestRecordScorer:
+    def test_matches_analyzers(self, tmp_path):
+        source = tmp_path / "events.jsonl.gz"
+        _write_jsonl(source, _records(10))
+        output = tmp_path / "scores.jsonl"
+        stats = bulk_score.bulk_score(source, output, ScoreOptions(), chunk_size=3)
+        assert stats == {"records": 10, "scored": 10, "elapsed": stats["elapsed"]}
+
+        results = _read(output)
+        assert [r["index"] for r in results] == list(range(10))
+        assert [r["id"] for r in results] == [f"e{i}" for i in range(10)]
+        for i, result in enumerate(results):
+            text = TEXTS[i % len(TEXTS)]
+            assert result["conversation"]["risk_score"] == ScamAnalyzer().analyze(text)["risk_score"]
+            assert result["dark_job"]["risk_score"] == DarkJobChecker().check(text)["risk_score"]
+            if i % 2 == 0:
+                expected = MetadataAnalyzer().analyze("09012345678", "sms", "至急ご確認ください")
+                assert result["metadata"]["risk_score"] == expected["risk_score"]
+            else:
+                assert result["metadata"] is None
+        assert not (tmp_path / "scores.jsonl.checkpoint").exists()
+
+    def test_reports_bad_records_in_place(self, tmp_path):
+        source = tmp_path / "events.jsonl"
+        _write_jsonl(source, _records(2), extra_lines=["", "not json", "[1]", '{"id": 9}'])
+        output = tmp_path / "scores.jsonl"
+        bulk_score.bulk_score(source, output, ScoreOptions(analyzers=("dark_job",)))
+        results = _read(output)
+        assert [r["index"] for r in results] == [0, 1, 2, 3, 4]
+        assert set(results[0]) == {"index", "id", "dark_job"}
+        assert "JSON" in results[2]["error"]
+        assert "オブジェクト" in results[3]["error"]
+        assert results[4] == {"index": 4, "id": 9, "error": "text がありません"}
+
+    def test_reports_non_string_metadata_fields(self, tmp_path):
+        source = tmp_path / "events.jsonl"
+        bad = [
+            {"id": "b0", "text": TEXTS[0], "caller_number": "09012345678", "sms_content": ["x"]},
+            {"id": "b1", "text": TEXTS[0], "caller_number": "09012345678", "call_type": 1},
+            {"id": "b2", "text": TEXTS[0], "caller_number": {"n": 1}},
+        ]
+        _write_jsonl(source, _records(2) + bad)
+        output = tmp_path / "scores.jsonl"
+        stats = bulk_score.bulk_score(source, output, ScoreOptions())
+        assert stats["scored"] == 5
+        results = _read(output)
+        assert results[0]["metadata"]["risk_score"] >= 0
+        assert results[2] == {"index": 2, "id": "b0", "error": "sms_content が文字列ではありません"}
+        assert results[3] == {"index": 3, "id": "b1", "error": "call_type が文字列ではありません"}
+        assert results[4] == {"index": 4, "id": "b2", "error": "caller_number が文字列ではありません"}
+        # メタデータを採点しないときは対象外の項目の型を問わない
+        bulk_score.bulk_score(source, output, ScoreOptions(analyzers=("dark_job",)))
+        assert all("error" not in result for result in _read(output))
+
+    def test_csv_with_custom_fields(self, tmp_path):
+        source = tmp_path / "checks.csv.gz"
+        with gzip.open(source, "wt", encoding="utf-8", newline="") as f:
+            f.write('check_id,message\n1,"還付金が\nあります"\n2,明日は散歩\n')
+        output = tmp_path / "scores.jsonl"
+        options = ScoreOptions(analyzers=("conversation",), id_field="check_id", text_field="message")
+        bulk_score.bulk_score(source, output, options)
+        results = _read(output)
+        assert [r["id"] for r in results] == ["1", "2"]
+        assert results[0]["conversation"]["scam_type"] == "refund_fraud"
+        assert "dark_job" not in results[0]
+
+    def test_process_pool_matches_inline(self, tmp_path):
+        source = tmp_path / "events.jsonl"
+        _write_jsonl(source, _records(40))
+        bulk_score.bulk_score(source, tmp_path / "inline.jsonl", ScoreOptions(), chunk_size=7)
+        bulk_score.bulk_score(source, tmp_path / "pool.jsonl", ScoreOptions(), workers=2, chunk_size=7)
+        assert _normalized(_read(tmp_path / "pool.jsonl")) == _normalized(_read(tmp_path / "inline.jsonl"))
+
+
+class TestCheckpoint:
+    def test_resumes_after_interruption(self, tmp_path, monkeypatch):
+        source = tmp_path / "events.jsonl.gz"
+        _write_jsonl(source, _records(25))
+        output = tmp_path / "scores.jsonl"
+        score_chunk = bulk_score._score_chunk
+        calls = []
+
+        def interrupted(start, records):
+            calls.append(start)
+            if len(calls) == 4:
+                raise KeyboardInterrupt
+            return score_chunk(start, records)
+
+        monkeypatch.setattr(bulk_score, "_score_chunk", interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            bulk_score.bulk_score(source, output, ScoreOptions(), chunk_size=4, checkpoint_interval=3600)
+        checkpoint = json.loads((tmp_path / "scores.jsonl.checkpoint").read_text(encoding="utf-8"))
+        assert checkpoint["records"] == 12
+        # 中断時に書きかけだった行は再開時に切り詰める
+        with open(output, "ab") as f:
+            f.write(b'{"index": 12, "conv')
+
+        monkeypatch.setattr(bulk_score, "_score_chunk", score_chunk)
+        stats = bulk_score.bulk_score(source, output, ScoreOptions(), chunk_size=4, resume=True)
+        assert stats["records"] == 25 and stats["scored"] == 13
+        assert [r["index"] for r in _read(output)] == list(range(25))
+        assert not (tmp_path / "scores.jsonl.checkpoint").exists()
+
+    def test_refuses_to_overwrite_or_mismatch(self, tmp_path):
+        source = tmp_path / "events.jsonl"
+        _write_jsonl(source, _records(3))
+        output = tmp_path / "scores.jsonl"
+        output.write_text("", encoding="utf-8")
+        bulk_score.write_checkpoint(
+            tmp_path / "scores.jsonl.checkpoint",
+            {"input": str(source.resolve()), "options": {}, "records": 1, "output_bytes": 0},
+        )
+        with pytest.raises(ValueError):
+            bulk_score.bulk_score(source, output, ScoreOptions())
+        with pytest.raises(ValueError):
+            bulk_score.bulk_score(source, output, ScoreOptions(), resume=True)
+
+
+class TestCli:
+    def test_main(self, tmp_path):
+        source = tmp_path / "events.jsonl"
+        _write_jsonl(source, _records(5))
+        output = tmp_path / "scores.jsonl"
+        assert main([str(source), "-o", str(output), "--workers", "0", "--analyzers", "conversation"]) == 0
+        assert len(_read(output)) == 5
+
+    def test_rejects_unknown_analyzer(self, tmp_path):
+        with pytest.raises(SystemExit):
+            main([str(tmp_path / "x.jsonl"), "-o", str(tmp_path / "out.jsonl"), "--analyzers", "ocr"])
+
+    def test_missing_input(self, tmp_path):
+        assert main([str(tmp_path / "missing.jsonl"), "-o", str(tmp_path / "out.jsonl"), "--workers", "0"]) == 1
@@ -0,0 +1,256 @@
+"""Threshold calibration tool tests."""
+
+import json
+
+import numpy as np
+import pytest
+
+from app.services.dark_job_checker import DarkJobChecker
+from app.services.metadata_analyzer import MetadataAnalyzer
+from app.services.rule_bundle import BUILTIN_RULES
+from app.services.scam_analyzer import ScamAnalyzer
+from app.tools import calibrate_thresholds
+from app.tools.calibrate_thresholds import (
+    analyzer_spec,
+    calibrate,
+    extract_features,
+    load_or_extract,
+    main,
+    read_corpus,
+    score_block,
+    threshold_metrics,
+    weight_grid,
+)
+
+SCAM_TEXTS = [
+    ("市役所の者ですが、還付金があります。ATMで手続きしてください。", 1, "refund_fraud"),
+    ("キャッシュカードを封筒に入れてください。暗証番号も必要です。至急お願いします。", 1, "cash_card_fraud"),
+    ("もしもし、俺だけど。事故を起こして示談金が必要なんだ。今日中に頼む。", 1, "ore_ore"),
+    ("未払いの料金があります。本日中に連絡がない場合は法的手続きに移ります。", 1, "billing_fraud"),
+    ("必ず儲かる投資の話があります。元本保証です。", 1, "investment_fraud"),
+    ("明日は散歩に行きましょう。", 0, "chat"),
+    ("銀行の窓口で手続きを済ませました。", 0, "chat"),
+    ("還付金の申請は税務署で行います。", 0, "tax_notice"),
+]
+
+DARK_JOB_TEXTS = [
+    ("高額バイト！受け子募集。Telegramで連絡。", 1, "recruit"),
+    ("簡単に稼げる仕事。報酬は即日払い。連絡先はTelegramまで。", 1, "recruit"),
+    ("報酬は即日払いのアルバイトです。", 1, "recruit"),
+    ("急募！身分証を送ってください。", 1, "recruit"),
+    ("コンビニのアルバイト募集。時給1100円。", 0, "job"),
+    ("週払い可の倉庫作業です。", 0, "job"),
+]
+
+METADATA_RECORDS = [
+    {"caller_number": "+8613800000000", "call_type": "call", "label": 1},
+    {"caller_number": "09012345678", "call_type": "sms", "sms_content": "至急 未払いの料金 https://x.top/a", "label": 1},
+    {"caller_number": "非通知", "call_type": "call", "label": 1},
+    {"caller_number": "09012345678", "call_type": "sms", "sms_content": "明日の予定です", "label": 0},
+    {"caller_number": "0312345678", "call_type": "call", "label": 0},
+    {"text": "番号なし", "label": 0},
+]
+
+
+def _write_jsonl(path, records) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _corpus(path, texts) -> None:
+    _write_jsonl(path, [{"text": text, "label": label, "type": kind} for text, label, kind in texts])
+
+
+def _scores(analyzer, features, weights, grey_zone=None):
+    scores, grey, top = score_block(analyzer, features, np.asarray(weights)[None, :], grey_zone)
+    return scores[0], None if grey is None else grey[0], None if top is None else top[0]
+
+
+class TestVectorizedScores:
+    def test_conversation_matches_analyzer(self, tmp_path):
+        path = tmp_path / "corpus.jsonl"
+        _corpus(path, SCAM_TEXTS)
+        features = extract_features("conversation", read_corpus(path, "conversation"), BUILTIN_RULES)
+        spec = analyzer_spec("conversation", BUILTIN_RULES)
+        scores, _, top = _scores("conversation", features, spec.weights)
+        for (text, _, _), score, pattern in zip(SCAM_TEXTS, scores, top):
+            result = ScamAnalyzer().analyze(text)
+            assert score == result["risk_score"]
+            if result["scam_type"] != "none":
+                assert spec.type_names[pattern] == result["scam_type"]
+
+    def test_dark_job_matches_checker(self, tmp_path):
+        path = tmp_path / "corpus.jsonl"
+        _corpus(path, DARK_JOB_TEXTS)
+        features = extract_features("dark_job", read_corpus(path, "dark_job"), BUILTIN_RULES)
+        spec = analyzer_spec("dark_job", BUILTIN_RULES)
+        scores, grey, _ = _scores("dark_job", features, spec.weights, spec.grey_zone)
+        checker = DarkJobChecker()
+        for (text, _, _), score, in_grey in zip(DARK_JOB_TEXTS, scores, grey):
+            assert score == checker.check(text)["risk_score"]
+            rule_score, matched = checker.rule_verdict(text)
+            assert in_grey == (bool(matched) and BUILTIN_RULES.dark_job.in_grey_zone(rule_score))
+        # グレーゾーンに入り、近接ルールで補正される件を含むこと
+        assert (grey & (features["boost"] > 0)).any()
+
+    def test_metadata_matches_analyzer(self, tmp_path):
+        path = tmp_path / "corpus.jsonl"
+        _write_jsonl(path, METADATA_RECORDS)
+        records = read_corpus(path, "metadata")
+        assert len(records) == 5
+        features = extract_features("metadata", records, BUILTIN_RULES)
+        scores, _, _ = _scores("metadata", features, analyzer_spec("metadata", BUILTIN_RULES).weights)
+        analyzer = MetadataAnalyzer()
+        for record, score in zip(METADATA_RECORDS, scores):
+            expected = analyzer.analyze(record["caller_number"], record["call_type"], record.get("sms_content"))
+            assert score == expected["risk_score"]
+
+    def test_weights_change_scores(self, tmp_path):
+        path = tmp_path / "corpus.jsonl"
+        _corpus(path, SCAM_TEXTS[:1])
+        features = extract_features("conversation", read_corpus(path, "conversation"), BUILTIN_RULES)
+        weights = analyzer_spec("conversation", BUILTIN_RULES).weights
+        lowered = np.where(features["pattern_hits"][0], weights - 30, weights)
+        assert _scores("conversation", features, lowered)[0][0] == _scores("conversation", features, weights)[0][0] - 30
+
+
+class TestSweep:
+    def test_weight_grid(self):
+        grid = weight_grid(np.array([95, 10]), [-10, 10], 100)
+        # 0 は常に含め、0〜100 に丸めて重複を除く
+        assert grid.tolist() == [[85, 0], [85, 10], [85, 20], [95, 0], [95, 10], [95, 20], [100, 0], [100, 10], [100, 20]]
+        with pytest.raises(ValueError):
+            weight_grid(np.zeros(7, dtype=np.int64), [-10, 0, 10], 1000)
+
+    def test_threshold_metrics(self):
+        positives = np.zeros(101, dtype=np.int64)
+        negatives = np.zeros(101, dtype=np.int64)
+        positives[[80, 60, 40]] = 1
+        negatives[[50, 10]] = 1
+        metrics = threshold_metrics(positives, negatives)
+        assert [int(metrics[k][50]) for k in ("tp", "fp", "fn", "tn")] == [2, 1, 1, 1]
+        assert metrics["precision"][50] == pytest.approx(2 / 3)
+        assert metrics["recall"][0] == 1.0 and metrics["recall"][100] == 0.0
+        # 陽性と判定した件がなければ適合率は 0
+        assert metrics["precision"][100] == 0.0
+        assert metrics["f1"].argmax() == 11
+
+    def test_sweep_matches_per_setting_scores(self, tmp_path):
+        path = tmp_path / "corpus.jsonl"
+        _corpus(path, DARK_JOB_TEXTS)
+        features = extract_features("dark_job", read_corpus(path, "dark_job"), BUILTIN_RULES)
+        spec = analyzer_spec("dark_job", BUILTIN_RULES)
+        grid = weight_grid(spec.weights, [-10, 0], 1000)
+        zones = [(20, 55), (30, 40)]
+        positives, negatives, llm_calls = calibrate_thresholds.sweep("dark_job", features, grid, zones)
+        for g, zone in enumerate(zones):
+            for c in (0, len(grid) // 2, len(grid) - 1):
+                scores, grey, _ = _scores("dark_job", features, grid[c], zone)
+                labels = features["labels"]
+                assert positives[g, c].tolist() == np.bincount(scores[labels], minlength=101).tolist()
+                assert negatives[g, c].tolist() == np.bincount(scores[~labels], minlength=101).tolist()
+                assert llm_calls[g, c] == grey.sum()
+
+    def test_sweep_in_blocks(self, tmp_path, monkeypatch):
+        path = tmp_path / "corpus.jsonl"
+        _corpus(path, SCAM_TEXTS)
+        features = extract_features("conversation", read_corpus(path, "conversation"), BUILTIN_RULES)
+        grid = weight_grid(analyzer_spec("conversation", BUILTIN_RULES).weights, [-5, 0], 1000)
+        expected = calibrate_thresholds.sweep("conversation", features, grid, [None])
+        monkeypatch.setattr(calibrate_thresholds, "BLOCK_ELEMENTS", 1)
+        for whole, blocked in zip(expected, calibrate_thresholds.sweep("conversation", features, grid, [None])):
+            assert np.array_equal(whole, blocked)
+
+
+class TestCalibrate:
+    def test_conversation_report(self, tmp_path):
+        path = tmp_path / "corpus.jsonl"
+        _corpus(path, SCAM_TEXTS)
+        features = extract_features("conversation", read_corpus(path, "conversation"), BUILTIN_RULES)
+        report = calibrate("conversation", features, analyzer_spec("conversation", BUILTIN_RULES), deltas=[-10, 0])
+        assert report["items"] == 8 and report["positives"] == 5
+        assert report["combinations"] == 32
+        current = report["current"]
+        assert current["weights"]["refund_fraud"] == 75
+        assert set(current["thresholds"]) == {"severity.high", "severity.medium", "summary.high", "summary.medium"}
+        assert current["thresholds"]["summary.medium"]["threshold"] == 30
+        assert len(current["curve"]) == 101 and current["curve"][0]["recall"] == 1.0
+        confusion = current["thresholds"]["severity.medium"]["confusion"]
+        assert sum(confusion.values()) == 8
+
+        types = current["by_type"]["types"]
+        assert current["by_type"]["threshold"] == "severity.medium"
+        assert types["refund_fraud"]["confusion"]["tp"] == 1
+        assert types["chat"] == {"items": 2, "positives": 0, "flagged": 0, "flagged_rate": 0.0}
+        assert "confusion" not in types["tax_notice"]
+
+        top = report["top"]
+        assert len(top) == 10
+        assert top[0]["f1"] >= current["best"]["f1"]
+        assert [entry["f1"] for entry in top] == sorted((entry["f1"] for entry in top), reverse=True)
+        assert "by_type" in top[0] and "grey_zone" not in top[0]
+
+    def test_dark_job_llm_calls(self, tmp_path):
+        path = tmp_path / "corpus.jsonl"
+        _corpus(path, DARK_JOB_TEXTS)
+        features = extract_features("dark_job", read_corpus(path, "dark_job"), BUILTIN_RULES)
+        spec = analyzer_spec("dark_job", BUILTIN_RULES)
+        report = calibrate("dark_job", features, spec, grey_zones=[(0, 100), (20, 55)], top=5)
+        assert report["combinations"] == 2
+        current = report["current"]
+        assert current["grey_zone"] == [20, 55]
+        _, grey, _ = _scores("dark_job", features, spec.weights, spec.grey_zone)
+        assert current["llm_calls"] == grey.sum()
+        assert current["llm_call_rate"] == round(grey.sum() / 6, 4)
+
+        wide = next(entry for entry in report["top"] if entry["grey_zone"] == [0, 100])
+        assert wide["llm_calls"] == int(features["category_hits"].any(axis=1).sum())
+        limited = calibrate("dark_job", features, spec, grey_zones=[(0, 100)], max_llm_rate=current["llm_calls"] / 6)
+        assert [entry["grey_zone"] for entry in limited["top"]] == [[20, 55]]
+
+
+class TestCache:
+    def test_reuses_features(self, tmp_path, monkeypatch):
+        path = tmp_path / "corpus.jsonl"
+        _corpus(path, SCAM_TEXTS)
+        cache = tmp_path / "features.npz"
+        first = load_or_extract(path, "conversation", BUILTIN_RULES, cache_path=cache)
+        assert cache.exists()
+
+        def fail(*args):
+            raise AssertionError("照合し直しました")
+
+        monkeypatch.setattr(calibrate_thresholds, "extract_features", fail)
+        cached = load_or_extract(path, "conversation", BUILTIN_RULES, cache_path=cache)
+        assert set(cached) == set(first)
+        for name in first:
+            assert np.array_equal(cached[name], first[name])
+
+        # 入力が変わればキャッシュを使わない
+        _corpus(path, SCAM_TEXTS[:2])
+        with pytest.raises(AssertionError):
+            load_or_extract(path, "conversation", BUILTIN_RULES, cache_path=cache)
+
+
+class TestCli:
+    def test_main(self, tmp_path, capsys):
+        path = tmp_path / "corpus.jsonl"
+        _corpus(path, DARK_JOB_TEXTS)
+        output = tmp_path / "report.json"
+        argv = [str(path), "--analyzer", "dark_job", "--deltas=-5,0", "--grey-zones", "25-50", "-o", str(output)]
+        assert main(argv) == 0
+        report = json.loads(output.read_text(encoding="utf-8"))
+        assert report["analyzer"] == "dark_job" and report["combinations"] == 256
+        assert "F1 の高い設定" in capsys.readouterr().out
+
+    def test_rejects_bad_labels(self, tmp_path):
+        path = tmp_path / "corpus.jsonl"
+        _write_jsonl(path, [{"text": "a", "label": "maybe"}])
+        assert main([str(path)]) == 1
+
+    def test_rejects_grey_zones_for_other_analyzers(self, tmp_path):
+        with pytest.raises(SystemExit):
+            main([str(tmp_path / "x.jsonl"), "--grey-zones", "20-55"])
+        with pytest.raises(SystemExit):
+            main([str(tmp_path / "x.jsonl"), "--analyzer", "dark_job", "--grey-zones", "60-20"])
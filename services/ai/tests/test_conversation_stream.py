@@ -0,0 +1,95 @@
+"""Streaming conversation analysis tests."""
+
+import random
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.conversation_stream import ConversationStreamSession
+from app.services.scam_analyzer import KEYWORD_MATCHER, ScamAnalyzer
+
+client = TestClient(app)
+
+STREAM_PATH = "/api/v1/analyze/conversation/stream"
+
+
+def _chunks(text: str, rng: random.Random) -> list[str]:
+    chunks, pos = [], 0
+    while pos < len(text):
+        size = rng.randint(1, 6)
+        chunks.append(text[pos:pos + size])
+        pos += size
+    return chunks
+
+
+class TestStreamSession:
+    def test_matches_full_text_analysis(self):
+        rng = random.Random(0)
+        analyzer = ScamAnalyzer()
+        vocabulary = list(KEYWORD_MATCHER.keywords) + ["もしもし。", "そうですか。", "\n"]
+        for _ in range(100):
+            text = "".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 12)))
+            session = ConversationStreamSession(threshold=70)
+            for chunk in _chunks(text, rng):
+                session.feed(chunk)
+            session.finish()
+            expected = analyzer.analyze(text)
+            assert session.risk_score == expected["risk_score"]
+            assert session.scam_type == expected["scam_type"]
+            assert sorted(session.result()["keywords_found"]) == sorted(expected["keywords_found"])
+
+    def test_keyword_split_across_chunks(self):
+        session = ConversationStreamSession(threshold=70)
+        assert session.feed("キャッシュ") == ([], False)
+        new_keywords, crossed = session.feed("カードを預かりに伺います")
+        assert "キャッシュカード" in new_keywords
+        assert crossed is True
+        assert session.risk_score >= 80
+
+    def test_alert_only_once(self):
+        session = ConversationStreamSession(threshold=50)
+        assert session.feed("還付金があります")[1] is True
+        assert session.feed("ATMで手続きを、今すぐ")[1] is False
+        assert session.alerted is True
+
+
+class TestStreamEndpoint:
+    def test_update_alert_and_final(self):
+        with client.websocket_connect(f"{STREAM_PATH}?threshold=80") as ws:
+            ws.send_json({"text": "市役所の者です。"})
+            update = ws.receive_json()
+            assert update["type"] == "update"
+            assert update["new_keywords"] == ["市役所"]
+            assert update["risk_score"] == 75
+            assert update["scam_type"] == "refund_fraud"
+
+            ws.send_json({"text": "医療費の払い戻しがあります。今すぐ"})
+            alert = ws.receive_json()
+            assert alert["type"] == "alert"
+            assert alert["risk_score"] == 80
+            assert "払い戻し" in alert["keywords_found"]
+
+            ws.send_json({"type": "end"})
+            final = ws.receive_json()
+            assert final["type"] == "final"
+            assert final["risk_score"] == alert["risk_score"]
+            assert final["model_version"] == "rule-v0.1.0"
+
+    def test_custom_threshold(self):
+        with client.websocket_connect(f"{STREAM_PATH}?threshold=100") as ws:
+            ws.send_json({"text": "還付金があります"})
+            assert ws.receive_json()["type"] == "update"
+
+    def test_invalid_messages(self):
+        with client.websocket_connect(STREAM_PATH) as ws:
+            ws.send_text("not json")
+            assert ws.receive_json()["type"] == "error"
+            ws.send_json({"text": 123})
+            assert ws.receive_json()["type"] == "error"
+            ws.send_json({"text": "あ" * 5000})
+            assert ws.receive_json()["type"] == "error"
+            ws.send_json({"type": "end"})
+            final = ws.receive_json()
+            assert final["type"] == "final"
+            assert final["scam_type"] == "none"
+            assert final["chars"] == 0
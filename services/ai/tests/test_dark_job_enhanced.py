@@ -28,6 +28,12 @@ class TestDarkJobEnhancedV2:
         assert data["risk_score"] >= 15
         assert any(kw in ["DM", "インスタ", "プロフのリンク"] for kw in data["keywords_found"])
 
+    def test_ascii_keywords_do_not_match_inside_words(self):
+        checker = DarkJobChecker()
+        for text in ("admin page", "admission office, good morning", "Good morning, team"):
+            assert checker.check(text)["keywords_found"] == [], text
+        assert "DM" in checker.check("詳細は DM で")["keywords_found"]
+
     def test_luffy_syndicate_pattern(self):
         res = client.post(
             ENDPOINT,
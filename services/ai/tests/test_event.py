@@ -0,0 +1,70 @@
+"""Unified event analysis endpoint tests."""
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.key_points import extract_key_points
+from app.services.event_analyzer import scan_text
+
+client = TestClient(app)
+
+ENDPOINT = "/api/v1/analyze/event"
+
+TEXTS = [
+    "市役所の者ですが、還付金があります。ATMで手続きしてください。期限が今日までです。",
+    "オレだけど、事故を起こして示談金が必要。今すぐ200万円振り込んで。誰にも言わないで。",
+    "高額バイト！受け子募集。Telegramで連絡。今すぐ連絡ください。\nDMで応募。",
+    "お元気ですか？明日公園に散歩に行きましょう。天気が良さそうです。",
+]
+
+
+class TestEventAnalysis:
+    """POST /api/v1/analyze/event"""
+
+    def test_matches_individual_endpoints(self):
+        for text in TEXTS:
+            res = client.post(ENDPOINT, json={"text": text})
+            assert res.status_code == 200
+            data = res.json()
+
+            conversation = client.post("/api/v1/analyze/conversation", json={"text": text}).json()
+            summary = client.post("/api/v1/analyze/conversation-summary", json={"text": text}).json()
+            dark_job = client.post("/api/v1/check/dark-job", json={"text": text}).json()
+
+            assert data["conversation"]["risk_score"] == conversation["risk_score"]
+            assert data["conversation"]["scam_type"] == conversation["scam_type"]
+            assert data["conversation"]["summary"] == conversation["summary"]
+            assert set(data["conversation"]["keywords_found"]) == set(conversation["keywords_found"])
+            assert data["summary"]["key_points"] == summary["key_points"]
+            assert data["summary"]["recommended_actions"] == summary["recommended_actions"]
+            assert data["dark_job"]["risk_score"] == dark_job["risk_score"]
+            assert data["dark_job"]["risk_level"] == dark_job["risk_level"]
+            assert data["metadata"] is None
+
+    def test_includes_metadata_for_sms(self):
+        payload = {
+            "phone_number": "+44123456789",
+            "call_type": "sms",
+            "sms_content": "お届け物をお届けにあがりましたが不在でした。至急 http://evil.example.com",
+        }
+        res = client.post(
+            ENDPOINT,
+            json={
+                "text": payload["sms_content"],
+                "caller_number": payload["phone_number"],
+                "call_type": "sms",
+                "sms_content": payload["sms_content"],
+            },
+        )
+        assert res.status_code == 200
+        metadata = client.post("/api/v1/analyze/call-metadata", json=payload).json()
+        assert res.json()["metadata"] == metadata
+
+    def test_empty_text_returns_422(self):
+        res = client.post(ENDPOINT, json={"text": ""})
+        assert res.status_code == 422
+
+
+def test_shared_scan_key_points_match_rescan():
+    for text in TEXTS + ["銀行。\n\n 孫が事故。病院 。お金", "天気。散歩。晴れ。夕飯。"]:
+        assert extract_key_points(text, scan_text(text).positions) == extract_key_points(text)
@@ -0,0 +1,136 @@
+"""CPU executor tier tests."""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import Settings
+from app.main import app
+from app.services import executor as executor_module
+from app.services.executor import (
+    ExecutorPool,
+    ExecutorSaturatedError,
+    executor_queue_wait_seconds,
+    executor_run_seconds,
+)
+from app.services.ocr_service import OcrService
+
+client = TestClient(app)
+
+
+def _sample_count(histogram, pool: str) -> float:
+    for metric in histogram.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_count") and sample.labels.get("pool") == pool:
+                return sample.value
+    return 0.0
+
+
+class TestExecutorPool:
+    def test_thread_pool_runs_and_records_histograms(self):
+        pool = ExecutorPool("test-thread", "thread", workers=2, queue_size=4)
+
+        async def main():
+            return await asyncio.gather(*(pool.run(pow, i, 2) for i in range(5)))
+
+        try:
+            results = asyncio.run(main())
+        finally:
+            pool.shutdown()
+        assert list(results) == [0, 1, 4, 9, 16]
+        assert pool.pending == 0
+        assert _sample_count(executor_queue_wait_seconds, "test-thread") == 5
+        assert _sample_count(executor_run_seconds, "test-thread") == 5
+
+    def test_rejects_when_queue_full(self):
+        pool = ExecutorPool("test-full", "thread", workers=1, queue_size=1)
+        release = threading.Event()
+
+        async def main():
+            running = [asyncio.ensure_future(pool.run(release.wait, 5)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            with pytest.raises(ExecutorSaturatedError):
+                await pool.run(release.wait, 5)
+            release.set()
+            return await asyncio.gather(*running)
+
+        try:
+            assert asyncio.run(main()) == [True, True]
+        finally:
+            pool.shutdown()
+        assert pool.pending == 0
+
+    def test_cancelled_caller_keeps_slot_until_job_finishes(self):
+        pool = ExecutorPool("test-cancel", "thread", workers=1, queue_size=0)
+        started = threading.Event()
+        release = threading.Event()
+
+        def job():
+            started.set()
+            return release.wait(5)
+
+        async def main():
+            task = asyncio.ensure_future(pool.run(job))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # ジョブはまだ動いているので、枠は空かない
+            assert pool.pending == 1
+            with pytest.raises(ExecutorSaturatedError):
+                await pool.run(pow, 2, 2)
+            release.set()
+            for _ in range(100):
+                if pool.pending == 0:
+                    break
+                await asyncio.sleep(0.01)
+            return await pool.run(pow, 2, 2)
+
+        try:
+            assert asyncio.run(main()) == 4
+        finally:
+            release.set()
+            pool.shutdown()
+        assert pool.pending == 0
+
+    def test_exception_releases_slot(self):
+        pool = ExecutorPool("test-error", "thread", workers=1, queue_size=0)
+        try:
+            with pytest.raises(ZeroDivisionError):
+                asyncio.run(pool.run(divmod, 1, 0))
+            assert pool.pending == 0
+            assert asyncio.run(pool.run(divmod, 7, 2)) == (3, 1)
+        finally:
+            pool.shutdown()
+
+    def test_process_pool(self):
+        pool = ExecutorPool("test-process", "process", workers=1, queue_size=2)
+        try:
+            result = asyncio.run(pool.run(OcrService().extract_text, "5pel57WmMTDkuIfjga7pq5jpoY3jg5DjgqTjg4g="))
+        finally:
+            pool.shutdown()
+        assert "日給10万" in result
+
+
+class TestExecutorSettings:
+    def test_parse_pool_specs(self):
+        specs = Settings(executor_pools="analysis=thread:8:100, ocr=process:2:0").executor_pool_specs
+        assert specs == {"analysis": ("thread", 8, 100), "ocr": ("process", 2, 0)}
+
+    @pytest.mark.parametrize("value", ["analysis=fiber:1:1", "analysis=thread:0:1", "analysis=thread:1"])
+    def test_invalid_specs(self, value):
+        with pytest.raises(ValueError):
+            Settings(executor_pools=value)
+
+
+class TestSaturatedEndpoint:
+    def test_returns_503(self, monkeypatch):
+        full = ExecutorPool("analysis", "thread", workers=1, queue_size=0)
+        full._pending = 1
+        monkeypatch.setitem(executor_module._pools, "analysis", full)
+        response = client.post("/api/v1/check/dark-job", json={"text": "503確認用テキスト"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert "X-Request-ID" in response.headers
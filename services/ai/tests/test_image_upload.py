@@ -0,0 +1,147 @@
+"""Binary image upload tests."""
+
+import base64
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app
+from app.services.image_upload import (
+    MultipartImageReader,
+    UploadBuffer,
+    UploadFormatError,
+    UploadTooLargeError,
+    multipart_boundary,
+)
+
+client = TestClient(app)
+
+UPLOAD_ENDPOINT = "/api/v1/check/dark-job-image/upload"
+IMAGE = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) + "日給10万の高額バイト、Telegramで連絡".encode() + b"\r\n--x" * 3
+BOUNDARY = b"----test-boundary"
+
+
+def _multipart(image: bytes, boundary: bytes = BOUNDARY) -> bytes:
+    return (
+        b"preamble\r\n"
+        b"--" + boundary + b"\r\n"
+        b'Content-Disposition: form-data; name="note"\r\n\r\n'
+        b"memo\r\n"
+        b"--" + boundary + b"\r\n"
+        b'Content-Disposition: form-data; name="image"; filename="a.png"\r\n'
+        b"Content-Type: image/png\r\n\r\n" + image + b"\r\n"
+        b"--" + boundary + b"--\r\n"
+        b"epilogue"
+    )
+
+
+def _read(body: bytes, chunk_size: int, limit: int = 1 << 20) -> bytes:
+    buffer = UploadBuffer(limit)
+    reader = MultipartImageReader(BOUNDARY, buffer)
+    for i in range(0, len(body), chunk_size):
+        reader.feed(body[i:i + chunk_size])
+    reader.finish()
+    return bytes(buffer.view)
+
+
+class TestUploadBuffer:
+    def test_grows_up_to_limit(self):
+        buffer = UploadBuffer(1000)
+        for _ in range(10):
+            buffer.write(b"x" * 100)
+        assert bytes(buffer.view) == b"x" * 1000
+        with pytest.raises(UploadTooLargeError):
+            buffer.write(b"x")
+
+    def test_shared_memory(self):
+        with UploadBuffer(1000, 10, shared=True) as buffer:
+            buffer.write(b"0123456789")
+            assert buffer.name is not None
+            with pytest.raises(UploadTooLargeError):
+                buffer.write(b"x")
+
+
+class TestMultipartReader:
+    @pytest.mark.parametrize("chunk_size", [1, 2, 7, 19, 64, 100000])
+    def test_extracts_image_part(self, chunk_size):
+        assert _read(_multipart(IMAGE), chunk_size) == IMAGE
+
+    def test_boundary(self):
+        assert multipart_boundary(f'multipart/form-data; boundary="{BOUNDARY.decode()}"') == BOUNDARY
+        assert multipart_boundary("image/png") is None
+        with pytest.raises(UploadFormatError):
+            multipart_boundary("multipart/form-data")
+
+    def test_limit_applies_to_image(self):
+        with pytest.raises(UploadTooLargeError):
+            _read(_multipart(IMAGE), 16, limit=len(IMAGE) - 1)
+
+    def test_missing_image_part(self):
+        body = b"--" + BOUNDARY + b'\r\nContent-Disposition: form-data; name="other"\r\n\r\nx\r\n--' + BOUNDARY + b"--"
+        with pytest.raises(UploadFormatError):
+            _read(body, 8)
+
+    def test_truncated_body(self):
+        with pytest.raises(UploadFormatError):
+            _read(_multipart(IMAGE)[:-40], 8)
+
+    def test_oversized_headers(self):
+        body = b"--" + BOUNDARY + b"\r\nX-Pad: " + b"a" * 10000
+        with pytest.raises(UploadFormatError):
+            _read(body, 512)
+
+
+class TestUploadEndpoint:
+    def test_raw_upload_matches_base64_path(self):
+        raw = client.post(UPLOAD_ENDPOINT, content=IMAGE, headers={"Content-Type": "image/png"})
+        encoded = client.post(
+            "/api/v1/check/dark-job-image", json={"image_base64": base64.b64encode(IMAGE).decode()}
+        )
+        assert raw.status_code == 200
+        assert raw.json() == encoded.json()
+        assert raw.json()["is_dark_job"] is True
+
+    def test_multipart_upload(self):
+        res = client.post(UPLOAD_ENDPOINT, files={"image": ("a.png", IMAGE, "image/png")}, data={"note": "memo"})
+        assert res.status_code == 200
+        assert "日給10万" in res.json()["keywords_found"]
+
+    def test_chunked_upload(self):
+        def chunks():
+            for i in range(0, len(IMAGE), 10):
+                yield IMAGE[i:i + 10]
+
+        res = client.post(UPLOAD_ENDPOINT, content=chunks(), headers={"Content-Type": "application/octet-stream"})
+        assert res.request.headers.get("transfer-encoding") == "chunked"
+        assert res.status_code == 200
+        assert res.json()["is_dark_job"] is True
+
+    def test_larger_than_json_limit_accepted(self):
+        image = IMAGE + b"\x00" * (2 * 1024 * 1024)
+        res = client.post(UPLOAD_ENDPOINT, content=image, headers={"Content-Type": "image/png"})
+        assert res.status_code == 200
+
+    def test_declared_size_over_limit(self, monkeypatch):
+        monkeypatch.setattr(get_settings(), "image_upload_max_bytes", 100)
+        res = client.post(UPLOAD_ENDPOINT, content=IMAGE, headers={"Content-Type": "image/png"})
+        assert res.status_code == 413
+
+    def test_chunked_over_limit(self, monkeypatch):
+        monkeypatch.setattr(get_settings(), "image_upload_max_bytes", 100)
+
+        def chunks():
+            for _ in range(20):
+                yield b"x" * 10
+
+        res = client.post(UPLOAD_ENDPOINT, content=chunks(), headers={"Content-Type": "image/png"})
+        assert res.status_code == 413
+
+    def test_unsupported_content_type(self):
+        res = client.post(UPLOAD_ENDPOINT, content=b"{}", headers={"Content-Type": "application/json"})
+        assert res.status_code == 415
+
+    def test_empty_body(self):
+        res = client.post(UPLOAD_ENDPOINT, content=b"", headers={"Content-Type": "image/png"})
+        assert res.status_code == 200
+        assert res.json()["model_version"] == "ocr-fallback-v0.1.0"
@@ -0,0 +1,128 @@
+"""Aho-Corasick keyword matcher tests."""
+
+import random
+
+from app.services.keyword_matcher import KeywordMatcher
+from app.services.scam_analyzer import KEYWORD_MATCHER, SCAM_PATTERNS, URGENCY_KEYWORDS, ScamAnalyzer
+from app.services.text_normalizer import is_word_char, keyword_variants, normalize_text
+
+
+def _contains(text: str, keyword: str) -> bool:
+    """Reference: substring scan of the normalized text for every normalized variant.
+
+    Variants that start or end with an ASCII letter or digit only count at word boundaries.
+    """
+    normalized = normalize_text(text).text
+    for variant in keyword_variants(keyword):
+        start = normalized.find(variant)
+        while start >= 0:
+            end = start + len(variant)
+            before_ok = not (is_word_char(variant[0]) and start > 0 and is_word_char(normalized[start - 1]))
+            after_ok = not (is_word_char(variant[-1]) and end < len(normalized) and is_word_char(normalized[end]))
+            if before_ok and after_ok:
+                return True
+            start = normalized.find(variant, start + 1)
+    return False
+
+
+class TestKeywordMatcher:
+    def test_finds_overlapping_keywords(self):
+        matcher = KeywordMatcher(["今日中", "今日中に", "日中", "すぐに", "すぐに届く"])
+        assert matcher.find_all("今日中にすぐに届く") == {"今日中", "今日中に", "日中", "すぐに", "すぐに届く"}
+
+    def test_no_match_returns_empty(self):
+        matcher = KeywordMatcher(["還付金", "ATMで"])
+        assert matcher.find_all("明日の天気は晴れです。") == set()
+
+    def test_positions_cover_every_occurrence(self):
+        matcher = KeywordMatcher(["あい", "い", "あいう"])
+        assert sorted(matcher.find_positions("あいうあい")) == [
+            (0, "あい"), (0, "あいう"), (1, "い"), (3, "あい"), (4, "い"),
+        ]
+
+    def test_ascii_keywords_need_word_boundaries(self):
+        matcher = KeywordMatcher(["DM", "Signal", "ATMで"])
+        assert matcher.find_all("admin page") == set()
+        assert matcher.find_all("admission office, good morning") == set()
+        assert matcher.find_all("signals are weak") == set()
+        assert matcher.find_all("DMで連絡、Signal可") == {"DM", "Signal"}
+        assert matcher.find_all("ＤＭください") == {"DM"}
+        assert matcher.find_all("d・m 送って") == {"DM"}
+        assert matcher.find_all("ATMで") == {"ATMで"}
+        assert matcher.find_all("ZATMで") == set()
+        text = "xx, D M ok"
+        assert [(text[start:end], kw) for start, end, kw in matcher.find_spans(text)] == [("D M", "DM")]
+
+    def test_scan_waits_for_the_end_of_an_ascii_word(self):
+        matcher = KeywordMatcher(["DM"])
+        found, state = matcher.scan("ad")
+        found, state = matcher.scan("m", state)
+        assert found == set() and matcher.finish(state) == set()
+        found, state = matcher.scan("xx d")
+        found, state = matcher.scan("m", state)
+        assert found == set()
+        assert matcher.finish(state) == {"DM"}
+        found, state = matcher.scan("d")
+        found, state = matcher.scan("m です", state)
+        assert found == {"DM"}
+
+    def test_matches_across_spelling_variants(self):
+        matcher = KeywordMatcher(["ATMで", "振込", "LINE追加", "テレグラム", "払い戻し"])
+        assert matcher.find_all("ＡＴＭで") == {"ATMで"}
+        assert matcher.find_all("atm で") == {"ATMで"}
+        assert matcher.find_all("振り込みをお願い") == {"振込"}
+        assert matcher.find_all("L・I・N・E 追加して") == {"LINE追加"}
+        assert matcher.find_all("ﾃﾚｸﾞﾗﾑ") == matcher.find_all("てれぐらむ") == {"テレグラム"}
+        assert matcher.find_all("払戻の手続") == {"払い戻し"}
+
+    def test_spans_point_into_original_text(self):
+        matcher = KeywordMatcher(["振込", "ATM"])
+        text = "まず、振 り 込 みを。ＡＴＭ"
+        spans = matcher.find_spans(text)
+        assert [(text[start:end], kw) for start, end, kw in spans] == [("振 り 込", "振込"), ("ＡＴＭ", "ATM")]
+        assert matcher.find_positions(text) == [(3, "振込"), (12, "ATM")]
+
+    def test_scan_resumes_across_normalized_chunks(self):
+        matcher = KeywordMatcher(["キャッシュカード"])
+        found, state = matcher.scan("ｷｬｯｼｭ")
+        assert found == set()
+        found, _ = matcher.scan(" かーど", state)
+        assert found == {"キャッシュカード"}
+
+    def test_ignores_empty_and_duplicate_keywords(self):
+        matcher = KeywordMatcher(["", "DM", "DM"])
+        assert matcher.keywords == ("DM",)
+
+    def test_matches_naive_scan_on_random_text(self):
+        rng = random.Random(0)
+        keywords = list(KEYWORD_MATCHER.keywords)
+        alphabet = "".join(keywords) + "、。あいう"
+        for _ in range(200):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 200)))
+            expected = {kw for kw in keywords if _contains(text, kw)}
+            assert KEYWORD_MATCHER.find_all(text) == expected
+
+
+def _legacy_analyze(text: str) -> tuple[int, str, set[str]]:
+    """Reference: the original per-keyword substring scan (on normalized text)."""
+    matched = []
+    for name, keywords, base in SCAM_PATTERNS:
+        found = [kw for kw in keywords if _contains(text, kw)]
+        if found:
+            matched.append((name, found, base))
+    if not matched:
+        return 5, "none", set()
+    matched.sort(key=lambda x: x[2], reverse=True)
+    urgency = [kw for kw in URGENCY_KEYWORDS if _contains(text, kw)]
+    score = min(matched[0][2] + min(len(urgency) * 5, 15) + min((len(matched) - 1) * 10, 20), 100)
+    return score, matched[0][0], {kw for _, kws, _ in matched for kw in kws} | set(urgency)
+
+
+def test_analyzer_results_match_legacy_scan():
+    rng = random.Random(1)
+    analyzer = ScamAnalyzer()
+    vocabulary = list(KEYWORD_MATCHER.keywords) + ["お元気ですか。", "明日は晴れです。", "散歩に行きましょう。"]
+    for _ in range(300):
+        text = "".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 12)))
+        result = analyzer.analyze(text)
+        assert (result["risk_score"], result["scam_type"], set(result["keywords_found"])) == _legacy_analyze(text)
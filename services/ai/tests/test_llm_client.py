@@ -0,0 +1,292 @@
+"""Grey-zone LLM client tests."""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import dark_job
+from app.services.dark_job_checker import DarkJobChecker
+from app.services.llm_client import CircuitBreaker, LlmClient, llm_attempts_total, llm_batch_flushes_total
+from app.services.result_cache import ResultCache
+from benchmarks.fake_llm import FakeLlmConfig, create_app, fake_score
+
+# ルールスコア30（高額報酬の誘い）でグレーゾーン。ヒューリスティック補正では「簡単→高収入」で +12
+GREY_TEXT = "簡単に高収入のお仕事です"
+
+
+def _attempts(kind: str) -> float:
+    return llm_attempts_total.labels(kind=kind)._value.get()
+
+
+def _client(config: FakeLlmConfig, **kwargs) -> tuple[LlmClient, object]:
+    fake = create_app(config)
+    kwargs.setdefault("breaker", CircuitBreaker(failure_threshold=3, reset_timeout=30.0))
+    client = LlmClient("http://fake-llm", "fake-model", transport=httpx.ASGITransport(app=fake), **kwargs)
+    return client, fake
+
+
+def _score(client: LlmClient, text: str = GREY_TEXT, budget: float = 1.0) -> int | None:
+    async def main():
+        try:
+            return await client.grey_zone_score(text, 30, deadline=time.monotonic() + budget)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(main())
+
+
+class TestLlmClient:
+    def test_returns_score(self):
+        client, fake = _client(FakeLlmConfig(latency=0.0))
+        assert _score(client) == 30
+        assert fake.state.requests == 1
+
+    def test_hedges_slow_response(self):
+        client, fake = _client(
+            FakeLlmConfig(latency=0.0, slow_latency=5.0, script=["slow", "ok"]), hedge_delay=0.02
+        )
+        before = _attempts("hedge")
+        start = time.monotonic()
+        assert _score(client) == 30
+        assert time.monotonic() - start < 1.0
+        assert fake.state.requests == 2
+        assert _attempts("hedge") == before + 1
+
+    def test_retries_fast_failure(self):
+        client, fake = _client(FakeLlmConfig(latency=0.0, script=["error", "ok"]))
+        before = _attempts("retry")
+        assert _score(client) == 30
+        assert _attempts("retry") == before + 1
+        assert client.breaker.state == "closed"
+
+    def test_respects_deadline(self):
+        client, _ = _client(FakeLlmConfig(script=["hang", "hang"]), hedge_delay=0.02)
+        start = time.monotonic()
+        assert _score(client, budget=0.2) is None
+        assert time.monotonic() - start < 0.5
+
+    def test_skips_when_budget_spent(self):
+        client, fake = _client(FakeLlmConfig())
+        assert _score(client, budget=0.01) is None
+        assert fake.state.requests == 0
+
+    def test_deadline_cut_is_not_a_failure(self):
+        client, _ = _client(
+            FakeLlmConfig(script=["hang"] * 4), breaker=CircuitBreaker(failure_threshold=1, reset_timeout=30.0),
+            max_attempts=1,
+        )
+        # リクエストの残り予算（timeout より短い）で打ち切っても、ブレーカーは開かない
+        assert _score(client, budget=0.2) is None
+        assert client.breaker.state == "closed"
+
+        client, _ = _client(
+            FakeLlmConfig(script=["hang"] * 4), breaker=CircuitBreaker(failure_threshold=1, reset_timeout=30.0),
+            max_attempts=1, timeout=0.1,
+        )
+        assert _score(client, budget=1.0) is None
+        assert client.breaker.state == "open"
+
+    def test_circuit_opens_and_recovers(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0, clock=lambda: now[0])
+        client, fake = _client(FakeLlmConfig(latency=0.0, error_rate=1.0), breaker=breaker, max_attempts=1)
+
+        async def main():
+            scores = [await client.grey_zone_score(GREY_TEXT, 30) for _ in range(4)]
+            requests_while_open = fake.state.requests
+            now[0] = 11.0
+            fake.state.config.error_rate = 0.0
+            scores.append(await client.grey_zone_score(GREY_TEXT, 30))
+            await client.aclose()
+            return scores, requests_while_open
+
+        scores, requests_while_open = asyncio.run(main())
+        assert scores == [None, None, None, None, 30]
+        # 2回失敗した時点で開き、以降は問い合わせない
+        assert requests_while_open == 2
+        assert breaker.state == "closed"
+
+    def test_half_open_allows_single_probe(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5.0, clock=lambda: now[0])
+        breaker.record_failure()
+        assert not breaker.allow()
+        now[0] = 5.0
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+
+def _score_many(client: LlmClient, texts: list[str], budget: float = 1.0) -> list[int | None]:
+    async def main():
+        deadline = time.monotonic() + budget
+        try:
+            return await asyncio.gather(*(client.grey_zone_score(text, 30, deadline=deadline) for text in texts))
+        finally:
+            await client.aclose()
+
+    return asyncio.run(main())
+
+
+def _flushes(reason: str) -> float:
+    return llm_batch_flushes_total.labels(reason=reason)._value.get()
+
+
+class TestMicroBatching:
+    TEXTS = [GREY_TEXT, "日給5万の高額バイト", "Telegramで連絡、即日払い", "在宅で簡単", "普通のカフェ求人"]
+
+    def test_concurrent_items_share_one_call(self):
+        client, fake = _client(FakeLlmConfig(latency=0.0), batch_window=0.05)
+        before = _flushes("window")
+        assert _score_many(client, self.TEXTS) == [fake_score(text) for text in self.TEXTS]
+        assert fake.state.batch_sizes == [5]
+        assert _flushes("window") == before + 1
+
+    def test_flushes_when_batch_is_full(self):
+        client, fake = _client(FakeLlmConfig(latency=0.0), batch_window=0.05, batch_max_size=2)
+        before = _flushes("size")
+        assert _score_many(client, self.TEXTS) == [fake_score(text) for text in self.TEXTS]
+        assert fake.state.batch_sizes == [2, 2, 1]
+        assert _flushes("size") == before + 2
+
+    def test_wait_is_bounded_by_window(self):
+        client, fake = _client(FakeLlmConfig(latency=0.0), batch_window=0.05)
+        start = time.monotonic()
+        assert _score(client) == 30
+        # 後続が来なくても窓が閉じた時点で送る
+        assert 0.05 <= time.monotonic() - start < 0.5
+        assert fake.state.batch_sizes == [1]
+
+    def test_failed_batch_returns_none_to_all(self):
+        client, fake = _client(FakeLlmConfig(latency=0.0, error_rate=1.0), batch_window=0.02, max_attempts=1)
+        assert _score_many(client, self.TEXTS) == [None] * len(self.TEXTS)
+        assert fake.state.requests == 1
+        # まとめた問い合わせの失敗は1回として数える
+        assert client.breaker.state == "closed"
+
+    def test_cancelled_caller_does_not_affect_others(self):
+        client, fake = _client(FakeLlmConfig(latency=0.0), batch_window=0.05)
+
+        async def main():
+            deadline = time.monotonic() + 1
+            tasks = [asyncio.create_task(client.grey_zone_score(text, 30, deadline=deadline)) for text in self.TEXTS]
+            await asyncio.sleep(0.01)
+            tasks[0].cancel()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            await client.aclose()
+            return results
+
+        results = asyncio.run(main())
+        assert isinstance(results[0], asyncio.CancelledError)
+        assert results[1:] == [fake_score(text) for text in self.TEXTS[1:]]
+        assert fake.state.batch_sizes == [5]
+
+    def test_groups_items_by_deadline(self):
+        client, fake = _client(FakeLlmConfig(latency=0.0), batch_window=0.05)
+
+        async def main():
+            now = time.monotonic()
+            budgets = [1.0, 0.3, 1.0, 0.3, 1.0]
+            results = await asyncio.gather(*(
+                client.grey_zone_score(text, 30, deadline=now + budget) for text, budget in zip(self.TEXTS, budgets)
+            ))
+            await client.aclose()
+            return results
+
+        assert asyncio.run(main()) == [fake_score(text) for text in self.TEXTS]
+        # 期限の短い2件に長い3件の予算を削らせない
+        assert sorted(fake.state.batch_sizes) == [2, 3]
+
+    def test_short_budget_is_sent_without_waiting(self):
+        client, fake = _client(FakeLlmConfig(latency=0.0), batch_window=0.2)
+        before = _flushes("no_wait")
+        start = time.monotonic()
+        assert _score(client, budget=0.25) == 30
+        # 窓を待つと予算が尽きるため、ためずにすぐ単独で送る
+        assert time.monotonic() - start < 0.15
+        assert fake.state.batch_sizes == [1]
+        assert _flushes("no_wait") == before + 1
+
+    def test_rejects_wrong_number_of_scores(self):
+        def handler(request):
+            content = json.dumps({"risk_scores": [50]})
+            return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+        client = LlmClient(
+            "http://fake-llm", "fake-model", transport=httpx.MockTransport(handler),
+            batch_window=0.02, max_attempts=1,
+        )
+        assert _score_many(client, self.TEXTS[:2]) == [None, None]
+
+
+class TestDarkJobCheckerWithLlm:
+    def test_grey_zone_uses_llm_score(self):
+        client, _ = _client(FakeLlmConfig(latency=0.0))
+        checker = DarkJobChecker(llm=client)
+        result = asyncio.run(checker.check_async(GREY_TEXT, deadline=time.monotonic() + 1))
+        assert result["risk_score"] == 30
+        # 同じ本文でも LLM なしの判定はヒューリスティック補正の結果
+        assert DarkJobChecker().check(GREY_TEXT)["risk_score"] == 42
+
+    def test_falls_back_to_heuristic(self):
+        client, _ = _client(FakeLlmConfig(latency=0.0, error_rate=1.0))
+        cache = ResultCache("test-llm-fallback", max_entries=10, max_bytes=1 << 20, ttl=60)
+        checker = DarkJobChecker(cache=cache, llm=client)
+        result = asyncio.run(checker.check_async(GREY_TEXT, deadline=time.monotonic() + 1))
+        assert result == DarkJobChecker().check(GREY_TEXT)
+        # フォールバックの結果はキャッシュしない
+        assert len(cache) == 0
+
+    def test_outside_grey_zone_skips_llm(self):
+        client, fake = _client(FakeLlmConfig(latency=0.0))
+        checker = DarkJobChecker(llm=client)
+        text = "受け子の仕事、日給10万、Telegramで連絡"
+        result = asyncio.run(checker.check_async(text, deadline=time.monotonic() + 1))
+        assert result == DarkJobChecker().check(text)
+        assert fake.state.requests == 0
+
+    def test_batch_matches_single_checks(self):
+        client, fake = _client(FakeLlmConfig(latency=0.0), batch_window=0.02)
+        checker = DarkJobChecker(llm=client)
+        texts = [GREY_TEXT, "受け子の仕事、日給10万、Telegramで連絡", "明日は散歩", GREY_TEXT]
+        results = asyncio.run(checker.check_batch_async(texts, deadline=time.monotonic() + 1))
+        single = asyncio.run(DarkJobChecker(llm=_client(FakeLlmConfig(latency=0.0))[0]).check_async(GREY_TEXT))
+        assert results[0] == results[3] == single
+        assert results[0]["risk_score"] == 30
+        assert results[1:3] == DarkJobChecker().check_batch(texts[1:3])
+        # グレーゾーンの本文だけ、重複を除いて問い合わせる
+        assert fake.state.requests == 1
+
+
+class TestDarkJobEndpointWithLlm:
+    @pytest.fixture
+    def fake(self, monkeypatch):
+        client, fake = _client(FakeLlmConfig(latency=0.0))
+        monkeypatch.setattr(dark_job.checker, "llm", client)
+        monkeypatch.setattr(dark_job.checker, "cache", None)
+        monkeypatch.setattr(dark_job.checker, "near_cache", None)
+        return fake
+
+    def test_endpoint_asks_llm(self, fake):
+        with TestClient(app) as test_client:
+            response = test_client.post("/api/v1/check/dark-job", json={"text": GREY_TEXT})
+        assert response.status_code == 200
+        assert response.json()["risk_score"] == 30
+        assert fake.state.requests == 1
+
+    def test_batch_endpoint_asks_llm(self, fake):
+        with TestClient(app) as test_client:
+            response = test_client.post(
+                "/api/v1/check/dark-job:batch", json={"items": [{"text": GREY_TEXT}, {"text": "明日は散歩"}]}
+            )
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert results[0]["result"]["risk_score"] == 30
+        assert results[1]["result"]["risk_score"] == 0
+        assert fake.state.requests == 1
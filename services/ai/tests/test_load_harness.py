@@ -0,0 +1,34 @@
+"""Load-test harness tests."""
+
+import argparse
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.load_test import ENDPOINTS, EndpointStats, parse_mix, summarize
+
+client = TestClient(app)
+
+
+class TestLoadHarness:
+    @pytest.mark.parametrize("name", list(ENDPOINTS))
+    def test_payloads_accepted(self, name):
+        args = argparse.Namespace(text_length=400, density=0.3, image_kb=4)
+        payload = ENDPOINTS[name].build(CorpusGenerator(1), args)
+        assert client.post(ENDPOINTS[name].path, json=payload).status_code == 200
+
+    def test_parse_mix(self):
+        assert parse_mix("conversation=3, dark-job") == {"conversation": 3, "dark-job": 1}
+        with pytest.raises(ValueError):
+            parse_mix("unknown=1")
+
+    def test_summarize(self):
+        stats = {"a": EndpointStats([10.0] * 19 + [900.0], errors=0), "b": EndpointStats([], errors=2)}
+        rows = summarize(stats, elapsed=2.0)
+        assert rows["a"]["p50"] == 10.0
+        assert rows["a"]["p95"] == 900.0
+        assert rows["b"]["error_rate"] == 1.0
+        assert rows["total"]["count"] == 22
+        assert rows["total"]["rps"] == 11.0
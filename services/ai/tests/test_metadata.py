@@ -21,7 +21,7 @@ class TestMetadataAnalysis:
         data = res.json()
         assert data["risk_score"] >= 40
         assert "国際番号" in data["summary"]
-        assert data["model_version"] == "metadata-rule-v0.1.0"
+        assert data["model_version"] == "metadata-rule-v0.2.0"
 
     def test_suspicious_prefix_adds_risk(self):
         res = client.post(
@@ -91,3 +91,25 @@ class TestMetadataAnalysis:
     def test_missing_phone_number_returns_422(self):
         res = client.post(ENDPOINT, json={"call_type": "call"})
         assert res.status_code == 422
+
+    def test_full_width_and_hyphenated_number_normalized(self):
+        res = client.post(
+            ENDPOINT,
+            json={"phone_number": "＋８６－１２３４－５６７８－９０１", "call_type": "call"},
+        )
+        data = res.json()
+        assert data["risk_score"] >= 60
+        assert any("+86" in r for r in data["reasons"])
+
+    def test_domestic_ip_phone_forms_match_prefix(self):
+        for number in ("050-1234-5678", "+81 50 1234 5678", "0081-50-1234-5678"):
+            res = client.post(ENDPOINT, json={"phone_number": number, "call_type": "call"})
+            data = res.json()
+            assert data["risk_score"] == 20, number
+            assert any("050" in r for r in data["reasons"])
+
+    def test_japan_number_via_international_prefix_not_foreign(self):
+        res = client.post(ENDPOINT, json={"phone_number": "0081-90-1234-5678", "call_type": "call"})
+        data = res.json()
+        assert data["risk_score"] < 20
+        assert not any("国際番号" in r for r in data["reasons"])
@@ -0,0 +1,106 @@
+"""Request context middleware tests."""
+
+import logging
+
+from fastapi.testclient import TestClient
+
+from app.main import MAX_REQUEST_SIZE, http_requests_total, app
+
+client = TestClient(app)
+
+SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+    "Permissions-Policy": "camera=(), microphone=(), geolocation=()",
+}
+
+
+def _request_count(path: str, status_code: int) -> float:
+    for metric in http_requests_total.collect():
+        for sample in metric.samples:
+            if (
+                sample.name == "http_requests_total"
+                and sample.labels["path"] == path
+                and sample.labels["status_code"] == str(status_code)
+            ):
+                return sample.value
+    return 0.0
+
+
+class TestHeaders:
+    def test_security_headers(self):
+        response = client.get("/health")
+        for name, value in SECURITY_HEADERS.items():
+            assert response.headers[name] == value
+        assert "Strict-Transport-Security" not in response.headers
+
+    def test_request_id_echoed(self):
+        response = client.get("/health", headers={"X-Request-ID": "req-abc"})
+        assert response.headers["X-Request-ID"] == "req-abc"
+        assert response.headers.get_list("X-Request-ID") == ["req-abc"]
+
+    def test_request_id_generated(self):
+        first = client.get("/health").headers["X-Request-ID"]
+        second = client.get("/health").headers["X-Request-ID"]
+        assert len(first) == 36
+        assert first != second
+
+    def test_request_id_on_error_body(self, monkeypatch):
+        from app.routers import health
+
+        monkeypatch.setattr(health, "_start_time", None)
+        error_client = TestClient(app, raise_server_exceptions=False)
+        response = error_client.get("/health", headers={"X-Request-ID": "req-500"})
+        assert response.status_code == 500
+        assert response.json()["requestId"] == "req-500"
+
+
+class TestSizeLimit:
+    def test_rejects_large_body(self):
+        response = client.post(
+            "/api/v1/analyze/quick-check",
+            content=b"x" * (MAX_REQUEST_SIZE + 1),
+            headers={"Content-Type": "application/json", "X-Request-ID": "req-413"},
+        )
+        assert response.status_code == 413
+        assert response.json() == {"detail": "リクエストボディが大きすぎます（上限: 1MB）"}
+        assert response.headers["X-Request-ID"] == "req-413"
+        assert "X-Frame-Options" not in response.headers
+
+
+class TestMetricsAndLogging:
+    def test_records_request(self, caplog):
+        before = _request_count("/api/v1/analyze/quick-check", 200)
+        with caplog.at_level(logging.INFO, logger="app.main"):
+            response = client.post(
+                "/api/v1/analyze/quick-check",
+                json={"text": "ミドルウェア確認"},
+                headers={"X-Request-ID": "req-log"},
+            )
+        assert response.status_code == 200
+        assert _request_count("/api/v1/analyze/quick-check", 200) == before + 1
+        record = next(r for r in caplog.records if r.getMessage() == "request completed")
+        assert record.method == "POST"
+        assert record.path == "/api/v1/analyze/quick-check"
+        assert record.status_code == 200
+        assert record.request_id == "req-log"
+        assert record.duration_ms >= 0
+
+    def test_validation_error_counted(self):
+        before = _request_count("/api/v1/analyze/quick-check", 422)
+        client.post("/api/v1/analyze/quick-check", json={})
+        assert _request_count("/api/v1/analyze/quick-check", 422) == before + 1
+
+    def test_unmatched_paths_share_label(self):
+        before = _request_count("unmatched", 404)
+        for i in range(3):
+            assert client.get(f"/wp-admin/{i}.php").status_code == 404
+        assert _request_count("unmatched", 404) == before + 3
+        assert _request_count("/wp-admin/0.php", 404) == 0
+
+    def test_method_not_allowed_uses_template(self):
+        before = _request_count("/api/v1/check/dark-job", 405)
+        assert client.get("/api/v1/check/dark-job").status_code == 405
+        assert _request_count("/api/v1/check/dark-job", 405) == before + 1
@@ -0,0 +1,135 @@
+"""Near-duplicate verdict cache tests."""
+
+import asyncio
+import time
+
+import httpx
+
+from app.services.dark_job_checker import DarkJobChecker
+from app.services.llm_client import CircuitBreaker, LlmClient
+from app.services.near_duplicate import NearDuplicateCache, mask_variable_parts, simhash
+from benchmarks.fake_llm import FakeLlmConfig, create_app
+
+CAMPAIGN = (
+    "【募集】報酬{amount}円、{name}さんからの紹介です。詳細は {url} まで。"
+    "{phone} 簡単に高収入のお仕事です。本日中にご連絡ください。"
+)
+COPIES = [
+    CAMPAIGN.format(amount="5万", name="田中", url="https://bit.ly/abc123", phone="090-1234-5678"),
+    CAMPAIGN.format(amount="30,000", name="佐藤", url="https://t.co/zzzz9", phone="080-9999-0000"),
+    CAMPAIGN.format(amount="１０万", name="スズキ", url="www.example.xyz/r?id=77", phone="070 1111 2222"),
+]
+UNRELATED = "駅前のカフェでホールスタッフを募集しています。時給1100円、週2日から。未経験歓迎、研修あり。"
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _distance(a: str, b: str) -> int:
+    return (simhash(a) ^ simhash(b)).bit_count()
+
+
+class TestFingerprint:
+    def test_masks_variable_parts(self):
+        masked = [mask_variable_parts(text) for text in COPIES]
+        assert masked[0] == masked[1] == masked[2]
+        assert "<url>" in masked[0] and "<num>" in masked[0] and "<name>" in masked[0]
+
+    def test_copies_are_close(self):
+        assert _distance(COPIES[0], COPIES[1]) == 0
+        assert _distance(COPIES[0], COPIES[0].replace("本日中に", "明日までに")) <= 10
+
+    def test_unrelated_text_is_far(self):
+        assert _distance(COPIES[0], UNRELATED) > 16
+
+    def test_short_text(self):
+        assert simhash("") == simhash("")
+        assert isinstance(simhash("a"), int)
+
+
+class TestNearDuplicateCache:
+    def test_reuses_near_duplicate(self):
+        cache = NearDuplicateCache("test", max_entries=10, ttl=60)
+        cache.put("v1", COPIES[0], {"risk_score": 70})
+        assert cache.get("v1", COPIES[1]) == {"risk_score": 70}
+        assert cache.get("v1", UNRELATED) is None
+
+    def test_distance_threshold(self):
+        cache = NearDuplicateCache("test", max_entries=10, ttl=60, max_distance=2)
+        cache.put_fingerprint("v1", 0, "zero")
+        assert cache.get_fingerprint("v1", 0b11) == "zero"
+        assert cache.get_fingerprint("v1", 0b111) is None
+        # 帯の境界をまたいで散らばったビットでも見つかる
+        assert cache.get_fingerprint("v1", (1 << 63) | 1) == "zero"
+
+    def test_returns_closest_entry(self):
+        cache = NearDuplicateCache("test", max_entries=10, ttl=60)
+        cache.put_fingerprint("v1", 0b0000, "far")
+        cache.put_fingerprint("v1", 0b1110, "near")
+        assert cache.get_fingerprint("v1", 0b1111) == "near"
+
+    def test_lru_bound_removes_from_index(self):
+        cache = NearDuplicateCache("test", max_entries=2, ttl=60)
+        fingerprints = [0, (1 << 32) - 1, ((1 << 32) - 1) << 32]
+        cache.put_fingerprint("v1", fingerprints[0], "a")
+        cache.put_fingerprint("v1", fingerprints[1], "b")
+        assert cache.get_fingerprint("v1", fingerprints[0]) == "a"  # b becomes least recently used
+        cache.put_fingerprint("v1", fingerprints[2], "c")
+        assert len(cache) == 2
+        assert cache.get_fingerprint("v1", fingerprints[1]) is None
+        assert all(fingerprints[1] not in bucket for table in cache._tables for bucket in table.values())
+
+    def test_expires(self):
+        clock = FakeClock()
+        cache = NearDuplicateCache("test", max_entries=10, ttl=10, clock=clock)
+        cache.put("v1", COPIES[0], 1)
+        clock.now = 11
+        assert cache.get("v1", COPIES[1]) is None
+        assert len(cache) == 0
+
+    def test_version_change_clears(self):
+        cache = NearDuplicateCache("test", max_entries=10, ttl=60)
+        cache.put("v1", COPIES[0], 1)
+        assert cache.get("v2", COPIES[0]) is None
+        assert len(cache) == 0 and cache.size_bytes == 0
+
+
+def _check_all(texts: list[str], max_distance: int = 3) -> tuple[list[dict], object]:
+    fake = create_app(FakeLlmConfig(latency=0.0))
+    client = LlmClient(
+        "http://fake-llm", "fake-model",
+        transport=httpx.ASGITransport(app=fake),
+        breaker=CircuitBreaker(failure_threshold=3, reset_timeout=30.0),
+    )
+    near_cache = NearDuplicateCache("test", max_entries=10, ttl=60, max_distance=max_distance)
+    checker = DarkJobChecker(llm=client, near_cache=near_cache)
+
+    async def main():
+        results = [await checker.check_async(text, deadline=time.monotonic() + 1) for text in texts]
+        await client.aclose()
+        return results
+
+    return asyncio.run(main()), fake
+
+
+class TestDarkJobCheckerNearDuplicate:
+    def test_reuses_llm_score_for_campaign_copies(self):
+        results, fake = _check_all(COPIES)
+        assert fake.state.requests == 1
+        assert len({result["risk_score"] for result in results}) == 1
+        # キーワードは使い回さず、それぞれの本文から出す
+        assert results[0]["keywords_found"] == DarkJobChecker().check(COPIES[0])["keywords_found"]
+
+    def test_skips_reuse_when_rule_score_differs(self):
+        # 「日払い」は同じカテゴリで、ルールスコアは変わらない
+        same_rules = COPIES[1] + "日払い"
+        # 「DM」で SNS 勧誘のカテゴリが増え、ルールスコアが変わる（グレーゾーンのまま）
+        more_rules = COPIES[1] + "DM"
+        assert max(_distance(COPIES[0], same_rules), _distance(COPIES[0], more_rules)) <= 8
+        _, fake = _check_all([COPIES[0], same_rules, more_rules], max_distance=8)
+        assert fake.state.requests == 2
@@ -0,0 +1,119 @@
+"""Character n-gram model tests."""
+
+import json
+
+import numpy as np
+import pytest
+
+from app.services.ngram_model import NgramModel, hash_ngrams
+from app.services.scam_analyzer import DEFAULT_RULES, MODEL_VERSION, ScamAnalyzer
+from app.tools.train_ngram_model import evaluate, main, read_labelled, save_model, train
+
+SCAM = [
+    "還付金の手続きがあります。ATMで操作してください。",
+    "キャッシュカードと暗証番号を封筒に入れてください。",
+    "未払いの料金があります。本日中に電子マネーで払ってください。",
+    "必ず儲かる投資の特別な案件です。元本保証です。",
+    "俺だけど、事故を起こして示談金が必要なんだ。",
+    "年金事務所です。医療費の払い戻しがあります。",
+]
+BENIGN = [
+    "明日の夕飯は何にしようか。",
+    "孫の運動会は来月の土曜日だったね。",
+    "病院の予約は来週の火曜日にしておいたよ。",
+    "今日は天気がいいから散歩に行ってきた。",
+    "駅前のパン屋さんが新しくできたらしい。",
+    "週末は家族で公園に行く予定です。",
+]
+
+
+@pytest.fixture(scope="module")
+def model() -> NgramModel:
+    texts = SCAM + BENIGN
+    labels = np.array([1] * len(SCAM) + [0] * len(BENIGN), dtype=np.float64)
+    return train(texts, labels, "ngram-test", bits=14, epochs=200)
+
+
+class TestHashNgrams:
+    def test_counts_every_ngram(self):
+        buckets, owners = hash_ngrams(["abcd"], bits=16)
+        assert len(buckets) == 4 + 3 + 2
+        assert owners.tolist() == [0] * 9
+        assert buckets.max() < 1 << 16
+
+    def test_normalizes_before_hashing(self):
+        assert np.array_equal(hash_ngrams(["ＡＴＭで"])[0], hash_ngrams(["atm で"])[0])
+
+    def test_batch_skips_ngrams_across_texts(self):
+        buckets, owners = hash_ngrams(["ab", "", "cde"], bits=16)
+        assert np.bincount(owners, minlength=3).tolist() == [3, 0, 6]
+        single = np.concatenate([hash_ngrams(["ab"], bits=16)[0], hash_ngrams(["cde"], bits=16)[0]])
+        assert sorted(buckets.tolist()) == sorted(single.tolist())
+
+
+class TestNgramModel:
+    def test_separates_training_data(self, model):
+        assert evaluate(model, SCAM + BENIGN, np.array([1] * 6 + [0] * 6))["accuracy"] == 1.0
+        assert model.score("還付金の払い戻しはATMで") > 50 > model.score("散歩に行く予定です")
+
+    def test_batch_matches_single(self, model):
+        texts = SCAM[:2] + ["", "ab"] + BENIGN[:2]
+        assert model.score_batch(texts) == [model.score(text) for text in texts]
+        assert model.score_batch([]) == []
+
+    def test_empty_text_scores_bias(self, model):
+        assert model.probabilities([""])[0] == pytest.approx(1 / (1 + np.exp(-model.bias)))
+
+    def test_save_and_load(self, model, tmp_path):
+        path = tmp_path / "model.mngm"
+        save_model(model, path)
+        loaded = NgramModel.load(path)
+        assert loaded.model_version == "ngram-test"
+        assert loaded.bits == 14 and loaded.ngram_range == (1, 3)
+        assert loaded.score_batch(SCAM + BENIGN) == model.score_batch(SCAM + BENIGN)
+
+    def test_rejects_invalid_file(self, tmp_path):
+        path = tmp_path / "broken.mngm"
+        path.write_bytes(b"XXXX" + bytes(100))
+        with pytest.raises(ValueError):
+            NgramModel.load(path)
+
+    def test_rejects_non_power_of_two_weights(self):
+        with pytest.raises(ValueError):
+            NgramModel(np.zeros(100, dtype=np.float32), 0.0, "bad")
+
+
+class TestTrainingCli:
+    def test_trains_from_jsonl(self, tmp_path):
+        data = tmp_path / "labelled.jsonl"
+        lines = [json.dumps({"text": t, "label": 1}, ensure_ascii=False) for t in SCAM]
+        lines += [json.dumps({"text": t, "label": False}, ensure_ascii=False) for t in BENIGN]
+        data.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        output = tmp_path / "model.mngm"
+        assert main([str(data), "-o", str(output), "--bits", "12", "--epochs", "50", "--holdout", "0"]) == 0
+        model = NgramModel.load(output)
+        assert model.model_version.startswith("ngram-")
+        assert model.score(SCAM[0]) > model.score(BENIGN[0])
+
+    def test_rejects_bad_label(self, tmp_path):
+        data = tmp_path / "bad.jsonl"
+        data.write_text(json.dumps({"text": "a", "label": "scam"}) + "\n", encoding="utf-8")
+        with pytest.raises(ValueError):
+            read_labelled([data])
+
+
+class TestScamAnalyzerWithModel:
+    def test_adds_model_score_beside_rules(self, model):
+        plain = ScamAnalyzer().analyze(SCAM[0])
+        result = ScamAnalyzer(model=model).analyze(SCAM[0])
+        assert "model_score" not in plain
+        assert result["model_score"] == {"risk_score": model.score(SCAM[0]), "model_version": "ngram-test"}
+        assert {k: v for k, v in result.items() if k != "model_score"} == plain
+
+    def test_batch_adds_model_scores(self, model):
+        analyzer = ScamAnalyzer(model=model)
+        results = analyzer.analyze_batch(SCAM[:2] + BENIGN[:2])
+        assert [r["model_score"]["risk_score"] for r in results] == model.score_batch(SCAM[:2] + BENIGN[:2])
+
+    def test_cache_version_includes_model(self, model):
+        assert ScamAnalyzer(model=model).version(DEFAULT_RULES) == f"{MODEL_VERSION}+ngram-test"
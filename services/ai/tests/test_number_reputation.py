@@ -0,0 +1,108 @@
+"""Reported-number reputation store tests."""
+
+import pytest
+
+from app.services.metadata_analyzer import MetadataAnalyzer
+from app.services.number_reputation import NumberReputationStore, ReputationFile, hash_number
+from app.tools.build_reputation_store import build_store, main, parse_feed_row
+
+
+def _rows(*numbers, **fields):
+    return [parse_feed_row({"phone_number": n, **fields}) for n in numbers]
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = tmp_path / "reputation.mrep"
+    rows = _rows("090-1111-2222", "+44 20 1234 5678", risk_score="90", category="fraud_call")
+    rows += _rows("09011112222", report_count="4", last_reported="2026-01-01")
+    rows += _rows(*(f"+8180{i:08d}" for i in range(1000)), category="sms_phishing")
+    build_store(rows, path)
+    return path
+
+
+class TestReputationStore:
+    def test_lookup_hit_merges_duplicate_reports(self, store_path):
+        store = ReputationFile(store_path)
+        assert store.count == 1002
+        record = store.lookup("+819011112222")
+        assert record.risk_score == 90
+        assert record.report_count == 5
+        assert record.category == "fraud_call"
+        assert record.last_reported > 0
+
+    def test_lookup_miss(self, store_path):
+        store = ReputationFile(store_path)
+        assert store.lookup("+819099998888") is None
+        misses = sum(store.lookup(f"+8170{i:08d}") is not None for i in range(2000))
+        assert misses == 0
+
+    def test_bloom_filter_rejects_most_unknown_numbers(self, store_path):
+        store = ReputationFile(store_path)
+        passed = sum(store.might_contain(*hash_number(f"+8170{i:08d}")) for i in range(5000))
+        assert passed < 5000 * 0.05
+
+    def test_swaps_to_new_file_atomically(self, store_path):
+        store = NumberReputationStore(store_path, reload_interval=0)
+        old = store.current
+        assert store.lookup("+819033334444") is None
+
+        build_store(_rows("090-3333-4444"), store_path)
+        assert store.refresh() is True
+        assert store.current is not old
+        assert store.lookup("+819033334444") is not None
+        # 旧世代は参照が残っている間は引き続き読める
+        assert old.lookup("+819011112222") is not None
+        assert store.refresh() is False
+
+    def test_rejects_invalid_file(self, tmp_path):
+        path = tmp_path / "broken.mrep"
+        path.write_bytes(b"\0" * 128)
+        with pytest.raises(ValueError):
+            ReputationFile(path)
+
+    def test_cli_builds_from_csv(self, tmp_path):
+        feed = tmp_path / "feed.csv"
+        feed.write_text("phone_number,risk_score\n0312345678,70\n", encoding="utf-8")
+        output = tmp_path / "out.mrep"
+        assert main([str(feed), "-o", str(output)]) == 0
+        assert ReputationFile(output).lookup("+81312345678").risk_score == 70
+        assert [p.name for p in tmp_path.iterdir() if p.suffix == ".tmp"] == []
+
+    def test_cli_rejects_malformed_rows(self, tmp_path, caplog):
+        feed = tmp_path / "feed.csv"
+        feed.write_text("phone_number,risk_score,report_count\n0312345678,70,1\n0312345679,high,2\n", encoding="utf-8")
+        output = tmp_path / "out.mrep"
+        assert main([str(feed), "-o", str(output)]) == 1
+        assert f"{feed}:3: risk_score" in caplog.text
+        assert not output.exists()
+        assert [p.name for p in tmp_path.iterdir() if p.suffix == ".tmp"] == []
+
+        feed.write_text("phone_number,last_reported\n0312345678,yesterday\n", encoding="utf-8")
+        assert main([str(feed), "-o", str(output)]) == 1
+        assert f"{feed}:2: last_reported" in caplog.text
+
+        feed.write_text("phone_number,last_reported\n0312345678,2026-01-01\n0312345679,1960-01-01\n", encoding="utf-8")
+        assert main([str(feed), "-o", str(output)]) == 1
+        assert f"{feed}:3: last_reported" in caplog.text
+        assert not output.exists()
+
+    def test_clamps_out_of_range_counts(self, tmp_path):
+        feed = tmp_path / "feed.csv"
+        feed.write_text(f"phone_number,risk_score,report_count\n0312345678,150,{2**40}\n", encoding="utf-8")
+        output = tmp_path / "out.mrep"
+        assert main([str(feed), "-o", str(output)]) == 0
+        record = ReputationFile(output).lookup("+81312345678")
+        assert record.risk_score == 100
+        assert record.report_count == 0xFFFF
+
+
+def test_metadata_analyzer_reports_known_number(store_path):
+    analyzer = MetadataAnalyzer(reputation_store=NumberReputationStore(store_path))
+    result = analyzer.analyze("090-1111-2222")
+    assert result["risk_score"] >= 90
+    assert result["scam_type"] == "suspicious_call"
+    assert any("通報済み" in r for r in result["reasons"])
+
+    clean = analyzer.analyze("090-5555-6666")
+    assert not any("通報済み" in r for r in clean["reasons"])
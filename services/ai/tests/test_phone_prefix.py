@@ -0,0 +1,36 @@
+"""Phone number normalization and prefix trie tests."""
+
+from app.services.phone_prefix import PrefixTrie, get_default_prefix_table, normalize_phone_number
+
+
+class TestNormalizePhoneNumber:
+    def test_domestic_numbers_get_country_code(self):
+        assert normalize_phone_number("090-1234-5678") == "+819012345678"
+        assert normalize_phone_number("０９０－１２３４－５６７８") == "+819012345678"
+        assert normalize_phone_number("(03) 1234.5678") == "+81312345678"
+
+    def test_international_access_codes(self):
+        assert normalize_phone_number("0081-50-1234-5678") == "+815012345678"
+        assert normalize_phone_number("010-44-20-1234-5678") == "+442012345678"
+        assert normalize_phone_number("+81 50 1234 5678") == "+815012345678"
+
+    def test_drops_domestic_trunk_zero_after_country_code(self):
+        assert normalize_phone_number("+81-090-1234-5678") == "+819012345678"
+
+    def test_short_and_non_numeric_values_unchanged(self):
+        assert normalize_phone_number("110") == "110"
+        assert normalize_phone_number("非通知") == "非通知"
+        assert normalize_phone_number("") == ""
+
+
+class TestPrefixTrie:
+    def test_longest_prefix_wins(self):
+        trie = PrefixTrie([("+81", 5, "日本"), ("+8150", 20, "IP電話")])
+        assert trie.longest_match("+815012345678")[1] == 20
+        assert trie.longest_match("+819012345678")[1] == 5
+        assert trie.longest_match("+4412345") is None
+
+    def test_default_table_loaded_in_e164(self):
+        table = get_default_prefix_table()
+        assert len(table) == 8
+        assert table.longest_match("+81120123456")[0] == "+81120"
@@ -0,0 +1,56 @@
+"""Proximity rule engine tests."""
+
+import random
+import re
+
+from app.services.dark_job_checker import PROXIMITY_ENGINE, SUSPICIOUS_PROXIMITY_RULES
+from app.services.proximity_rules import ProximityRuleEngine
+
+# The regexes the grey-zone fallback used before the proximity engine
+LEGACY_PATTERNS = [
+    ("報酬.*即日", 10),
+    # 英数字の語は単語境界でだけ一致する（「TelegramTelegram」は1語）
+    ("連絡先.*(?<![0-9A-Za-z])Telegram(?![0-9A-Za-z])", 15),
+    ("身分証.*送", 12),
+    ("誰にも.*言わない", 10),
+    ("簡単.*高収入", 12),
+    ("口座.*開設", 10),
+    ("受け取.*現金", 15),
+]
+
+
+def _legacy_boost(text: str) -> int:
+    return sum(score for pattern, score in LEGACY_PATTERNS if re.search(pattern, text))
+
+
+def _corpus(seed: int, size: int) -> list[str]:
+    rng = random.Random(seed)
+    terms = [term for rule in SUSPICIOUS_PROXIMITY_RULES for term in rule[:2]]
+    vocabulary = terms + ["\n", "。", "仕事です", "連絡", "口", "受け", "簡", "お気軽に"]
+    return ["".join(rng.choice(vocabulary) for _ in range(rng.randint(0, 30))) for _ in range(size)]
+
+
+class TestProximityRuleEngine:
+    def test_matches_legacy_regex_boost(self):
+        for text in _corpus(seed=0, size=2000):
+            assert PROXIMITY_ENGINE.boost(text) == _legacy_boost(text), text
+
+    def test_order_matters(self):
+        engine = ProximityRuleEngine([("報酬", "即日", 10, None)])
+        assert engine.boost("報酬は即日払い") == 10
+        assert engine.boost("即日払いの報酬") == 0
+
+    def test_rules_do_not_cross_lines(self):
+        engine = ProximityRuleEngine([("報酬", "即日", 10, None)])
+        assert engine.boost("報酬あり\n即日払い") == 0
+
+    def test_max_gap(self):
+        engine = ProximityRuleEngine([("受け取", "現金", 15, 3)])
+        assert engine.boost("受け取って現金") == 15
+        assert engine.boost("受け取ってから現金") == 0
+        # 遠い語A があっても、近い語A があれば成立
+        assert engine.boost("受け取り……受け取る現金") == 15
+
+    def test_adjacent_terms(self):
+        engine = ProximityRuleEngine([("口座", "開設", 10, 0)])
+        assert engine.boost("口座開設") == 10
@@ -0,0 +1,132 @@
+"""Analysis result cache tests."""
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.dark_job_checker import DarkJobChecker
+from app.services.metadata_analyzer import MetadataAnalyzer
+from app.services.result_cache import ResultCache, cached_map
+from app.services.scam_analyzer import ScamAnalyzer
+
+client = TestClient(app)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _cache(**kwargs) -> ResultCache:
+    options = {"max_entries": 100, "max_bytes": 1 << 20, "ttl": 60.0}
+    options.update(kwargs)
+    return ResultCache("test", **options)
+
+
+class TestResultCache:
+    def test_hit_returns_copy(self):
+        cache = _cache()
+        key = ResultCache.make_key("v1", "本文")
+        assert cache.get("v1", key) is None
+        cache.put("v1", key, {"keywords_found": ["還付金"]})
+        first = cache.get("v1", key)
+        first["keywords_found"].append("改ざん")
+        assert cache.get("v1", key) == {"keywords_found": ["還付金"]}
+
+    def test_key_ignores_surrounding_whitespace(self):
+        assert ResultCache.make_key("v1", " 本文\n") == ResultCache.make_key("v1", "本文")
+        assert ResultCache.make_key("v1", "本文") != ResultCache.make_key("v2", "本文")
+
+    def test_lru_entry_bound(self):
+        cache = _cache(max_entries=2)
+        keys = [ResultCache.make_key("v1", str(i)) for i in range(3)]
+        cache.put("v1", keys[0], 0)
+        cache.put("v1", keys[1], 1)
+        assert cache.get("v1", keys[0]) == 0  # keys[1] becomes least recently used
+        cache.put("v1", keys[2], 2)
+        assert cache.get("v1", keys[1]) is None
+        assert cache.get("v1", keys[0]) == 0
+        assert len(cache) == 2
+
+    def test_byte_bound(self):
+        cache = _cache(max_bytes=1000)
+        for i in range(10):
+            cache.put("v1", ResultCache.make_key("v1", str(i)), "x" * 200)
+        assert cache.size_bytes <= 1000
+        assert len(cache) == 2
+        cache.put("v1", ResultCache.make_key("v1", "big"), "x" * 2000)
+        assert cache.get("v1", ResultCache.make_key("v1", "big")) is None
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = _cache(ttl=10.0, clock=clock)
+        key = ResultCache.make_key("v1", "本文")
+        cache.put("v1", key, 1)
+        clock.now = 9.9
+        assert cache.get("v1", key) == 1
+        clock.now = 10.0
+        assert cache.get("v1", key) is None
+        assert len(cache) == 0
+
+    def test_version_change_invalidates(self):
+        cache = _cache()
+        cache.put("v1", ResultCache.make_key("v1", "a"), 1)
+        cache.put("v1", ResultCache.make_key("v1", "b"), 2)
+        assert cache.get("v2", ResultCache.make_key("v2", "a")) is None
+        assert len(cache) == 0 and cache.size_bytes == 0
+
+    def test_cached_map_deduplicates(self):
+        cache = _cache()
+        calls = []
+
+        def compute(texts):
+            calls.append(list(texts))
+            return [len(t) for t in texts]
+
+        assert cached_map(cache, "v1", ["aa", "b", "aa"], compute) == [2, 1, 2]
+        assert cached_map(cache, "v1", ["b", "ccc"], compute) == [1, 3]
+        assert calls == [["aa", "b"], ["ccc"]]
+
+
+class TestCachedAnalyzers:
+    TEXTS = ["市役所です。還付金があります。今すぐATMで", "日給10万、Telegramで連絡", "", "こんにちは"]
+
+    def test_scam_analyzer_matches_uncached(self):
+        cached = ScamAnalyzer(cache=_cache())
+        plain = ScamAnalyzer()
+        for _ in range(2):
+            assert [cached.analyze(t) for t in self.TEXTS] == [plain.analyze(t) for t in self.TEXTS]
+            assert cached.analyze_batch(self.TEXTS * 2) == plain.analyze_batch(self.TEXTS * 2)
+
+    def test_dark_job_checker_matches_uncached(self):
+        cached = DarkJobChecker(cache=_cache())
+        plain = DarkJobChecker()
+        for _ in range(2):
+            assert [cached.check(t) for t in self.TEXTS] == [plain.check(t) for t in self.TEXTS]
+            assert cached.check_batch(self.TEXTS * 2) == plain.check_batch(self.TEXTS * 2)
+
+    def test_metadata_analyzer_matches_uncached(self):
+        cache = _cache()
+        cached = MetadataAnalyzer(cache=cache)
+        plain = MetadataAnalyzer()
+        items = [("+8190" + str(i) * 8, "sms", text) for i, text in enumerate(self.TEXTS)]
+        items.append(("非通知", "call", None))
+        for _ in range(2):
+            assert [cached.analyze(*item) for item in items] == [plain.analyze(*item) for item in items]
+            assert cached.analyze_batch(items) == plain.analyze_batch(items)
+        # 空でないSMS本文のみキャッシュされる
+        assert len(cache) == 3
+
+
+class TestCacheMetrics:
+    def test_metrics_exported(self):
+        text = "キャッシュ確認用: 還付金の手続き期限が今日です"
+        client.post("/api/v1/analyze/conversation", json={"text": text})
+        client.post("/api/v1/analyze/conversation", json={"text": text})
+        body = client.get("/metrics").text
+        assert 'analysis_cache_hits_total{cache="conversation"}' in body
+        assert 'analysis_cache_misses_total{cache="conversation"}' in body
+        assert 'analysis_cache_bytes{cache="conversation"}' in body
+        assert 'analysis_cache_entries{cache="conversation"}' in body
@@ -0,0 +1,283 @@
+"""Rule bundle loading and hot reload tests."""
+
+import json
+import os
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app
+from app.routers import admin
+from app.services import rule_bundle
+from app.services.conversation_stream import ConversationStreamSession
+from app.services.dark_job_checker import DarkJobChecker
+from app.services.event_analyzer import EventAnalyzer
+from app.services.key_points import extract_key_points
+from app.services.metadata_analyzer import MetadataAnalyzer
+from app.services.rule_bundle import (
+    BUILTIN_RULES,
+    RuleBundle,
+    RuleRegistry,
+    builtin_rule_bundle,
+    compile_rule_bundle,
+    load_rule_bundle,
+)
+from app.services.scam_analyzer import MODEL_VERSION, ScamAnalyzer
+from app.tools.rule_bundle import main
+
+client = TestClient(app)
+
+SCAM_TEXT = "市役所の者ですが、還付金があります。ATMで手続きしてください。"
+DARK_JOB_TEXT = "高額バイト！受け子募集。Telegramで連絡。"
+
+# 還付金詐欺の代わりに「給付金」だけを見るバンドル（他のセクションは組み込みのルール）
+OVERRIDE = {
+    "version": "2026.10-a",
+    "scam": {
+        "patterns": [{"name": "benefit_fraud", "label": "給付金詐欺", "score": 90, "keywords": ["給付金"]}],
+        "urgency_keywords": ["至急"],
+    },
+}
+
+
+def _write(path, data) -> None:
+    # 監視側が書きかけを読まないよう、本番と同じく置き換えで書き込む
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class TestLoadRuleBundle:
+    def test_builtin_bundle_matches_default_rules(self):
+        rules = compile_rule_bundle(builtin_rule_bundle())
+        texts = [SCAM_TEXT, DARK_JOB_TEXT, "明日は散歩に行きます。"]
+        for text in texts:
+            expected = ScamAnalyzer().analyze(text)
+            result = ScamAnalyzer().analyze(text, rules=rules.scam)
+            assert result["model_version"] == f"{MODEL_VERSION}+builtin"
+            assert {**result, "model_version": expected["model_version"]} == expected
+            assert DarkJobChecker().check(text, rules=rules.dark_job)["risk_score"] == (
+                DarkJobChecker().check(text)["risk_score"]
+            )
+        assert rules.event_matcher.keywords == BUILTIN_RULES.event_matcher.keywords
+
+    def test_loads_yaml(self, tmp_path):
+        path = tmp_path / "rules.yaml"
+        path.write_text(
+            "version: y1\n"
+            "key_points:\n"
+            "  important_markers: [合言葉]\n",
+            encoding="utf-8",
+        )
+        rules = compile_rule_bundle(load_rule_bundle(path))
+        assert rules.version == "y1"
+        assert extract_key_points("合言葉を決めましょう。", None, rules.key_points) == ["合言葉を決めましょう。"]
+
+    def test_partial_override_keeps_other_sections(self, tmp_path):
+        path = tmp_path / "rules.json"
+        _write(path, OVERRIDE)
+        rules = compile_rule_bundle(load_rule_bundle(path))
+        result = ScamAnalyzer().analyze("至急、給付金の手続きを", rules=rules.scam)
+        assert result["scam_type"] == "benefit_fraud"
+        assert result["risk_score"] == 95
+        assert "給付金詐欺" in result["summary"]
+        assert result["model_version"] == f"{MODEL_VERSION}+2026.10-a"
+        assert ScamAnalyzer().analyze(SCAM_TEXT, rules=rules.scam)["scam_type"] == "none"
+        assert DarkJobChecker().check(DARK_JOB_TEXT, rules=rules.dark_job)["risk_score"] == (
+            DarkJobChecker().check(DARK_JOB_TEXT)["risk_score"]
+        )
+
+    def test_prefix_override(self):
+        bundle = RuleBundle.model_validate(
+            {
+                "version": "p1",
+                "metadata": {"suspicious_prefixes": [{"prefix": "090-1234", "weight": 55, "reason": "検証用"}]},
+            }
+        )
+        rules = compile_rule_bundle(bundle)
+        result = MetadataAnalyzer().analyze("09012345678", rules=rules.metadata)
+        assert result["risk_score"] >= 55
+        assert any("検証用" in reason for reason in result["reasons"])
+        assert MetadataAnalyzer().analyze("+12025550123", rules=rules.metadata)["risk_score"] < 55
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            {"version": "bad version"},
+            {"version": "v1", "unknown": {}},
+            {"version": "v1", "scam": {"patterns": []}},
+            {"version": "v1", "scam": {"severity_thresholds": {"high": 40, "medium": 60}}},
+            {"version": "v1", "dark_job": {"llm_grey_zone": [60, 30]}},
+            {"version": "v1", "dark_job": {"categories": [{"name": "x", "weight": 120, "keywords": ["a"]}]}},
+            {"version": "v1", "dark_job": {"categories": [{"name": "x", "weight": 10, "keywords": [""]}]}},
+            {"version": "v1", "scam": {"urgency_keywords": ["至急", ""]}},
+            {"version": "v1", "metadata": {"sms_keywords": [""]}},
+            {"version": "v1", "key_points": {"important_markers": [""]}},
+        ],
+    )
+    def test_rejects_invalid_bundle(self, tmp_path, data):
+        path = tmp_path / "rules.json"
+        _write(path, data)
+        with pytest.raises(ValueError):
+            load_rule_bundle(path)
+
+    def test_rejects_broken_yaml(self, tmp_path):
+        path = tmp_path / "rules.yml"
+        path.write_text("version: [unclosed\n", encoding="utf-8")
+        with pytest.raises(ValueError):
+            load_rule_bundle(path)
+
+
+class TestRuleRegistry:
+    def test_without_path_uses_builtin_rules(self):
+        registry = RuleRegistry()
+        assert registry.current is BUILTIN_RULES
+        assert registry.reload(force=True) is False
+
+    def test_reloads_changed_file(self, tmp_path):
+        path = tmp_path / "rules.json"
+        _write(path, OVERRIDE)
+        registry = RuleRegistry(path)
+        assert registry.reload() is True
+        assert registry.reload() is False
+        assert registry.current.version == "2026.10-a"
+
+        _write(path, {**OVERRIDE, "version": "2026.10-b"})
+        assert registry.reload() is True
+        assert registry.scam_rules().version == f"{MODEL_VERSION}+2026.10-b"
+
+    def test_broken_file_keeps_current_rules(self, tmp_path):
+        path = tmp_path / "rules.json"
+        _write(path, OVERRIDE)
+        registry = RuleRegistry(path)
+        registry.reload()
+        previous = registry.current
+
+        path.write_text("{not json", encoding="utf-8")
+        with pytest.raises(ValueError):
+            registry.reload()
+        assert registry.current is previous
+        # 同じ壊れたファイルは確認のたびに読み直さない
+        assert registry.reload() is False
+
+    def test_compile_failure_keeps_current_rules(self, tmp_path, monkeypatch):
+        path = tmp_path / "rules.json"
+        _write(path, OVERRIDE)
+        registry = RuleRegistry(path)
+
+        def broken(bundle):
+            raise KeyError("")
+
+        monkeypatch.setattr(rule_bundle, "compile_rule_bundle", broken)
+        with pytest.raises(ValueError):
+            registry.reload()
+        assert registry.current is BUILTIN_RULES
+
+    def test_watcher_survives_unexpected_errors(self, tmp_path, monkeypatch):
+        registry = RuleRegistry(tmp_path / "rules.json", reload_interval=0.01)
+        calls = []
+        second_call = threading.Event()
+
+        def reload(force=False):
+            calls.append(force)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            second_call.set()
+            return False
+
+        monkeypatch.setattr(registry, "reload", reload)
+        registry.start()
+        try:
+            assert second_call.wait(2.0)
+        finally:
+            registry.stop()
+
+    def test_analysis_uses_one_rule_version(self, tmp_path):
+        path = tmp_path / "rules.json"
+        _write(path, OVERRIDE)
+        registry = RuleRegistry(path)
+        snapshots = []
+
+        def rules():
+            # 解析の途中で切り替えが起きても、最初に取得したルールで最後まで処理される
+            snapshots.append(registry.current)
+            registry.reload(force=True)
+            return snapshots[-1]
+
+        result = EventAnalyzer(rules=rules).analyze("給付金の件です。受け子募集", "09012345678", "sms")
+        assert len(snapshots) == 1
+        assert result["conversation"]["model_version"] == snapshots[0].scam.version
+        assert result["dark_job"]["model_version"] == snapshots[0].dark_job.version
+        assert result["metadata"]["model_version"] == snapshots[0].metadata.version
+        assert registry.current is not snapshots[0]
+
+    def test_stream_session_keeps_starting_rules(self, tmp_path):
+        path = tmp_path / "rules.json"
+        _write(path, OVERRIDE)
+        registry = RuleRegistry(path)
+        registry.reload()
+        analyzer = ScamAnalyzer(rules=registry.scam_rules)
+        session = ConversationStreamSession(threshold=70, analyzer=analyzer)
+        session.feed("給付金が")
+
+        _write(path, {"version": "builtin-again"})
+        registry.reload()
+        session.feed("あります。至急")
+        result = session.result()
+        assert result["scam_type"] == "benefit_fraud"
+        assert result["model_version"] == f"{MODEL_VERSION}+2026.10-a"
+        assert analyzer.analyze("給付金があります")["scam_type"] == "none"
+
+
+class TestAdminEndpoints:
+    @pytest.fixture
+    def registry(self, tmp_path, monkeypatch):
+        path = tmp_path / "rules.json"
+        _write(path, OVERRIDE)
+        registry = RuleRegistry(path)
+        monkeypatch.setattr(admin, "get_rule_registry", lambda: registry)
+        monkeypatch.setattr(get_settings(), "admin_token", "secret")
+        return registry
+
+    def test_disabled_without_token(self):
+        assert get_settings().admin_token == ""
+        assert client.get("/api/v1/admin/rules").status_code == 404
+        assert client.post("/api/v1/admin/rules/reload").status_code == 404
+
+    def test_rejects_wrong_token(self, registry):
+        assert client.get("/api/v1/admin/rules").status_code == 403
+        assert client.get("/api/v1/admin/rules", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    def test_reload(self, registry):
+        headers = {"X-Admin-Token": "secret"}
+        assert client.get("/api/v1/admin/rules", headers=headers).json()["version"] == "builtin"
+
+        response = client.post("/api/v1/admin/rules/reload", headers=headers)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["version"] == "2026.10-a"
+        assert body["reloaded"] is True
+        assert body["model_versions"]["conversation"] == f"{MODEL_VERSION}+2026.10-a"
+
+    def test_reload_error_keeps_rules(self, registry):
+        registry.path.write_text('{"version": "bad version"}', encoding="utf-8")
+        response = client.post("/api/v1/admin/rules/reload", headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 422
+        assert registry.current is BUILTIN_RULES
+
+
+class TestRuleBundleCli:
+    def test_export_and_check(self, tmp_path, capsys):
+        output = tmp_path / "rules.yaml"
+        assert main(["export", "-o", str(output), "--version", "exported"]) == 0
+        assert load_rule_bundle(output).version == "exported"
+        capsys.readouterr()
+        assert main(["check", str(output)]) == 0
+        assert json.loads(capsys.readouterr().out)["model_versions"]["conversation"] == f"{MODEL_VERSION}+exported"
+
+    def test_check_rejects_invalid(self, tmp_path):
+        path = tmp_path / "rules.json"
+        _write(path, {"version": "v1", "scam": {"patterns": []}})
+        assert main(["check", str(path)]) == 1
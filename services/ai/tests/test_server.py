@@ -0,0 +1,115 @@
+"""Prefork server tests."""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+from app.server import MULTIPROC_DIR_ENV, prepare_metrics_dir
+
+SERVICE_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _worker_pids(pid: int) -> set[int]:
+    children = Path(f"/proc/{pid}/task/{pid}/children").read_text().split()
+    return {int(child) for child in children}
+
+
+def _metric(text: str, name: str, labels: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(f"{name}{{{labels}}} "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def _wait_healthy(base_url: str, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        assert process.poll() is None, "server exited during startup"
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise AssertionError("server did not become healthy")
+
+
+@pytest.fixture
+def server():
+    port = _free_port()
+    env = {k: v for k, v in os.environ.items() if k != "PROMETHEUS_MULTIPROC_DIR"}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--workers", "2", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=SERVICE_ROOT,
+        env={**env, "LOG_LEVEL": "WARNING"},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_healthy(base_url, process)
+        yield process, base_url
+    finally:
+        if process.poll() is None:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=15)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="uses fork and /proc")
+class TestPrepareMetricsDir:
+    def test_clears_previous_run_files(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(MULTIPROC_DIR_ENV, str(tmp_path))
+        for name in ("counter_123.db", "stage_metrics_123.json", "keep.txt"):
+            (tmp_path / name).write_text("{}")
+        assert prepare_metrics_dir(2) == (str(tmp_path), False)
+        assert [path.name for path in tmp_path.iterdir()] == ["keep.txt"]
+
+
+class TestPreforkServer:
+    def test_metrics_aggregated_across_workers(self, server):
+        _, base_url = server
+        for i in range(30):
+            # 接続を使い回さず、リクエストごとにどちらかのワーカーが受ける
+            response = httpx.post(f"{base_url}/api/v1/analyze/quick-check", json={"text": f"還付金の確認 {i}"})
+            assert response.status_code == 200
+        httpx.get(f"{base_url}/no-such-path/{time.time()}")
+
+        text = httpx.get(f"{base_url}/metrics").text
+        assert _metric(
+            text, "http_requests_total",
+            'method="POST",path="/api/v1/analyze/quick-check",status_code="200"',
+        ) == 30
+        assert _metric(text, "http_requests_total", 'method="GET",path="unmatched",status_code="404"') == 1
+        assert "no-such-path" not in text
+
+    def test_worker_respawned(self, server):
+        process, base_url = server
+        workers = _worker_pids(process.pid)
+        assert len(workers) == 2
+        victim = min(workers)
+        os.kill(victim, signal.SIGKILL)
+
+        deadline = time.monotonic() + 15
+        while time.monotonic() < deadline:
+            current = _worker_pids(process.pid)
+            if len(current) == 2 and victim not in current:
+                break
+            time.sleep(0.2)
+        else:
+            raise AssertionError("worker was not respawned")
+        _wait_healthy(base_url, process)
+
+    def test_graceful_shutdown(self, server):
+        process, _ = server
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=15) == 0
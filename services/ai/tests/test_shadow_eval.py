@@ -0,0 +1,226 @@
+"""Shadow evaluation tests."""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app
+from app.routers import admin, conversation
+from app.services import shadow_eval
+from app.services.executor import get_executor
+from app.services.rule_bundle import BUILTIN_RULES, RuleBundle, compile_rule_bundle
+from app.services.shadow_eval import (
+    OTHER_KEYWORD,
+    ShadowEvaluator,
+    ShadowStats,
+    compare_rule_sets,
+    shadow_compare,
+)
+
+client = TestClient(app)
+
+# 還付金詐欺のキーワードを「給付金」だけにし、闇バイトの高リスクしきい値を下げた候補
+CANDIDATE = compile_rule_bundle(
+    RuleBundle.model_validate(
+        {
+            "version": "candidate",
+            "scam": {"patterns": [{"name": "refund_fraud", "score": 75, "keywords": ["給付金"]}]},
+            "dark_job": {"risk_thresholds": {"high": 30, "medium": 20}},
+        }
+    )
+)
+
+SCAM_TEXT = "市役所の者ですが、還付金があります。ATMで手続きしてください。"
+DARK_JOB_TEXT = "高額バイト！受け子募集。Telegramで連絡。"
+
+
+def _diff(delta: int, gained=(), lost=(), levels=("low", "low"), versions=("builtin", "candidate")) -> dict:
+    return {
+        "analyzer": "conversation",
+        "current_version": versions[0],
+        "candidate_version": versions[1],
+        "current_score": 50,
+        "candidate_score": 50 + delta,
+        "current_level": levels[0],
+        "candidate_level": levels[1],
+        "gained": list(gained),
+        "lost": list(lost),
+    }
+
+
+class TestCompareRuleSets:
+    def test_conversation_diff(self):
+        diff = compare_rule_sets("conversation", SCAM_TEXT, BUILTIN_RULES, CANDIDATE)
+        assert diff["current_version"] == "builtin" and diff["candidate_version"] == "candidate"
+        assert diff["current_score"] > diff["candidate_score"] == 5
+        assert diff["current_level"] == "high" and diff["candidate_level"] == "low"
+        assert diff["gained"] == []
+        assert {"還付金", "ATMで", "市役所"} <= set(diff["lost"])
+
+    def test_dark_job_threshold_flip(self):
+        diff = compare_rule_sets("dark_job", DARK_JOB_TEXT, BUILTIN_RULES, CANDIDATE)
+        assert diff["current_score"] == diff["candidate_score"]
+        assert diff["candidate_level"] == "high"
+        assert diff["gained"] == diff["lost"] == []
+
+    def test_unknown_analyzer(self):
+        with pytest.raises(ValueError):
+            compare_rule_sets("metadata", SCAM_TEXT, BUILTIN_RULES, CANDIDATE)
+
+    def test_worker_loads_configured_bundles(self, tmp_path, monkeypatch):
+        path = tmp_path / "candidate.json"
+        path.write_text('{"version": "c1", "scam": {"urgency_keywords": ["至急"]}}', encoding="utf-8")
+        monkeypatch.setattr(get_settings(), "shadow_rule_bundle_path", str(path))
+        shadow_eval._worker_registries.cache_clear()
+        try:
+            diff = shadow_compare("conversation", SCAM_TEXT + "至急")
+            assert diff["candidate_version"] == "c1"
+            assert diff["gained"] == ["至急"]
+        finally:
+            shadow_eval._worker_registries.cache_clear()
+
+    def test_worker_rejects_unloaded_candidate(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(get_settings(), "shadow_rule_bundle_path", str(tmp_path / "missing.json"))
+        shadow_eval._worker_registries.cache_clear()
+        try:
+            with pytest.raises(ValueError):
+                shadow_compare("conversation", SCAM_TEXT)
+        finally:
+            shadow_eval._worker_registries.cache_clear()
+
+
+class TestShadowStats:
+    def test_aggregates(self):
+        stats = ShadowStats()
+        stats.record(_diff(0))
+        stats.record(_diff(-30, lost=["還付金"], levels=("high", "low")))
+        stats.record(_diff(15, gained=["給付金"], lost=["還付金"], levels=("low", "medium")))
+        summary = stats.summary()["analyzers"]["conversation"]
+        assert summary["evaluated"] == 3 and summary["changed"] == 2
+        assert summary["mean_delta"] == -5.0 and summary["mean_abs_delta"] == 15.0
+        assert summary["max_increase"] == 15 and summary["max_decrease"] == -30
+        assert summary["delta_histogram"]["<=-20"] == 1
+        assert summary["delta_histogram"]["<=0"] == 1
+        assert summary["delta_histogram"]["<=20"] == 1
+        assert sum(summary["delta_histogram"].values()) == 3
+        assert summary["flips"] == [
+            {"current": "high", "candidate": "low", "count": 1},
+            {"current": "low", "candidate": "medium", "count": 1},
+        ]
+        assert summary["keywords"][0] == {"keyword": "還付金", "gained": 0, "lost": 2}
+        assert stats.summary()["analyzers"]["dark_job"]["evaluated"] == 0
+
+    def test_keywords_are_bounded(self, monkeypatch):
+        monkeypatch.setattr(shadow_eval, "MAX_KEYWORDS", 2)
+        stats = ShadowStats()
+        stats.record(_diff(5, gained=["a", "b", "c", "d"]))
+        keywords = {k["keyword"]: k["gained"] for k in stats.summary()["analyzers"]["conversation"]["keywords"]}
+        assert keywords == {"a": 1, "b": 1, OTHER_KEYWORD: 2}
+
+    def test_version_change_restarts_aggregates(self):
+        stats = ShadowStats()
+        stats.sampled = 3
+        stats.record(_diff(10))
+        stats.record(_diff(10, versions=("builtin", "candidate-2")))
+        summary = stats.summary()
+        assert summary["candidate_version"] == "candidate-2"
+        assert summary["analyzers"]["conversation"]["evaluated"] == 1
+        assert summary["sampled"] == 3
+
+
+class TestShadowEvaluator:
+    def _evaluator(self, **kwargs) -> ShadowEvaluator:
+        return ShadowEvaluator(
+            True,
+            1.0,
+            pool="admin",
+            compare=lambda analyzer, text: compare_rule_sets(analyzer, text, BUILTIN_RULES, CANDIDATE),
+            **kwargs,
+        )
+
+    def test_sampling(self):
+        assert not ShadowEvaluator(False, 1.0).sample()
+        assert ShadowEvaluator(True, 0.5, random_value=lambda: 0.4).sample()
+        assert not ShadowEvaluator(True, 0.5, random_value=lambda: 0.5).sample()
+
+    def test_evaluates_in_background(self):
+        evaluator = self._evaluator()
+
+        async def run():
+            await evaluator.submit("conversation", SCAM_TEXT)
+            await evaluator.submit("dark_job", DARK_JOB_TEXT)
+            await evaluator.drain()
+
+        asyncio.run(run())
+        summary = evaluator.stats.summary()
+        assert summary["sampled"] == 2 and summary["errors"] == 0
+        assert summary["analyzers"]["conversation"]["flips"][0]["candidate"] == "low"
+        assert summary["analyzers"]["dark_job"]["evaluated"] == 1
+
+    def test_sheds_when_primary_pool_is_busy(self):
+        primary = get_executor("shadow-test-primary")
+        evaluator = self._evaluator(primary_pool="shadow-test-primary")
+        primary._pending = primary.workers
+        try:
+            asyncio.run(evaluator.submit("conversation", SCAM_TEXT))
+        finally:
+            primary._pending = 0
+        assert evaluator.stats.shed == {"busy": 1}
+        assert evaluator.stats.summary()["analyzers"]["conversation"]["evaluated"] == 0
+
+    def test_sheds_when_shadow_pool_is_full(self):
+        pool = get_executor("shadow-test-full")
+        evaluator = ShadowEvaluator(True, 1.0, pool="shadow-test-full")
+        pool._pending = pool.capacity
+        try:
+            asyncio.run(evaluator.submit("conversation", SCAM_TEXT))
+        finally:
+            pool._pending = 0
+        assert evaluator.stats.shed == {"queue_full": 1}
+
+    def test_counts_errors(self):
+        def fail(analyzer, text):
+            raise ValueError("候補ルールバンドルが読み込まれていません")
+
+        evaluator = ShadowEvaluator(True, 1.0, pool="admin", compare=fail)
+
+        async def run():
+            await evaluator.submit("conversation", SCAM_TEXT)
+            await evaluator.drain()
+
+        asyncio.run(run())
+        assert evaluator.stats.errors == 1
+
+
+class TestShadowEndpoints:
+    def test_conversation_schedules_shadow_after_response(self, monkeypatch):
+        evaluator = ShadowEvaluator(True, 1.0)
+        submitted = []
+
+        async def submit(analyzer, text):
+            submitted.append((analyzer, text))
+
+        monkeypatch.setattr(evaluator, "submit", submit)
+        monkeypatch.setattr(conversation, "shadow", evaluator)
+        response = client.post("/api/v1/analyze/conversation", json={"text": SCAM_TEXT})
+        assert response.status_code == 200
+        assert submitted == [("conversation", SCAM_TEXT)]
+
+    def test_not_sampled_by_default(self):
+        assert not conversation.shadow.enabled
+
+    def test_summary_endpoint(self, monkeypatch):
+        evaluator = ShadowEvaluator(True, 0.1)
+        evaluator.stats.record(_diff(-30, lost=["還付金"], levels=("high", "low")))
+        monkeypatch.setattr(admin, "get_shadow_evaluator", lambda: evaluator)
+        monkeypatch.setattr(get_settings(), "admin_token", "secret")
+        assert client.get("/api/v1/admin/shadow").status_code == 403
+
+        response = client.get("/api/v1/admin/shadow", headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["enabled"] is True and body["sample_rate"] == 0.1
+        assert body["candidate_version"] == "candidate"
+        assert body["analyzers"]["conversation"]["keywords"] == [{"keyword": "還付金", "gained": 0, "lost": 1}]
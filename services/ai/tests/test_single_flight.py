@@ -0,0 +1,150 @@
+"""Request coalescing tests."""
+
+import asyncio
+import threading
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import coalescing, dark_job
+from app.services.single_flight import SingleFlight, flight_key, singleflight_coalesced_total
+
+
+def _coalesced(operation: str, reason: str) -> float:
+    return singleflight_coalesced_total.labels(operation=operation, reason=reason)._value.get()
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_share_one_computation(self):
+        flight = SingleFlight("test-share")
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"risk_score": 80}
+
+        async def main():
+            key = flight_key("本文")
+            return await asyncio.gather(*(flight.run(key, compute) for _ in range(5)))
+
+        results = asyncio.run(main())
+        assert calls == [1]
+        assert results == [{"risk_score": 80}] * 5
+        # 最初の呼び出し側も合流側も複製を受け取る
+        assert len({id(r) for r in results}) == 5
+        assert flight.in_flight == 0
+        assert _coalesced("test-share", "content") == 4
+
+    def test_request_id_reason(self):
+        flight = SingleFlight("test-retry")
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            return 1
+
+        async def main():
+            key = flight_key("本文")
+            return await asyncio.gather(
+                flight.run(key, compute, request_id="req-1"),
+                flight.run(key, compute, request_id="req-1"),
+                flight.run(key, compute, request_id="req-2"),
+            )
+
+        assert asyncio.run(main()) == [1, 1, 1]
+        assert _coalesced("test-retry", "request_id") == 1
+        assert _coalesced("test-retry", "content") == 1
+
+    def test_different_keys_run_separately(self):
+        flight = SingleFlight("test-separate")
+        calls = []
+
+        async def compute(value):
+            calls.append(value)
+            await asyncio.sleep(0)
+            return value
+
+        async def main():
+            return await asyncio.gather(
+                flight.run(flight_key("a"), lambda: compute("a")),
+                flight.run(flight_key("b"), lambda: compute("b")),
+            )
+
+        assert asyncio.run(main()) == ["a", "b"]
+        assert sorted(calls) == ["a", "b"]
+
+    def test_exception_propagates_to_all(self):
+        flight = SingleFlight("test-error")
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def main():
+            key = flight_key("x")
+            return await asyncio.gather(
+                flight.run(key, compute), flight.run(key, compute), return_exceptions=True
+            )
+
+        results = asyncio.run(main())
+        assert all(isinstance(r, ValueError) for r in results)
+        assert flight.in_flight == 0
+
+    def test_key_distinguishes_none(self):
+        assert flight_key("a", None) != flight_key("a", "")
+        assert flight_key("ab", "c") != flight_key("a", "bc")
+
+
+class TestCoalescedEndpoints:
+    def test_concurrent_identical_requests(self, monkeypatch):
+        calls = []
+        release = threading.Event()
+        original = coalescing.run_in_pool
+
+        async def slow_pool(pool, fn, *args):
+            calls.append(args)
+            await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+            return await original(pool, fn, *args)
+
+        monkeypatch.setattr(coalescing, "run_in_pool", slow_pool)
+
+        async def main():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                body = {"text": "合流テスト: 市役所から還付金のお知らせです"}
+                requests = [
+                    client.post("/api/v1/analyze/conversation", json=body, headers={"X-Request-ID": "retry-1"})
+                    for _ in range(3)
+                ]
+                gathered = asyncio.gather(*requests)
+                await asyncio.sleep(0.05)
+                release.set()
+                return await gathered
+
+        responses = asyncio.run(main())
+        assert [r.status_code for r in responses] == [200, 200, 200]
+        assert len({r.text for r in responses}) == 1
+        assert len(calls) == 1
+
+    def test_ocr_text_does_not_leak_into_joined_text_check(self):
+        text = "合流テスト: 日給10万の受け子、Telegramで連絡"
+
+        async def main():
+            return await asyncio.gather(
+                dark_job._check_extracted_text(text, None, None),
+                dark_job._check_text(text, None),
+            )
+
+        image_result, text_result = asyncio.run(main())
+        assert image_result["extracted_text"] == text
+        assert "extracted_text" not in text_result
+
+    @pytest.mark.parametrize("path", ["/api/v1/check/dark-job", "/api/v1/analyze/quick-check"])
+    def test_sequential_requests_unaffected(self, path):
+        client = TestClient(app)
+        first = client.post(path, json={"text": "日給10万の高額バイト"})
+        second = client.post(path, json={"text": "日給10万の高額バイト"})
+        assert first.status_code == second.status_code == 200
+        assert first.json() == second.json()
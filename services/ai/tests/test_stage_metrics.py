@@ -0,0 +1,117 @@
+"""Stage-level latency metrics tests."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY, CollectorRegistry
+
+from app.main import app
+from app.services import stage_metrics
+from app.services.stage_metrics import MultiProcessStageCollector, collect_stages, replay_stages, reset_endpoint, set_endpoint, stage
+
+client = TestClient(app)
+
+
+def _count(endpoint: str, name: str) -> float:
+    value = REGISTRY.get_sample_value(
+        "analysis_stage_duration_seconds_count", {"endpoint": endpoint, "stage": name}
+    )
+    return value or 0.0
+
+
+def _chars(endpoint: str) -> float:
+    return REGISTRY.get_sample_value("analysis_input_chars_total", {"endpoint": endpoint}) or 0.0
+
+
+@pytest.fixture
+def endpoint():
+    token = set_endpoint("/test/stage")
+    yield "/test/stage"
+    reset_endpoint(token)
+
+
+class TestStage:
+    def test_records_duration_and_input(self, endpoint):
+        before = _count(endpoint, "match")
+        chars_before = _chars(endpoint)
+        with stage("match", chars=120):
+            pass
+        assert _count(endpoint, "match") == before + 1
+        assert _chars(endpoint) == chars_before + 120
+        buckets = REGISTRY.get_sample_value(
+            "analysis_stage_duration_seconds_bucket", {"endpoint": endpoint, "stage": "match", "le": "+Inf"}
+        )
+        assert buckets == _count(endpoint, "match")
+
+    def test_merges_threads(self):
+        before = _count("none", "threaded")
+
+        def work():
+            with stage("threaded"):
+                pass
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            for _ in range(20):
+                pool.submit(work)
+        assert _count("none", "threaded") == before + 20
+
+    def test_disabled(self, endpoint, monkeypatch):
+        monkeypatch.setattr(stage_metrics, "_enabled", False)
+        before = _count(endpoint, "off")
+        with stage("off", chars=10):
+            pass
+        assert _count(endpoint, "off") == before
+
+    def test_collect_and_replay(self, endpoint):
+        def worker():
+            with stage("ocr", nbytes=2048):
+                return "text"
+
+        result, observations = collect_stages(worker)
+        assert result == "text"
+        assert [(name, nbytes) for name, _, _, nbytes in observations] == [("ocr", 2048)]
+
+        before = _count(endpoint, "ocr")
+        replay_stages(observations)
+        assert _count(endpoint, "ocr") == before + 1
+        assert REGISTRY.get_sample_value("analysis_input_bytes_total", {"endpoint": endpoint}) >= 2048
+
+
+class TestEndpointStages:
+    def test_dark_job_stages(self):
+        path = "/api/v1/check/dark-job"
+        text = "ステージ計測: 日給10万の受け子、Telegramで連絡"
+        before = {name: _count(path, name) for name in ("keyword_match", "score", "serialize")}
+        chars_before = _chars(path)
+        assert client.post(path, json={"text": text}).status_code == 200
+        for name, count in before.items():
+            assert _count(path, name) == count + 1
+        assert _chars(path) == chars_before + len(text)
+
+    def test_summary_key_points(self):
+        path = "/api/v1/analyze/conversation-summary"
+        before = _count(path, "key_points")
+        client.post(path, json={"text": "ステージ計測。息子が事故を起こした。"})
+        assert _count(path, "key_points") == before + 1
+
+
+class TestMultiProcess:
+    def test_snapshots_are_summed(self, endpoint, tmp_path, monkeypatch):
+        monkeypatch.setattr(stage_metrics, "MULTIPROCESS", True)
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+        with stage("snapshot", chars=7):
+            pass
+        own = _count(endpoint, "snapshot")
+        stage_metrics.flush()
+        # 別のワーカーのスナップショットに見立てて、同じ内容を別 pid で書き出す
+        stage_metrics.write_snapshot(tmp_path, pid=1)
+        (tmp_path / "stage_metrics_2.json").write_text("{broken")
+
+        registry = CollectorRegistry()
+        MultiProcessStageCollector(registry)
+        count = registry.get_sample_value(
+            "analysis_stage_duration_seconds_count", {"endpoint": endpoint, "stage": "snapshot"}
+        )
+        assert count == own * 2
+        assert registry.get_sample_value("analysis_input_chars_total", {"endpoint": endpoint}) == _chars(endpoint) * 2
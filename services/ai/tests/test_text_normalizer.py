@@ -0,0 +1,76 @@
+"""Text normalizer tests."""
+
+import numpy as np
+
+from app.services.proximity_rules import ProximityRuleEngine
+from app.services.scam_analyzer import ScamAnalyzer
+from app.services.text_normalizer import keyword_variants, normalize_text
+
+
+class TestNormalizeText:
+    def test_folds_width_case_and_kana(self):
+        assert normalize_text("ＡＴＭでﾃﾚｸﾞﾗﾑ").text == "atmでてれぐらむ"
+        assert normalize_text("キャッシュカード").text == normalize_text("きゃっしゅかーど").text
+
+    def test_strips_spaces_and_symbols_keeping_offsets(self):
+        normalized = normalize_text("振 込・ATM")
+        assert normalized.text == "振込atm"
+        assert normalized.to_original([0, 1, 2]) == [0, 2, 4]
+        assert normalized.original_end(2) == 3
+        # 位置の対応表は文字数ぶん確保するため int32 で持つ
+        assert normalized.offsets.dtype == np.int32
+        assert normalize_text("㈱・ｶﾞ").offsets.dtype == np.int32
+
+    def test_keeps_one_space_between_ascii_words(self):
+        assert normalize_text("admission office,  good morning").text == "admission office good morning"
+        assert normalize_text("L・I・N・E 追加").text == "l i n e追加"
+        normalized = normalize_text("ok 、 ｶﾞ ok")
+        assert normalized.text == "okがok"
+        normalized = normalize_text("ｶﾞ good,  morning")
+        assert normalized.text == "がgood morning"
+        assert normalized.to_original([5, 6]) == [7, 10]
+
+    def test_keeps_line_breaks_and_separators(self):
+        assert normalize_text("口座\n開設\x00現金").text == "口座\n開設\x00現金"
+
+    def test_unchanged_length_has_no_offsets(self):
+        normalized = normalize_text("還付金ATM")
+        assert normalized.offsets is None
+        assert normalized.to_original([2]) == [2]
+
+    def test_expands_compatibility_characters(self):
+        normalized = normalize_text("㈱ｶﾞ")
+        assert normalized.text == "株が"
+        assert normalized.to_original(list(range(len(normalized.text)))) == [0, 1]
+
+    def test_keeps_astral_characters(self):
+        assert normalize_text("送金😀 ＯＫ").text == "送金😀ok"
+
+    def test_reuses_last_result(self):
+        text = "本日中にお振込みください"
+        assert normalize_text(text) is normalize_text(text)
+
+
+class TestKeywordVariants:
+    def test_expands_okurigana(self):
+        assert set(keyword_variants("振り込み")) == {"振り込み", "振込み"}
+        assert keyword_variants("払い戻し")[0] == "払い戻し"
+        assert "払戻" in keyword_variants("払い戻し")
+
+    def test_normalizes_each_variant(self):
+        assert keyword_variants("ＬＩＮＥ追加") == ["line追加", "l i n e追加"]
+        assert keyword_variants(" ") == []
+
+
+class TestAnalyzersSeeVariants:
+    def test_scam_analyzer_catches_respelled_keywords(self):
+        analyzer = ScamAnalyzer()
+        plain = analyzer.analyze("還付金の手続きでATMに行ってください")
+        respelled = analyzer.analyze("還 付 金の手続でＡＴＭに行ってください")
+        assert respelled["risk_score"] == plain["risk_score"]
+        assert respelled["scam_type"] == plain["scam_type"]
+
+    def test_proximity_gap_uses_original_offsets(self):
+        engine = ProximityRuleEngine([("受け取", "現金", 15, 5)])
+        assert engine.boost("受取った現金") == 15
+        assert engine.boost("受 け 取ったあとで、その現金") == 0
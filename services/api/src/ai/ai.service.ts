@@ -2,6 +2,7 @@ import { Injectable, Logger } from '@nestjs/common';
 import { ConfigService } from '@nestjs/config';
 import { HttpService } from '@nestjs/axios';
 import { firstValueFrom, timeout, catchError } from 'rxjs';
+import { randomUUID } from 'crypto';
 import { PrismaService } from '../prisma/prisma.service';
 import {
   CircuitBreaker,
@@ -41,11 +42,13 @@ export class AiService {
     data: any,
     timeoutMs = 3000,
   ): Promise<T> {
+    // 再送時も同じIDを送り、AIサービス側で実行中の解析に合流させる
+    const headers = { 'X-Request-ID': randomUUID() };
     return this.circuitBreaker.execute(() =>
       withRetry(
         async () => {
           const response = await firstValueFrom(
-            this.http.post(url, data).pipe(
+            this.http.post(url, data, { headers }).pipe(
               timeout(timeoutMs),
               catchError((err) => {
                 throw err;